@@ -1,29 +1,43 @@
-import os
+import sys
 import time
+import select
 import subprocess
-import psutil
-import json
-import lz4.block
-import sqlite3
-from collections import defaultdict
 from datetime import datetime, timedelta
 
+from segment_log import append_segment
+from symbols import default_table
+from browser_sources import BrowserCollector, history_sources, history_title_map
+from history_index import default_index
+from chromium_sessions import ChromiumSessions
+from url_engine import site_key
+from firefox_profiles import default_profile_path, recovery_file, places_sources, read_session_tabs
+from memory_budget import LRUCache, SpillCounter, install_report_signal
+from checkpoint import Checkpoint, CheckpointedCounter
+from adaptive_rate import default_rate, XIdle
+from lazy_import import lazy_module
+from offload import default_pool
+
+psutil = lazy_module("psutil")
+
 # === CONFIG ===
-FIREFOX_PROFILE_PATH = "/home/wassef/snap/firefox/common/.mozilla/firefox/3afnh5rk.default"
-RECOVERY_FILE = os.path.join(FIREFOX_PROFILE_PATH, "sessionstore-backups", "recovery.jsonlz4")
+FIREFOX_PROFILE_PATH = default_profile_path()  # from profiles.ini (native, Snap or Flatpak)
+RECOVERY_FILE = recovery_file(FIREFOX_PROFILE_PATH)
 
 IGNORED_PROCESSES = {"Xwayland", "Xorg", "gnome-shell", "gnome-shell-calendar-server", "pipewire"}
 IGNORED_DISPLAY_APPS = {"Isolated Web Co", "Unknown"}
-
-CHROMIUM_PATHS = {
-    "chrome": os.path.expanduser("~/.config/google-chrome/Default/History"),
-    "brave": os.path.expanduser("~/.config/BraveSoftware/Brave-Browser/Default/History"),
-    "edge": os.path.expanduser("~/.config/microsoft-edge/Default/History")
-}
+CHROMIUM_APPS = {"chrome", "brave", "edge", "msedge"}
 
 HISTORY_UPDATE_INTERVAL = 10  # seconds
-history_cache = {}
+HEARTBEAT_INTERVAL = 5  # seconds; --events mode extends the checkpointed segment this often
+history_cache = LRUCache("history_cache")  # page title -> url, refreshed in place
+history_collector = None  # one history source per Chromium/Firefox profile (browser_sources)
 last_history_update = datetime.min
+chromium_sessions = ChromiumSessions()  # active tab from Session_* files, no debug port needed
+
+# Focus polling speeds up with frequent switches; both stretch on battery and when idle
+sampling = default_rate()
+sampling.register("focus_poll", 1, high=15, follows_focus=True)  # spawns xdotool every wakeup
+sampling.register("browser_history", HISTORY_UPDATE_INTERVAL, high=300, expensive=True)
 
 # === UTILITIES ===
 def is_gui_process(proc):
@@ -74,30 +88,24 @@ def get_best_gui_app():
     gui_candidates.sort(key=lambda x: x[1], reverse=True)
     return gui_candidates[0][0] if gui_candidates else "Unknown"
 
+def read_firefox_session():
+    """Active and open tabs from recovery.jsonlz4, parsed in an offload worker (multi-MB JSON)."""
+    return default_pool().run("firefox_session", read_session_tabs, RECOVERY_FILE)
+
 def get_current_firefox_tab_url():
+    """Return (title, url) of the active tab in Firefox from recovery.jsonlz4."""
     try:
-        with open(RECOVERY_FILE, "rb") as f:
-            f.read(8)  # Skip LZ4 magic header
-            json_data = lz4.block.decompress(f.read()).decode("utf-8")
-            session = json.loads(json_data)
-
-            selected_win_idx = session.get("selectedWindow", 1) - 1
-            windows = session.get("windows", [])
-            if not windows or selected_win_idx >= len(windows):
-                return None, None
-            win = windows[selected_win_idx]
-
-            selected_tab_idx = win.get("selected", 1) - 1
-            tabs = win.get("tabs", [])
-            if not tabs or selected_tab_idx >= len(tabs):
-                return None, None
-            tab = tabs[selected_tab_idx]
-
-            entries = tab.get("entries", [])
-            i = tab.get("index", 1) - 1
-            if 0 <= i < len(entries):
-                entry = entries[i]
-                return entry.get("title", "").strip(), entry.get("url", "").strip()
+        return read_firefox_session()["selected"] or (None, None)
+    except Exception as e:
+        print("⚠️ Error reading Firefox session:", e)
+    return None, None
+
+def find_firefox_url_by_title(window_title):
+    """URL of the open Firefox tab whose page title appears in window_title."""
+    try:
+        for title, url in read_firefox_session()["tabs"]:
+            if title and title in window_title:
+                return title, url
     except Exception as e:
         print("⚠️ Error reading Firefox session:", e)
     return None, None
@@ -109,109 +117,211 @@ def get_active_window_title():
     except Exception:
         return None
 
-def read_history(db_path):
-    if not os.path.exists(db_path):
-        return []
-    temp_copy = "/tmp/browser_history_copy"
-    try:
-        if os.path.exists(temp_copy):
-            os.remove(temp_copy)
-        os.system(f"cp '{db_path}' '{temp_copy}'")
-        conn = sqlite3.connect(temp_copy)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT urls.url, urls.title, urls.last_visit_time
-            FROM urls
-            ORDER BY last_visit_time DESC
-            LIMIT 100
-        """)
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    except Exception as e:
-        print(f"Failed to read {db_path}: {e}")
-        return []
-
 def update_history_cache():
-    global history_cache
-    new_cache = {}
-    for _, path in CHROMIUM_PATHS.items():
-        entries = read_history(path)
-        for url, title, _ in entries:
-            if url and title:
-                new_cache[title] = url
-    history_cache = new_cache
+    """Refresh Chromium histories and index new Firefox visits concurrently; a slow browser serves its last result."""
+    global history_collector
+    index = default_index()
+    if history_collector is None:
+        history_collector = BrowserCollector(history_sources() + places_sources(index))
+    history_title_map(history_collector, index, into=history_cache)
+
+def refresh_history_cache():
+    """Re-read browser history when its (adaptive) interval has passed; skipped while locked or away."""
+    global last_history_update
+    if sampling.due("browser_history", (datetime.now() - last_history_update).total_seconds()):
+        update_history_cache()
+        last_history_update = datetime.now()
 
 def find_url_by_title(title):
-    if title in history_cache:
-        return history_cache[title]
+    url = history_cache.get(title)
+    if url:
+        return url
     for cached_title in history_cache:
         if cached_title in title or title in cached_title:
-            return history_cache[cached_title]
-    return None
+            return history_cache.get(cached_title)
+    # Evicted or older than the cached window: the history index has every visit
+    return default_index().url_for_title(title)
 
 # === TRACKING ===
-def track_forever(interval=1):
+def open_checkpoint(symbols):
+    """Usage counters that survive a crash or logout, with a crashed run's totals and open segment restored."""
+    checkpoint = Checkpoint("FirefoxChromiumBrowsersAppUsage", ("app_usage", "site_usage"))
+    app_usage = CheckpointedCounter(SpillCounter("app_usage"), checkpoint, "app_usage")    # symbol id -> seconds
+    site_usage = CheckpointedCounter(SpillCounter("site_usage"), checkpoint, "site_usage")  # symbol id -> seconds
+    segment = checkpoint.take_segment()
+    if segment:
+        (app, site, title, url), start, seen = segment
+        if seen > start:
+            app_usage.add(app, seen - start)
+            if site is not None:
+                site_usage.add(site, seen - start)
+            append_segment(symbols.name(app), start, seen,
+                           title and symbols.name(title), url and symbols.name(url))
+            print(f"⚠️ Recovered {seen - start:.0f} s of {symbols.name(app)} from an interrupted run")
+    return checkpoint, app_usage, site_usage
+
+def open_segment(checkpoint, symbols, start, app, site, title, url):
+    """Checkpoint the segment that just started; empty names are stored as absent."""
+    checkpoint.open_segment(start, *(symbols.intern(name) if name else None for name in (app, site, title, url)))
+
+def track_forever():
     print("🟢 GUI + Website Tracker is running (Ctrl+C to stop)...")
 
-    app_usage = defaultdict(float)
-    site_usage = defaultdict(float)
+    symbols = default_table()
+    checkpoint, app_usage, site_usage = open_checkpoint(symbols)
     active_app = None
     active_site = None
+    active_page = (None, None)
     app_start_time = time.time()
 
-    global last_history_update
     try:
         while True:
             now = time.time()
-
-            if (datetime.now() - last_history_update).total_seconds() > HISTORY_UPDATE_INTERVAL:
-                update_history_cache()
-                last_history_update = datetime.now()
+            refresh_history_cache()
 
             current_app = get_best_gui_app()
             current_site = None
+            current_page = (None, None)
 
             if current_app == "firefox":
                 title, url = get_current_firefox_tab_url()
                 if url:
-                    current_site = f"{title} ({url})"
-            elif current_app.lower() in {"chrome", "brave", "edge"}:
-                window_title = get_active_window_title()
-                if window_title:
-                    url = find_url_by_title(window_title)
-                    if url:
-                        current_site = f"{window_title} ({url})"
+                    current_site = site_key(url)
+                    current_page = (title, url)
+            elif current_app.lower() in CHROMIUM_APPS:
+                tab = chromium_sessions.active_tab(current_app)
+                if tab:
+                    url, title = tab
+                    current_site = site_key(url)
+                    current_page = (title, url)
+                else:
+                    window_title = get_active_window_title()
+                    if window_title:
+                        url = find_url_by_title(window_title)
+                        if url:
+                            current_site = site_key(url)
+                            current_page = (window_title, url)
 
             if current_app != active_app or current_site != active_site:
                 if active_app and active_app != "Unknown":
                     delta = now - app_start_time
-                    app_usage[active_app] += delta
+                    app_usage.add(symbols.intern(active_app), delta)
                     if active_site:
-                        site_usage[active_site] += delta
+                        site_usage.add(symbols.intern(active_site), delta)
+                    append_segment(active_app, app_start_time, now, *active_page)
                 active_app = current_app
                 active_site = current_site
+                active_page = current_page
                 app_start_time = now
+                if active_app != "Unknown":
+                    open_segment(checkpoint, symbols, now, active_app, active_site, *active_page)
+                else:
+                    checkpoint.close_segment()
+                sampling.note_focus_change(now)
+            else:
+                checkpoint.heartbeat(now)
 
-            time.sleep(interval)
+            sampling.wait("focus_poll")
 
     except KeyboardInterrupt:
         # Final log
         if active_app and active_app != "Unknown":
-            delta = time.time() - app_start_time
-            app_usage[active_app] += delta
+            now = time.time()
+            delta = now - app_start_time
+            app_usage.add(symbols.intern(active_app), delta)
             if active_site:
-                site_usage[active_site] += delta
+                site_usage.add(symbols.intern(active_site), delta)
+            append_segment(active_app, app_start_time, now, *active_page)
 
-        print("\n\n📊 Application usage report:")
-        for app, seconds in sorted(app_usage.items(), key=lambda x: -x[1]):
-            if app not in IGNORED_DISPLAY_APPS:
-                print(f" - {app}: {seconds:.2f} seconds")
+        print_usage_report(symbols, app_usage, site_usage)
+        checkpoint.close()
+        sampling.report()
+
+def resolve_site(app, window_title):
+    """(page title, url) shown in a browser window, or (None, None)."""
+    if not app or not window_title:
+        return None, None
+    if app == "firefox":
+        return find_firefox_url_by_title(window_title)
+    if app.lower() in CHROMIUM_APPS:
+        tab = chromium_sessions.active_tab(app)
+        if tab:
+            return tab[1], tab[0]
+        refresh_history_cache()
+        url = find_url_by_title(window_title)
+        if url:
+            return window_title, url
+    return None, None
 
-        print("\n🌐 Website usage report:")
-        for site, seconds in sorted(site_usage.items(), key=lambda x: -x[1]):
-            print(f" - {site}: {seconds:.2f} seconds")
+def track_events():
+    """Like track_forever, but driven by X focus/title change events instead of polling."""
+    from title_watcher import TitleWatcher
+
+    print("🟢 Event-driven GUI + Website Tracker is running (Ctrl+C to stop)...")
+    symbols = default_table()
+    checkpoint, app_usage, site_usage = open_checkpoint(symbols)
+
+    opened = [None, None]  # (app, title, start) of the checkpointed segment, its (page title, url)
+
+    def on_segment(app, window_title, start, end):
+        if app == "Unknown":
+            return
+        if opened[0] == (app, window_title, start):
+            page_title, url = opened[1]
+        else:
+            page_title, url = resolve_site(app, window_title)
+        app_usage.add(symbols.intern(app), end - start)
+        if url:
+            site_usage.add(symbols.intern(site_key(url)), end - start)
+        append_segment(app, start, end, window_title, url)
+
+    watcher = TitleWatcher(on_segment, app_resolver=resolve_main_process_name)
+    try:
+        watcher.listen()
+        while True:
+            current = watcher.current()
+            app, window_title, start = current
+            if current == opened[0]:
+                checkpoint.heartbeat()
+            else:
+                opened[0] = current
+                opened[1] = resolve_site(app, window_title)
+                if app and app != "Unknown":
+                    url = opened[1][1]
+                    open_segment(checkpoint, symbols, start, app, url and site_key(url), window_title, url)
+                else:
+                    checkpoint.close_segment()
+            select.select([watcher], [], [], HEARTBEAT_INTERVAL)
+            if not watcher.dispatch():
+                break
+    except KeyboardInterrupt:
+        pass
+    watcher.close_segment()
+    print_usage_report(symbols, app_usage, site_usage)
+    checkpoint.close()
+
+def print_usage_report(symbols, app_usage, site_usage):
+    print("\n\n📊 Application usage report:")
+    for sid, seconds in sorted(app_usage.items(), key=lambda x: -x[1]):
+        app = symbols.name(sid)
+        if app not in IGNORED_DISPLAY_APPS:
+            print(f" - {app}: {seconds:.2f} seconds")
+
+    print("\n🌐 Website usage report:")
+    for sid, seconds in sorted(site_usage.items(), key=lambda x: -x[1]):
+        print(f" - {symbols.name(sid)}: {seconds:.2f} seconds")
 
 # === MAIN ===
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
+    sampling.idle_source = XIdle().query  # no input listeners here: idle and screensaver state from X
+    if "--events" in argv:
+        track_events()
+    else:
+        track_forever()
+    return 0
+
+
 if __name__ == "__main__":
-    track_forever()
+    sys.exit(main())
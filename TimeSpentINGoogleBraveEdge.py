@@ -1,20 +1,25 @@
-import os
-import sqlite3
 import time
 import subprocess
 from datetime import datetime, timedelta
-from collections import defaultdict
 
-CHROMIUM_PATHS = {
-    "chrome": os.path.expanduser("~/.config/google-chrome/Default/History"),
-    "brave": os.path.expanduser("~/.config/BraveSoftware/Brave-Browser/Default/History"),
-    "edge": os.path.expanduser("~/.config/microsoft-edge/Default/History")
-}
-
-history_cache = {}
+from segment_log import append_segment
+from symbols import default_table
+from browser_sources import BrowserCollector, history_sources, history_title_map
+from history_index import default_index
+from firefox_profiles import places_sources
+from memory_budget import LRUCache, SpillCounter, install_report_signal
+from adaptive_rate import default_rate, XIdle
+from checkpoint import Checkpoint, CheckpointedCounter
+
+history_cache = LRUCache("history_cache")  # page title -> url, refreshed in place
+history_collector = None  # one history source per Chromium/Firefox profile (browser_sources)
 last_history_update = datetime.min
 HISTORY_UPDATE_INTERVAL = 10
 
+sampling = default_rate()
+sampling.register("title_poll", 1, high=15, follows_focus=True)
+sampling.register("browser_history", HISTORY_UPDATE_INTERVAL, high=300, expensive=True)
+
 def get_active_window_title():
     try:
         title = subprocess.check_output(
@@ -25,63 +30,47 @@ def get_active_window_title():
     except Exception:
         return None
 
-def read_history(db_path):
-    if not os.path.exists(db_path):
-        return []
-
-    temp_copy = "/tmp/browser_history_copy"
-    try:
-        if os.path.exists(temp_copy):
-            os.remove(temp_copy)
-        os.system(f"cp '{db_path}' '{temp_copy}'")
-
-        conn = sqlite3.connect(temp_copy)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT urls.url, urls.title, urls.last_visit_time
-            FROM urls
-            ORDER BY last_visit_time DESC
-            LIMIT 100
-        """)
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    except Exception as e:
-        print(f"Failed to read {db_path}: {e}")
-        return []
-
 def update_history_cache():
-    global history_cache
-    new_cache = {}
-    for browser, path in CHROMIUM_PATHS.items():
-        entries = read_history(path)
-        for url, title, _ in entries:
-            if url and title:
-                new_cache[title] = url
-    history_cache = new_cache
+    """Refresh Chromium histories and index new Firefox visits concurrently; a slow browser serves its last result."""
+    global history_collector
+    index = default_index()
+    if history_collector is None:
+        history_collector = BrowserCollector(history_sources() + places_sources(index))
+    history_title_map(history_collector, index, into=history_cache)
 
 def find_url_by_title(title):
 
-    if title in history_cache:
-        return history_cache[title]
+    url = history_cache.get(title)
+    if url:
+        return url
 
 
     for cached_title in history_cache:
         if cached_title in title or title in cached_title:
-            return history_cache[cached_title]
-    return None
+            return history_cache.get(cached_title)
+    # Evicted or older than the cached window: the history index has every visit
+    return default_index().url_for_title(title)
 
-def main(poll_interval=1):
+def main():
     global last_history_update
 
-    time_spent = defaultdict(float)
+    symbols = default_table()
+    # Survives a crash or logout: a crashed run's totals are restored and its open segment closed
+    checkpoint = Checkpoint("TimeSpentINGoogleBraveEdge", ("time_spent",))
+    time_spent = CheckpointedCounter(SpillCounter("time_spent"), checkpoint, "time_spent")  # (url id, title id) -> seconds
+    segment = checkpoint.take_segment()
+    if segment:
+        (url_id, title_id, _, _), start, seen = segment
+        if seen > start:
+            time_spent.add((url_id, title_id), seen - start)
+            append_segment("browser", start, seen, symbols.name(title_id), symbols.name(url_id))
     current_key = None
     start_time = None
 
     try:
         while True:
             now = time.time()
-            if (datetime.now() - last_history_update).total_seconds() > HISTORY_UPDATE_INTERVAL:
+            if sampling.due("browser_history", (datetime.now() - last_history_update).total_seconds()):
                 update_history_cache()
                 last_history_update = datetime.now()
             active_title = get_active_window_title()
@@ -93,23 +82,40 @@ def main(poll_interval=1):
             if key != current_key:
                 if current_key and start_time:
                     duration = now - start_time
-                    time_spent[current_key] += duration
+                    url, title = current_key
+                    time_spent.add((symbols.intern(url), symbols.intern(title)), duration)
+                    append_segment("browser", start_time, now, title, url)
                 current_key = key
                 start_time = now
+                if key:
+                    checkpoint.open_segment(now, symbols.intern(key[0]), symbols.intern(key[1]))
+                else:
+                    checkpoint.close_segment()
+                sampling.note_focus_change(now)
+            else:
+                checkpoint.heartbeat(now)
 
-            time.sleep(poll_interval)
+            sampling.wait("title_poll")
 
     except KeyboardInterrupt:
 
         if current_key and start_time:
-            duration = time.time() - start_time
-            time_spent[current_key] += duration
+            now = time.time()
+            duration = now - start_time
+            url, title = current_key
+            time_spent.add((symbols.intern(url), symbols.intern(title)), duration)
+            append_segment("browser", start_time, now, title, url)
 
         print("\n📊 Time spent summary:")
-        for (url, title), seconds in sorted(time_spent.items(), key=lambda x: -x[1]):
+        for (url_id, title_id), seconds in sorted(time_spent.items(), key=lambda x: -x[1]):
+            url, title = symbols.name(url_id), symbols.name(title_id)
             mins = int(seconds // 60)
             secs = int(seconds % 60)
             print(f"{mins:02}:{secs:02} | {title[:50]} | {url}")
+        checkpoint.close()
+        sampling.report()
 
 if __name__ == "__main__":
+    install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
+    sampling.idle_source = XIdle().query  # idle and screensaver state from X
     main()
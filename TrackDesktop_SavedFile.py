@@ -1,33 +1,58 @@
+import sys
 import time
 import os
 import json
 import shutil
 import traceback
-import pyautogui
-import psutil
 import subprocess
-from pynput import keyboard, mouse
 from threading import Thread
 from datetime import datetime
 
+from lazy_import import lazy_module
+from automation_detector import AutomationDetector
+from activity_payload import InputCounters
+from memory_budget import SpillCounter, install_report_signal
+from adaptive_rate import default_rate
+from offload import default_pool
+from file_activity import FileActivity, by_focus
+
+# Imported on first use, so importing this module stays fast and side-effect free
+psutil = lazy_module("psutil")
 
 LOG_FILE = "user_activity_detailed.log"
 LOG_SYSTEM="system_usage_detailed.log"
+ALERT_LOG = "automation_alerts.log"
 SCREENSHOT_FOLDER = "screenshots"
 INACTIVITY_THRESHOLD = 20
 SCREENSHOT_INTERVAL = 600
 AUTOMATION_THRESHOLD = 0.02
-
-mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-keyboard_activity = {"key_presses": 0, "keys": []}
-app_usage = {}
+SCREENSHOT_SCOPE = "screen"  # "screen", "monitor" (the one showing the active window) or "window"
+FILE_ROOTS = ["~"]  # where document saves are tracked (fanotify as root, else inotify within a watch budget)
+
+# Interval bounds per collector; the controller stretches them on battery, idle or locked
+sampling = default_rate()
+sampling.register("system_usage", 10, high=300)
+sampling.register("activity_log", 60, high=300)
+sampling.register("inactivity_check", 10, high=120, expensive=True)  # takes a screenshot
+sampling.register("screenshots", SCREENSHOT_INTERVAL, high=3600, expensive=True)
+sampling.register("net_accounting", 1, high=30)
+net_accountant = None  # per-app network bytes; created by main() (may open a capture socket)
+file_watcher = None  # documents created/modified/saved under FILE_ROOTS; started by main()
+
+input_counters = InputCounters(keys_kept=10)  # per-minute counts, drained atomically
+app_usage = SpillCounter("app_usage")  # cumulative per window; cold windows spill to the local store
 last_activity_time = time.time()
 last_screenshot_time = time.time()
 last_mouse_position = (0, 0)
 active_app = None
 app_start_time = time.time()
 
-os.makedirs(SCREENSHOT_FOLDER, exist_ok=True)
+def log_automation_alert(alert):
+    print(f"🚨 Synthetic {alert['channel']} input detected (confidence {alert['confidence']:.2f})")
+    with open(ALERT_LOG, "a") as log_file:
+        log_file.write(json.dumps(alert) + "\n")
+
+automation_detector = AutomationDetector(on_alert=log_automation_alert, jitter_threshold=AUTOMATION_THRESHOLD)
 
 def log_system_usage():
     while True:
@@ -44,7 +69,8 @@ def log_system_usage():
                 "memory_percent": memory.percent,
                 "disk_usage": f"Total: {total / 1024 ** 3:.2f} GB, Used: {used / 1024 ** 3:.2f} GB, Free: {free / 1024 ** 3:.2f} GB",
                 "network_sent": f"{net.bytes_sent / 1024 ** 2:.2f} MB",
-                "network_received": f"{net.bytes_recv / 1024 ** 2:.2f} MB"
+                "network_received": f"{net.bytes_recv / 1024 ** 2:.2f} MB",
+                "network_by_app": net_accountant.drain() if net_accountant else {}
             }
 
             with open(LOG_SYSTEM, "a") as log_file:
@@ -53,7 +79,16 @@ def log_system_usage():
         except Exception as e:
             print(f"Error logging system usage: {e}")
 
-        time.sleep(10)
+        sampling.wait("system_usage")
+
+def track_network():
+    """Socket owners and per-app bytes, about once a second (net_accounting)."""
+    while True:
+        try:
+            net_accountant.tick()
+        except Exception as e:
+            print(f"Error accounting network usage: {e}")
+        sampling.wait("net_accounting")
 
 def get_active_window():
     try:
@@ -71,59 +106,74 @@ def get_active_window():
         return "Unknown"
 
 def update_application_usage():
-    global active_app, app_start_time, app_usage
+    global active_app, app_start_time
     current_app = get_active_window()
 
     if active_app != current_app:
         elapsed_time = time.time() - app_start_time
         if active_app and active_app != "Unknown":
-            app_usage[active_app] = app_usage.get(active_app, 0) + elapsed_time
+            app_usage.add(active_app, elapsed_time)
 
         active_app = current_app
         app_start_time = time.time()
+        sampling.note_focus_change(app_start_time)
 
 def log_user_activity():
-    global mouse_activity, keyboard_activity, app_usage
     while True:
         try:
             update_application_usage()
+            mouse_counts, keyboard_counts = input_counters.drain()
             uptime = time.time() - psutil.boot_time()
 
             log_data = {
                 "timestamp": datetime.now().isoformat(),
-                "mouse_activity": mouse_activity,
+                "mouse_activity": mouse_counts,
                 "keyboard_activity": {
-                    "total_key_presses": keyboard_activity["key_presses"],
-                    "keys": keyboard_activity["keys"][-10:]  # Last 10 keys pressed
+                    "total_key_presses": keyboard_counts["key_presses"],
+                    "keys": keyboard_counts["keys"]  # Last 10 keys pressed
                 },
                 "system_uptime": f"{uptime:.2f} seconds",
-                "application_usage": {app: f"{time_spent:.2f} seconds" for app, time_spent in app_usage.items()}
+                "application_usage": {app: f"{time_spent:.2f} seconds" for app, time_spent in app_usage.items()},
+                "file_activity": by_focus(file_watcher.drain()) if file_watcher else {},  # keyed like application_usage
+                "wakeups_per_hour": sampling.wakeups_per_hour()
             }
 
             with open(LOG_FILE, "a") as log_file:
                 log_file.write(json.dumps(log_data, indent=4) + "\n")
 
-            # Reset counts
-            mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-            keyboard_activity = {"key_presses": 0, "keys": []}
-
         except Exception as e:
             print(f"Error logging user activity: {e}")
 
-        time.sleep(60)  # Log every minute
+        sampling.wait("activity_log")  # every minute, up to 5 when idle or on battery
 
 def take_screenshot(reason="Periodic"):
+    """Grab the screen into shared memory (MIT-SHM); PNG encoding (hundreds of ms of GIL) runs in an offload worker."""
     global last_screenshot_time
+    from screen_capture import default_capture
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     screenshot_path = os.path.join(SCREENSHOT_FOLDER, f"{reason}_screenshot_{timestamp}.png")
-    pyautogui.screenshot(screenshot_path)
+    capture = default_capture()
+    with capture.lock:  # the frame is a view of the reused SHM buffer until save_frame has copied it
+        frame = capture.grab_scope(SCREENSHOT_SCOPE)
+        if frame is None:
+            print(f"Error taking screenshot ({reason}): capture failed")
+            return
+        future = default_pool().save_frame(frame, screenshot_path, capture.rawmode, key=f"screenshot:{reason}")
+    future.add_done_callback(lambda f: report_screenshot(f, reason, screenshot_path))
     last_screenshot_time = time.time()
-    print(f"📸 Screenshot taken ({reason}): {screenshot_path}")
+
+def report_screenshot(future, reason, screenshot_path):
+    if future.cancelled() or (future.exception() is None and future.result() != screenshot_path):
+        print(f"⚠️ Screenshot ({reason}) dropped as stale before it was written: {screenshot_path}")
+    elif future.exception() is not None:
+        print(f"Error saving screenshot: {future.exception()}")
+    else:
+        print(f"📸 Screenshot taken ({reason}): {screenshot_path}")
 
 def track_inactivity():
     global last_activity_time
     while True:
-        time.sleep(10)
+        sampling.wait("inactivity_check")  # suspended while locked or long away: the screen cannot change
         inactive_time = time.time() - last_activity_time
 
         if inactive_time > INACTIVITY_THRESHOLD:
@@ -132,55 +182,74 @@ def track_inactivity():
 
 def periodic_screenshots():
     while True:
-        time.sleep(SCREENSHOT_INTERVAL)
+        sampling.wait("screenshots")
         take_screenshot("Periodic")
 
 def on_key_press(key):
-    global keyboard_activity, last_activity_time
+    global last_activity_time
     try:
-        keyboard_activity["key_presses"] += 1
-        keyboard_activity["keys"].append(str(key))
+        input_counters.key(key)
         last_activity_time = time.time()
+        sampling.note_input(last_activity_time)
+        automation_detector.on_key(last_activity_time)
     except Exception as e:
         print(f"Error in key press event: {e}")
 
 def on_mouse_click(x, y, button, pressed):
-    global mouse_activity, last_activity_time
+    global last_activity_time
     if pressed:
-        mouse_activity["clicks"] += 1
+        input_counters.mouse_event("clicks")
         last_activity_time = time.time()
+        sampling.note_input(last_activity_time)
+        automation_detector.on_click(last_activity_time)
 
 def on_mouse_scroll(x, y, dx, dy):
-    global mouse_activity, last_activity_time
-    mouse_activity["scrolls"] += 1
+    global last_activity_time
+    input_counters.mouse_event("scrolls")
     last_activity_time = time.time()
+    sampling.note_input(last_activity_time)
+    automation_detector.on_scroll(last_activity_time)
 
 def on_mouse_move(x, y):
-    global mouse_activity, last_activity_time
-    mouse_activity["movements"] += 1
+    global last_activity_time
+    input_counters.mouse_event("movements")
     last_activity_time = time.time()
+    sampling.note_input(last_activity_time)
+    automation_detector.on_move(x, y, last_activity_time)
 
-system_usage_thread = Thread(target=log_system_usage)
-system_usage_thread.daemon = True
-system_usage_thread.start()
+def main(argv=None):
+    global net_accountant, file_watcher
+    from pynput import keyboard, mouse
 
-activity_thread = Thread(target=log_user_activity, daemon=True)
-activity_thread.start()
+    os.makedirs(SCREENSHOT_FOLDER, exist_ok=True)
 
-inactivity_thread = Thread(target=track_inactivity, daemon=True)
-inactivity_thread.start()
+    from net_accounting import default_accountant
+    net_accountant = default_accountant()
+    Thread(target=track_network, daemon=True).start()
+    file_watcher = FileActivity(FILE_ROOTS, focus=lambda: active_app,
+                                ignore=[LOG_FILE, LOG_SYSTEM, ALERT_LOG, SCREENSHOT_FOLDER]).start()
 
-screenshot_thread = Thread(target=periodic_screenshots, daemon=True)
-screenshot_thread.start()
+    system_usage_thread = Thread(target=log_system_usage)
+    system_usage_thread.daemon = True
+    system_usage_thread.start()
 
-keyboard_listener = keyboard.Listener(on_press=on_key_press)
-mouse_listener = mouse.Listener(
-    on_click=on_mouse_click, on_scroll=on_mouse_scroll, on_move=on_mouse_move
-)
+    activity_thread = Thread(target=log_user_activity, daemon=True)
+    activity_thread.start()
+
+    inactivity_thread = Thread(target=track_inactivity, daemon=True)
+    inactivity_thread.start()
+
+    screenshot_thread = Thread(target=periodic_screenshots, daemon=True)
+    screenshot_thread.start()
+
+    keyboard_listener = keyboard.Listener(on_press=on_key_press)
+    mouse_listener = mouse.Listener(
+        on_click=on_mouse_click, on_scroll=on_mouse_scroll, on_move=on_mouse_move
+    )
 
-if __name__ == "__main__":
     try:
         print("✅ Activity tracker started. Logging user activity and taking screenshots.")
+        install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
         keyboard_listener.start()
         mouse_listener.start()
         keyboard_listener.join()
@@ -188,3 +257,11 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error in main loop: {e}")
         traceback.print_exc()
+    finally:
+        file_watcher.stop()
+        sampling.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
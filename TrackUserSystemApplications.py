@@ -1,43 +1,66 @@
+import sys
 import time
 import os
 import json
 import shutil
 import traceback
-import psutil
 import subprocess
-from pynput import keyboard, mouse
 from threading import Thread
 from datetime import datetime
-import requests
 import re
 
+from lazy_import import lazy_module
+from activity_payload import UsageAccumulator, InputCounters
+from adaptive_rate import default_rate
+
+# Imported on first use, so importing this module stays fast and side-effect free
+psutil = lazy_module("psutil")
+requests = lazy_module("requests")
+
 ODOO_URL = "http://localhost:8069"
 ODOO_API_ENDPOINT_USER = f"{ODOO_URL}/api/user-activity"
 ODOO_API_ENDPOINT_SYSTEM = f"{ODOO_URL}/api/system-usage"
 ODOO_API_ALERT = f"{ODOO_URL}/api/activity-alert"
 TOKEN_FILE = os.path.expanduser("~/PycharmProjects/ScriptDev/checkin_token.txt")
-FIREFOX_PROFILE_PATH = "/home/wassef/snap/firefox/common/.mozilla/firefox/3afnh5rk.default"
+FIREFOX_PROFILE_PATH = None  # from profiles.ini (native, Snap or Flatpak), resolved in setup()
 
-try:
-    with open(TOKEN_FILE, "r") as f:
-        AUTH_TOKEN = f.read().strip()
-    if not AUTH_TOKEN:
-        raise ValueError("Token file is empty")
-except Exception as e:
-    print(f"\u274c CRITICAL ERROR: Failed to load token - {str(e)}")
-    exit(1)
-
-ODOO_HEADERS = {
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {AUTH_TOKEN}"
-}
-
-mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-keyboard_activity = {"key_presses": 0, "keys": []}
-app_usage = {}
+ODOO_HEADERS = None  # set by setup() once the token is loaded
+
+input_counters = InputCounters()  # per-minute mouse/keyboard counts, drained atomically
+symbol_table = None  # created by setup()
+activity_snapshot = None
+app_usage = UsageAccumulator()  # symbol id -> seconds since the last record
 active_app = None
 app_start_time = time.time()
 
+# Interval bounds per collector; stretched on battery, idle or locked (adaptive_rate)
+sampling = default_rate()
+sampling.register("activity_log", 60, high=300)
+sampling.register("system_usage", 60, high=600)
+sampling.register("active_window", 5, low=2, high=60, follows_focus=True)  # xdotool + xprop + ps per wakeup
+
+def load_token(path=TOKEN_FILE):
+    with open(path, "r") as f:
+        token = f.read().strip()
+    if not token:
+        raise ValueError("Token file is empty")
+    return token
+
+def setup(token=None):
+    """Load the token and create the collectors; nothing here starts a thread or a listener."""
+    global ODOO_HEADERS, FIREFOX_PROFILE_PATH, symbol_table, activity_snapshot
+    from symbols import default_table
+    from activity_payload import IntervalSnapshot
+    from firefox_profiles import default_profile_path
+
+    ODOO_HEADERS = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token or load_token()}"
+    }
+    FIREFOX_PROFILE_PATH = default_profile_path()
+    symbol_table = default_table()
+    activity_snapshot = IntervalSnapshot(symbol_table)
+
 def send_log_to_odoo(endpoint, data):
     try:
         response = requests.post(endpoint, json=data, headers=ODOO_HEADERS)
@@ -52,54 +75,53 @@ def send_log_to_odoo(endpoint, data):
 
 def on_key_press(key):
     try:
-        keyboard_activity["key_presses"] += 1
-        keyboard_activity["keys"].append(str(key))
+        input_counters.key(key)
+        sampling.note_input()
 
     except Exception as e:
         print(f"[ERROR] key press: {e}")
 
 def on_mouse_click(x, y, button, pressed):
     if pressed:
-        mouse_activity["clicks"] += 1
+        input_counters.mouse_event("clicks")
+        sampling.note_input()
 
 def on_mouse_scroll(x, y, dx, dy):
-    mouse_activity["scrolls"] += 1
+    input_counters.mouse_event("scrolls")
+    sampling.note_input()
 
 def on_mouse_move(x, y):
-    mouse_activity["movements"] += 1
+    input_counters.mouse_event("movements")
+    sampling.note_input()
 
 def log_user_activity():
-    global mouse_activity, keyboard_activity
     while True:
         try:
             update_current_app_time()
+            mouse_counts, keyboard_counts = input_counters.drain()
             uptime = time.time() - psutil.boot_time()
-            log_data = {
-                "timestamp": datetime.now().isoformat(),
-                "mouse_clicks": mouse_activity["clicks"],
-                "scrolls": mouse_activity["scrolls"],
-                "movements": mouse_activity["movements"],
-                "key_presses": keyboard_activity["key_presses"],
-                "keys": keyboard_activity["keys"],
-                "system_uptime": f"{uptime:.2f} seconds",
-                "application_usage": [
-                    {"name": app, "time_spent": time_spent}
-                    for app, time_spent in app_usage.items()
-                ]
-            }
+            log_data = activity_snapshot.emit(
+                {"application_usage": app_usage.drain()},
+                timestamp=datetime.now().isoformat(),
+                mouse_clicks=mouse_counts["clicks"],
+                scrolls=mouse_counts["scrolls"],
+                movements=mouse_counts["movements"],
+                key_presses=keyboard_counts["key_presses"],
+                keys=keyboard_counts["keys"],
+                system_uptime=f"{uptime:.2f} seconds",
+                wakeups_per_hour=sampling.wakeups_per_hour()
+            )
             print(log_data)
-            mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-            keyboard_activity = {"key_presses": 0, "keys": []}
         except Exception as e:
             print(f"[ERROR] log_user_activity: {e}")
-        time.sleep(60)
+        sampling.wait("activity_log", jitter=True)
 
 def update_current_app_time():
-    global active_app, app_start_time, app_usage
+    global active_app, app_start_time
     now = time.time()
     if active_app and active_app != "Unknown":
         duration = now - app_start_time
-        app_usage[active_app] = app_usage.get(active_app, 0) + duration
+        app_usage.add(symbol_table.intern(active_app), duration)
         app_start_time = now
 
 def get_active_window():
@@ -120,8 +142,8 @@ def get_active_window():
         print(f"\u26a0\ufe0f Error determining active window: {e}")
         return "Unknown"
 
-def track_active_window(interval=5):
-    global active_app, app_start_time, app_usage
+def track_active_window():
+    global active_app, app_start_time
     while True:
         try:
             current_app = get_active_window()
@@ -129,13 +151,14 @@ def track_active_window(interval=5):
             if current_app != active_app:
                 if active_app and active_app != "Unknown":
                     duration = now - app_start_time
-                    app_usage[active_app] = app_usage.get(active_app, 0) + duration
+                    app_usage.add(symbol_table.intern(active_app), duration)
                     print(f"[SWITCH] {active_app} → {current_app} ({duration:.2f} sec)")
                 active_app = current_app
                 app_start_time = now
+                sampling.note_focus_change(now)
         except Exception as e:
             print(f"[ERROR] track_active_window: {e}")
-        time.sleep(interval)
+        sampling.wait("active_window")
 
 def log_system_usage():
     while True:
@@ -155,11 +178,20 @@ def log_system_usage():
             }
         except Exception as e:
             print(f"[ERROR] log_system_usage: {e}")
-        time.sleep(60)
+        sampling.wait("system_usage", jitter=True)
+
+def main(argv=None):
+    try:
+        setup()
+    except Exception as e:
+        print(f"\u274c CRITICAL ERROR: Failed to load token - {str(e)}")
+        return 1
+    from pynput import keyboard, mouse
+    from memory_budget import install_report_signal
 
-if __name__ == "__main__":
     try:
         print("\u2705 Activity tracker started. Logging in background.")
+        install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
         Thread(target=log_system_usage, daemon=True).start()
         Thread(target=log_user_activity, daemon=True).start()
         Thread(target=track_active_window, daemon=True).start()
@@ -173,3 +205,10 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\u274c MAIN ERROR: {e}")
         traceback.print_exc()
+    finally:
+        sampling.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+import sys
+import time
+import struct
+import argparse
+import threading
+from datetime import datetime
+
+import local_store
+from lazy_import import lazy_module
+from rollups import local_midnight, next_local_midnight
+
+np = lazy_module("numpy")  # recording needs only the bytearray; numpy loads on the first vector op
+
+# === CONFIG ===
+CONTAINER_BITS = 4096          # bits per roaring-style container (512 bytes raw)
+BITMAP_MAGIC = b"ABM1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity_bitmaps (
+    source TEXT NOT NULL,
+    day REAL NOT NULL,          -- local midnight (epoch seconds)
+    data BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (source, day)
+);
+"""
+
+# Containers: empty / full need no payload, runs store (start, length-1) uint16 pairs,
+# dense ones store the raw 512 bytes -- whichever is smallest.
+EMPTY, FULL, RUNS, DENSE = 0, 1, 2, 3
+
+_POPCOUNT = None  # byte -> set bits, for numpy without bitwise_count (< 2.0)
+
+
+def _popcount(packed):
+    global _POPCOUNT
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(packed).sum())
+    if _POPCOUNT is None:
+        _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+class DayBitmap:
+    """One bit per second of a local day: set when there was any input during that second.
+
+    86,400 bits (82,800 / 90,000 on DST days) = ~10.5 KB uncompressed. Writes go to a
+    bytearray; numpy views over the same buffer do the range and set operations.
+    """
+
+    def __init__(self, day, nbits=None, data=None):
+        self.day = day
+        self.nbits = nbits if nbits is not None else next_local_midnight(day) - day
+        self.bits = bytearray(data) if data is not None else bytearray((self.nbits + 7) // 8)
+
+    @classmethod
+    def for_time(cls, ts):
+        return cls(local_midnight(ts))
+
+    @property
+    def array(self):
+        return np.frombuffer(self.bits, dtype=np.uint8)
+
+    def mark(self, ts):
+        i = int(ts - self.day)
+        if 0 <= i < self.nbits:
+            self.bits[i >> 3] |= 0x80 >> (i & 7)
+
+    def mark_range(self, start, end):
+        """Set every second in [start, end) (e.g. from an interval source)."""
+        a = max(0, int(start - self.day))
+        b = min(self.nbits, int(np.ceil(end - self.day)))
+        if b > a:
+            unpacked = np.unpackbits(self.array)
+            unpacked[a:b] = 1
+            self.bits[:] = np.packbits(unpacked).tobytes()
+
+    def __contains__(self, ts):
+        i = int(ts - self.day)
+        return 0 <= i < self.nbits and bool(self.bits[i >> 3] & (0x80 >> (i & 7)))
+
+    # --- counting ---
+    def count(self, start=None, end=None):
+        """Active seconds in [start, end) (epoch seconds; default the whole day)."""
+        a = 0 if start is None else max(0, int(start - self.day))
+        b = self.nbits if end is None else min(self.nbits, int(end - self.day))
+        if b <= a:
+            return 0
+        packed = self.array
+        first_full, last_full = (a + 7) >> 3, b >> 3
+        if first_full >= last_full:
+            lo = a >> 3
+            return int(np.unpackbits(packed[lo:(b + 7) >> 3])[a - 8 * lo:b - 8 * lo].sum())
+        total = _popcount(packed[first_full:last_full])
+        if a & 7:
+            total += bin(int(packed[a >> 3]) & (0xFF >> (a & 7))).count("1")
+        if b & 7:
+            total += bin(int(packed[b >> 3]) & (0xFF << (8 - (b & 7))) & 0xFF).count("1")
+        return total
+
+    def prefix(self):
+        """Cumulative active seconds: prefix[i] = active seconds in [0, i)."""
+        out = np.zeros(self.nbits + 1, dtype=np.int32)
+        np.cumsum(np.unpackbits(self.array)[:self.nbits], out=out[1:])
+        return out
+
+    def count_intervals(self, starts, ends):
+        """Active seconds inside each [start, end) interval, vectorised over all intervals."""
+        prefix = self.prefix()
+        a = np.clip(np.asarray(starts, dtype=np.float64) - self.day, 0, self.nbits).astype(np.int64)
+        b = np.clip(np.asarray(ends, dtype=np.float64) - self.day, 0, self.nbits).astype(np.int64)
+        return np.maximum(prefix[b] - prefix[a], 0)
+
+    # --- set operations ---
+    def _binary(self, other, op):
+        if other.day != self.day:
+            raise ValueError("bitmaps are for different days")
+        return DayBitmap(self.day, self.nbits, op(self.array, other.array).tobytes())
+
+    def __and__(self, other):
+        return self._binary(other, np.bitwise_and)
+
+    def __or__(self, other):
+        return self._binary(other, np.bitwise_or)
+
+    def __sub__(self, other):
+        return self._binary(other, lambda x, y: np.bitwise_and(x, np.bitwise_not(y)))
+
+    @classmethod
+    def from_intervals(cls, day, starts, ends):
+        """Bitmap of the seconds covered by [start, end) intervals (e.g. an app's focus segments)."""
+        bm = cls(day)
+        delta = np.zeros(bm.nbits + 1, dtype=np.int32)
+        a = np.clip(np.asarray(starts, dtype=np.float64) - day, 0, bm.nbits).astype(np.int64)
+        b = np.clip(np.ceil(np.asarray(ends, dtype=np.float64) - day), 0, bm.nbits).astype(np.int64)
+        keep = b > a
+        np.add.at(delta, a[keep], 1)
+        np.add.at(delta, b[keep], -1)
+        covered = (np.cumsum(delta[:-1]) > 0).astype(np.uint8)
+        bm.bits[:] = np.packbits(covered).tobytes()
+        return bm
+
+    # --- roaring-style compression ---
+    def compress(self):
+        unpacked = np.unpackbits(self.array)[:self.nbits]
+        out = bytearray(BITMAP_MAGIC)
+        out += struct.pack("<dI", self.day, self.nbits)
+        for base in range(0, self.nbits, CONTAINER_BITS):
+            chunk = unpacked[base:base + CONTAINER_BITS]
+            ones = int(chunk.sum())
+            if ones == 0:
+                out.append(EMPTY)
+            elif ones == len(chunk):
+                out.append(FULL)
+            else:
+                edges = np.flatnonzero(np.diff(np.concatenate(([0], chunk, [0])).astype(np.int8)))
+                starts, ends = edges[0::2], edges[1::2]
+                runs_size = 2 + 4 * len(starts)
+                if runs_size < CONTAINER_BITS // 8:
+                    out.append(RUNS)
+                    out += struct.pack("<H", len(starts))
+                    pairs = np.empty(2 * len(starts), dtype="<u2")
+                    pairs[0::2], pairs[1::2] = starts, ends - starts - 1
+                    out += pairs.tobytes()
+                else:
+                    out.append(DENSE)
+                    out += np.packbits(chunk).tobytes()
+        return bytes(out)
+
+    @classmethod
+    def decompress(cls, blob):
+        if blob[:4] != BITMAP_MAGIC:
+            raise ValueError("not an activity bitmap")
+        day, nbits = struct.unpack_from("<dI", blob, 4)
+        pos = 16
+        unpacked = np.zeros(nbits, dtype=np.uint8)
+        for base in range(0, nbits, CONTAINER_BITS):
+            kind = blob[pos]
+            pos += 1
+            size = min(CONTAINER_BITS, nbits - base)
+            if kind == FULL:
+                unpacked[base:base + size] = 1
+            elif kind == RUNS:
+                (n,) = struct.unpack_from("<H", blob, pos)
+                pos += 2
+                pairs = np.frombuffer(blob, dtype="<u2", count=2 * n, offset=pos)
+                pos += 4 * n
+                for start, length in zip(pairs[0::2].tolist(), pairs[1::2].tolist()):
+                    unpacked[base + start:base + start + length + 1] = 1
+            elif kind == DENSE:
+                nbytes = (size + 7) // 8
+                unpacked[base:base + size] = np.unpackbits(np.frombuffer(blob, dtype=np.uint8, count=nbytes, offset=pos))[:size]
+                pos += nbytes
+        return cls(day, nbits, np.packbits(unpacked).tobytes())
+
+
+def merge_days(bitmaps):
+    """(total active seconds, per-second-of-day activity counts) across several days' bitmaps."""
+    profile = np.zeros(90000, dtype=np.int32)
+    total = 0
+    for bm in bitmaps:
+        unpacked = np.unpackbits(bm.array)[:bm.nbits]
+        profile[:bm.nbits] += unpacked
+        total += int(unpacked.sum())
+    return total, profile[:86400]
+
+
+def active_seconds_by_key(bitmap, starts, ends, keys, nkeys):
+    """Active (had-input) seconds per key (e.g. app id) from focus intervals: a bitmap AND per interval."""
+    counts = bitmap.count_intervals(starts, ends)
+    return np.bincount(np.asarray(keys, dtype=np.int64), weights=counts, minlength=nkeys)
+
+# === RECORDING ===
+class ActivityRecorder:
+    """Marks "had input" seconds as events arrive; rolls over at local midnight."""
+
+    def __init__(self, store=None, source="tracker"):
+        self.store = store
+        self.source = source
+        self.lock = threading.Lock()
+        self.today = None
+        self.pending = []        # finished days not yet saved
+        self.last_second = None
+
+    def mark(self, ts=None):
+        ts = time.time() if ts is None else ts
+        second = int(ts)
+        if second == self.last_second:
+            return  # same second as the previous event: already set
+        with self.lock:
+            self.last_second = second
+            today = self.today
+            if today is None or not (today.day <= ts < today.day + today.nbits):
+                if today is not None:
+                    self.pending.append(today)
+                today = self.today = DayBitmap.for_time(ts)
+            today.mark(ts)
+
+    def count(self, start, end):
+        """Seconds with input in [start, end) among the days still held in memory."""
+        with self.lock:
+            days = self.pending + ([self.today] if self.today is not None else [])
+            return sum(bm.count(start, end) for bm in days)
+
+    def save(self):
+        """Persist finished days and merge the current day into the local store (call once a minute)."""
+        if self.store is None:
+            return
+        with self.lock:
+            days, self.pending = self.pending, []
+            if self.today is not None:
+                days.append(DayBitmap(self.today.day, self.today.nbits, bytes(self.today.bits)))
+        for bm in days:
+            self.store.save(self.source, bm)
+
+
+class BitmapStore:
+    """Compressed day bitmaps per source in the local store; loading ORs all sources of a day."""
+
+    def __init__(self, path=local_store.LOCAL_STORE):
+        self.conn = local_store.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def save(self, source, bitmap):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT data FROM activity_bitmaps WHERE source = ? AND day = ?",
+                                    (source, bitmap.day)).fetchone()
+            if row:
+                bitmap = bitmap | DayBitmap.decompress(row[0])
+            self.conn.execute("INSERT OR REPLACE INTO activity_bitmaps (source, day, data, updated) VALUES (?, ?, ?, ?)",
+                              (source, bitmap.day, bitmap.compress(), time.time()))
+
+    def load(self, day):
+        """Union of every source's bitmap for the day starting at local midnight `day`, or None."""
+        with self.lock:
+            rows = self.conn.execute("SELECT data FROM activity_bitmaps WHERE day = ?", (day,)).fetchall()
+        merged = None
+        for (blob,) in rows:
+            bm = DayBitmap.decompress(blob)
+            merged = bm if merged is None else merged | bm
+        return merged
+
+    def days(self, start, end):
+        with self.lock:
+            rows = self.conn.execute("SELECT DISTINCT day FROM activity_bitmaps WHERE day >= ? AND day < ? ORDER BY day",
+                                     (local_midnight(start), end)).fetchall()
+        return [self.load(day) for (day,) in rows]
+
+    def stored_bytes(self):
+        with self.lock:
+            return self.conn.execute("SELECT IFNULL(SUM(LENGTH(data)), 0), COUNT(*) FROM activity_bitmaps").fetchone()
+
+# === BENCHMARK ===
+def run_benchmark(seed=0):
+    """A synthetic workday: compression size and vectorised per-app active seconds."""
+    rng = np.random.default_rng(seed)
+    day = local_midnight(time.time())
+    bm = DayBitmap(day)
+    # 9:00-18:00 with bursts of input and pauses, plus a lunch break
+    t = day + 9 * 3600
+    events = 0
+    while t < day + 18 * 3600:
+        if day + 12.5 * 3600 <= t < day + 13.5 * 3600:
+            t = day + 13.5 * 3600
+        burst = rng.exponential(40)
+        for s in np.arange(t, t + burst, rng.uniform(0.1, 0.6)):
+            bm.mark(s)
+            events += 1
+        t += burst + rng.exponential(25)
+    t0 = time.perf_counter()
+    blob = bm.compress()
+    t_compress = time.perf_counter() - t0
+    assert DayBitmap.decompress(blob).bits == bm.bits
+
+    # 2,000 focus segments over 30 apps
+    cuts = np.sort(rng.uniform(day + 9 * 3600, day + 18 * 3600, 2001))
+    apps = rng.integers(0, 30, 2000)
+    t0 = time.perf_counter()
+    per_app = active_seconds_by_key(bm, cuts[:-1], cuts[1:], apps, 30)
+    t_apps = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        bm.count(day + 10 * 3600 + 3, day + 11 * 3600 + 5)
+    t_count = (time.perf_counter() - t0) / 1000
+    focus = DayBitmap.from_intervals(day, cuts[:-1:2], cuts[1::2])
+    t0 = time.perf_counter()
+    both = (bm & focus).count()
+    t_and = time.perf_counter() - t0
+
+    print(f"📅 {events:,} input events -> {bm.count():,} active seconds; bitmap {len(bm.bits):,} B raw, "
+          f"{len(blob):,} B compressed ({t_compress * 1000:.2f} ms)")
+    print(f"⏱️ active seconds for 2,000 focus segments / 30 apps: {t_apps * 1000:.2f} ms "
+          f"(total {int(per_app.sum()):,} s)")
+    print(f"⏱️ range popcount: {t_count * 1e6:.1f} µs; AND + popcount with a focus bitmap: "
+          f"{t_and * 1000:.2f} ms ({both:,} s)")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-second activity bitmaps")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--days", type=int, default=7, help="days to summarise from the local store")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_benchmark()
+        return 0
+    store = BitmapStore()
+    now = time.time()
+    bitmaps = store.days(now - args.days * 86400, now + 1)
+    if not bitmaps:
+        print("❌ No activity bitmaps stored yet")
+        return 1
+    for bm in bitmaps:
+        active = bm.count()
+        print(f"{datetime.fromtimestamp(bm.day):%Y-%m-%d}  active {active // 3600}h{active % 3600 // 60:02d}m")
+    total, profile = merge_days(bitmaps)
+    busiest = int(np.argmax(np.add.reduceat(profile, np.arange(0, 86400, 3600))))
+    size, rows = store.stored_bytes()
+    print(f"Σ {total // 3600}h{total % 3600 // 60:02d}m over {len(bitmaps)} days; busiest hour {busiest:02d}:00; "
+          f"{size:,} B stored in {rows} bitmaps")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
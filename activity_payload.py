@@ -0,0 +1,146 @@
+import os
+import time
+import socket
+import threading
+from collections import deque
+
+import local_store
+from symbols import SymbolSender
+from memory_budget import SpillCounter
+
+# === CONFIG ===
+CHECKPOINT_EVERY = 60  # records between full checkpoints (hourly at one record per minute)
+KEYS_KEPT = 100        # most recent key names kept per interval
+STREAM_MAX_IDS = 20000 # distinct ids after which a stream is rotated at its next checkpoint
+
+
+class UsageAccumulator:
+    """Thread-safe id -> seconds counter that is drained once per emitted record."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = {}
+
+    def add(self, sid, seconds):
+        with self.lock:
+            self.current[sid] = self.current.get(sid, 0) + seconds
+
+    def drain(self):
+        with self.lock:
+            drained, self.current = self.current, {}
+        return drained
+
+    def __len__(self):
+        return len(self.current)
+
+
+class InputCounters:
+    """Per-interval mouse/keyboard counts, swapped out atomically when a record is built.
+
+    Listener callbacks and the per-minute drain share one lock, so an event arriving while
+    the record is built lands in either this interval or the next, never in neither. Only
+    the last KEYS_KEPT key names are kept.
+    """
+
+    def __init__(self, keys_kept=KEYS_KEPT):
+        self.lock = threading.Lock()
+        self.keys_kept = keys_kept
+        self.mouse, self.keyboard = self._fresh()
+
+    def _fresh(self):
+        return {"clicks": 0, "scrolls": 0, "movements": 0}, {"key_presses": 0, "keys": deque(maxlen=self.keys_kept)}
+
+    def key(self, key):
+        with self.lock:
+            self.keyboard["key_presses"] += 1
+            self.keyboard["keys"].append(str(key))
+
+    def mouse_event(self, kind):
+        with self.lock:
+            self.mouse[kind] += 1
+
+    def drain(self):
+        """(mouse counts, keyboard counts with "keys" as a list) for the interval just ended."""
+        with self.lock:
+            (mouse, keyboard), (self.mouse, self.keyboard) = (self.mouse, self.keyboard), self._fresh()
+        keyboard["keys"] = list(keyboard["keys"])
+        return mouse, keyboard
+
+
+class IntervalSnapshot:
+    """Builds interval ("delta") records with sequence numbers plus periodic full checkpoints.
+
+    Every record carries stream/seq so the receiver can detect gaps and duplicates; a new
+    stream id means the tracker restarted. Every checkpoint_every records the record also
+    carries the stream's cumulative totals and all symbol definitions they reference, so a
+    receiver that missed records can resynchronise by replacing its totals.
+
+    Once a stream's totals reference more than max_ids distinct ids, the stream is rotated
+    right after a checkpoint (to "<stream>/<n>", like a restart), so checkpoints and the
+    totals behind them stay bounded over a long uptime.
+    """
+
+    def __init__(self, symbols, checkpoint_every=CHECKPOINT_EVERY, stream=None, budget=None,
+                 path=local_store.LOCAL_STORE, max_ids=STREAM_MAX_IDS):
+        self.symbols = symbols
+        self.sender = SymbolSender(symbols, budget)
+        self.checkpoint_every = checkpoint_every
+        self.stream = self.base_stream = stream or f"{socket.gethostname()}:{os.getpid()}:{int(time.time())}"
+        self.rotations = 0
+        self.max_ids = max_ids
+        self.seq = 0
+        self.interval_start = time.time()
+        self.budget = budget
+        self.path = path
+        self.totals = {}  # category -> SpillCounter {id: seconds}; cold ids spill to the local store
+
+    def emit(self, usage, **fields):
+        """usage maps a category ("application_usage", ...) to a drained {id: seconds} dict."""
+        now = time.time()
+        self.seq += 1
+        record = {
+            "stream": self.stream,
+            "seq": self.seq,
+            "interval_start": round(self.interval_start, 3),
+            "interval_end": round(now, 3),
+        }
+        record.update(fields)
+        ids = set()
+        for category, interval in usage.items():
+            totals = self.totals.get(category)
+            if totals is None:
+                totals = self.totals[category] = SpillCounter(f"snapshot.{category}", self.budget, self.path)
+            entries = []
+            for sid, seconds in interval.items():
+                if seconds <= 0:
+                    continue
+                totals.add(sid, seconds)
+                entries.append({"id": sid, "time_spent": round(seconds, 3)})
+                ids.add(sid)
+            record[category] = entries
+
+        checkpoint = self.seq == 1 or self.seq % self.checkpoint_every == 0
+        record["type"] = "checkpoint" if checkpoint else "delta"
+        if checkpoint:
+            record["totals"] = {
+                category: [{"id": sid, "time_spent": round(seconds, 3)} for sid, seconds in totals.items()]
+                for category, totals in self.totals.items()
+            }
+            all_ids = {entry["id"] for entries in record["totals"].values() for entry in entries}
+            record["symbols"] = {str(sid): name for sid, name in self.symbols.definitions(all_ids).items()}
+        else:
+            record["symbols"] = self.sender.new_symbols(ids)
+        self.sender.acknowledge(record["symbols"])
+        self.interval_start = now
+        if checkpoint and len(record["symbols"]) > self.max_ids:
+            self._rotate()
+        return record
+
+    def _rotate(self):
+        """Start a new stream; the checkpoint just built carries the old stream's final totals."""
+        self.rotations += 1
+        self.stream = f"{self.base_stream}/{self.rotations}"
+        self.seq = 0
+        for totals in self.totals.values():
+            totals.drain()
+        self.sender.known.clear()
@@ -0,0 +1,597 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+import segment_log
+from url_engine import site_key, default_categorizer
+from activity_bitmap import BitmapStore
+from rollups import local_midnight, next_local_midnight
+
+# === CONFIG ===
+ACTIVITY_LOG = "activity_log.json"                 # tracking.py
+USER_DETAILED_LOG = "user_activity_detailed.log"   # TrackDesktop_SavedFile.py
+SYSTEM_DETAILED_LOG = "system_usage_detailed.log"  # TrackDesktop_SavedFile.py
+
+SEGMENT_DTYPE = np.dtype([
+    ("start", "f8"),
+    ("end", "f8"),
+    ("app", "i4"),
+    ("title", "i4"),
+    ("domain", "i4"),
+    ("category", "i4"),
+    ("idle", "?"),
+])
+SYSTEM_DTYPE = np.dtype([
+    ("ts", "f8"),
+    ("cpu", "f4"),
+    ("mem", "f4"),
+])
+
+# Focus sessions: consecutive segments of one app separated by less than this gap are merged
+SESSION_MERGE_GAP = 5
+SESSION_BINS = [0, 60, 300, 900, 1800, 3600, 7200, np.inf]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# === LOADING ===
+class _Interner:
+    """Map strings to dense integer codes; code 0 is the empty string."""
+
+    def __init__(self):
+        self.codes = {"": 0}
+        self.names = [""]
+
+    def __call__(self, value):
+        value = value or ""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.names)
+            self.names.append(value)
+        return code
+
+
+def _domain_of(url):
+    return site_key(url) if url else ""
+
+
+def _category_of(url):
+    return default_categorizer().classify(url) if url else ""
+
+
+def _parse_ts(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _iter_json_stream(path):
+    """Yield objects from a file of concatenated (possibly pretty-printed) JSON values."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    pos, size = 0, len(text)
+    while pos < size:
+        while pos < size and text[pos].isspace():
+            pos += 1
+        if pos >= size:
+            break
+        try:
+            obj, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            nl = text.find("\n", pos)
+            if nl < 0:
+                break
+            pos = nl + 1
+            continue
+        yield obj
+
+
+class ActivityData:
+    """Columnar view of persisted activity: segments plus system samples, with string tables."""
+
+    def __init__(self):
+        self.apps = _Interner()
+        self.titles = _Interner()
+        self.domains = _Interner()
+        self.categories = _Interner()
+        self._cols = {name: [] for name in SEGMENT_DTYPE.names}
+        self._sys = {name: [] for name in SYSTEM_DTYPE.names}
+        self.segments = np.empty(0, dtype=SEGMENT_DTYPE)
+        self.system = np.empty(0, dtype=SYSTEM_DTYPE)
+        self._derived = {}
+
+    def add_segment(self, start, end, app, title=None, url=None, idle=False, domain=None):
+        if end <= start or not app:
+            return
+        cols = self._cols
+        cols["start"].append(start)
+        cols["end"].append(end)
+        cols["app"].append(self.apps(app))
+        cols["title"].append(self.titles(title))
+        cols["domain"].append(self.domains(domain if domain is not None else _domain_of(url)))
+        cols["category"].append(self.categories(_category_of(url)))
+        cols["idle"].append(bool(idle))
+
+    def add_system_sample(self, ts, cpu, mem):
+        self._sys["ts"].append(ts)
+        self._sys["cpu"].append(cpu)
+        self._sys["mem"].append(mem)
+
+    def finalize(self):
+        """Move buffered rows into the structured arrays, sorted by start time."""
+        segments = np.empty(len(self._cols["start"]), dtype=SEGMENT_DTYPE)
+        for name in SEGMENT_DTYPE.names:
+            segments[name] = self._cols[name]
+        system = np.empty(len(self._sys["ts"]), dtype=SYSTEM_DTYPE)
+        for name in SYSTEM_DTYPE.names:
+            system[name] = self._sys[name]
+        self.segments = np.concatenate([self.segments, segments])
+        self.segments = self.segments[np.argsort(self.segments["start"], kind="stable")]
+        self.system = np.concatenate([self.system, system])
+        self.system = self.system[np.argsort(self.system["ts"], kind="stable")]
+        self._cols = {name: [] for name in SEGMENT_DTYPE.names}
+        self._sys = {name: [] for name in SYSTEM_DTYPE.names}
+        self._derived = {}
+        return self
+
+    def derived(self, name, compute):
+        """Memoize a column derived from the segments (shared by several aggregates)."""
+        if name not in self._derived:
+            self._derived[name] = compute(self.segments)
+        return self._derived[name]
+
+    @property
+    def durations(self):
+        return self.derived("durations", lambda seg: seg["end"] - seg["start"])
+
+    @property
+    def hour_split(self):
+        return self.derived("hour_split", lambda seg: _split_by_hour(seg["start"], seg["end"]))
+
+    def between(self, since=None, until=None):
+        """Return a view restricted to [since, until), clipping segments at the edges."""
+        view = ActivityData()
+        view.apps, view.titles, view.domains = self.apps, self.titles, self.domains
+        view.categories = self.categories
+        seg = self.segments
+        lo = -np.inf if since is None else since
+        hi = np.inf if until is None else until
+        keep = (seg["end"] > lo) & (seg["start"] < hi)
+        seg = seg[keep].copy()
+        np.maximum(seg["start"], lo, out=seg["start"])
+        np.minimum(seg["end"], hi, out=seg["end"])
+        view.segments = seg
+        sys_ts = self.system["ts"]
+        view.system = self.system[(sys_ts >= lo) & (sys_ts < hi)]
+        return view
+
+
+def load_segment_log(data, path=segment_log.SEGMENT_LOG):
+    for rec in segment_log.read_segments(path):
+        try:
+            data.add_segment(float(rec["start"]), float(rec["end"]), rec.get("app"),
+                             rec.get("title"), rec.get("url"), rec.get("idle", False))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def load_activity_log(data, path=ACTIVITY_LOG):
+    """tracking.py writes one JSON array of {timestamp, application, duration_seconds, idle}."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        records = json.load(f)
+    for rec in records:
+        try:
+            end = _parse_ts(rec["timestamp"])
+            duration = float(rec.get("duration_seconds", 0))
+            title = rec.get("application")
+            data.add_segment(end - duration, end, title, title, idle=rec.get("idle", False))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def load_user_detailed_log(data, path=USER_DETAILED_LOG):
+    """TrackDesktop_SavedFile.py logs cumulative per-app seconds every minute; keep the deltas."""
+    previous = {}
+    for rec in _iter_json_stream(path):
+        try:
+            end = _parse_ts(rec["timestamp"])
+            usage = rec.get("application_usage", {})
+        except (KeyError, TypeError, ValueError):
+            continue
+        current = {}
+        for app, spent in usage.items():
+            try:
+                current[app] = float(str(spent).split()[0])
+            except ValueError:
+                continue
+        for app, total in current.items():
+            before = previous.get(app, 0.0)
+            delta = total - before if total >= before else total  # tracker restarted
+            if delta > 0:
+                data.add_segment(end - delta, end, app, app)
+        previous = current
+
+
+def load_system_detailed_log(data, path=SYSTEM_DETAILED_LOG):
+    for rec in _iter_json_stream(path):
+        try:
+            ts = _parse_ts(rec["timestamp"])
+            cpu = rec.get("cpu_usage", [])
+            cpu = sum(cpu) / len(cpu) if isinstance(cpu, list) and cpu else float(cpu or 0)
+            data.add_system_sample(ts, cpu, float(rec.get("memory_percent", 0)))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+
+def load_all(segments=None, activity_log=None, user_log=None, system_log=None):
+    data = ActivityData()
+    for loader, path in ((load_segment_log, segments), (load_activity_log, activity_log),
+                         (load_user_detailed_log, user_log), (load_system_detailed_log, system_log)):
+        if path and os.path.exists(path):
+            try:
+                loader(data, path)
+            except Exception as e:
+                print(f"[⚠️] Failed to load {path}: {e}", file=sys.stderr)
+    return data.finalize()
+
+# === AGGREGATION ===
+def totals_by(data, field, top=None):
+    """Per-key total and idle seconds for field in {'app', 'title', 'domain', 'category'}, largest first."""
+    names = {"app": data.apps, "title": data.titles, "domain": data.domains, "category": data.categories}[field].names
+    seg = data.segments
+    dur = data.durations
+    total = np.bincount(seg[field], weights=dur, minlength=len(names))
+    idle = np.bincount(seg[field], weights=dur * seg["idle"], minlength=len(names))
+    total[0] = 0  # code 0 means "no title/domain/category"
+    order = np.argsort(-total, kind="stable")
+    order = order[total[order] > 0]
+    if top:
+        order = order[:top]
+    return [{"name": names[i], "seconds": float(total[i]), "idle_seconds": float(idle[i])}
+            for i in order]
+
+
+def category_totals(data):
+    """Per-category total and idle seconds (each record's URL is classified when it is loaded)."""
+    return totals_by(data, "category")
+
+
+def active_totals(data, store, top=None):
+    """Per-app seconds with input while focused: focus segments AND the stored per-second bitmaps.
+
+    "idle_seconds" is focused time without input. Apps on days with no bitmap are left out.
+    """
+    seg = data.segments
+    names = data.apps.names
+    active = np.zeros(len(names))
+    focused = np.zeros(len(names))
+    if len(seg):
+        day = local_midnight(seg["start"].min())
+        last = seg["end"].max()
+        while day < last:
+            end = next_local_midnight(day)
+            bitmap = store.load(day)
+            if bitmap is not None:
+                keep = (seg["end"] > day) & (seg["start"] < end)
+                starts = np.maximum(seg["start"][keep], day)
+                ends = np.minimum(seg["end"][keep], end)
+                apps = seg["app"][keep]
+                active += np.bincount(apps, weights=bitmap.count_intervals(starts, ends), minlength=len(names))
+                focused += np.bincount(apps, weights=ends - starts, minlength=len(names))
+            day = end
+    order = np.argsort(-active, kind="stable")
+    order = order[active[order] > 0]
+    if top:
+        order = order[:top]
+    return [{"name": names[i], "seconds": float(active[i]), "idle_seconds": float(max(focused[i] - active[i], 0))}
+            for i in order]
+
+
+def _split_by_hour(start, end):
+    """Split intervals at hour boundaries; returns (hour_bucket, seconds, source_index)."""
+    # Timestamps are positive, so truncation is floor; multiplying beats float floor-division
+    first = (start * (1 / 3600)).astype(np.int64)
+    last = ((end - 1e-6) * (1 / 3600)).astype(np.int64)
+    counts = last - first + 1
+    if not len(counts) or counts.max() <= 1:
+        return first, end - start, np.arange(len(start))
+    counts = np.maximum(counts, 1)
+    src = np.repeat(np.arange(len(start)), counts)
+    offset = np.arange(len(src)) - np.repeat(np.cumsum(counts) - counts, counts)
+    bucket = first[src] + offset
+    lo = np.maximum(start[src], bucket * 3600.0)
+    hi = np.minimum(end[src], (bucket + 1) * 3600.0)
+    return bucket, np.maximum(hi - lo, 0.0), src
+
+
+def _hour_totals(bucket, seconds):
+    """Sum seconds per hour bucket; returns (dense bucket ids, totals) without sorting."""
+    if not len(bucket):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    base = int(bucket.min())
+    totals = np.bincount(bucket - base, weights=seconds)
+    return np.arange(base, base + len(totals)), totals
+
+
+def _local_weekday_hour(buckets):
+    """Map UTC hour buckets to local (weekday, hour) with one localtime() call per hour."""
+    wd = np.empty(len(buckets), dtype=np.int64)
+    hr = np.empty(len(buckets), dtype=np.int64)
+    for i, b in enumerate(buckets.tolist()):
+        t = time.localtime(b * 3600)
+        wd[i], hr[i] = t.tm_wday, t.tm_hour
+    return wd, hr
+
+
+def hourly_heatmap(data, active_only=True):
+    """7x24 matrix (weekday x local hour) of focused seconds."""
+    seg = data.segments
+    heat = np.zeros((7, 24))
+    if not len(seg):
+        return heat
+    bucket, seconds, src = data.hour_split
+    if active_only:
+        seconds = seconds * ~seg["idle"][src]
+    hours, totals = _hour_totals(bucket, seconds)
+    wd, hr = _local_weekday_hour(hours)
+    heat += np.bincount(wd * 24 + hr, weights=totals, minlength=7 * 24).reshape(7, 24)
+    return heat
+
+
+def focus_sessions(data, merge_gap=SESSION_MERGE_GAP):
+    """Lengths (seconds) of uninterrupted non-idle focus on one app."""
+    active = ~data.segments["idle"]
+    app = data.segments["app"][active]
+    if not len(app):
+        return np.empty(0)
+    start = data.segments["start"][active]
+    end = data.segments["end"][active]
+    new = np.ones(len(app), dtype=bool)
+    new[1:] = (app[1:] != app[:-1]) | (start[1:] - end[:-1] > merge_gap)
+    session_id = np.cumsum(new) - 1
+    return np.bincount(session_id, weights=data.durations[active])
+
+
+def session_distribution(lengths, bins=SESSION_BINS):
+    if not len(lengths):
+        return {"count": 0, "histogram": []}
+    hist, _ = np.histogram(lengths, bins=bins)
+    labels = [f"{_fmt_bound(lo)}-{_fmt_bound(hi)}" for lo, hi in zip(bins[:-1], bins[1:])]
+    p50, p90, p99 = np.percentile(lengths, [50, 90, 99])
+    return {
+        "count": int(len(lengths)),
+        "mean_seconds": float(lengths.mean()),
+        "p50_seconds": float(p50),
+        "p90_seconds": float(p90),
+        "p99_seconds": float(p99),
+        "longest_seconds": float(lengths.max()),
+        "histogram": [{"range": label, "sessions": int(n)} for label, n in zip(labels, hist)],
+    }
+
+
+def _fmt_bound(seconds):
+    if np.isinf(seconds):
+        return "inf"
+    return f"{int(seconds // 60)}m"
+
+
+def idle_ratios(data):
+    """Overall and per-day idle share of tracked time."""
+    seg = data.segments
+    dur = data.durations
+    total = float(dur.sum())
+    idle = float(dur[seg["idle"]].sum())
+    days = {}
+    if len(seg):
+        bucket, seconds, src = data.hour_split
+        hours, hour_total = _hour_totals(bucket, seconds)
+        _, hour_idle = _hour_totals(bucket, seconds * seg["idle"][src])
+        # Local days, one fromtimestamp() per hour (ISO labels sort chronologically)
+        labels = [datetime.fromtimestamp(h * 3600).strftime("%Y-%m-%d") for h in hours.tolist()]
+        day_labels, day_idx = np.unique(labels, return_inverse=True)
+        day_total = np.bincount(day_idx, weights=hour_total)
+        day_idle = np.bincount(day_idx, weights=hour_idle)
+        for label, t, i in zip(day_labels.tolist(), day_total.tolist(), day_idle.tolist()):
+            if t:
+                days[label] = i / t
+    return {
+        "tracked_seconds": total,
+        "idle_seconds": idle,
+        "idle_ratio": idle / total if total else 0.0,
+        "per_day": days,
+    }
+
+
+def system_summary(data):
+    sysd = data.system
+    if not len(sysd):
+        return {}
+    return {
+        "samples": int(len(sysd)),
+        "cpu_mean": float(sysd["cpu"].mean()),
+        "cpu_p95": float(np.percentile(sysd["cpu"], 95)),
+        "mem_mean": float(sysd["mem"].mean()),
+        "mem_max": float(sysd["mem"].max()),
+    }
+
+
+def build_report(data, top=20, bitmaps=None):
+    heat = hourly_heatmap(data)
+    report = {
+        "range": {
+            "start": float(data.segments["start"].min()) if len(data.segments) else None,
+            "end": float(data.segments["end"].max()) if len(data.segments) else None,
+        },
+        "apps": totals_by(data, "app", top),
+        "domains": totals_by(data, "domain", top),
+        "categories": category_totals(data),
+        "titles": totals_by(data, "title", top),
+        "heatmap": {WEEKDAYS[d]: [round(float(v), 1) for v in heat[d]] for d in range(7)},
+        "focus_sessions": session_distribution(focus_sessions(data)),
+        "idle": idle_ratios(data),
+        "system": system_summary(data),
+    }
+    if bitmaps is not None:
+        report["active"] = active_totals(data, bitmaps, top)
+    return report
+
+# === OUTPUT ===
+def _fmt_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
+def report_rows(report):
+    """Flatten a report into (section, key, field, value) rows."""
+    for section in ("apps", "domains", "categories", "titles", "active"):
+        for item in report.get(section, []):
+            yield section, item["name"], "seconds", round(item["seconds"], 3)
+            yield section, item["name"], "idle_seconds", round(item["idle_seconds"], 3)
+    for day, hours in report["heatmap"].items():
+        for hour, seconds in enumerate(hours):
+            yield "heatmap", day, f"{hour:02d}", seconds
+    sessions = report["focus_sessions"]
+    for key, value in sessions.items():
+        if key != "histogram":
+            yield "focus_sessions", key, "value", value
+    for bucket in sessions.get("histogram", []):
+        yield "focus_sessions", bucket["range"], "sessions", bucket["sessions"]
+    idle = report["idle"]
+    for key in ("tracked_seconds", "idle_seconds", "idle_ratio"):
+        yield "idle", key, "value", idle[key]
+    for day, ratio in idle["per_day"].items():
+        yield "idle", day, "idle_ratio", round(ratio, 4)
+    for key, value in report["system"].items():
+        yield "system", key, "value", value
+
+
+def write_csv(report, out=sys.stdout):
+    writer = csv.writer(out)
+    writer.writerow(["section", "key", "field", "value"])
+    writer.writerows(report_rows(report))
+
+
+def write_table(report, out=sys.stdout):
+    def section(title, items):
+        print(f"\n{title}", file=out)
+        if not items:
+            print("   (no data)", file=out)
+        width = max((len(i["name"][:60]) for i in items), default=0)
+        for item in items:
+            idle = item["idle_seconds"] / item["seconds"] if item["seconds"] else 0
+            print(f" - {item['name'][:60]:<{width}}  {_fmt_seconds(item['seconds']):>12}  idle {idle:6.1%}",
+                  file=out)
+
+    section("📊 Application usage:", report["apps"])
+    section("🌐 Domain usage:", report["domains"])
+    section("🏷️ Categories:", report["categories"])
+    section("🪟 Window titles:", report["titles"])
+    if "active" in report:
+        section("⌨️ Seconds with input per app (idle = focused without input):", report["active"])
+
+    print("\n🔥 Active minutes by weekday/hour:", file=out)
+    print("     " + "".join(f"{h:>4}" for h in range(24)), file=out)
+    for day, hours in report["heatmap"].items():
+        print(f" {day} " + "".join(f"{int(s // 60):>4}" for s in hours), file=out)
+
+    sessions = report["focus_sessions"]
+    print(f"\n🎯 Focus sessions: {sessions['count']}", file=out)
+    if sessions["count"]:
+        print(f"   median {_fmt_seconds(sessions['p50_seconds'])}, p90 {_fmt_seconds(sessions['p90_seconds'])}, "
+              f"longest {_fmt_seconds(sessions['longest_seconds'])}", file=out)
+        for bucket in sessions["histogram"]:
+            print(f"   {bucket['range']:>10}: {bucket['sessions']}", file=out)
+
+    idle = report["idle"]
+    print(f"\n💤 Idle: {_fmt_seconds(idle['idle_seconds'])} of {_fmt_seconds(idle['tracked_seconds'])} "
+          f"({idle['idle_ratio']:.1%})", file=out)
+    for day, ratio in idle["per_day"].items():
+        print(f"   {day}: {ratio:.1%}", file=out)
+
+    if report["system"]:
+        s = report["system"]
+        print(f"\n🖥️ System: cpu mean {s['cpu_mean']:.1f}% (p95 {s['cpu_p95']:.1f}%), "
+              f"memory mean {s['mem_mean']:.1f}% (max {s['mem_max']:.1f}%)", file=out)
+
+# === BENCHMARK ===
+def synthetic_month(days=30, apps=30, titles=2000, domains=200, seed=0):
+    """One 1-second segment per second of the period, for benchmarking."""
+    rng = np.random.default_rng(seed)
+    n = days * 86400
+    data = ActivityData()
+    for i in range(apps):
+        data.apps(f"app-{i}")
+    for i in range(titles):
+        data.titles(f"Window title {i}")
+    for i in range(domains):
+        data.domains(f"site{i}.example.com")
+    categories = sorted(set(default_categorizer().domains.values()))
+    for category in categories:
+        data.categories(category)
+    seg = np.empty(n, dtype=SEGMENT_DTYPE)
+    seg["start"] = time.time() - n + np.arange(n, dtype=np.float64)
+    seg["end"] = seg["start"] + 1.0
+    # Sticky focus: apps change in runs, like real usage
+    runs = np.repeat(rng.integers(1, apps + 1, n // 60 + 1), 60)[:n]
+    seg["app"] = runs
+    seg["title"] = rng.integers(1, titles + 1, n)
+    seg["domain"] = rng.integers(0, domains + 1, n)
+    seg["category"] = np.where(seg["domain"] > 0, rng.integers(1, len(categories) + 1, n), 0)
+    seg["idle"] = rng.random(n) < 0.1
+    data.segments = seg
+    return data
+
+
+def run_benchmark(days=30):
+    data = synthetic_month(days)
+    t0 = time.perf_counter()
+    build_report(data)
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ Aggregated {len(data.segments):,} segments ({days} days @ 1 s) in {elapsed:.3f} s")
+    return elapsed
+
+# === MAIN ===
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline activity report over persisted tracker logs")
+    parser.add_argument("--segments", default=segment_log.SEGMENT_LOG)
+    parser.add_argument("--activity-log", default=ACTIVITY_LOG)
+    parser.add_argument("--user-log", default=USER_DETAILED_LOG)
+    parser.add_argument("--system-log", default=SYSTEM_DETAILED_LOG)
+    parser.add_argument("--since", type=_parse_day, help="YYYY-MM-DD (inclusive)")
+    parser.add_argument("--until", type=_parse_day, help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--format", choices=["table", "json", "csv"], default="table")
+    parser.add_argument("--active", action="store_true",
+                        help="add per-app seconds with input from the stored activity bitmaps")
+    parser.add_argument("--bench", action="store_true", help="aggregate a synthetic month and report timing")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        run_benchmark()
+        return
+
+    data = load_all(args.segments, args.activity_log, args.user_log, args.system_log)
+    if args.since or args.until:
+        data = data.between(args.since, args.until)
+    report = build_report(data, args.top, BitmapStore() if args.active else None)
+
+    if args.format == "json":
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif args.format == "csv":
+        write_csv(report)
+    else:
+        write_table(report)
+
+
+if __name__ == "__main__":
+    main()
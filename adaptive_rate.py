@@ -0,0 +1,417 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import argparse
+import threading
+import subprocess
+from collections import deque
+
+from ingest_client import client_phase, next_delay
+
+# === CONFIG ===
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+STATE_TTL = 30                # seconds a power reading is reused before /sys is read again
+LOCK_CHECK_IDLE = 30          # only ask logind about the lock after this much idle (no spawns while typing)
+IDLE_AFTER = 120              # seconds without input before the session counts as idle
+DEEP_IDLE_AFTER = 900         # idle this long: screen content cannot change, expensive collectors stop
+FOCUS_WINDOW = 300            # seconds of focus changes behind the switch rate
+BUSY_SWITCHES_PER_MIN = 4     # at or above this, focus pollers run at their fastest bound
+CALM_SWITCHES_PER_MIN = 0.2   # below this (one switch in 5 min), focus pollers slow down
+BATTERY_FACTOR = 2.0
+LOW_BATTERY_FACTOR = 4.0
+LOW_BATTERY_PERCENT = 20
+IDLE_FACTOR = 4.0
+DEFAULT_SLOWDOWN = 8          # slowest bound, as a multiple of the base interval, when none is given
+MAINS_TYPES = {"Mains", "USB", "USB_C", "USB_PD"}
+
+
+# === STATE SOURCES ===
+def _read(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def power_state(root=POWER_SUPPLY_DIR):
+    """(on_battery, battery percent or None) from /sys/class/power_supply; desktops read as (False, None)."""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return False, None
+    online = None
+    discharging = False
+    capacities = []
+    for name in names:
+        path = os.path.join(root, name)
+        kind = _read(path, "type")
+        if kind in MAINS_TYPES:
+            if _read(path, "online") == "1":
+                online = True
+            elif online is None:
+                online = False
+        elif kind == "Battery" and _read(path, "scope") != "Device":  # skip mouse/headset batteries
+            capacity = _read(path, "capacity")
+            if capacity and capacity.isdigit():
+                capacities.append(int(capacity))
+            discharging = discharging or _read(path, "status") == "Discharging"
+    if not capacities:
+        return False, None
+    on_battery = discharging or online is False
+    return on_battery, min(capacities)
+
+
+def session_locked(session=None):
+    """LockedHint of the login session (logind); False when loginctl is unavailable."""
+    session = session or os.environ.get("XDG_SESSION_ID") or "auto"
+    try:
+        out = subprocess.run(["loginctl", "show-session", session, "-p", "LockedHint", "--value"],
+                             capture_output=True, text=True, timeout=2).stdout
+    except Exception:
+        return False
+    return out.strip() == "yes"
+
+
+class _XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [("window", ctypes.c_ulong), ("state", ctypes.c_int), ("kind", ctypes.c_int),
+                ("til_or_since", ctypes.c_ulong), ("idle", ctypes.c_ulong), ("event_mask", ctypes.c_ulong)]
+
+
+class XIdle:
+    """Idle time and screensaver state from the MIT-SCREEN-SAVER extension, via ctypes (no xprintidle spawn).
+
+    For trackers without input listeners. Returns None when X or libXss is unavailable.
+    """
+
+    SCREENSAVER_ON = 1
+
+    def __init__(self, display_name=None):
+        self.display_name = display_name
+        self.xss = None
+        self.dpy = None
+        self.info = None
+        self.failed = False
+
+    def _open(self):
+        x11 = ctypes.util.find_library("X11")
+        xss = ctypes.util.find_library("Xss")
+        if not x11 or not xss or not (self.display_name or os.environ.get("DISPLAY")):
+            return False
+        x11 = ctypes.CDLL(x11)
+        self.xss = ctypes.CDLL(xss)
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(_XScreenSaverInfo)
+        self.xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                                   ctypes.POINTER(_XScreenSaverInfo)]
+        name = self.display_name.encode() if self.display_name else None
+        self.dpy = x11.XOpenDisplay(name)
+        if not self.dpy:
+            return False
+        self.root = x11.XDefaultRootWindow(self.dpy)
+        self.info = self.xss.XScreenSaverAllocInfo()
+        return bool(self.info)
+
+    def query(self):
+        """(idle seconds, screensaver active) or None."""
+        if self.failed:
+            return None
+        if self.info is None and not self._open():
+            self.failed = True
+            return None
+        if not self.xss.XScreenSaverQueryInfo(self.dpy, self.root, self.info):
+            return None
+        return self.info.contents.idle / 1000.0, self.info.contents.state == self.SCREENSAVER_ON
+
+
+# === CONTROLLER ===
+class Collector:
+    """One periodic collector: base interval, bounds, and how it reacts to state."""
+
+    def __init__(self, name, base, low=None, high=None, expensive=False, follows_focus=False):
+        self.name = name
+        self.base = base
+        self.low = base if low is None else low
+        self.high = base * DEFAULT_SLOWDOWN if high is None else high
+        self.expensive = expensive          # suspended when its output cannot change
+        self.follows_focus = follows_focus  # polls focus: speeds up with frequent switches
+        self.wakeups = 0
+        self.stretched = False  # sleeping on an interval above base: the next input cuts it short
+
+
+class AdaptiveRate:
+    """Scales every registered collector's interval by power, lock/idle state and focus-change rate.
+
+    Input handlers call note_input() (one attribute store), focus trackers call
+    note_focus_change(); collectors replace time.sleep(n) with wait(name). On battery
+    intervals stretch, idle and locked sessions stretch them further, and expensive
+    collectors (screenshots, browser history, process scans) are suspended while the
+    screen is locked or the user has been away long enough that nothing can change.
+    A collector waiting on a stretched interval is woken by the first input and then runs
+    within its base interval.
+    """
+
+    def __init__(self, idle_source=None, clock=time.time):
+        self.collectors = {}
+        self.clock = clock
+        self.idle_source = idle_source  # callable -> (idle seconds, locked) or None, when no listener feeds input
+        self.last_input = None
+        self.focus_changes = deque(maxlen=256)
+        self.started = clock()
+        self.cond = threading.Condition()
+        self.stretched = False  # some collector is stretched: note_input() must wake the waiters
+        self._power = (False, None)
+        self._power_at = None
+        self._locked = False
+        self._locked_at = None
+
+    def register(self, name, base, low=None, high=None, expensive=False, follows_focus=False):
+        collector = self.collectors.get(name)
+        if collector is None:
+            collector = self.collectors[name] = Collector(name, base, low, high, expensive, follows_focus)
+        return collector
+
+    # --- signals ---
+    def note_input(self, ts=None):
+        self.last_input = ts or self.clock()
+        if self.stretched:
+            with self.cond:
+                self.stretched = False
+                self.cond.notify_all()
+
+    def note_focus_change(self, ts=None):
+        self.focus_changes.append(ts or self.clock())
+
+    def switches_per_min(self, now=None):
+        now = now or self.clock()
+        recent = sum(1 for t in self.focus_changes if now - t <= FOCUS_WINDOW)
+        return recent * 60.0 / FOCUS_WINDOW
+
+    def state(self, now=None):
+        """Current {on_battery, battery, idle, locked, switches_per_min}; power is cached for STATE_TTL."""
+        now = now or self.clock()
+        if self._power_at is None or now - self._power_at >= STATE_TTL:
+            self._power = power_state()
+            self._power_at = now
+        idle, locked = 0.0, False
+        if self.last_input is not None:
+            idle = max(now - self.last_input, 0.0)
+        elif self.idle_source is not None:
+            reading = self.idle_source()
+            if reading:
+                idle, locked = reading
+        if not locked and idle >= LOCK_CHECK_IDLE:
+            if self._locked_at is None or now - self._locked_at >= STATE_TTL:
+                self._locked = session_locked()
+                self._locked_at = now
+            locked = self._locked
+        elif idle < LOCK_CHECK_IDLE:
+            self._locked, self._locked_at = False, None
+        return {"on_battery": self._power[0], "battery": self._power[1], "idle": idle, "locked": locked,
+                "switches_per_min": self.switches_per_min(now)}
+
+    # --- policy ---
+    def interval(self, name, state=None):
+        """Seconds until the collector's next run, within its configured bounds."""
+        c = self.collectors[name]
+        state = state or self.state()
+        if state["locked"]:
+            return c.high
+        factor = 1.0
+        if state["on_battery"]:
+            low_battery = state["battery"] is not None and state["battery"] <= LOW_BATTERY_PERCENT
+            factor *= LOW_BATTERY_FACTOR if low_battery else BATTERY_FACTOR
+        if state["idle"] >= IDLE_AFTER:
+            factor *= IDLE_FACTOR
+        elif c.follows_focus:
+            if state["switches_per_min"] >= BUSY_SWITCHES_PER_MIN:
+                factor *= 0.5
+            elif state["switches_per_min"] < CALM_SWITCHES_PER_MIN:
+                factor *= 2.0
+        return min(max(c.base * factor, c.low), c.high)
+
+    def suspended(self, name, state=None):
+        """True while an expensive collector's output cannot change (locked, or away past DEEP_IDLE_AFTER)."""
+        c = self.collectors[name]
+        if not c.expensive:
+            return False
+        state = state or self.state()
+        return state["locked"] or state["idle"] >= DEEP_IDLE_AFTER
+
+    def due(self, name, elapsed=None):
+        """For a collector run from another collector's loop: True (and counted) once `elapsed`
+        seconds since its last run reach its current interval, unless it is suspended.
+        Without `elapsed` it runs on every pass of the host loop while not suspended."""
+        state = self.state()
+        if self.suspended(name, state):
+            return False
+        if elapsed is not None and elapsed < self.interval(name, state):
+            return False
+        self.collectors[name].wakeups += 1
+        return True
+
+    def wait(self, name, jitter=False):
+        """Sleep for the collector's current interval; a suspended collector keeps sleeping.
+
+        jitter=True keeps the per-host phase alignment of ingest_client.jittered_sleep.
+        Returns the state at wakeup so callers need not read it again.
+        """
+        c = self.collectors[name]
+        while True:
+            state = self.state()
+            interval = seconds = self.interval(name, state)
+            if jitter:
+                import socket
+                seconds = next_delay(interval, client_phase(socket.gethostname(), interval))
+            deadline = self.clock() + seconds
+            with self.cond:
+                # Stretched by state (battery, idle, calm focus), not by jitter
+                c.stretched = interval > c.base
+                self.stretched = self.stretched or c.stretched
+                while True:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        break
+                    # Input woke this stretched collector: the rest of the wait is at most its base interval
+                    if self.cond.wait(remaining) and c.stretched and not self.stretched:
+                        c.stretched = False
+                        deadline = min(deadline, self.clock() + c.base)
+                c.stretched = False
+            c.wakeups += 1
+            state = self.state()
+            if not self.suspended(name, state):
+                return state
+
+    # --- reporting ---
+    def stats(self, now=None):
+        """Per-collector wakeups per hour since start, next to what the fixed base interval would cost."""
+        hours = max(((now or self.clock()) - self.started) / 3600.0, 1e-9)
+        return [{"name": c.name, "base": c.base, "wakeups": c.wakeups, "per_hour": c.wakeups / hours,
+                 "fixed_per_hour": 3600.0 / c.base} for c in self.collectors.values()]
+
+    def wakeups_per_hour(self):
+        return round(sum(row["per_hour"] for row in self.stats()), 1)
+
+    def report(self, out=sys.stdout, rows=None):
+        rows = self.stats() if rows is None else rows
+        print_wakeups(rows, out)
+
+
+def print_wakeups(rows, out=sys.stdout):
+    fixed = sum(r["fixed_per_hour"] for r in rows)
+    adaptive = sum(r["per_hour"] for r in rows)
+    saved = 1 - adaptive / fixed if fixed else 0.0
+    print(f"⏱️ Wakeups per hour: {adaptive:,.0f} adaptive vs {fixed:,.0f} fixed ({saved:.0%} fewer)", file=out)
+    for r in rows:
+        print(f" - {r['name']:<20} base {r['base']:>5g} s  {r['per_hour']:>8,.1f}/h  fixed {r['fixed_per_hour']:>8,.1f}/h",
+              file=out)
+
+
+_default_rate = None
+_default_lock = threading.Lock()
+
+
+def default_rate():
+    """Process-wide controller every tracker's collectors register with."""
+    global _default_rate
+    if _default_rate is None:
+        with _default_lock:
+            if _default_rate is None:
+                _default_rate = AdaptiveRate()
+    return _default_rate
+
+# === SIMULATION ===
+# (hours, label, on_battery, battery %, locked, input, focus switches per minute)
+SIMULATED_DAY = [
+    (3.0, "desk, on AC", False, 100, False, True, 2.0),
+    (0.5, "meeting, many switches", False, 100, False, True, 6.0),
+    (1.0, "lunch, screen locked", False, 100, True, False, 0.0),
+    (2.0, "train, on battery", True, 70, False, True, 1.0),
+    (1.0, "reading, few switches", True, 45, False, True, 0.1),
+    (0.5, "away, unlocked", True, 30, False, False, 0.0),
+    (1.0, "low battery", True, 15, False, True, 1.0),
+    (14.0, "overnight, locked", False, 100, True, False, 0.0),
+]
+# The collectors of TrackDesktop_SavedFile and FirefoxChromiumBrowsersAppUsage, as registered there
+SIMULATED_COLLECTORS = [
+    ("focus_poll", 1, 1, 15, False, True),
+    ("browser_history", 10, 10, 300, True, False),
+    ("system_usage", 10, 10, 300, False, False),
+    ("activity_log", 60, 60, 300, False, False),
+    ("inactivity_check", 10, 10, 120, True, False),
+    ("screenshots", 600, 600, 3600, True, False),
+]
+
+
+def simulate(day=SIMULATED_DAY, collectors=SIMULATED_COLLECTORS):
+    """Step every collector through a scripted day on a virtual clock; returns (total rows, per-phase rows)."""
+    phases = []
+    t = 0.0
+    idle_since = None
+    for hours, label, on_battery, battery, locked, active, switches in day:
+        start = t
+        t += hours * 3600
+        if active:
+            idle_since = None
+        elif idle_since is None:
+            idle_since = start
+        phases.append((start, t, label, on_battery, battery, locked, idle_since, switches))
+
+    def state_at(now):
+        for start, end, label, on_battery, battery, locked, since, switches in phases:
+            if start <= now < end:
+                return {"on_battery": on_battery, "battery": battery, "locked": locked,
+                        "idle": 0.0 if since is None else now - since, "switches_per_min": switches}, label
+        return None, None
+
+    ctl = AdaptiveRate(clock=lambda: 0.0)
+    per_phase = {p[2]: {} for p in phases}
+    for name, base, low, high, expensive, follows_focus in collectors:
+        ctl.register(name, base, low, high, expensive, follows_focus)
+        now = 0.0
+        while True:
+            state, label = state_at(now)
+            if state is None:
+                break
+            now += ctl.interval(name, state)
+            ctl.collectors[name].wakeups += 1
+            per_phase[label][name] = per_phase[label].get(name, 0) + 1
+    total = ctl.stats(now=t)
+    phase_rows = []
+    for start, end, label, *_ in phases:
+        hours = (end - start) / 3600
+        fixed = sum(3600.0 / c.base for c in ctl.collectors.values())
+        phase_rows.append((label, hours, sum(per_phase[label].values()) / hours, fixed))
+    return total, phase_rows
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Power- and presence-aware sampling rates for the collectors")
+    parser.add_argument("--simulate", action="store_true", help="wakeups per hour over a scripted day, fixed vs adaptive")
+    parser.add_argument("--status", action="store_true", help="print the current power, idle and lock state")
+    args = parser.parse_args(argv)
+    if args.simulate:
+        total, phases = simulate()
+        print(f"{'phase':<26} {'hours':>5} {'adaptive/h':>11} {'fixed/h':>9}")
+        for label, hours, adaptive, fixed in phases:
+            print(f"{label:<26} {hours:>5.1f} {adaptive:>11,.0f} {fixed:>9,.0f}")
+        print()
+        print_wakeups(total)
+        return 0
+    if args.status:
+        ctl = AdaptiveRate(idle_source=XIdle().query)
+        state = ctl.state()
+        print(f"🔋 on battery: {state['on_battery']} ({state['battery'] if state['battery'] is not None else '-'}%)")
+        print(f"💤 idle: {state['idle']:.0f} s, locked: {state['locked']}")
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,621 @@
+import os
+import sys
+import json
+import time
+import random
+import bisect
+import argparse
+import threading
+from collections import OrderedDict, deque, defaultdict
+from datetime import datetime
+
+from ingest_client import encode_batch
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ALERT_RULES_FILE = os.path.join(BASE_DIR, "alert_rules.json")
+DEFAULT_COOLDOWN = 600      # seconds before the same rule (and group) may alert again
+MAX_GROUPS = 1000           # per-"by" aggregates kept per rule window; least recently updated dropped
+SEND_INTERVAL = 5           # seconds between batched POSTs
+SEND_BATCH = 100
+SEND_QUEUE_MAX = 1000       # alerts kept while Odoo is unreachable; the oldest are dropped beyond this
+RETRY_MAX = 300             # seconds between retries at most (doubling from SEND_INTERVAL)
+OPS = {">": 1, ">=": 1, "<": -1, "<=": -1}
+EPSILON = 1e-9              # ">= t" is kept as "> t - EPSILON", so one sorted list serves both
+
+
+# === WINDOWED AGGREGATES ===
+class Last:
+    """Value of the most recent event."""
+
+    def __init__(self, window=0):
+        self.value = None
+
+    def add(self, ts, value):
+        self.value = value
+
+    def expire(self, now):
+        pass
+
+
+class Totals:
+    """count, sum and avg over the last `window` seconds: one deque and a running sum, O(1) amortized."""
+
+    def __init__(self, window):
+        self.window = window
+        self.events = deque()
+        self.sum = 0.0
+        self.count = 0
+        self.avg = None
+
+    def add(self, ts, value):
+        self.events.append((ts, value))
+        self.sum += value
+        self.expire(ts)
+
+    def expire(self, now):
+        cutoff = now - self.window
+        events = self.events
+        while events and events[0][0] <= cutoff:
+            self.sum -= events.popleft()[1]
+        self.count = n = len(events)
+        self.avg = self.sum / n if n else None
+        if not n:
+            self.sum = 0.0  # no float drift carried into the next burst
+
+
+class Extreme:
+    """min or max over the last `window` seconds (monotonic deque, O(1) amortized).
+
+    The value only counts once the window is covered: "CPU above 90% for 5 minutes" must
+    not fire on the first sample. A gap longer than the window starts coverage again.
+    """
+
+    def __init__(self, window, sign=1):
+        self.window = window
+        self.sign = sign  # 1: min, -1: max
+        self.events = deque()  # (ts, signed value), signed values increasing
+        self.value = None
+        self.since = None
+        self.last = None
+
+    def add(self, ts, value):
+        if self.last is not None and ts - self.last > self.window:
+            self.events.clear()
+            self.since = None
+        if self.since is None:
+            self.since = ts
+        self.last = ts
+        signed = self.sign * value
+        events = self.events
+        while events and events[-1][1] >= signed:
+            events.pop()
+        events.append((ts, signed))
+        self.expire(ts)
+
+    def expire(self, now):
+        cutoff = now - self.window
+        events = self.events
+        while events and events[0][0] <= cutoff:
+            events.popleft()
+        if not events or now - self.since < self.window:
+            self.value = None
+        else:
+            self.value = self.sign * events[0][1]
+
+
+def _aggregate_source(agg, window):
+    """(aggregate key, attribute) for a rule's agg/window; rules over one window share one aggregate."""
+    if agg == "last" or window <= 0:  # no window: compare each value as it arrives
+        return ("last", 0), "value"
+    if agg in ("count", "sum", "avg"):
+        return ("totals", window), agg
+    return (agg, window), "value"
+
+
+def _make_aggregate(key):
+    kind, window = key
+    if kind == "last":
+        return Last()
+    if kind == "totals":
+        return Totals(window)
+    return Extreme(window, 1 if kind == "min" else -1)
+
+
+AGGREGATES = ("last", "count", "sum", "avg", "min", "max")
+
+# === RULES ===
+class Rule:
+    """One declarative rule; see alert_rules.json for the fields."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.name = spec["name"]
+        self.event = spec["event"]
+        self.severity = spec.get("severity", "warning")
+        self.cooldown = spec.get("cooldown", DEFAULT_COOLDOWN)
+        self.hours = spec.get("hours")  # [start, end) local hours
+        self.days = set(spec["days"]) if "days" in spec else None  # 0 = Monday
+        self.where = tuple(sorted(spec.get("where", {}).items()))
+        self.by = spec.get("by")
+        self.field = spec.get("field")
+        self.members = {str(v).lower() for v in spec["in"]} if "in" in spec else None
+        if self.members is None:
+            self.agg = spec.get("agg", "last")
+            self.window = spec.get("window", 0)
+            self.op = spec.get("op", ">")
+            if self.agg not in AGGREGATES:
+                raise ValueError(f"rule {self.name}: unknown agg {self.agg!r}")
+            if self.op not in OPS:
+                raise ValueError(f"rule {self.name}: unknown op {self.op!r}")
+            self.threshold = float(spec["value"])
+            self.direction = OPS[self.op]
+            # Strict and non-strict comparisons share a sorted list: nudge the non-strict ones
+            nudge = EPSILON if self.op in (">=", "<=") else 0.0
+            self.key = self.threshold - nudge if self.direction > 0 else self.threshold + nudge
+
+    def in_schedule(self, ts):
+        if self.hours is None and self.days is None:
+            return True
+        t = datetime.fromtimestamp(ts)
+        if self.days is not None and t.weekday() not in self.days:
+            return False
+        if self.hours is not None:
+            start, end = self.hours
+            return start <= t.hour < end if start <= end else (t.hour >= start or t.hour < end)
+        return True
+
+
+class Thresholds:
+    """The threshold rules reading one aggregate, sorted so an update only visits rules that change state.
+
+    Per group, `state` remembers how many ">" rules fire (a prefix of `above`) and where the
+    firing "<" rules start (a suffix of `below`); a new value moves those boundaries by bisection.
+    """
+
+    def __init__(self, source, attr):
+        self.source = source
+        self.attr = attr
+        self.above, self.above_keys = [], []  # ">" / ">=" by key
+        self.below, self.below_keys = [], []  # "<" / "<=" by key
+
+    def add_rule(self, rule):
+        keys, rules = (self.above_keys, self.above) if rule.direction > 0 else (self.below_keys, self.below)
+        i = bisect.bisect_right(keys, rule.key)
+        keys.insert(i, rule.key)
+        rules.insert(i, rule)
+
+    def evaluate(self, state, v, changed):
+        """Append (rules, fired) to `changed` for the rules whose condition flipped."""
+        if v is None:
+            n_above, start_below = 0, len(self.below)
+        else:
+            n_above = bisect.bisect_left(self.above_keys, v)
+            start_below = bisect.bisect_right(self.below_keys, v)
+        if n_above != state[0]:
+            if n_above > state[0]:
+                changed.append((self.above[state[0]:n_above], True))
+            else:
+                changed.append((self.above[n_above:state[0]], False))
+            state[0] = n_above
+        if start_below != state[1]:
+            if start_below < state[1]:
+                changed.append((self.below[start_below:state[1]], True))
+            else:
+                changed.append((self.below[state[1]:start_below], False))
+            state[1] = start_below
+
+
+class Stream:
+    """Threshold rules on one (event, where, by): per group, each window is kept once for all of them."""
+
+    def __init__(self, by):
+        self.by = by
+        self.sources = []      # aggregate keys
+        self.thresholds = {}   # (agg, window) -> Thresholds
+        self.groups = OrderedDict()  # group -> ([aggregate per source], [[n_above, start_below] per Thresholds])
+
+    def add_rule(self, rule):
+        key = (rule.agg, rule.window) if rule.window > 0 else ("last", 0)
+        t = self.thresholds.get(key)
+        if t is None:
+            source, attr = _aggregate_source(rule.agg, rule.window)
+            if source not in self.sources:
+                self.sources.append(source)
+            t = self.thresholds[key] = Thresholds(self.sources.index(source), attr)
+        t.add_rule(rule)
+
+    def _state(self, group):
+        state = self.groups.get(group)
+        if state is None:
+            state = self.groups[group] = ([_make_aggregate(s) for s in self.sources],
+                                          [[0, len(t.below)] for t in self.thresholds.values()])
+            if len(self.groups) > MAX_GROUPS:
+                self.groups.popitem(last=False)
+        elif len(self.groups) > 1:
+            self.groups.move_to_end(group)
+        return state
+
+    def update(self, ts, value, group, changed):
+        aggregates, states = self._state(group)
+        for aggregate in aggregates:
+            aggregate.add(ts, value)
+        self._evaluate(aggregates, states, changed)
+
+    def expire(self, now):
+        """[(group, changed)] after ageing every group's windows to `now`."""
+        out = []
+        for group, (aggregates, states) in list(self.groups.items()):
+            for aggregate in aggregates:
+                aggregate.expire(now)
+            changed = []
+            self._evaluate(aggregates, states, changed)
+            if changed:
+                out.append((group, changed))
+        return out
+
+    def _evaluate(self, aggregates, states, changed):
+        for t, state in zip(self.thresholds.values(), states):
+            t.evaluate(state, getattr(aggregates[t.source], t.attr), changed)
+
+
+class RuleEngine:
+    """Evaluates declarative alert rules over the tracker's event stream.
+
+    Events are (kind, value, attributes): "idle" seconds, "cpu" percent, "automation"
+    confidence, "focus" with app/site, "odoo_error"... Threshold rules compile into shared
+    windowed aggregates (Stream), blocklists into set lookups, both indexed by event kind
+    and "where" attribute, so emit() costs a few dict lookups and O(1) aggregate updates.
+    Alerts fire when a rule's condition becomes true, and again on events that find it still
+    true once its cooldown has passed (per rule and group); a condition that becomes true
+    outside the rule's hours is held until they open.
+    """
+
+    def __init__(self, rules, on_alert=None, clock=time.time):
+        self.on_alert = on_alert
+        self.clock = clock
+        self.rules = [r if isinstance(r, Rule) else Rule(r) for r in rules]
+        self.lock = threading.Lock()
+        # kind -> [unfiltered handlers, {(attr, value): handlers}, [(where, handlers)] for multi-attribute filters]
+        self.index = {}
+        self.streams = {}
+        self.firing = {}        # (rule name, group) -> value, while the condition holds
+        self.deferred = {}      # (rule name, group) -> (rule, value): true outside the rule's hours
+        self.last_alert = {}    # (rule name, group) -> ts
+        self.held = {}          # (stream, group) -> [earliest due, {rule: ts of its next alert while it stays true}]
+        self.stream_of = {}     # threshold rule name -> its Stream
+        self.counts = defaultdict(int)
+        for rule in self.rules:
+            if rule.members is not None:
+                self._handlers(rule.event, rule.where).append(rule)
+                continue
+            key = (rule.event, rule.where, rule.by)
+            stream = self.streams.get(key)
+            if stream is None:
+                stream = self.streams[key] = Stream(rule.by)
+                self._handlers(rule.event, rule.where).append(stream)
+            stream.add_rule(rule)
+            self.stream_of[rule.name] = stream
+
+    def _handlers(self, kind, where):
+        plain, single, multi = self.index.setdefault(kind, ([], {}, []))
+        if not where:
+            return plain
+        if len(where) == 1:
+            return single.setdefault(where[0], [])
+        for w, handlers in multi:
+            if w == where:
+                return handlers
+        multi.append((where, []))
+        return multi[-1][1]
+
+    @classmethod
+    def from_file(cls, path=ALERT_RULES_FILE, on_alert=None):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["rules"], on_alert)
+
+    def emit(self, kind, value=1.0, ts=None, **attrs):
+        entry = self.index.get(kind)
+        if entry is None:
+            return
+        ts = self.clock() if ts is None else ts
+        plain, single, multi = entry
+        with self.lock:
+            self.counts["events"] += 1
+            self._dispatch(plain, ts, value, attrs)
+            if single:
+                for item in attrs.items():
+                    handlers = single.get(item)
+                    if handlers:
+                        self._dispatch(handlers, ts, value, attrs)
+            for where, handlers in multi:
+                if all(attrs.get(k) == v for k, v in where):
+                    self._dispatch(handlers, ts, value, attrs)
+
+    def _dispatch(self, handlers, ts, value, attrs):
+        for handler in handlers:
+            if isinstance(handler, Stream):
+                group = attrs.get(handler.by) if handler.by else None
+                changed = []
+                handler.update(ts, value, group, changed)
+                if changed:
+                    self._apply(changed, group, value, ts, attrs)
+                if self.held:
+                    self._repeat(handler, group, value, ts, attrs)
+            else:
+                member = attrs.get(handler.field)
+                if member is not None:
+                    member = str(member).lower()
+                    if member in handler.members:
+                        self._alert(handler, member, value, ts, attrs)
+
+    def tick(self, now=None):
+        """Age windows without events (counts fall, coverage lapses) and release alerts held for schedule."""
+        now = self.clock() if now is None else now
+        with self.lock:
+            for stream in self.streams.values():
+                for group, changed in stream.expire(now):
+                    self._apply(changed, group, None, now, {})
+            for key, (rule, value) in list(self.deferred.items()):
+                if key not in self.firing:
+                    del self.deferred[key]  # cleared before its hours opened
+                elif rule.in_schedule(now):
+                    del self.deferred[key]
+                    self._alert(rule, key[1], value, now, {})
+                    self._hold(rule, key[1])
+
+    def _apply(self, changed, group, value, ts, attrs):
+        for rules, fired in changed:
+            for rule in rules:
+                if fired:
+                    self.firing[(rule.name, group)] = value
+                    self._alert(rule, group, value, ts, attrs)
+                    self._hold(rule, group)
+                else:
+                    self.firing.pop((rule.name, group), None)
+                    held = self.held.get((self.stream_of[rule.name], group))
+                    if held is not None:
+                        held[1].pop(rule, None)  # held[0] may now be early: the next scan corrects it
+
+    def _hold(self, rule, group):
+        """Schedule the next alert of a threshold rule that stays true (not while held for schedule)."""
+        key = (rule.name, group)
+        last = self.last_alert.get(key)
+        if last is not None and key not in self.deferred:
+            held = self.held.get((self.stream_of[rule.name], group))
+            if held is None:
+                held = self.held[(self.stream_of[rule.name], group)] = [last + rule.cooldown, {}]
+            held[1][rule] = last + rule.cooldown
+            held[0] = min(held[0], last + rule.cooldown)
+
+    def _repeat(self, stream, group, value, ts, attrs):
+        """Alert again for conditions this event finds still true, once their cooldown has passed."""
+        held = self.held.get((stream, group))
+        if held is None or ts < held[0]:
+            return
+        due = held[1]
+        held[0] = float("inf")
+        for rule, at in list(due.items()):
+            if ts >= at:
+                del due[rule]
+                self._alert(rule, group, value, ts, attrs)
+                self._hold(rule, group)
+            else:
+                held[0] = min(held[0], at)
+
+    def _alert(self, rule, group, value, ts, attrs):
+        key = (rule.name, group)
+        last = self.last_alert.get(key)
+        if last is not None and ts - last < rule.cooldown:
+            self.counts["suppressed"] += 1
+            return
+        if not rule.in_schedule(ts):
+            if rule.members is None:
+                self.deferred[key] = (rule, value)
+            self.counts["deferred"] += 1
+            return
+        self.last_alert[key] = ts
+        self.counts["alerts"] += 1
+        alert = {
+            "type": "rule",
+            "rule": rule.name,
+            "severity": rule.severity,
+            "event": rule.event,
+            "value": value,
+            "timestamp": datetime.fromtimestamp(ts).isoformat(),
+        }
+        if group is not None:
+            alert["group"] = group
+        if rule.members is None:
+            alert["threshold"] = f"{rule.agg}({rule.window}s) {rule.op} {rule.threshold:g}"
+        if attrs:
+            alert["attributes"] = attrs
+        if self.on_alert:
+            try:
+                self.on_alert(alert)
+            except Exception as e:
+                print(f"[ERROR] alert delivery: {e}")
+# === DELIVERY ===
+class AlertSender:
+    """Batched, retrying delivery of alerts to ODOO_API_ALERT from one background thread.
+
+    add() never blocks the caller (listeners, collectors). The thread starts with the first
+    alert; failures back off up to RETRY_MAX and are reported to on_failure (the engine's
+    "odoo_error" event), so the unreachable-Odoo rule sees them too.
+    """
+
+    def __init__(self, endpoint, headers=None, on_failure=None, post=None):
+        self.endpoint = endpoint
+        self.headers = headers or {}
+        self.on_failure = on_failure
+        self.post = post or self._post
+        self.queue = deque(maxlen=SEND_QUEUE_MAX)
+        self.cond = threading.Condition()
+        self.thread = None
+        self.counts = defaultdict(int)
+
+    def add(self, alert):
+        print(f"🚨 {alert['rule']}: {alert.get('group') or alert['event']} = {alert['value']} ({alert['severity']})")
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.counts["dropped"] += 1
+            self.queue.append(alert)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="alert-sender", daemon=True)
+                self.thread.start()
+            if len(self.queue) >= SEND_BATCH:
+                self.cond.notify()
+
+    def _post(self, batch):
+        import requests
+        body, headers = encode_batch(batch)
+        headers.update({k: v for k, v in self.headers.items() if k != "Content-Type"})
+        response = requests.post(self.endpoint, data=body, headers=headers, timeout=10)
+        return response.status_code == 200
+
+    def _run(self):
+        delay = SEND_INTERVAL
+        while True:
+            with self.cond:
+                self.cond.wait(delay)
+                batch = [self.queue.popleft() for _ in range(min(SEND_BATCH, len(self.queue)))]
+            if not batch:
+                continue
+            try:
+                ok = self.post(batch)
+            except Exception as e:
+                print(f"❌ Error sending alerts to Odoo: {e}")
+                ok = False
+            if ok:
+                self.counts["sent"] += len(batch)
+                delay = SEND_INTERVAL
+                continue
+            with self.cond:
+                self.queue.extendleft(reversed(batch))  # oldest first again; maxlen drops the newest overflow
+            self.counts["failed"] += 1
+            delay = min(delay * 2, RETRY_MAX)
+            if self.on_failure:
+                self.on_failure()
+
+# === BENCHMARK ===
+EVENT_KINDS = ["cpu", "memory", "idle", "automation", "focus", "odoo_error", "net_rx", "net_tx", "disk", "key_rate"]
+APPS = [f"app{i}" for i in range(40)]
+SITES = [f"site{i}.example" for i in range(2000)]
+
+
+def synthetic_rules(n=500, seed=0):
+    """n rules over EVENT_KINDS: thresholds on shared and per-app windows, blocklists and filters."""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(n):
+        kind = rng.choice(EVENT_KINDS)
+        if kind == "focus":
+            rules.append({"name": f"r{i}", "event": "focus", "field": "site",
+                          "in": rng.sample(SITES, 20), "cooldown": 300})
+            continue
+        spec = {"name": f"r{i}", "event": kind, "agg": rng.choice(["last", "count", "avg", "min", "max", "sum"]),
+                "window": rng.choice([0, 60, 300, 900]), "op": rng.choice([">", ">=", "<", "<="]),
+                "value": rng.uniform(0, 100), "cooldown": rng.choice([60, 600])}
+        if rng.random() < 0.3:
+            spec["by"] = "app"
+        if rng.random() < 0.2:
+            spec["where"] = {"app": rng.choice(APPS)}
+        if rng.random() < 0.1:
+            spec["hours"] = [9, 18]
+        rules.append(spec)
+    return rules
+
+
+def synthetic_events(n, rate=10_000, seed=1):
+    rng = random.Random(seed)
+    ts = 1_700_000_000.0
+    events = []
+    for _ in range(n):
+        ts += rng.expovariate(rate)
+        kind = rng.choice(EVENT_KINDS)
+        attrs = {"app": rng.choice(APPS)}
+        if kind == "focus":
+            attrs["site"] = rng.choice(SITES)
+        events.append((kind, rng.uniform(0, 100), ts, attrs))
+    return events
+
+
+def run_bench(rules=500, events=200_000, rate=10_000):
+    engine = RuleEngine(synthetic_rules(rules), on_alert=lambda a: None)
+    stream = synthetic_events(events, rate)
+    windows = sum(len(stream.sources) for stream in engine.streams.values())
+    print(f"📐 {rules} rules -> {len(engine.streams)} streams over {windows} shared windows, "
+          f"{sum(r.members is not None for r in engine.rules)} membership rules")
+    t0 = time.perf_counter()
+    for kind, value, ts, attrs in stream:
+        engine.emit(kind, value, ts, **attrs)
+    elapsed = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    engine.tick(stream[-1][2] + 1)
+    t_tick = (time.perf_counter() - t1) * 1000
+    per_event = elapsed / events * 1e6
+    print(f"⏱️ {events:,} events in {elapsed:.2f} s: {per_event:.1f} µs/event, {events / elapsed:,.0f} events/s; "
+          f"at {rate:,}/s that is {per_event * rate / 1e4:.1f}% of one core")
+    print(f"📈 tick {t_tick:.1f} ms; {dict(engine.counts)}")
+
+def run_self_test(path=ALERT_RULES_FILE):
+    """Replay held conditions through the shipped rules: each must alert again once per cooldown."""
+    ok = True
+    alerts = []
+    engine = RuleEngine.from_file(path, on_alert=alerts.append)
+    # A mouse jiggler: one detection at 0.9 per hour for 10 hours (scripted_input, cooldown 600 s)
+    start = datetime(2026, 1, 5, 8).timestamp()
+    for hour in range(10):
+        engine.emit("automation", 0.9, start + hour * 3600, channel="mouse")
+    fired = sum(a["rule"] == "scripted_input" for a in alerts)
+    good = fired == 10
+    ok &= good
+    print(f"{'🟢' if good else '❌'} scripted_input held for 10 h, one detection per hour: {fired} alerts (expected 10)")
+    # Idle for 3 h from Monday 09:00, sampled every minute (idle_work_hours, cooldown 3600 s)
+    start = datetime(2026, 1, 5, 9).timestamp()
+    for minute in range(180):
+        engine.emit("idle", minute * 60.0, start + minute * 60)
+    fired = sum(a["rule"] == "idle_work_hours" for a in alerts)
+    good = fired == 3
+    ok &= good
+    print(f"{'🟢' if good else '❌'} idle_work_hours held for 2 h 45 min: {fired} alerts (expected 3)")
+    # Once the condition clears, nothing repeats
+    before = len(alerts)
+    engine.emit("automation", 0.1, start + 4 * 3600, channel="mouse")
+    engine.emit("automation", 0.1, start + 5 * 3600, channel="mouse")
+    good = len(alerts) == before
+    ok &= good
+    print(f"{'🟢' if good else '❌'} cleared condition: {len(alerts) - before} further alerts (expected 0)")
+    return 0 if ok else 1
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming alert rules over tracker events")
+    parser.add_argument("--bench", action="store_true", help="evaluation cost with synthetic rules and events")
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--self-test", action="store_true", help="replay held conditions; they must alert once per cooldown")
+    parser.add_argument("--check", metavar="FILE", nargs="?", const=ALERT_RULES_FILE, help="validate a rules file")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_bench(args.rules, args.events)
+        return 0
+    if args.self_test:
+        return run_self_test()
+    if args.check:
+        try:
+            engine = RuleEngine.from_file(args.check)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ {args.check}: {e}")
+            return 1
+        for rule in engine.rules:
+            cond = f"{rule.field} in {len(rule.members)} values" if rule.members is not None else \
+                f"{rule.agg}({rule.window}s) {rule.op} {rule.threshold:g}"
+            print(f"🟢 {rule.name:<20} {rule.event:<12} {cond}")
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
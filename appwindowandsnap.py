@@ -1,14 +1,17 @@
-import os
 import time
 import subprocess
-import psutil
-import json
-import lz4.block
-from collections import defaultdict
+
+from segment_log import append_segment
+from firefox_profiles import default_profile_path, recovery_file, read_session_tabs
+from memory_budget import SpillCounter, default_budget
+from lazy_import import lazy_module
+from offload import default_pool
+
+psutil = lazy_module("psutil")
 
 # === CONFIG ===
-FIREFOX_PROFILE_PATH = "/home/wassef/snap/firefox/common/.mozilla/firefox/3afnh5rk.default"
-RECOVERY_FILE = os.path.join(FIREFOX_PROFILE_PATH, "sessionstore-backups", "recovery.jsonlz4")
+FIREFOX_PROFILE_PATH = default_profile_path()  # from profiles.ini (native, Snap or Flatpak)
+RECOVERY_FILE = recovery_file(FIREFOX_PROFILE_PATH)
 IGNORED_PROCESSES = {"Xwayland", "Xorg", "gnome-shell", "gnome-shell-calendar-server", "pipewire"}
 IGNORED_DISPLAY_APPS = {"Isolated Web Co", "Unknown"}
 # === UTILITIES ===
@@ -62,40 +65,21 @@ def get_best_gui_app():
 
 # === FIREFOX TAB DETECTION ===
 def get_current_firefox_tab_url():
-    """Return (title, url) of the active tab in Firefox from recovery.jsonlz4."""
+    """Return (title, url) of the active tab in Firefox from recovery.jsonlz4 (parsed in an offload worker)."""
     try:
-        with open(RECOVERY_FILE, "rb") as f:
-            f.read(8)  # Skip LZ4 magic header
-            json_data = lz4.block.decompress(f.read()).decode("utf-8")
-            session = json.loads(json_data)
-
-            selected_win_idx = session.get("selectedWindow", 1) - 1
-            windows = session.get("windows", [])
-            if not windows or selected_win_idx >= len(windows):
-                return None, None
-            win = windows[selected_win_idx]
-
-            selected_tab_idx = win.get("selected", 1) - 1
-            tabs = win.get("tabs", [])
-            if not tabs or selected_tab_idx >= len(tabs):
-                return None, None
-            tab = tabs[selected_tab_idx]
-
-            entries = tab.get("entries", [])
-            i = tab.get("index", 1) - 1
-            if 0 <= i < len(entries):
-                entry = entries[i]
-                return entry.get("title", "").strip(), entry.get("url", "").strip()
+        session = default_pool().run("firefox_session", read_session_tabs, RECOVERY_FILE)
+        return session["selected"] or (None, None)
     except Exception as e:
         print("⚠️ Error reading Firefox session:", e)
     return None, None
 
 # === TRACKING LOGIC ===
 def track_gui_app_and_web_usage(duration=60, interval=2):
-    app_usage = defaultdict(float)
-    site_usage = defaultdict(float)
+    app_usage = SpillCounter("app_usage")
+    site_usage = SpillCounter("site_usage")
     active_app = None
     active_site = None
+    active_page = (None, None)
     app_start_time = time.time()
     end_time = app_start_time + duration
 
@@ -104,31 +88,40 @@ def track_gui_app_and_web_usage(duration=60, interval=2):
         current_app = get_best_gui_app()
 
         current_site = None
+        current_page = (None, None)
         if current_app == "firefox":
             title, url = get_current_firefox_tab_url()
             if url:
                 current_site = f"{title} ({url})"
+                current_page = (title, url)
 
         if current_app != active_app or current_site != active_site:
             if active_app and active_app != "Unknown":
                 delta = now - app_start_time
-                app_usage[active_app] += delta
+                app_usage.add(active_app, delta)
                 if active_app == "firefox" and active_site:
-                    site_usage[active_site] += delta
+                    site_usage.add(active_site, delta)
+                append_segment(active_app, app_start_time, now, *active_page)
             active_app = current_app
             active_site = current_site
+            active_page = current_page
             app_start_time = now
 
         time.sleep(interval)
 
     # Final update
     if active_app and active_app != "Unknown":
-        delta = time.time() - app_start_time
-        app_usage[active_app] += delta
+        now = time.time()
+        delta = now - app_start_time
+        app_usage.add(active_app, delta)
         if active_app == "firefox" and active_site:
-            site_usage[active_site] += delta
+            site_usage.add(active_site, delta)
+        append_segment(active_app, app_start_time, now, *active_page)
 
-    return dict(app_usage), dict(site_usage)
+    results = app_usage.drain(), site_usage.drain()
+    default_budget().unregister(app_usage)
+    default_budget().unregister(site_usage)
+    return results
 
 
 # === MAIN ===
@@ -0,0 +1,361 @@
+import sys
+import math
+import json
+import time
+import random
+import argparse
+import threading
+from array import array
+from datetime import datetime
+
+# === CONFIG ===
+AUTOMATION_THRESHOLD = 0.02   # seconds: in-burst interval jitter below this looks machine-generated
+BLOCK_EVENTS = 32             # events per scoring block (per channel)
+BURST_GAP = 1.0               # intervals longer than this are pauses, not typing/motion rhythm
+STROKE_GAP = 0.05             # motion events closer than this belong to one stroke
+RING = 64                     # intervals kept for the autocorrelation window
+MAX_LAG = 8
+ALERT_CONFIDENCE = 0.75
+ALERT_COOLDOWN = 300          # seconds between alerts for the same channel
+
+HIST_BINS = 24                # log-spaced interval bins from 1 ms to ~16 s
+HIST_MIN = 0.001
+HIST_STEP = math.log(2) / 1.5  # 1.5 bins per doubling
+DIRECTIONS = 8
+MAGNITUDES = 4                # |delta| < 4, < 16, < 64, >= 64 px
+ENTROPY_REF = 3.0             # bits of delta entropy considered fully human
+
+
+def _interval_bin(dt):
+    if dt <= HIST_MIN:
+        return 0
+    return min(HIST_BINS - 1, int(math.log(dt / HIST_MIN) / HIST_STEP))
+
+
+def _delta_symbol(dx, dy):
+    mag = abs(dx) + abs(dy)
+    m = 0 if mag < 4 else 1 if mag < 16 else 2 if mag < 64 else 3
+    d = int((math.atan2(dy, dx) + math.pi) / (2 * math.pi) * DIRECTIONS) % DIRECTIONS
+    return m * DIRECTIONS + d
+
+
+def _entropy(counts, total):
+    if total <= 0:
+        return 0.0
+    h = 0.0
+    for c in counts:
+        if c:
+            p = c / total
+            h -= p * math.log2(p)
+    return h
+
+
+class ChannelStats:
+    """Constant-memory timing statistics for one input channel (keys, clicks, scrolls or motion).
+
+    Per event: a Welford update of the in-burst interval mean/variance, one interval
+    histogram increment, one ring-buffer write and, for motion, one delta-symbol increment.
+    Every BLOCK_EVENTS events the block is scored (bounded work: fixed bins and lags) and
+    the block accumulators are reset.
+    """
+
+    def __init__(self, name, jitter_threshold=AUTOMATION_THRESHOLD, block=BLOCK_EVENTS):
+        self.name = name
+        self.jitter_threshold = jitter_threshold
+        self.block = block
+        self.last = None
+        self.ring = array("d", [0.0] * RING)  # recent intervals (or motion projections)
+        self.ring_pos = 0
+        self.ring_len = 0
+        self.total_events = 0
+        self._reset_block()
+
+    def _reset_block(self):
+        self.events = 0
+        self.n = 0          # Welford over in-burst intervals
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hist = [0] * HIST_BINS
+        self.hist_total = 0
+        self.symbols = [0] * (DIRECTIONS * MAGNITUDES)
+        self.symbol_total = 0
+
+    def add(self, t, delta=None):
+        """Record one event at time t; delta=(dx, dy) for motion. Returns a score dict at block end."""
+        self.total_events += 1
+        self.events += 1
+        if self.last is not None:
+            dt = t - self.last
+            if dt >= 0:
+                self.hist[_interval_bin(dt)] += 1
+                self.hist_total += 1
+                # Pauses (and, once the rhythm is known, gaps far above it) are not jitter
+                if dt < BURST_GAP and (self.n < 4 or dt < 8 * self.mean):
+                    self.n += 1
+                    d = dt - self.mean
+                    self.mean += d / self.n
+                    self.m2 += d * (dt - self.mean)
+                if delta is None:
+                    self._push(dt)
+        self.last = t
+        if delta is not None:
+            dx, dy = delta
+            self.symbols[_delta_symbol(dx, dy)] += 1
+            self.symbol_total += 1
+            self._push(dx + dy)
+        if self.events >= self.block:
+            score = self.score()
+            self._reset_block()
+            return score
+        return None
+
+    def _push(self, value):
+        self.ring[self.ring_pos] = value
+        self.ring_pos = (self.ring_pos + 1) % RING
+        self.ring_len = min(RING, self.ring_len + 1)
+
+    def periodicity(self):
+        """Largest normalised autocorrelation over lags 1..MAX_LAG of the ring buffer."""
+        n = self.ring_len
+        if n < 2 * MAX_LAG:
+            return 0.0
+        start = (self.ring_pos - n) % RING
+        xs = [self.ring[(start + i) % RING] for i in range(n)]
+        mean = sum(xs) / n
+        xs = [x - mean for x in xs]
+        var = sum(x * x for x in xs)
+        if var <= 1e-12:
+            return 1.0  # perfectly constant sequence
+        best = 0.0
+        for lag in range(1, MAX_LAG + 1):
+            r = sum(xs[i] * xs[i + lag] for i in range(n - lag)) / var * n / (n - lag)
+            best = max(best, r)
+        return min(1.0, best)
+
+    def score(self):
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None
+        features = {
+            "events": self.events,
+            "interval_mean": round(self.mean, 4) if self.n else None,
+            "interval_std": round(std, 4) if std is not None else None,
+            "interval_entropy": round(_entropy(self.hist, self.hist_total), 3),
+            "periodicity": round(self.periodicity(), 3),
+        }
+        parts = []
+        if std is not None and self.n >= self.block // 4:
+            parts.append((3.0, min(1.0, self.jitter_threshold / max(std, 1e-9))))
+        if self.hist_total >= self.block // 2:
+            parts.append((1.0, max(0.0, 1.0 - features["interval_entropy"] / ENTROPY_REF)))
+        if self.symbol_total:
+            features["delta_entropy"] = round(_entropy(self.symbols, self.symbol_total), 3)
+            parts.append((2.0, max(0.0, 1.0 - features["delta_entropy"] / ENTROPY_REF)))
+        parts.append((1.0, max(0.0, features["periodicity"])))
+        weight = sum(w for w, _ in parts)
+        features["confidence"] = round(sum(w * s for w, s in parts) / weight, 3)
+        return features
+
+
+class AutomationDetector:
+    """Scores keyboard and mouse input streams for synthetic (scripted) input.
+
+    Feed it from the input listeners (on_key, on_click, on_scroll, on_move); each call is
+    O(1). When a channel's block scores at least ALERT_CONFIDENCE, on_alert(alert) is called,
+    at most once per ALERT_COOLDOWN per channel.
+    """
+
+    def __init__(self, on_alert=None, jitter_threshold=AUTOMATION_THRESHOLD,
+                 confidence=ALERT_CONFIDENCE, cooldown=ALERT_COOLDOWN):
+        self.on_alert = on_alert
+        self.confidence = confidence
+        self.cooldown = cooldown
+        self.channels = {name: ChannelStats(name, jitter_threshold)
+                         for name in ("keyboard", "click", "scroll", "motion")}
+        self.last_pos = None
+        self.stroke_end = None
+        self.last_alert = {}
+        self.alerts = 0
+        self.lock = threading.Lock()
+        self.latest = {}
+
+    def on_key(self, t=None):
+        self._check("keyboard", self.channels["keyboard"].add(time.time() if t is None else t))
+
+    def on_click(self, t=None):
+        self._check("click", self.channels["click"].add(time.time() if t is None else t))
+
+    def on_scroll(self, t=None):
+        self._check("scroll", self.channels["scroll"].add(time.time() if t is None else t))
+
+    def on_move(self, x, y, t=None):
+        """Motion is scored per stroke: the stroke start time plus its net displacement."""
+        t = time.time() if t is None else t
+        if self.last_pos is None:
+            self.last_pos, self.stroke_end, self.stroke_start = (x, y), t, (x, y)
+            return
+        if t - self.stroke_end > STROKE_GAP:
+            sx, sy = self.stroke_start
+            lx, ly = self.last_pos
+            self._check("motion", self.channels["motion"].add(t, (lx - sx, ly - sy)))
+            self.stroke_start = self.last_pos
+        self.last_pos, self.stroke_end = (x, y), t
+
+    def _check(self, channel, score):
+        if score is None:
+            return
+        self.latest[channel] = score
+        if score["confidence"] < self.confidence:
+            return
+        now = time.time()
+        with self.lock:
+            if now - self.last_alert.get(channel, 0) < self.cooldown:
+                return
+            self.last_alert[channel] = now
+            self.alerts += 1
+        alert = {
+            "type": "synthetic_input",
+            "channel": channel,
+            "confidence": score["confidence"],
+            "features": score,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if self.on_alert:
+            try:
+                self.on_alert(alert)
+            except Exception as e:
+                print(f"[ERROR] automation alert: {e}")
+
+# === TRACES ===
+def auto_mouse_trace(cycles=40, start=0.0, seed=0):
+    """Event trace of auto_mouse.simulate_activity: the same calls, sleeps and typing speed."""
+    rng = random.Random(seed)
+    events, t = [], start
+    x, y = 500, 400
+
+    def step(seconds=0.5):
+        nonlocal t
+        t += seconds + rng.uniform(0.0001, 0.0015)  # sleep overshoot + print
+
+    for _ in range(cycles):
+        step(0.5 + rng.uniform(0, 0.002))     # file write
+        x += 50; events.append((t, "move", x, y)); step()
+        x -= 50; events.append((t, "move", x, y)); step()
+        events.append((t, "scroll", x, y)); step()
+        events.append((t, "scroll", x, y)); step()
+        events.append((t, "click", x, y)); step()
+        for _ in "Hello from simulation script!":
+            events.append((t, "key", x, y))
+            t += rng.uniform(0.0003, 0.0009)  # pynput press+release per character
+        step()
+        events.append((t, "key", x, y)); step()  # Enter
+        events.append((t, "click", x, y)); t += 0.0005
+        events.append((t, "click", x, y)); step()
+    return events
+
+
+def human_trace(seconds=600, start=0.0, seed=1):
+    """Rough human input: lognormal typing rhythm and curved, variable-speed mouse strokes."""
+    rng = random.Random(seed)
+    events, t = [], start
+    x, y = 500.0, 400.0
+    while t < start + seconds:
+        if rng.random() < 0.5:
+            for _ in range(rng.randint(3, 40)):
+                events.append((t, "key", int(x), int(y)))
+                t += rng.lognormvariate(math.log(0.16), 0.5)
+        else:
+            tx, ty = rng.uniform(0, 1920), rng.uniform(0, 1080)
+            bend = rng.uniform(-0.5, 0.5)
+            steps = rng.randint(10, 80)
+            for i in range(1, steps + 1):
+                f = i / steps
+                ease = f * f * (3 - 2 * f)
+                nx = x + (tx - x) * ease + bend * (ty - y) * f * (1 - f)
+                ny = y + (ty - y) * ease - bend * (tx - x) * f * (1 - f)
+                events.append((t, "move", int(nx), int(ny)))
+                t += 0.008 + rng.uniform(-0.001, 0.001)
+            x, y = tx, ty
+            if rng.random() < 0.6:
+                t += rng.lognormvariate(math.log(0.3), 0.6)
+                events.append((t, "click", int(x), int(y)))
+            if rng.random() < 0.3:
+                for _ in range(rng.randint(1, 8)):
+                    t += rng.lognormvariate(math.log(0.08), 0.5)
+                    events.append((t, "scroll", int(x), int(y)))
+        t += rng.lognormvariate(math.log(1.5), 1.0)
+    return events
+
+
+def replay(events, detector):
+    for t, kind, x, y in events:
+        if kind == "key":
+            detector.on_key(t)
+        elif kind == "click":
+            detector.on_click(t)
+        elif kind == "scroll":
+            detector.on_scroll(t)
+        elif kind == "move":
+            detector.on_move(x, y, t)
+    return detector
+
+
+def load_trace(path):
+    with open(path, "r") as f:
+        return [(r["t"], r["kind"], r.get("x", 0), r.get("y", 0)) for r in map(json.loads, f) if r]
+
+
+def record_trace(path):
+    """Record live pynput events to a JSONL trace (run auto_mouse.py alongside to capture a jiggler)."""
+    from pynput import keyboard, mouse
+
+    out = open(path, "a")
+    lock = threading.Lock()
+
+    def write(kind, x=0, y=0):
+        with lock:
+            out.write(json.dumps({"t": time.time(), "kind": kind, "x": x, "y": y}) + "\n")
+
+    print(f"🔴 Recording input to {path} (Ctrl+C to stop)...")
+    with keyboard.Listener(on_press=lambda key: write("key")) as k, \
+            mouse.Listener(on_move=lambda x, y: write("move", x, y),
+                           on_click=lambda x, y, b, pressed: pressed and write("click", x, y),
+                           on_scroll=lambda x, y, dx, dy: write("scroll", x, y)) as m:
+        try:
+            k.join()
+            m.join()
+        except KeyboardInterrupt:
+            pass
+    out.close()
+
+# === MAIN ===
+def _report(label, detector, elapsed, count):
+    print(f"\n{label}: {count:,} events in {elapsed * 1000:.1f} ms ({count / elapsed:,.0f} events/s), "
+          f"{detector.alerts} alert(s)")
+    for channel, score in detector.latest.items():
+        print(f"  {channel:<8} confidence {score['confidence']:.2f}  {score}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic input detector")
+    parser.add_argument("--validate", action="store_true", help="replay auto_mouse and human traces")
+    parser.add_argument("--replay", metavar="TRACE", help="replay a recorded JSONL trace")
+    parser.add_argument("--record", metavar="TRACE", help="record live input to a JSONL trace")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_trace(args.record)
+        return 0
+    traces = []
+    if args.replay:
+        traces.append((args.replay, load_trace(args.replay)))
+    if args.validate or not traces:
+        traces += [("auto_mouse.simulate_activity", auto_mouse_trace()), ("human", human_trace())]
+    for label, events in traces:
+        detector = AutomationDetector(on_alert=lambda a: print(f"🚨 {a['channel']}: confidence {a['confidence']}"))
+        t0 = time.perf_counter()
+        replay(events, detector)
+        _report(label, detector, time.perf_counter() - t0, len(events))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
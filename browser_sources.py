@@ -0,0 +1,267 @@
+import os
+import glob
+import time
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import queue
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+# === CONFIG ===
+MAX_WORKERS = 6
+SOURCE_DEADLINE = 1.5        # seconds a source may take before its cached result is used
+FAILURE_THRESHOLD = 3        # consecutive failures/timeouts that open the circuit
+BREAKER_COOLDOWN = 60        # seconds an open circuit skips the source
+STALE_AFTER = 300            # cached results older than this are dropped, not served
+HISTORY_LIMIT = 100
+
+CHROMIUM_CONFIG_DIRS = {
+    "chrome": "~/.config/google-chrome",
+    "brave": "~/.config/BraveSoftware/Brave-Browser",
+    "edge": "~/.config/microsoft-edge",
+}
+
+
+class DaemonPool:
+    """Fixed set of daemon worker threads; unlike ThreadPoolExecutor, a hung read never blocks exit."""
+
+    def __init__(self, workers, name="browser-source"):
+        self.tasks = queue.Queue()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def _work(self):
+        while True:
+            future, fn = self.tasks.get()
+            if fn is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, fn):
+        future = Future()
+        self.tasks.put((future, fn))
+        return future
+
+    def shutdown(self, workers):
+        for _ in range(workers):
+            self.tasks.put((None, None))
+
+
+class Source:
+    """One browser data source with its own deadline, circuit breaker and last good result."""
+
+    def __init__(self, name, fn, deadline=SOURCE_DEADLINE):
+        self.name = name
+        self.fn = fn
+        self.deadline = deadline
+        self.failures = 0
+        self.open_until = 0.0
+        self.future = None
+        self.result = None
+        self.result_time = 0.0
+        self.last_error = None
+
+    def available(self, now):
+        """Closed circuit, or an open one whose cooldown has passed (half-open: one trial call)."""
+        return now >= self.open_until
+
+    def succeed(self, result, now):
+        self.failures = 0
+        self.open_until = 0.0
+        self.result, self.result_time = result, now
+        self.last_error = None
+
+    def fail(self, error, now):
+        self.failures += 1
+        self.last_error = error
+        if self.failures >= FAILURE_THRESHOLD:
+            self.open_until = now + BREAKER_COOLDOWN
+            if self.failures == FAILURE_THRESHOLD:
+                print(f"⚠️ Browser source {self.name} disabled for {BREAKER_COOLDOWN}s: {error}")
+
+    def cached(self, now):
+        if self.result is not None and now - self.result_time <= STALE_AFTER:
+            return self.result
+        return None
+
+
+class BrowserCollector:
+    """Runs browser sources concurrently on a bounded pool.
+
+    collect() returns once every submitted source has finished or passed its own deadline,
+    so one hung browser costs at most its deadline instead of stalling the others. A source
+    that times out or fails serves its last good result; a source that is still running from
+    a previous call is not resubmitted, so hung reads never pile up in the pool.
+    """
+
+    def __init__(self, sources, max_workers=MAX_WORKERS):
+        self.sources = list(sources)
+        self.workers = max(1, min(max_workers, len(self.sources)))
+        self.pool = DaemonPool(self.workers)
+        self.lock = threading.Lock()
+
+    def collect(self):
+        """Map source name -> (result, fresh); sources with no usable result are omitted."""
+        with self.lock:
+            start = time.monotonic()
+            pending = {}
+            for source in self.sources:
+                if not source.available(start):
+                    continue
+                if source.future is not None and not source.future.done():
+                    # Still stuck in an earlier call: counts towards opening the circuit
+                    source.fail(TimeoutError("previous read still running"), start)
+                    continue
+                source.future = self.pool.submit(source.fn)
+                pending[source.future] = source
+
+            fresh = set()
+            while pending:
+                remaining = min(start + s.deadline for s in pending.values()) - time.monotonic()
+                done = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)[0] if remaining > 0 else ()
+                now = time.monotonic()
+                for future in done:
+                    source = pending.pop(future)
+                    try:
+                        source.succeed(future.result(), now)
+                        fresh.add(source.name)
+                    except Exception as e:
+                        source.fail(e, now)
+                for future, source in list(pending.items()):
+                    if now >= start + source.deadline:
+                        del pending[future]
+                        source.fail(TimeoutError(f"no result after {source.deadline}s"), now)
+
+            results = {}
+            now = time.monotonic()
+            for source in self.sources:
+                if source.name in fresh:
+                    results[source.name] = (source.result, True)
+                else:
+                    cached = source.cached(now)
+                    if cached is not None:
+                        results[source.name] = (cached, False)
+            return results
+
+    def status(self):
+        now = time.monotonic()
+        return {s.name: {"failures": s.failures, "open": now < s.open_until,
+                         "running": s.future is not None and not s.future.done(),
+                         "error": str(s.last_error) if s.last_error else None}
+                for s in self.sources}
+
+    def close(self):
+        self.pool.shutdown(self.workers)
+
+# === CHROMIUM HISTORY ===
+def chromium_history_paths(config_dirs=CHROMIUM_CONFIG_DIRS):
+    """browser/profile -> History file for every Chromium profile found on disk."""
+    paths = {}
+    for browser, config_dir in config_dirs.items():
+        base = os.path.expanduser(config_dir)
+        for history in sorted(glob.glob(os.path.join(base, "*", "History"))):
+            profile = os.path.basename(os.path.dirname(history))
+            if profile == "Default" or profile.startswith("Profile "):
+                paths[f"{browser}/{profile}"] = history
+    return paths
+
+
+def read_chromium_history(db_path, limit=HISTORY_LIMIT):
+    """(url, title, last_visit_time) rows, newest first, read from a private copy of the locked DB."""
+    if not os.path.exists(db_path):
+        return []
+    fd, temp_copy = tempfile.mkstemp(prefix="browser_history_", suffix=".sqlite")
+    os.close(fd)
+    try:
+        shutil.copyfile(db_path, temp_copy)
+        conn = sqlite3.connect(temp_copy)
+        try:
+            return conn.execute("""
+                SELECT urls.url, urls.title, urls.last_visit_time
+                FROM urls
+                ORDER BY last_visit_time DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        finally:
+            conn.close()
+    finally:
+        os.remove(temp_copy)
+
+
+def history_sources(paths=None, deadline=SOURCE_DEADLINE):
+    """One Source per Chromium profile; the copy and query run in an offload worker process."""
+    from offload import default_pool
+    paths = chromium_history_paths() if paths is None else paths
+
+    def read(name, path):
+        return default_pool().run(f"history:{name}", read_chromium_history, path, timeout=deadline)
+
+    return [Source(name, lambda n=name, p=path: read(n, p), deadline) for name, path in paths.items()]
+
+
+def history_title_map(collector, index=None, into=None):
+    """page title -> url across all history sources (fresh or cached) and the local history index.
+
+    With into (e.g. a memory_budget.LRUCache) the entries are merged into that mapping in
+    place instead of building a new dict on every refresh.
+    """
+    results = collector.collect()
+    title_map = index.title_map() if index is not None else {}
+    for entries, _ in results.values():
+        for url, title, _ in entries:
+            if url and title:
+                title_map[title] = url
+    if into is None:
+        return title_map
+    into.update(title_map)
+    return into
+
+# === DEMO ===
+def run_demo(rounds=3):
+    """Simulated sources: latency follows the slowest healthy source, a hung one serves its cache."""
+    hang = threading.Event()
+
+    def sleeper(seconds, result):
+        def fn():
+            time.sleep(seconds)
+            return result
+        return fn
+
+    def flaky():
+        if hang.is_set():
+            time.sleep(30)
+        return ["https://flaky.example/"]
+
+    sources = [Source("fast", sleeper(0.05, ["https://a.example/"])),
+               Source("medium", sleeper(0.3, ["https://b.example/"])),
+               Source("slow", sleeper(0.6, ["https://c.example/"])),
+               Source("flaky", flaky, deadline=0.8)]
+    collector = BrowserCollector(sources)
+    for i in range(rounds + FAILURE_THRESHOLD):
+        if i == 1:
+            hang.set()
+        t0 = time.perf_counter()
+        results = collector.collect()
+        elapsed = time.perf_counter() - t0
+        summary = ", ".join(f"{name}{'' if fresh else '(stale)'}" for name, (_, fresh) in results.items())
+        print(f"⏱️ round {i + 1}: {elapsed:.2f} s (serial would be ≥ 0.95 s) -> {summary}")
+    print(f"📈 {collector.status()}")
+    collector.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent browser collection")
+    parser.add_argument("--demo", action="store_true", help="run simulated slow/hung sources")
+    args = parser.parse_args()
+    if args.demo:
+        run_demo()
+    else:
+        for name, path in chromium_history_paths().items():
+            print(f"{name}: {path}")
@@ -0,0 +1,452 @@
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+
+# === CONFIG ===
+CHECKPOINT_FILE = "{name}.ckpt"  # next to tracker_store.db, one per tracker
+INITIAL_ENTRIES = 1024           # doubled when full
+MAX_TABLES = 16
+MAGIC = b"TRKCKPT\x01"
+NO_KEY = -(1 << 63)              # unused key half / segment field
+
+# File layout (little endian). Every record is written twice over ("slots"): an update goes
+# to the slot not holding the latest valid copy (chosen by sequence parity), body first and
+# CRC32 last, so a write torn by a crash leaves the previous copy readable.
+#   0    header: magic, CRC of the table names
+#   64   meta slots x2 (128 bytes): seq, clean flag, epoch per table
+#   320  open segment slots x2 (64 bytes): seq, 4 symbol ids, start, last heartbeat
+#   512  entries x N (96 bytes): 2 slots of seq, table, epoch, key (2 x int64), value
+# A drain bumps the table's epoch in the meta record; entry slots of an older epoch are dead.
+HEADER = struct.Struct("<8sI")
+META = struct.Struct("<QI%dI" % MAX_TABLES)
+SEGMENT = struct.Struct("<Q4qdd")
+SLOT = struct.Struct("<QIIqqd")
+CRC = struct.Struct("<I")
+META_OFF, META_SIZE = 64, 128
+SEG_OFF, SEG_SIZE = 320, 64
+ENTRY_OFF, SLOT_SIZE = 512, 48
+ENTRY_SIZE = 2 * SLOT_SIZE
+
+
+def _read(mm, off, record):
+    """Unpacked record at off, or None if its CRC does not match (torn or never written)."""
+    body = mm[off:off + record.size]
+    if CRC.unpack_from(mm, off + record.size)[0] != zlib.crc32(body):
+        return None
+    return record.unpack(body)
+
+
+def _latest(mm, off, size, record):
+    """(seq of the newest valid slot or 0, its fields or None) of a double-buffered record."""
+    best = None
+    for slot in (0, 1):
+        fields = _read(mm, off + slot * size, record)
+        if fields is not None and fields[0] and (best is None or fields[0] > best[0]):
+            best = fields
+    return (best[0], best) if best else (0, None)
+
+
+def _key(a, b):
+    return a if b == NO_KEY else (a, b)
+
+
+class Checkpoint:
+    """Crash-safe accumulators and the open focus segment in a memory-mapped file.
+
+    add() updates one entry in place (a struct pack and a CRC into the page cache, no
+    syscall), so it can run on every focus change; the kernel writes the pages back, and
+    they survive the process being killed. sync() forces them to disk (power loss).
+
+    Opening a file the previous process did not close() recovers its state: values() holds
+    what was accumulated since the last drain, take_segment() the segment that was open,
+    ending at its last heartbeat. A cleanly closed file starts empty.
+    """
+
+    def __init__(self, name, tables, path=None):
+        if len(tables) > MAX_TABLES:
+            raise ValueError(f"at most {MAX_TABLES} tables")
+        self.tables = {t: i for i, t in enumerate(tables)}
+        self.path = path or CHECKPOINT_FILE.format(name=name)
+        self.lock = threading.RLock()
+        self.tables_crc = zlib.crc32(",".join(tables).encode())
+        self.fd = None
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            # Another instance of this tracker owns the file (or it cannot be created)
+            print(f"⚠️ Checkpoint {self.path} unavailable ({e}); this run is not crash-safe")
+            if self.fd is not None:
+                os.close(self.fd)
+            self.fd = None
+        size = ENTRY_OFF + INITIAL_ENTRIES * ENTRY_SIZE
+        if self.fd is not None:
+            size = max(size, os.fstat(self.fd).st_size)
+            size -= (size - ENTRY_OFF) % ENTRY_SIZE
+            os.ftruncate(self.fd, size)
+            self.mm = mmap.mmap(self.fd, size)
+        else:
+            self.mm = mmap.mmap(-1, size)
+        self.capacity = (size - ENTRY_OFF) // ENTRY_SIZE
+        self.values_by_table = [{} for _ in tables]
+        self.index = {}     # (table, key) -> entry
+        self.seqs = [0] * self.capacity
+        self.free = []
+        self.segment = None  # (ids, start, last heartbeat) of the open segment
+        self.recovered = self._recover()
+        if not self.recovered:
+            self.epochs = [(e + 1) & 0xFFFFFFFF for e in self.epochs]  # whatever the file holds is dead
+            self.free = list(range(self.capacity - 1, -1, -1))
+            # Dead slots still hold their seqs: new writes must outnumber them, or a stale
+            # slot of the old epoch would win over them after a crash
+            for e in range(self.capacity):
+                self.seqs[e] = _latest(self.mm, ENTRY_OFF + e * ENTRY_SIZE, SLOT_SIZE, SLOT)[0]
+            self.index.clear()
+            for values in self.values_by_table:
+                values.clear()
+            self.segment = None
+        HEADER.pack_into(self.mm, 0, MAGIC, self.tables_crc)
+        self._write_meta(clean=0)
+        if self.segment is None:
+            self._write_segment((NO_KEY,) * 4, 0.0, 0.0)
+
+    # --- recovery ---
+    def _recover(self):
+        """True if the file holds the state of a process that did not close it."""
+        mm = self.mm
+        self.meta_seq, meta = _latest(mm, META_OFF, META_SIZE, META)
+        self.epochs = list(meta[2:]) if meta else [0] * MAX_TABLES
+        self.seg_seq, segment = _latest(mm, SEG_OFF, SEG_SIZE, SEGMENT)
+        if mm[:8] != MAGIC or meta is None:
+            return False
+        if HEADER.unpack_from(mm, 0)[1] != self.tables_crc:
+            print(f"⚠️ Checkpoint {self.path} was written for other tables; starting empty")
+            return False
+        if meta[1]:
+            return False  # closed cleanly: nothing to recover
+        ntables = len(self.values_by_table)
+        for e in range(self.capacity - 1, -1, -1):
+            seq, fields = _latest(mm, ENTRY_OFF + e * ENTRY_SIZE, SLOT_SIZE, SLOT)
+            self.seqs[e] = seq
+            if fields is None or fields[1] >= ntables or fields[2] != self.epochs[fields[1]]:
+                self.free.append(e)
+                continue
+            _, table, _, a, b, value = fields
+            key = _key(a, b)
+            if (table, key) in self.index:
+                self.free.append(e)
+                continue
+            self.index[(table, key)] = e
+            self.values_by_table[table][key] = value
+        if segment is not None and segment[5] > 0:
+            self.segment = (segment[1:5], segment[5], segment[6])
+        return True
+
+    # --- writes ---
+    def _write(self, off, size, seq, record, *fields):
+        body = record.pack(seq, *fields)
+        off += (seq & 1) * size
+        self.mm[off:off + record.size] = body
+        CRC.pack_into(self.mm, off + record.size, zlib.crc32(body))
+
+    def _write_meta(self, clean):
+        self.meta_seq += 1
+        self._write(META_OFF, META_SIZE, self.meta_seq, META, clean, *self.epochs)
+
+    def _write_segment(self, ids, start, seen):
+        self.seg_seq += 1
+        self._write(SEG_OFF, SEG_SIZE, self.seg_seq, SEGMENT, *ids, start, seen)
+
+    def _grow(self):
+        old = self.capacity
+        self.capacity *= 2
+        size = ENTRY_OFF + self.capacity * ENTRY_SIZE
+        if self.fd is not None:
+            os.ftruncate(self.fd, size)
+        self.mm.resize(size)
+        self.seqs.extend([0] * (self.capacity - old))
+        self.free.extend(range(self.capacity - 1, old - 1, -1))
+
+    # --- accumulators ---
+    def add(self, table, key, amount):
+        """values(table)[key] += amount, persisted; key is an int or a pair of ints (symbol ids)."""
+        t = self.tables[table]
+        with self.lock:
+            values = self.values_by_table[t]
+            value = values[key] = values.get(key, 0) + amount
+            e = self.index.get((t, key))
+            if e is None:
+                if not self.free:
+                    self._grow()
+                e = self.index[(t, key)] = self.free.pop()
+            seq = self.seqs[e] = self.seqs[e] + 1
+            a, b = key if isinstance(key, tuple) else (key, NO_KEY)
+            self._write(ENTRY_OFF + e * ENTRY_SIZE, SLOT_SIZE, seq, SLOT, t, self.epochs[t], a, b, value)
+
+    def values(self, table):
+        with self.lock:
+            return dict(self.values_by_table[self.tables[table]])
+
+    def drain(self, table):
+        """The table's values, reset to empty with one meta write."""
+        t = self.tables[table]
+        with self.lock:
+            values, self.values_by_table[t] = self.values_by_table[t], {}
+            self.epochs[t] = (self.epochs[t] + 1) & 0xFFFFFFFF
+            self._write_meta(clean=0)
+            for key in values:
+                self.free.append(self.index.pop((t, key)))
+        return values
+
+    # --- open segment ---
+    def open_segment(self, start, *ids):
+        """Record the segment that started at `start` (up to 4 symbol ids, None for absent ones)."""
+        ids = tuple(NO_KEY if i is None else i for i in ids) + (NO_KEY,) * (4 - len(ids))
+        with self.lock:
+            self.segment = (ids, start, start)
+            self._write_segment(ids, start, start)
+
+    def heartbeat(self, now=None):
+        """The open segment lasts at least until now; a crash closes it here."""
+        with self.lock:
+            if self.segment is not None:
+                ids, start, _ = self.segment
+                self.segment = (ids, start, now or time.time())
+                self._write_segment(ids, start, self.segment[2])
+
+    def close_segment(self):
+        with self.lock:
+            if self.segment is not None:
+                self.segment = None
+                self._write_segment((NO_KEY,) * 4, 0.0, 0.0)
+
+    def take_segment(self):
+        """(ids, start, last heartbeat) of the segment the previous process left open, once; else None."""
+        with self.lock:
+            if not self.recovered or self.segment is None:
+                return None
+            ids, start, seen = self.segment
+            self.close_segment()
+            self.recovered = False
+            return tuple(None if i == NO_KEY else i for i in ids), start, seen
+
+    def sync(self):
+        """Force the pages to disk (msync); add() alone survives a crash but not a power loss."""
+        with self.lock:
+            self.mm.flush()
+
+    def close(self):
+        """Mark the state as handled, so the next start does not recover it."""
+        with self.lock:
+            if self.mm.closed:
+                return
+            self._write_meta(clean=1)
+            self.mm.flush()
+            self.mm.close()
+            if self.fd is not None:
+                os.close(self.fd)  # releases the lock
+
+
+class CheckpointedCounter:
+    """A counter (UsageAccumulator, SpillCounter) whose adds are mirrored into a checkpoint table.
+
+    Values recovered from a crashed run are loaded into the counter first, so they are
+    reported with the next record (or final report) instead of being lost.
+    """
+
+    def __init__(self, counter, checkpoint, table):
+        self.counter = counter
+        self.checkpoint = checkpoint
+        self.table = table
+        for key, value in checkpoint.values(table).items():
+            counter.add(key, value)
+
+    def add(self, key, amount):
+        with self.checkpoint.lock:
+            self.counter.add(key, amount)
+            self.checkpoint.add(self.table, key, amount)
+
+    def drain(self):
+        with self.checkpoint.lock:
+            self.checkpoint.drain(self.table)
+            return self.counter.drain()
+
+    def __getattr__(self, name):
+        return getattr(self.counter, name)
+
+    def __len__(self):
+        return len(self.counter)
+
+# === BENCHMARK ===
+def run_bench(updates=200_000, keys=500):
+    with tempfile.TemporaryDirectory() as tmp:
+        ckpt = Checkpoint("bench", ("app_usage", "site_usage"), path=os.path.join(tmp, "bench.ckpt"))
+        t0 = time.perf_counter()
+        for i in range(updates):
+            ckpt.add("app_usage", i % keys, 1.5)
+        per_add = (time.perf_counter() - t0) / updates * 1e6
+        t0 = time.perf_counter()
+        for i in range(updates):
+            ckpt.heartbeat(1_700_000_000.0 + i)
+        per_beat = (time.perf_counter() - t0) / updates * 1e6
+        t0 = time.perf_counter()
+        ckpt.drain("app_usage")
+        t_drain = (time.perf_counter() - t0) * 1e6
+
+        values = {str(k): 1.5 * k for k in range(keys)}
+        path = os.path.join(tmp, "usage.json")
+        rounds = 500
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            with open(path + ".tmp", "w") as f:
+                json.dump(values, f)
+            os.replace(path + ".tmp", path)
+        per_json = (time.perf_counter() - t0) / rounds * 1e6
+
+        for i in range(keys * 20):
+            ckpt.add("site_usage", (i, i + 1), 1.0)
+        t0 = time.perf_counter()
+        copy = os.path.join(tmp, "copy.ckpt")
+        with open(copy, "wb") as f:
+            f.write(ckpt.mm[:])
+        recovered = Checkpoint("bench", ("app_usage", "site_usage"), path=copy)
+        t_recover = (time.perf_counter() - t0) * 1000
+        assert len(recovered.values("site_usage")) == keys * 20
+        print(f"⏱️ add: {per_add:.2f} µs, heartbeat: {per_beat:.2f} µs, drain of {keys} keys: {t_drain:.0f} µs")
+        print(f"⏱️ JSON dump + rename of the same {keys} values: {per_json:.0f} µs ({per_json / per_add:.0f}x an add)")
+        print(f"📈 recovery of {keys * 20:,} entries ({recovered.capacity:,} slots): {t_recover:.1f} ms")
+        recovered.close()
+        ckpt.close()
+
+
+def _crash_child(path):
+    ckpt = Checkpoint("crash", ("app_usage",), path=path)
+    ckpt.open_segment(time.time(), 1)
+    n = 0
+    while True:
+        ckpt.add("app_usage", n % 50, 1.0)
+        n += 1
+        if n % 1000 == 0:
+            ckpt.heartbeat()
+            print(n, flush=True)
+
+
+def _restart_child(path):
+    ckpt = Checkpoint("crash", ("app_usage",), path=path)
+    for n in range(51):
+        ckpt.add("app_usage", n % 50, 1.0)  # entry 0 reaches seq 2, in the slot a new seq 1 skips
+    ckpt.close()
+    ckpt = Checkpoint("crash", ("app_usage",), path=path)
+    ckpt.add("app_usage", 9, 42.0)
+    ckpt.add("app_usage", 10, 1.0)
+    ckpt.add("app_usage", 10, 1.0)
+    print("ready", flush=True)
+    time.sleep(60)
+
+
+def run_crash_test(rounds=5):
+    """SIGKILL a writer mid-stream, then check recovery; tear slots and check the fallback."""
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "crash.ckpt")
+        for r in range(rounds):
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--crash-child", path],
+                                     stdout=subprocess.PIPE, text=True)
+            done = 0
+            deadline = time.time() + 0.2 + 0.1 * r
+            while time.time() < deadline:
+                done = int(child.stdout.readline() or done)
+            child.send_signal(signal.SIGKILL)
+            child.wait()
+            ckpt = Checkpoint("crash", ("app_usage",), path=path)
+            total = sum(ckpt.values("app_usage").values())
+            segment = ckpt.take_segment()
+            good = total >= done and segment is not None and segment[2] > segment[1]
+            ok &= good
+            length = f"{segment[2] - segment[1]:.2f} s" if segment else "missing"
+            print(f"{'🟢' if good else '❌'} killed after >= {done:,} adds: recovered {total:,.0f}, open segment {length}")
+            # Tear the newest slot of every entry: each must fall back to one add less
+            before = ckpt.values("app_usage")
+            for e, seq in enumerate(ckpt.seqs):
+                if seq:
+                    off = ENTRY_OFF + e * ENTRY_SIZE + (seq & 1) * SLOT_SIZE
+                    ckpt.mm[off + 20] ^= 0xFF
+            with open(path + ".torn", "wb") as f:
+                f.write(ckpt.mm[:])
+            torn = Checkpoint("crash", ("app_usage",), path=path + ".torn")
+            after = torn.values("app_usage")
+            good = all(after.get(k, 0) == v - 1 for k, v in before.items())
+            ok &= good
+            print(f"{'🟢' if good else '❌'} torn slots: {len(before)} entries fell back to their previous value")
+            torn.close()
+            os.unlink(path + ".torn")
+            ckpt.close()
+            os.unlink(path)
+        # A clean close, then a crash: the new epoch's writes must win over the dead slots
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--restart-child", path],
+                                 stdout=subprocess.PIPE, text=True)
+        child.stdout.readline()
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        ckpt = Checkpoint("crash", ("app_usage",), path=path)
+        values = ckpt.values("app_usage")
+        good = values == {9: 42.0, 10: 2.0}
+        ok &= good
+        print(f"{'🟢' if good else '❌'} crash after a clean close and restart: recovered {values}")
+        ckpt.close()
+    return 0 if ok else 1
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crash-safe accumulator checkpoints")
+    parser.add_argument("--bench", action="store_true", help="update cost vs a JSON dump, recovery time")
+    parser.add_argument("--crash-test", action="store_true", help="SIGKILL a writer and torn slots, then recover")
+    parser.add_argument("--inspect", metavar="FILE", help="print what a restart would recover from FILE")
+    parser.add_argument("--tables", default="app_usage,site_usage", help="table names FILE was written with")
+    parser.add_argument("--crash-child", metavar="FILE", help=argparse.SUPPRESS)
+    parser.add_argument("--restart-child", metavar="FILE", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.crash_child:
+        _crash_child(args.crash_child)
+    elif args.restart_child:
+        _restart_child(args.restart_child)
+    elif args.bench:
+        run_bench()
+    elif args.crash_test:
+        return run_crash_test()
+    elif args.inspect:
+        if not os.path.exists(args.inspect):
+            print(f"❌ {args.inspect} not found")
+            return 1
+        # A copy: the tracker may hold the file, and opening it marks it as in use
+        with tempfile.NamedTemporaryFile(suffix=".ckpt") as copy:
+            with open(args.inspect, "rb") as f:
+                copy.write(f.read())
+            copy.flush()
+            ckpt = Checkpoint("inspect", args.tables.split(","), path=copy.name)
+            if not ckpt.recovered:
+                print("🟢 Closed cleanly: nothing to recover")
+            for table in ckpt.tables:
+                values = ckpt.values(table)
+                print(f"📈 {table}: {len(values)} keys, {sum(values.values()):.1f} s")
+            segment = ckpt.take_segment()
+            if segment:
+                print(f"⏱️ open segment {segment[0]}: {segment[2] - segment[1]:.1f} s until the last heartbeat")
+            ckpt.close()
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+import os
+import sys
+import glob
+import time
+import struct
+import argparse
+from collections import deque
+
+from browser_sources import CHROMIUM_CONFIG_DIRS
+
+# === CONFIG ===
+SNSS_MAGIC = b"SNSS"
+SNSS_VERSIONS = {1, 3}   # 2 is the encrypted format, which we cannot read
+CLOSED_TABS_KEPT = 50
+
+# Session_* command ids (components/sessions/core/session_service_commands.cc)
+CMD_SET_TAB_WINDOW = 0
+CMD_SET_TAB_INDEX_IN_WINDOW = 2
+CMD_UPDATE_TAB_NAVIGATION = 6
+CMD_SET_SELECTED_NAVIGATION_INDEX = 7
+CMD_SET_SELECTED_TAB_IN_INDEX = 8
+CMD_TAB_CLOSED = 16
+CMD_WINDOW_CLOSED = 17
+CMD_SET_ACTIVE_WINDOW = 20
+
+# Tabs_* (tab restore service) command ids
+CMD_RESTORE_UPDATE_TAB_NAVIGATION = 1
+
+# Process names that belong to each browser's profile directory
+BROWSER_PROCESSES = {"chrome": "chrome", "google-chrome": "chrome", "brave": "brave",
+                     "msedge": "edge", "edge": "edge"}
+
+_INT32_PAIR = struct.Struct("<ii")
+_INT32 = struct.Struct("<i")
+
+
+class SnssTail:
+    """Reads an append-only SNSS file incrementally, returning only commands written since the last poll.
+
+    A partially written command at the end of the file is left for the next poll. If the
+    file shrinks or is replaced, tail.reset is set and reading restarts from the header.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+        self.reset = False
+
+    def poll(self):
+        commands = []
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return commands
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.inode, self.offset, self.reset = st.st_ino, 0, True
+        if st.st_size == self.offset:
+            return commands
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        pos = 0
+        if self.offset == 0:
+            if len(data) < 8:
+                return commands
+            if data[:4] != SNSS_MAGIC or _INT32.unpack_from(data, 4)[0] not in SNSS_VERSIONS:
+                raise ValueError(f"{self.path}: not a readable SNSS file")
+            pos = 8
+        end = len(data)
+        while pos + 2 <= end:
+            size = data[pos] | (data[pos + 1] << 8)
+            if size == 0 or pos + 2 + size > end:
+                break  # empty marker or a command still being written
+            commands.append((data[pos + 2], data[pos + 3:pos + 2 + size]))
+            pos += 2 + size
+        self.offset += pos
+        return commands
+
+
+def _pickle_string(buf, pos, wide=False):
+    """Read a Chromium Pickle string(16) at pos; returns (value, next_pos)."""
+    (length,) = _INT32.unpack_from(buf, pos)
+    pos += 4
+    nbytes = length * 2 if wide else length
+    raw = buf[pos:pos + nbytes]
+    value = raw.decode("utf-16-le" if wide else "utf-8", "replace")
+    return value, pos + ((nbytes + 3) & ~3)
+
+
+def parse_navigation(payload):
+    """(tab_id, nav_index, url, title) from an UpdateTabNavigation pickle."""
+    # Pickle header (payload size), then tab id, navigation index, url, title
+    tab_id, nav_index = _INT32_PAIR.unpack_from(payload, 4)
+    url, pos = _pickle_string(payload, 12)
+    title, _ = _pickle_string(payload, pos, wide=True) if pos + 4 <= len(payload) else ("", pos)
+    return tab_id, nav_index, url, title
+
+
+class SessionModel:
+    """Live windows/tabs model rebuilt by replaying Session_* commands."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.tabs = {}            # tab id -> {"window", "index", "navs": {nav index: (url, title)}, "nav"}
+        self.selected = {}        # window id -> selected tab index
+        self.active_window = None
+        self.closed = deque(maxlen=CLOSED_TABS_KEPT)  # (url, title) of recently closed tabs
+
+    def _tab(self, tab_id):
+        tab = self.tabs.get(tab_id)
+        if tab is None:
+            tab = self.tabs[tab_id] = {"window": None, "index": None, "navs": {}, "nav": None}
+        return tab
+
+    def apply(self, command, payload):
+        try:
+            if command == CMD_SET_TAB_WINDOW:
+                window_id, tab_id = _INT32_PAIR.unpack_from(payload)
+                self._tab(tab_id)["window"] = window_id
+            elif command == CMD_SET_TAB_INDEX_IN_WINDOW:
+                tab_id, index = _INT32_PAIR.unpack_from(payload)
+                self._tab(tab_id)["index"] = index
+            elif command == CMD_UPDATE_TAB_NAVIGATION:
+                tab_id, nav_index, url, title = parse_navigation(payload)
+                tab = self._tab(tab_id)
+                tab["navs"][nav_index] = (url, title)
+                if tab["nav"] is None:
+                    tab["nav"] = nav_index
+            elif command == CMD_SET_SELECTED_NAVIGATION_INDEX:
+                tab_id, nav_index = _INT32_PAIR.unpack_from(payload)
+                self._tab(tab_id)["nav"] = nav_index
+            elif command == CMD_SET_SELECTED_TAB_IN_INDEX:
+                window_id, index = _INT32_PAIR.unpack_from(payload)
+                self.selected[window_id] = index
+            elif command == CMD_TAB_CLOSED:
+                (tab_id,) = _INT32.unpack_from(payload)
+                tab = self.tabs.pop(tab_id, None)
+                if tab and tab["nav"] in tab["navs"]:
+                    self.closed.append(tab["navs"][tab["nav"]])
+            elif command == CMD_WINDOW_CLOSED:
+                (window_id,) = _INT32.unpack_from(payload)
+                self.selected.pop(window_id, None)
+                for tab_id in [t for t, tab in self.tabs.items() if tab["window"] == window_id]:
+                    del self.tabs[tab_id]
+                if self.active_window == window_id:
+                    self.active_window = None
+            elif command == CMD_SET_ACTIVE_WINDOW:
+                (self.active_window,) = _INT32.unpack_from(payload)
+        except (struct.error, IndexError):
+            pass  # truncated payload; the next full rewrite of the session fixes the model
+
+    def _current(self, tab):
+        return tab["navs"].get(tab["nav"]) if tab["nav"] is not None else None
+
+    def active_tab(self):
+        """(url, title) of the selected tab in the active window, or None."""
+        window = self.active_window
+        if window not in self.selected:
+            window = next(iter(self.selected), None) if len(self.selected) == 1 else window
+        index = self.selected.get(window)
+        if index is None:
+            return None
+        for tab in self.tabs.values():
+            if tab["window"] == window and tab["index"] == index:
+                return self._current(tab)
+        return None
+
+    def open_tabs(self):
+        """(url, title) of every open tab."""
+        return [nav for nav in (self._current(tab) for tab in self.tabs.values()) if nav]
+
+
+class ChromiumSession:
+    """Follows the newest Session_* file of one Chromium profile and keeps its SessionModel current."""
+
+    def __init__(self, profile_dir):
+        self.profile_dir = profile_dir
+        self.sessions_dir = os.path.join(profile_dir, "Sessions")
+        self.model = SessionModel()
+        self.tail = None
+        self.closed_tail = None
+
+    def _newest(self, prefix):
+        files = glob.glob(os.path.join(self.sessions_dir, prefix + "*"))
+        return max(files, key=lambda p: (os.path.getmtime(p), p)) if files else None
+
+    def refresh(self):
+        """Replay commands appended since the last refresh; returns how many were applied."""
+        path = self._newest("Session_")
+        if path is None:
+            return 0
+        if self.tail is None or self.tail.path != path:
+            self.tail = SnssTail(path)  # Chrome starts a new file with a full snapshot
+        commands = self.tail.poll()
+        if self.tail.reset:
+            self.model.clear()
+            self.tail.reset = False
+        for command, payload in commands:
+            self.model.apply(command, payload)
+
+        closed_path = self._newest("Tabs_")
+        if closed_path:
+            if self.closed_tail is None or self.closed_tail.path != closed_path:
+                self.closed_tail = SnssTail(closed_path)
+            for command, payload in self.closed_tail.poll():
+                if command == CMD_RESTORE_UPDATE_TAB_NAVIGATION:
+                    try:
+                        _, _, url, title = parse_navigation(payload)
+                        self.model.closed.append((url, title))
+                    except (struct.error, IndexError):
+                        pass
+        return len(commands)
+
+    def active_tab(self):
+        self.refresh()
+        return self.model.active_tab()
+
+    def open_tabs(self):
+        self.refresh()
+        return self.model.open_tabs()
+
+
+def chromium_profile_dirs(config_dirs=CHROMIUM_CONFIG_DIRS):
+    """browser -> [profile dirs that have a Sessions folder]."""
+    found = {}
+    for browser, config_dir in config_dirs.items():
+        base = os.path.expanduser(config_dir)
+        dirs = [d for d in sorted(glob.glob(os.path.join(base, "*")))
+                if os.path.isdir(os.path.join(d, "Sessions"))
+                and (os.path.basename(d) == "Default" or os.path.basename(d).startswith("Profile "))]
+        if dirs:
+            found[browser] = dirs
+    return found
+
+
+class ChromiumSessions:
+    """Session readers for every Chromium profile, created on first use."""
+
+    def __init__(self, config_dirs=CHROMIUM_CONFIG_DIRS):
+        self.config_dirs = config_dirs
+        self.readers = {}
+
+    def _readers(self, browser=None):
+        for name, dirs in chromium_profile_dirs(self.config_dirs).items():
+            if browser and name != browser:
+                continue
+            for d in dirs:
+                reader = self.readers.get(d)
+                if reader is None:
+                    reader = self.readers[d] = ChromiumSession(d)
+                yield reader
+
+    def active_tab(self, app):
+        """(url, title) of the active tab for a browser process name such as "chrome" or "brave"."""
+        browser = BROWSER_PROCESSES.get((app or "").lower())
+        if browser is None:
+            return None
+        best, best_time = None, -1
+        for reader in self._readers(browser):
+            try:
+                tab = reader.active_tab()
+            except (OSError, ValueError):
+                continue
+            # With several profiles open, the one whose session was written last has focus
+            mtime = os.path.getmtime(reader.tail.path) if reader.tail else 0
+            if tab and mtime > best_time:
+                best, best_time = tab, mtime
+        return best
+
+    def open_urls(self):
+        urls = []
+        for reader in self._readers():
+            try:
+                urls.extend(url for url, _ in reader.open_tabs())
+            except (OSError, ValueError):
+                continue
+        return urls
+
+
+_default_sessions = None
+
+
+def default_sessions():
+    global _default_sessions
+    if _default_sessions is None:
+        _default_sessions = ChromiumSessions()
+    return _default_sessions
+
+# === BENCHMARK ===
+def _command(command_id, payload):
+    return struct.pack("<HB", len(payload) + 1, command_id) + payload
+
+
+def _pickle_navigation(tab_id, nav_index, url, title):
+    def pad(b):
+        return b + b"\0" * (-len(b) % 4)
+    url_b = url.encode()
+    title_b = title.encode("utf-16-le")
+    body = _INT32_PAIR.pack(tab_id, nav_index) + _INT32.pack(len(url_b)) + pad(url_b) \
+        + _INT32.pack(len(title)) + pad(title_b)
+    return struct.pack("<I", len(body)) + body
+
+
+def run_benchmark(path="/tmp/Session_bench", tabs=200, switches=100_000):
+    """Write a synthetic session, then time incremental replay of appended tab switches."""
+    with open(path, "wb") as f:
+        f.write(SNSS_MAGIC + _INT32.pack(1))
+        for t in range(tabs):
+            f.write(_command(CMD_SET_TAB_WINDOW, _INT32_PAIR.pack(1, t)))
+            f.write(_command(CMD_SET_TAB_INDEX_IN_WINDOW, _INT32_PAIR.pack(t, t)))
+            f.write(_command(CMD_UPDATE_TAB_NAVIGATION, _pickle_navigation(t, 0, f"https://site{t}.example/", f"Tab {t}")))
+        f.write(_command(CMD_SET_SELECTED_TAB_IN_INDEX, _INT32_PAIR.pack(1, 0)))
+        f.write(_command(CMD_SET_ACTIVE_WINDOW, _INT32.pack(1)))
+    tail, model = SnssTail(path), SessionModel()
+    t0 = time.perf_counter()
+    for command, payload in tail.poll():
+        model.apply(command, payload)
+    print(f"⏱️ initial replay of {tabs} tabs: {(time.perf_counter() - t0) * 1000:.2f} ms -> {model.active_tab()}")
+
+    with open(path, "ab") as f:
+        f.write(b"".join(_command(CMD_SET_SELECTED_TAB_IN_INDEX, _INT32_PAIR.pack(1, i % tabs))
+                         for i in range(switches)))
+    t0 = time.perf_counter()
+    applied = 0
+    for command, payload in tail.poll():
+        model.apply(command, payload)
+        applied += 1
+    elapsed = time.perf_counter() - t0
+    print(f"⏱️ tail of {applied:,} appended commands: {elapsed:.3f} s ({applied / elapsed:,.0f} commands/s) "
+          f"-> {model.active_tab()}")
+    t0 = time.perf_counter()
+    tail.poll()
+    print(f"⏱️ poll with nothing new: {(time.perf_counter() - t0) * 1e6:.0f} µs")
+    os.remove(path)
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chromium SNSS session reader")
+    parser.add_argument("--watch", action="store_true", help="print the active tab of each browser as it changes")
+    parser.add_argument("--bench", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        run_benchmark()
+        return 0
+    sessions = ChromiumSessions()
+    browsers = chromium_profile_dirs()
+    if not browsers:
+        print("❌ No Chromium profiles with session files found")
+        return 1
+    last = {}
+    while True:
+        for browser in browsers:
+            tab = sessions.active_tab(browser)
+            if tab != last.get(browser):
+                last[browser] = tab
+                print(f"[{browser}] {tab[1] if tab else None} ({tab[0] if tab else None})")
+        if not args.watch:
+            return 0
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
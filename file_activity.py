@@ -0,0 +1,672 @@
+import os
+import sys
+import time
+import heapq
+import struct
+import select
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict, deque, namedtuple, defaultdict
+
+# === CONFIG ===
+FILE_ROOTS = ["~"]
+IGNORED_DIRS = {"node_modules", "__pycache__", "venv", "site-packages", "build", "dist", "snap"}
+TEMP_SUFFIXES = ("~", ".swp", ".swx", ".swo", ".tmp", ".temp", ".part", ".crdownload", ".kate-swp", ".bak")
+TEMP_PREFIXES = (".goutputstream-", ".~lock.", "~$", ".#", "#")
+TEMP_NAMES = {"4913"}       # vim's probe file
+COALESCE_WINDOW = 2.0       # seconds of quiet before a path's events are reported as one
+PENDING_MAX = 5000          # paths being coalesced; the oldest are reported early beyond this
+QUEUE_MAX = 10000           # reported events waiting for drain(); newer ones are dropped beyond this
+WATCH_SHARE = 0.5           # share of fs.inotify.max_user_watches we may use (IDEs and sync clients need theirs)
+MAX_WATCHES = 100000
+WALK_CHUNK = 200            # directories scanned between reads of the event queue
+NEW_DIR_FILES = 100         # files reported for a directory that appeared (cp -r, unpacked archive)
+
+FileEvent = namedtuple("FileEvent", "ts action path app pid focus src")
+
+# inotify(7)
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x400, 0x4000, 0x8000, 0x40000000
+IN_ONLYDIR, IN_DONT_FOLLOW, IN_EXCL_UNLINK, IN_NONBLOCK, IN_CLOEXEC = 0x01000000, 0x02000000, 0x04000000, 0o4000, 0o2000000
+INOTIFY_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+                | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+# fanotify(7)
+FAN_CLOEXEC, FAN_NONBLOCK, FAN_CLASS_NOTIF, FAN_REPORT_DFID_NAME = 0x1, 0x2, 0x0, 0xC00
+FAN_MARK_ADD, FAN_MARK_FILESYSTEM = 0x1, 0x100
+FAN_CLOSE_WRITE, FAN_MOVED_FROM, FAN_MOVED_TO, FAN_CREATE, FAN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+FAN_Q_OVERFLOW, FAN_ONDIR = 0x4000, 0x40000000
+FAN_EVENT_INFO_TYPE_DFID_NAME = 2
+FANOTIFY_MASK = FAN_CLOSE_WRITE | FAN_MOVED_FROM | FAN_MOVED_TO | FAN_CREATE | FAN_DELETE
+AT_FDCWD = -100
+
+_libc = None
+
+
+def libc():
+    global _libc
+    if _libc is None:
+        import ctypes
+        _libc = ctypes.CDLL(None, use_errno=True)
+        _libc.fanotify_mark.argtypes = [ctypes.c_int, ctypes.c_uint, ctypes.c_uint64, ctypes.c_int, ctypes.c_char_p]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return _libc
+
+
+def _check(result):
+    if result < 0:
+        import ctypes
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return result
+
+
+def is_temp(name):
+    return name in TEMP_NAMES or name.endswith(TEMP_SUFFIXES) or name.startswith(TEMP_PREFIXES)
+
+
+def _skip_dir(name):
+    return name.startswith(".") or name in IGNORED_DIRS
+
+
+def under_roots(path, roots):
+    """Root-relative check: inside one of the roots and not inside a hidden or ignored directory."""
+    for root in roots:
+        if path.startswith(root) and (len(path) == len(root) or path[len(root)] == "/"):
+            parts = path[len(root):].split("/")[1:-1]
+            return not any(_skip_dir(p) for p in parts)
+    return False
+
+# === COALESCING ===
+class Coalescer:
+    """Turns raw create/write/move/delete operations into one event per document.
+
+    Editors rarely write a document in place: gedit and LibreOffice write a temp file and
+    rename it over the original, vim renames the original to a backup and writes a new
+    one, Office writes then deletes a temp. Operations on a path are held for `window`
+    seconds of quiet; a temp written and renamed into place is reported as "saved",
+    a file recreated right after it was moved away as "modified", temp files and files
+    created and deleted within the window are not reported at all.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW, max_pending=PENDING_MAX):
+        self.window = window
+        self.max_pending = max_pending
+        self.pending = OrderedDict()  # path -> [first ts, last ts, action, app, pid, focus, src, writes]
+        self.vanished = {}            # path -> when it was moved away or deleted
+        self.moves = {}               # cookie or pid -> (source path, ts, carried pending entry)
+
+    def feed(self, ts, op, path, app=None, pid=None, focus=None, cookie=None):
+        entry = self.pending.get(path)
+        if op == "create":
+            action = "modified" if path in self.vanished or (entry and entry[2] == "deleted") else "created"
+            self._put(path, [ts, ts, action, app, pid, focus, None, 0])
+        elif op == "write":
+            if entry is None or entry[2] == "deleted":
+                entry = self._put(path, [ts, ts, "modified", app, pid, focus, None, 0])
+            entry[1], entry[7] = ts, entry[7] + 1
+            entry[3], entry[4] = app or entry[3], pid or entry[4]
+        elif op == "from":
+            self.vanished[path] = ts
+            self.moves[cookie if cookie else pid] = (path, ts, self.pending.pop(path, None))
+        elif op == "to":
+            src, _, carried = self.moves.pop(cookie if cookie else pid, (None, None, None))
+            name = os.path.basename(path)
+            if is_temp(name):
+                return  # original moved aside as a backup: its replacement decides the action
+            if src is None:
+                action = "created"  # moved in from outside the watched tree
+            elif carried is not None or is_temp(os.path.basename(src)):
+                action = "saved"
+            else:
+                action = "renamed"
+            self.vanished.pop(path, None)
+            self._put(path, [ts, ts, action, app, pid, focus, src if action == "renamed" else None, 0])
+        elif op == "delete":
+            if entry is not None and entry[2] == "created":
+                del self.pending[path]  # transient file
+                return
+            self.vanished[path] = ts
+            self._put(path, [ts, ts, "deleted", app, pid, focus, None, 0])
+
+    def _put(self, path, entry):
+        self.pending.pop(path, None)
+        self.pending[path] = entry
+        return entry
+
+    def flush(self, now, force=False):
+        """FileEvents for paths quiet for a full window (all of them with force)."""
+        out = []
+        cutoff = now - self.window
+        overflow = len(self.pending) - self.max_pending
+        for path, entry in list(self.pending.items()):
+            if not force and entry[1] > cutoff and overflow <= 0:
+                continue
+            del self.pending[path]
+            overflow -= 1
+            if is_temp(os.path.basename(path)):
+                continue
+            first, _, action, app, pid, focus, src, _ = entry
+            out.append(FileEvent(first, action, path, app, pid, focus, src))
+        for path in [p for p, ts in self.vanished.items() if ts < cutoff or force]:
+            del self.vanished[path]
+        for key in [k for k, move in self.moves.items() if move[1] < cutoff or force]:
+            src, ts, carried = self.moves.pop(key)
+            if not is_temp(os.path.basename(src)) and carried is None:
+                out.append(FileEvent(ts, "deleted", src, None, None, None, None))  # moved out of the tree
+        out.sort(key=lambda e: e.ts)
+        return out
+
+# === FANOTIFY ===
+class FanotifyBackend:
+    """One filesystem-wide mark per root's filesystem: no per-directory watches, any tree size.
+
+    Needs CAP_SYS_ADMIN and Linux 5.9 (directory handle + name reporting). Events carry
+    the writer's pid; directory handles are resolved to paths once and cached.
+    """
+
+    name = "fanotify"
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.fd = _check(libc().fanotify_init(FAN_CLASS_NOTIF | FAN_REPORT_DFID_NAME | FAN_CLOEXEC | FAN_NONBLOCK,
+                                              os.O_RDONLY))
+        self.mount_fds = {}  # fsid -> fd of a directory on that filesystem, for open_by_handle_at
+        self.dirs = OrderedDict()  # handle bytes -> directory path
+        self.overflows = 0
+        try:
+            for root in roots:
+                _check(libc().fanotify_mark(self.fd, FAN_MARK_ADD | FAN_MARK_FILESYSTEM, FANOTIFY_MASK,
+                                            AT_FDCWD, root.encode()))
+                fsid = os.statvfs(root).f_fsid
+                if fsid not in self.mount_fds:
+                    self.mount_fds[fsid] = os.open(root, os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        except OSError:
+            self.close()
+            raise
+
+    def fileno(self):
+        return self.fd
+
+    def walking(self):
+        return False
+
+    def step(self):
+        return []
+
+    def _dir_path(self, fsid, handle):
+        import ctypes
+        key = (fsid, handle)
+        path = self.dirs.get(key)
+        if path is not None:
+            self.dirs.move_to_end(key)
+            return path
+        mount_fd = self.mount_fds.get(fsid)
+        if mount_fd is None:
+            return None  # another filesystem; its mark belongs to no root
+        buf = ctypes.create_string_buffer(handle)
+        fd = libc().open_by_handle_at(mount_fd, buf, os.O_PATH)
+        if fd < 0:
+            return None  # directory already gone
+        try:
+            path = os.readlink(f"/proc/self/fd/{fd}")
+        finally:
+            os.close(fd)
+        self.dirs[key] = path
+        if len(self.dirs) > 20000:
+            self.dirs.popitem(last=False)
+        return path
+
+    def read(self):
+        """[(op, path, pid, cookie)] for everything the kernel has queued."""
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        ops = []
+        p = 0
+        while p + 24 <= len(data):
+            event_len, _, _, metadata_len, mask, _, pid = struct.unpack_from("=IBBHQii", data, p)
+            if mask & FAN_Q_OVERFLOW:
+                self.overflows += 1
+            q, end = p + metadata_len, p + event_len
+            while q + 4 <= end:
+                info_type, _, info_len = struct.unpack_from("=BBH", data, q)
+                if info_type == FAN_EVENT_INFO_TYPE_DFID_NAME and not mask & FAN_ONDIR:
+                    v0, v1, handle_bytes = struct.unpack_from("=iiI", data, q + 4)
+                    handle = data[q + 12:q + 20 + handle_bytes]
+                    name_start = q + 20 + handle_bytes
+                    name = data[name_start:data.index(b"\0", name_start)].decode(errors="surrogateescape")
+                    directory = self._dir_path((v0 & 0xFFFFFFFF) | (v1 & 0xFFFFFFFF) << 32, handle)
+                    if directory is not None:
+                        path = os.path.join(directory, name)
+                        for bit, op in ((FAN_CREATE, "create"), (FAN_MOVED_FROM, "from"), (FAN_MOVED_TO, "to"),
+                                        (FAN_CLOSE_WRITE, "write"), (FAN_DELETE, "delete")):
+                            if mask & bit:
+                                ops.append((op, path, pid, None))
+                q += max(info_len, 4)
+            p += event_len
+        return [op for op in ops if under_roots(op[1], self.roots)]
+
+    def close(self):
+        for fd in self.mount_fds.values():
+            os.close(fd)
+        self.mount_fds = {}
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+# === INOTIFY ===
+def watch_budget(limit_path="/proc/sys/fs/inotify/max_user_watches", max_watches=MAX_WATCHES):
+    try:
+        with open(limit_path) as f:
+            limit = int(f.read())
+    except (OSError, ValueError):
+        limit = 8192
+    return max(1, min(max_watches, int(limit * WATCH_SHARE)))
+
+
+class InotifyBackend:
+    """Per-directory inotify watches under the roots, within a watch budget.
+
+    Nothing is walked up front: the tree is scanned in WALK_CHUNK slices between event
+    reads, most recently modified directories first, so the directories documents are
+    actually saved in get watched first and a 500k-file home costs no startup time.
+    Directories created later are watched as they appear. When the budget is spent,
+    the watch whose directory has been quiet longest is dropped for the new one.
+    Events carry no pid; the writer is taken to be the focused app.
+    """
+
+    name = "inotify"
+
+    def __init__(self, roots, budget=None):
+        self.roots = roots
+        self.budget = budget or watch_budget()
+        self.fd = _check(libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self.watches = OrderedDict()  # wd -> directory, least recently active first
+        self.by_path = {}
+        self.walk = [(0.0, root) for root in roots]  # heap of (-mtime, directory)
+        self.late = set()  # directories that appeared while we were watching: their files are new too
+        self.overflows = 0
+        self.evicted = 0
+        self.scanned = 0
+        self.walk_started = time.perf_counter()
+        self.walk_seconds = None
+
+    def fileno(self):
+        return self.fd
+
+    def walking(self):
+        return bool(self.walk)
+
+    def watch(self, path):
+        if path in self.by_path:
+            return True
+        if len(self.watches) >= self.budget:
+            if not self.walk_done():
+                return False  # the initial walk stops at the budget; only later directories evict
+            wd, old = self.watches.popitem(last=False)
+            del self.by_path[old]
+            libc().inotify_rm_watch(self.fd, wd)
+            self.evicted += 1
+        wd = libc().inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            return False  # gone already, or not ours to read
+        self.watches[wd] = path
+        self.by_path[path] = wd
+        return True
+
+    def walk_done(self):
+        return self.walk_seconds is not None
+
+    def step(self):
+        """Watch and scan up to WALK_CHUNK directories; the watch is added before the scan, so nothing slips in between.
+
+        Returns "create" operations for files found in directories that appeared after startup.
+        """
+        ops = []
+        for _ in range(WALK_CHUNK):
+            if not self.walk:
+                if self.walk_seconds is None:
+                    self.walk_seconds = time.perf_counter() - self.walk_started
+                break
+            _, path = heapq.heappop(self.walk)
+            late = path in self.late
+            self.late.discard(path)
+            if not self.watch(path):
+                if not self.walk_done() and len(self.watches) >= self.budget:
+                    self.walk = []  # budget spent: the rest is older than everything watched
+                continue
+            self.scanned += 1
+            files = 0
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if _skip_dir(entry.name):
+                                continue
+                            try:
+                                mtime = entry.stat(follow_symlinks=False).st_mtime
+                            except OSError:
+                                continue
+                            heapq.heappush(self.walk, (-mtime, entry.path))
+                            if late:
+                                self.late.add(entry.path)
+                        elif late and files < NEW_DIR_FILES and entry.is_file(follow_symlinks=False):
+                            ops.append(("create", entry.path, None, None))
+                            files += 1
+            except OSError:
+                pass
+        return ops
+
+    def _appeared(self, path, ts):
+        """A directory created or moved in (mkdir -p, cp -r, an unpacked archive): scan its subtree next."""
+        self.late.add(path)
+        heapq.heappush(self.walk, (-ts, path))
+
+    def _rename_tree(self, old, new):
+        prefix = old + "/"
+        for wd, path in list(self.watches.items()):
+            if path == old or path.startswith(prefix):
+                moved = new + path[len(old):]
+                self.watches[wd] = moved
+                del self.by_path[path]
+                self.by_path[moved] = wd
+
+    def read(self):
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        ops = []
+        dir_moves = {}
+        p = 0
+        now = time.time()
+        while p + 16 <= len(data):
+            wd, mask, cookie, length = struct.unpack_from("=iIII", data, p)
+            name = data[p + 16:p + 16 + length].split(b"\0", 1)[0].decode(errors="surrogateescape")
+            p += 16 + length
+            if mask & IN_Q_OVERFLOW:
+                self.overflows += 1
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                self.by_path.pop(directory, None)
+                continue
+            self.watches.move_to_end(wd)
+            if not name or mask & IN_DELETE_SELF:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if _skip_dir(name):
+                    continue
+                if mask & IN_MOVED_FROM:
+                    dir_moves[cookie] = path
+                elif mask & IN_MOVED_TO and cookie in dir_moves:
+                    self._rename_tree(dir_moves.pop(cookie), path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self._appeared(path, now)
+                continue
+            for bit, op in ((IN_CREATE, "create"), (IN_MOVED_FROM, "from"), (IN_MOVED_TO, "to"),
+                            (IN_CLOSE_WRITE, "write"), (IN_DELETE, "delete")):
+                if mask & bit:
+                    ops.append((op, path, None, cookie or None))
+        for old in dir_moves.values():  # moved out of the tree: its watches now point nowhere we track
+            for wd in [self.by_path[p] for p in list(self.by_path) if p == old or p.startswith(old + "/")]:
+                libc().inotify_rm_watch(self.fd, wd)
+        return ops
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+# === COLLECTOR ===
+class FileActivity:
+    """Documents created, modified, saved, renamed and deleted under the roots, and by whom.
+
+    One thread blocks on the kernel queue (fanotify, or inotify without the privilege)
+    and wakes only when there are events or a coalescing window to close. Each event
+    records the writing app (fanotify) and the app focused when it happened, so the
+    trackers can attach it to the open focus segment. Reported events wait in a bounded
+    queue until drain().
+    """
+
+    def __init__(self, roots=FILE_ROOTS, focus=None, ignore=(), fanotify=True, budget=None,
+                 ignore_pids=None, queue_max=QUEUE_MAX):
+        self.roots = [os.path.realpath(os.path.expanduser(r)) for r in roots]
+        self.focus = focus or (lambda: None)
+        self.ignore = {os.path.realpath(os.path.expanduser(p)) for p in ignore}
+        self.use_fanotify = fanotify
+        self.budget = budget
+        self.ignore_pids = {os.getpid()} if ignore_pids is None else set(ignore_pids)
+        self.coalescer = Coalescer()
+        self.ready = deque()
+        self.queue_max = queue_max
+        self.lock = threading.Lock()
+        self.apps = {}  # pid -> app
+        self.backend = None
+        self.counts = defaultdict(int)
+        self.wake_r = self.wake_w = None
+        self.thread = None
+
+    def start(self):
+        if self.use_fanotify:
+            try:
+                self.backend = FanotifyBackend(self.roots)
+            except (OSError, AttributeError) as e:
+                print(f"⚠️ fanotify unavailable ({e}); watching directories with inotify")
+        if self.backend is None:
+            self.backend = InotifyBackend(self.roots, self.budget)
+        self.wake_r, self.wake_w = os.pipe()
+        self.thread = threading.Thread(target=self._run, name="file-activity", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Report what is still being coalesced and close the kernel queue."""
+        if self.thread is not None and self.thread.is_alive():
+            os.write(self.wake_w, b"x")
+            self.thread.join(timeout)
+
+    def _app(self, pid):
+        if pid is None:
+            return None
+        app = self.apps.get(pid)
+        if app is None:
+            from net_accounting import main_process_name
+            app = main_process_name(pid)
+            if app == "Unknown":  # exited before we looked
+                app = f"pid {pid}"
+            if len(self.apps) > 1000:
+                self.apps.clear()
+            self.apps[pid] = app
+        return app
+
+    def _ignored(self, path):
+        return any(path == p or path.startswith(p + "/") for p in self.ignore)
+
+    def _run(self):
+        backend = self.backend
+        try:
+            while True:
+                if backend.walking():
+                    timeout = 0
+                elif self.coalescer.pending or self.coalescer.moves:
+                    timeout = self.coalescer.window
+                else:
+                    timeout = None  # nothing to close: sleep until the kernel has events
+                readable, _, _ = select.select([backend, self.wake_r], [], [], timeout)
+                if self.wake_r in readable:
+                    break
+                now = time.time()
+                if backend in readable:
+                    focus = self.focus()
+                    for op, path, pid, cookie in backend.read():
+                        if pid in self.ignore_pids or self._ignored(path):
+                            continue
+                        self.counts["operations"] += 1
+                        self.coalescer.feed(now, op, path, self._app(pid), pid, focus, cookie)
+                for op, path, pid, cookie in backend.step():
+                    self.coalescer.feed(now, op, path, None, pid, self.focus(), cookie)
+                self._publish(self.coalescer.flush(now))
+            self._publish(self.coalescer.flush(time.time(), force=True))
+        except Exception as e:
+            print(f"❌ file_activity: {e}")
+        finally:
+            backend.close()
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+
+    def _publish(self, events):
+        if not events:
+            return
+        with self.lock:
+            room = self.queue_max - len(self.ready)
+            self.ready.extend(events[:max(room, 0)])
+            self.counts["events"] += len(events)
+            if len(events) > room:
+                self.counts["dropped"] += len(events) - max(room, 0)
+
+    def drain(self):
+        with self.lock:
+            events, self.ready = list(self.ready), deque()
+        return events
+
+    def stats(self):
+        backend = self.backend
+        stats = dict(self.counts, backend=backend.name if backend else None,
+                     overflows=backend.overflows if backend else 0)
+        if isinstance(backend, InotifyBackend):
+            stats.update(watches=len(backend.watches), budget=backend.budget, evicted=backend.evicted,
+                         walk_seconds=backend.walk_seconds)
+        return stats
+
+
+def by_focus(events):
+    """{focused app: [{"time", "action", "path", "app"}]}: file events attached to the focus segment they happened in."""
+    grouped = defaultdict(list)
+    for e in events:
+        item = {"time": round(e.ts, 3), "action": e.action, "path": e.path}
+        if e.app:
+            item["app"] = e.app
+        if e.src:
+            item["from"] = e.src
+        grouped[e.focus or "Unknown"].append(item)
+    return dict(grouped)
+
+# === BENCHMARK ===
+EDITOR_SCRIPT = r"""
+import os, sys, time
+d = sys.argv[1]
+def write(p, text):
+    with open(p, "w") as f:
+        f.write(text)
+write(os.path.join(d, "notes.txt"), "v1")                                # new document
+for i in range(5):                                                      # autosave bursts
+    write(os.path.join(d, "notes.txt"), "v%d" % i)
+tmp = os.path.join(d, ".goutputstream-ABC123")                           # gedit: temp + rename
+write(tmp, "gedit")
+os.rename(tmp, os.path.join(d, "report.md"))
+os.rename(os.path.join(d, "plan.txt"), os.path.join(d, "plan.txt~"))    # vim: backup, then rewrite
+write(os.path.join(d, "plan.txt"), "vim")
+os.unlink(os.path.join(d, "plan.txt~"))
+write(os.path.join(d, "~$budget.xlsx"), "lock")                          # office lock file
+os.unlink(os.path.join(d, "~$budget.xlsx"))
+write(os.path.join(d, "scratch.txt"), "x")                               # created and deleted
+os.unlink(os.path.join(d, "scratch.txt"))
+os.rename(os.path.join(d, "old-name.odt"), os.path.join(d, "new-name.odt"))
+os.makedirs(os.path.join(d, "unpacked", "deep"))                          # new directories
+write(os.path.join(d, "unpacked", "deep", "readme.txt"), "late")
+"""
+
+
+def build_tree(root, files, per_dir=20, fanout=10):
+    """files empty files in directories of per_dir, fanout subdirectories per level."""
+    dirs = [root]
+    made = 0
+    i = 0
+    while made < files:
+        parent = dirs[i // fanout]
+        d = os.path.join(parent, f"d{i}")
+        os.mkdir(d)
+        dirs.append(d)
+        for j in range(min(per_dir, files - made)):
+            open(os.path.join(d, f"f{j}.txt"), "w").close()
+        made += per_dir
+        i += 1
+    return len(dirs)
+
+
+def run_bench(files=100_000, budget=None, fanotify=True):
+    tmp = tempfile.mkdtemp(prefix="file_activity_")
+    t0 = time.perf_counter()
+    ndirs = build_tree(tmp, files)
+    docs = os.path.join(tmp, "Documents")
+    os.mkdir(docs)
+    for name in ("plan.txt", "old-name.odt"):
+        open(os.path.join(docs, name), "w").close()
+    print(f"📁 {files:,} files in {ndirs:,} directories ({time.perf_counter() - t0:.1f} s to create)")
+
+    backends = (True, False) if fanotify else (False,)
+    for use_fanotify in backends:
+        t0 = time.perf_counter()
+        collector = FileActivity([tmp], focus=lambda: "Text Editor", fanotify=use_fanotify, budget=budget).start()
+        started = time.perf_counter() - t0
+        if isinstance(collector.backend, InotifyBackend):
+            while not collector.backend.walk_done():
+                time.sleep(0.05)
+        subprocess.run([sys.executable, "-c", EDITOR_SCRIPT, docs], check=True)
+        time.sleep(COALESCE_WINDOW + 0.5)
+        collector.stop()
+        events = collector.drain()
+        stats = collector.stats()
+        print(f"\n⏱️ {stats['backend']}: start() {started * 1000:.1f} ms" +
+              (f", walk {stats['walk_seconds']:.2f} s in the background, {stats['watches']:,} watches "
+               f"(budget {stats['budget']:,})" if stats["backend"] == "inotify" else ", no watches"))
+        print(f"📈 {stats.get('operations', 0)} operations -> {len(events)} events")
+        for e in events:
+            rel = os.path.relpath(e.path, docs)
+            src = f" (from {os.path.relpath(e.src, docs)})" if e.src else ""
+            print(f"  {e.action:<9} {rel}{src}  by {e.app or '-'} in {e.focus}")
+        # the tree is shared: undo the simulated session for the next backend
+        for name in ("notes.txt", "report.md", "new-name.odt"):
+            os.unlink(os.path.join(docs, name))
+        open(os.path.join(docs, "old-name.odt"), "w").close()
+        subprocess.run(["rm", "-rf", os.path.join(docs, "unpacked")], check=True)
+        time.sleep(0.2)
+    subprocess.run(["rm", "-rf", tmp])
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Document activity (created, modified, saved) per app")
+    parser.add_argument("--roots", nargs="*", default=FILE_ROOTS)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--inotify", action="store_true", help="skip fanotify even when permitted")
+    parser.add_argument("--bench", action="store_true", help="startup cost and coalescing on a synthetic tree")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--budget", type=int, help="inotify watch budget (default: share of the kernel limit)")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_bench(args.files, args.budget, fanotify=not args.inotify)
+        return 0
+    collector = FileActivity(args.roots, fanotify=not args.inotify, budget=args.budget).start()
+    print(f"🟢 Watching {', '.join(collector.roots)} with {collector.backend.name} for {args.seconds} s...")
+    stop = time.time() + args.seconds
+    while time.time() < stop:
+        time.sleep(1)
+        for e in collector.drain():
+            src = f" (from {e.src})" if e.src else ""
+            print(f"{time.strftime('%H:%M:%S', time.localtime(e.ts))} {e.action:<9} {e.path}{src} {e.app or ''}")
+    collector.stop()
+    print(f"📈 {collector.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
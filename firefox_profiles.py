@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import configparser
+from collections import namedtuple
+from urllib.parse import quote
+
+from browser_sources import Source, SOURCE_DEADLINE
+
+# === CONFIG ===
+FIREFOX_ROOTS = [
+    "~/.mozilla/firefox",                                # native / distro package
+    "~/snap/firefox/common/.mozilla/firefox",            # Snap
+    "~/.var/app/org.mozilla.firefox/.mozilla/firefox",   # Flatpak
+]
+BACKFILL_DAYS = 30      # history imported the first time a profile is seen
+INGEST_BATCH = 5000     # visits per query
+INGEST_MAX = 20000      # visits per refresh, so a first import never blows a source deadline
+
+FirefoxProfile = namedtuple("FirefoxProfile", "name path default")
+
+
+def _profiles_in(root):
+    ini_path = os.path.join(root, "profiles.ini")
+    if not os.path.exists(ini_path):
+        return []
+    ini = configparser.ConfigParser(interpolation=None, strict=False)
+    try:
+        ini.read(ini_path, encoding="utf-8")
+    except configparser.Error as e:
+        print(f"⚠️ Cannot parse {ini_path}: {e}")
+        return []
+
+    # Since Firefox 67 the profile in use is the [Install<hash>] Default, not [ProfileN] Default=1
+    install_defaults = {ini[s].get("Default") for s in ini.sections() if s.startswith("Install")}
+    profiles = []
+    for section in ini.sections():
+        if not section.startswith("Profile") or "Path" not in ini[section]:
+            continue
+        entry = ini[section]
+        rel = entry.get("Path")
+        path = os.path.join(root, rel) if entry.get("IsRelative", "1") == "1" else rel
+        if not os.path.isdir(path):
+            continue
+        default = rel in install_defaults or (not install_defaults and entry.get("Default") == "1")
+        profiles.append(FirefoxProfile(entry.get("Name", rel), os.path.normpath(path), default))
+    return profiles
+
+
+def discover_profiles(roots=FIREFOX_ROOTS):
+    """Every Firefox profile on disk (native, Snap, Flatpak), default profiles first."""
+    profiles, seen = [], set()
+    for root in roots:
+        for profile in _profiles_in(os.path.expanduser(root)):
+            real = os.path.realpath(profile.path)
+            if real not in seen:
+                seen.add(real)
+                profiles.append(profile)
+    profiles.sort(key=lambda p: not p.default)
+    return profiles
+
+
+def default_profile_path(roots=FIREFOX_ROOTS):
+    """Path of the profile Firefox opens by default, or "" when Firefox has never run."""
+    profiles = discover_profiles(roots)
+    return profiles[0].path if profiles else ""
+
+
+def recovery_file(profile_path):
+    return os.path.join(profile_path, "sessionstore-backups", "recovery.jsonlz4")
+
+
+def source_name(profile):
+    return f"firefox/{os.path.basename(profile.path)}"
+
+# === SESSION STORE ===
+def read_session_tabs(path):
+    """{"selected": (title, url) of the active tab or None, "tabs": (title, url) of every tab's current page}.
+
+    recovery.jsonlz4 can be several MB of JSON; this is run in an offload worker so the
+    decompress and parse never hold the trackers' GIL, and only the small result comes back.
+    """
+    import json
+    import lz4.block
+
+    with open(path, "rb") as f:
+        f.read(8)  # mozLz40\0 magic
+        session = json.loads(lz4.block.decompress(f.read()))
+
+    pages = []
+    for window in session.get("windows", []):
+        for tab in window.get("tabs", []):
+            entries = tab.get("entries", [])
+            i = tab.get("index", 1) - 1
+            if 0 <= i < len(entries):
+                pages.append((entries[i].get("title", "").strip(), entries[i].get("url", "").strip()))
+
+    selected = None
+    windows = session.get("windows", [])
+    win_idx = session.get("selectedWindow", 1) - 1
+    if 0 <= win_idx < len(windows):
+        win = windows[win_idx]
+        tabs = win.get("tabs", [])
+        tab_idx = win.get("selected", 1) - 1
+        if 0 <= tab_idx < len(tabs):
+            entries = tabs[tab_idx].get("entries", [])
+            i = tabs[tab_idx].get("index", 1) - 1
+            if 0 <= i < len(entries):
+                selected = (entries[i].get("title", "").strip(), entries[i].get("url", "").strip())
+    return {"selected": selected, "tabs": pages}
+
+# === PLACES HISTORY ===
+def open_places(profile_path):
+    """Open places.sqlite read-only in place (no copy, even for a large history).
+
+    A plain read-only connection sees the WAL, so visits not yet checkpointed are
+    included. If Firefox holds its exclusive lock, fall back to immutable mode, which
+    ignores locks and the WAL: visits still in the WAL then appear after Firefox's next
+    checkpoint, and the high-water mark makes sure none are skipped.
+    """
+    db = os.path.join(profile_path, "places.sqlite")
+    if not os.path.exists(db):
+        return None
+    uri = "file:" + quote(os.path.abspath(db))
+    conn = sqlite3.connect(f"{uri}?mode=ro", uri=True, timeout=0.2, check_same_thread=False)
+    try:
+        conn.execute("SELECT 1 FROM moz_historyvisits LIMIT 1").fetchall()
+        return conn
+    except sqlite3.OperationalError:
+        conn.close()
+    return sqlite3.connect(f"{uri}?immutable=1", uri=True, check_same_thread=False)
+
+
+def ingest_places(index, profile, backfill_days=BACKFILL_DAYS, limit=INGEST_MAX):
+    """Copy moz_historyvisits rows past the profile's high-water mark into the history index.
+
+    Returns the number of visits ingested. Reads walk the visits primary key, so the cost
+    is proportional to the new visits, not to the size of places.sqlite.
+    """
+    source = source_name(profile)
+    conn = open_places(profile.path)
+    if conn is None:
+        return 0
+    try:
+        mark = index.high_water(source)
+        newest = conn.execute("SELECT IFNULL(MAX(id), 0) FROM moz_historyvisits").fetchone()[0]
+        if mark is not None and newest < mark:
+            print(f"⚠️ {source}: history was cleared, re-indexing")
+            index.reset(source)
+            mark = None
+        if mark is None:
+            cutoff = int((time.time() - backfill_days * 86400) * 1_000_000)
+            first = conn.execute("SELECT MIN(id) FROM moz_historyvisits WHERE visit_date >= ?", (cutoff,)).fetchone()[0]
+            mark = (first - 1) if first is not None else newest
+
+        total = 0
+        while total < limit:
+            rows = conn.execute("""
+                SELECT v.id, v.visit_date, p.url, p.title
+                FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+                WHERE v.id > ?
+                ORDER BY v.id
+                LIMIT ?
+            """, (mark, min(INGEST_BATCH, limit - total))).fetchall()
+            if not rows:
+                break
+            mark = rows[-1][0]
+            index.add_visits(source, [(vid, vdate / 1_000_000, url, title) for vid, vdate, url, title in rows], mark)
+            total += len(rows)
+        if total == 0 and index.high_water(source) is None:
+            index.add_visits(source, [], mark)
+        return total
+    finally:
+        conn.close()
+
+
+def places_sources(index, profiles=None, deadline=None):
+    """One browser_sources.Source per profile; each refresh ingests new visits and returns no rows."""
+    def ingest(profile):
+        ingest_places(index, profile)
+        return []
+
+    profiles = discover_profiles() if profiles is None else profiles
+    return [Source(source_name(p), lambda p=p: ingest(p), deadline or SOURCE_DEADLINE) for p in profiles]
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Firefox profiles and incremental history indexing")
+    parser.add_argument("--ingest", action="store_true", help="index new visits from every profile")
+    args = parser.parse_args(argv)
+
+    profiles = discover_profiles()
+    if not profiles:
+        print("❌ No Firefox profiles found")
+        return 1
+    for p in profiles:
+        print(f"{'*' if p.default else ' '} {p.name:<20} {p.path}")
+    if args.ingest:
+        from history_index import default_index
+        index = default_index()
+        for p in profiles:
+            t0 = time.perf_counter()
+            count = ingest_places(index, p)
+            print(f"📥 {source_name(p)}: {count} new visits in {time.perf_counter() - t0:.3f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
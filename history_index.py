@@ -0,0 +1,85 @@
+import time
+import threading
+
+import local_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_index (
+    source TEXT NOT NULL,
+    visit_id INTEGER NOT NULL,
+    visit_time REAL NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    PRIMARY KEY (source, visit_id)
+);
+CREATE INDEX IF NOT EXISTS history_index_time ON history_index(visit_time);
+CREATE INDEX IF NOT EXISTS history_index_title ON history_index(title);
+CREATE TABLE IF NOT EXISTS history_marks (
+    source TEXT PRIMARY KEY,
+    high_water INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+RECENT_TITLES = 2000  # visits loaded into the in-memory title -> url map
+
+
+class HistoryIndex:
+    """Browser visits copied into the local store, with a per-source high-water mark.
+
+    Sources (one per browser profile) append only visits newer than their mark, so a
+    refresh costs what was visited since the last one rather than the whole history.
+    """
+
+    def __init__(self, path=local_store.LOCAL_STORE):
+        self.conn = local_store.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def high_water(self, source):
+        with self.lock:
+            row = self.conn.execute("SELECT high_water FROM history_marks WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def add_visits(self, source, visits, high_water):
+        """Store (visit_id, visit_time, url, title) rows and move the mark, in one transaction."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO history_index (source, visit_id, visit_time, url, title) VALUES (?, ?, ?, ?, ?)",
+                [(source, vid, vtime, url, title) for vid, vtime, url, title in visits])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO history_marks (source, high_water, updated) VALUES (?, ?, ?)",
+                (source, high_water, time.time()))
+
+    def reset(self, source):
+        """Forget a source's visits (its history was cleared or the profile replaced)."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM history_index WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM history_marks WHERE source = ?", (source,))
+
+    def url_for_title(self, title):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT url FROM history_index WHERE title = ? ORDER BY visit_time DESC LIMIT 1", (title,)).fetchone()
+        return row[0] if row else None
+
+    def title_map(self, limit=RECENT_TITLES):
+        """title -> url of the most recent visits; newer visits win."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT title, url FROM history_index WHERE title IS NOT NULL AND title != '' "
+                "ORDER BY visit_time DESC LIMIT ?", (limit,)).fetchall()
+        return {title: url for title, url in reversed(rows)}
+
+    def close(self):
+        self.conn.close()
+
+
+_default_index = None
+
+
+def default_index():
+    global _default_index
+    if _default_index is None:
+        _default_index = HistoryIndex()
+    return _default_index
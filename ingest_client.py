@@ -0,0 +1,42 @@
+import gzip
+import json
+import time
+import random
+import socket
+import zlib
+
+# === CONFIG ===
+JITTER_FRACTION = 0.1  # +/- share of the interval added to every sleep
+
+
+def client_phase(client_id, interval):
+    """Stable per-client offset inside the interval, so clients don't all fire on the same second."""
+    return (zlib.crc32(str(client_id).encode()) % 1000) / 1000 * interval
+
+
+def next_delay(interval, phase=0.0, jitter=JITTER_FRACTION, now=None):
+    """Seconds until this client's next slot: phase-aligned, plus a little random jitter.
+
+    The slot is the first one after now + the jitter bound, so a wake that came up to the
+    bound early is not sent back to the slot it just served: gaps stay within
+    interval +/- twice the bound.
+    """
+    now = time.time() if now is None else now
+    bound = jitter * interval
+    slot = now + bound + interval - ((now + bound - phase) % interval)
+    return slot + random.uniform(-bound, bound) - now
+
+
+def jittered_sleep(interval, client_id=None, jitter=JITTER_FRACTION):
+    client_id = client_id if client_id is not None else socket.gethostname()
+    time.sleep(next_delay(interval, client_phase(client_id, interval), jitter))
+
+
+def encode_batch(records, compress=True):
+    """Body and headers for a batched POST (a JSON list, gzip-compressed by default)."""
+    body = json.dumps(records, separators=(",", ":")).encode()
+    headers = {"Content-Type": "application/json"}
+    if compress:
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
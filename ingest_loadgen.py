@@ -0,0 +1,156 @@
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+
+import ingest_server
+from ingest_client import client_phase, next_delay, encode_batch
+
+# === CONFIG ===
+DEFAULT_CLIENTS = 200
+DEFAULT_DURATION = 30
+DEFAULT_INTERVAL = 5       # compressed stand-in for the trackers' 60 s cadence
+DEFAULT_BATCH = 12         # records per request (one per 5 s sample of a minute)
+
+APPS = ["firefox", "code", "gnome-terminal-", "slack", "chrome", "libreoffice", "evince"]
+DOMAINS = ["github.com", "mail.google.com", "stackoverflow.com", "odoo.com", "youtube.com"]
+
+
+def synthetic_record(i):
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "system_uptime": f"{time.monotonic():.2f} seconds",
+        "application_usage": [{"name": random.choice(APPS), "time_spent": random.uniform(1, 60)}
+                              for _ in range(3)],
+        "site_usage": [{"domain": random.choice(DOMAINS), "time_spent": random.uniform(1, 60)}],
+        "seq": i,
+    }
+
+
+def make_tokens(clients):
+    return {f"loadgen-token-{i:05d}": f"client-{i:05d}" for i in range(clients)}
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def run_client(client_id, token, args, stats, stop_at):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    phase = client_phase(client_id, args.interval)
+    seq = 0
+    try:
+        while True:
+            if args.aligned:
+                delay = args.interval - (time.time() % args.interval)  # everyone fires together
+            else:
+                delay = next_delay(args.interval, phase, args.jitter)
+            if time.time() + delay >= stop_at:
+                break
+            await asyncio.sleep(delay)
+
+            records = [synthetic_record(seq + i) for i in range(args.batch)]
+            seq += args.batch
+            payload = records if args.batch > 1 else records[0]
+            body, headers = encode_batch(payload, compress=args.gzip)
+            head = [f"POST {args.endpoint} HTTP/1.1", f"Host: {args.host}",
+                    f"Authorization: Bearer {token}", f"Content-Length: {len(body)}"]
+            head += [f"{k}: {v}" for k, v in headers.items()]
+            request = ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+            t0 = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await _read_response(reader)
+            stats["latencies"].append(time.perf_counter() - t0)
+            stats["status"][status] = stats["status"].get(status, 0) + 1
+            if status == 200:
+                stats["records"] += len(records)
+                stats["bytes"] += len(body)
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        stats["errors"] += 1
+        print(f"[ERROR] {client_id}: {e}")
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run(args):
+    tokens = make_tokens(args.clients)
+    server = None
+    if args.spawn_server:
+        server = ingest_server.IngestServer(tokens, args.db, rate=args.rate, burst=args.burst)
+        await server.start(args.host, args.port)
+
+    stats = {"latencies": [], "status": {}, "records": 0, "bytes": 0, "errors": 0}
+    started = time.time()
+    stop_at = started + args.duration
+    await asyncio.gather(*(run_client(client, token, args, stats, stop_at)
+                           for token, client in tokens.items()))
+    elapsed = time.time() - started
+    if server:
+        await server.stop()
+
+    latencies = sorted(stats["latencies"])
+    mode = "aligned" if args.aligned else f"jittered ±{args.jitter:.0%}"
+    print(f"\n📊 {args.clients} clients, {mode}, batch {args.batch}, gzip {args.gzip}, {elapsed:.1f} s")
+    print(f"   requests: {len(latencies)}  status: {stats['status']}  connection errors: {stats['errors']}")
+    print(f"   ingest throughput: {stats['records'] / elapsed:,.0f} records/s "
+          f"({stats['bytes'] / elapsed / 1024:,.1f} KiB/s on the wire)")
+    if latencies:
+        print(f"   latency p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+    if server:
+        print(f"   server: {server.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate N tracker clients against the ingest server")
+    parser.add_argument("--host", default=ingest_server.HOST)
+    parser.add_argument("--port", type=int, default=ingest_server.PORT)
+    parser.add_argument("--endpoint", default="/api/user-activity")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--aligned", action="store_true", help="fire all clients on the same boundary")
+    parser.add_argument("--no-gzip", dest="gzip", action="store_false")
+    parser.add_argument("--spawn-server", action="store_true", help="run the server in this process")
+    parser.add_argument("--db", default=ingest_server.INGEST_DB)
+    parser.add_argument("--rate", type=float, default=ingest_server.RATE_LIMIT_RPS)
+    parser.add_argument("--burst", type=int, default=ingest_server.RATE_LIMIT_BURST)
+    parser.add_argument("--write-tokens", help="write the simulated clients' tokens for a separate server")
+    args = parser.parse_args(argv)
+
+    if args.write_tokens:
+        with open(args.write_tokens, "w") as f:
+            for token, client in make_tokens(args.clients).items():
+                f.write(f"{client} {token}\n")
+        print(f"🔑 Wrote {args.clients} tokens to {args.write_tokens}")
+        return
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import os
+import gzip
+import json
+import time
+import asyncio
+import argparse
+import sqlite3
+
+# === CONFIG ===
+HOST = "127.0.0.1"
+PORT = 8069
+INGEST_DB = "ingest_store.db"
+TOKEN_FILE = "checkin_token.txt"  # one accepted Bearer token per line
+
+ENDPOINTS = {
+    "/api/user-activity": "user_activity",
+    "/api/system-usage": "system_usage",
+    "/api/activity-alert": "activity_alert",
+    "/api/activity-rollup": "activity_rollup",
+}
+
+MAX_BODY = 8 * 1024 * 1024
+MAX_RECORDS_PER_REQUEST = 5000
+WRITE_BATCH = 2000         # rows per INSERT transaction
+WRITE_LINGER = 0.02        # seconds the writer waits to fill a batch
+RATE_LIMIT_RPS = 2.0       # sustained requests per second per client
+RATE_LIMIT_BURST = 10      # bucket size per client
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests",
+               500: "Internal Server Error"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    client TEXT NOT NULL,
+    received REAL NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_client_received ON records(client, received);
+CREATE INDEX IF NOT EXISTS records_kind_received ON records(kind, received);
+"""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def load_tokens(path):
+    """Map token -> client name; a line may be 'token' or 'client token'."""
+    tokens = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 1:
+                tokens[parts[0]] = parts[0][:8]
+            elif len(parts) >= 2:
+                tokens[parts[1]] = parts[0]
+    if not tokens:
+        raise ValueError(f"No tokens in {path}")
+    return tokens
+
+# === RATE LIMITING ===
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.level = burst
+        self.stamp = time.monotonic()
+
+    def take(self):
+        """Return 0 if allowed, else seconds until the next request would be."""
+        now = time.monotonic()
+        self.level = min(self.burst, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.level >= 1:
+            self.level -= 1
+            return 0.0
+        return (1 - self.level) / self.rate
+
+# === STORAGE ===
+class BatchWriter:
+    """Group-commits queued records with executemany; each request waits for its commit."""
+
+    def __init__(self, path, batch=WRITE_BATCH, linger=WRITE_LINGER):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.batch = batch
+        self.linger = linger
+        self.queue = asyncio.Queue()
+        self.rows_written = 0
+        self.commits = 0
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    def _insert(self, rows):
+        with self.conn:
+            self.conn.executemany("INSERT INTO records (kind, client, received, payload) VALUES (?, ?, ?, ?)", rows)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            count = len(pending[0][0])
+            deadline = loop.time() + self.linger
+            while count < self.batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+            rows = [row for item_rows, _ in pending for row in item_rows]
+            try:
+                await loop.run_in_executor(None, self._insert, rows)
+                self.rows_written += len(rows)
+                self.commits += 1
+                for item_rows, future in pending:
+                    if not future.done():
+                        future.set_result(len(item_rows))
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def close(self):
+        self.conn.close()
+
+# === HTTP ===
+class IngestServer:
+    def __init__(self, tokens, db_path=INGEST_DB, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST):
+        self.tokens = tokens
+        self.writer = BatchWriter(db_path)
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.streams = {}  # (client, stream) -> last seq seen
+        self.requests = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.missing = 0
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(400, "Bad Content-Length")
+        if length < 0:
+            raise HttpError(400, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], headers, body
+
+    def _authenticate(self, headers):
+        auth = headers.get("authorization", "")
+        scheme, _, token = auth.partition(" ")
+        client = self.tokens.get(token.strip()) if scheme.lower() == "bearer" else None
+        if client is None:
+            raise HttpError(401, "Invalid or missing token")
+        return client
+
+    def _rate_limit(self, client):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            bucket = self.buckets[client] = TokenBucket(self.rate, self.burst)
+        wait = bucket.take()
+        if wait:
+            raise HttpError(429, "Rate limit exceeded", {"Retry-After": f"{max(1, round(wait))}"})
+
+    def _decode(self, headers, body):
+        if headers.get("content-encoding", "").lower() == "gzip":
+            try:
+                body = gzip.decompress(body)
+            except (OSError, EOFError):
+                raise HttpError(400, "Bad gzip body")
+            if len(body) > MAX_BODY * 8:
+                raise HttpError(413, "Body too large")
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HttpError(400, "Invalid JSON")
+        if isinstance(data, dict) and isinstance(data.get("records"), list):
+            data = data["records"]
+        records = data if isinstance(data, list) else [data]
+        if len(records) > MAX_RECORDS_PER_REQUEST:
+            raise HttpError(413, "Too many records")
+        return records
+
+    def _sequence(self, client, records):
+        """Drop re-sent records and count sequence gaps for trackers that number their records.
+
+        Returns the new last seq per stream too: they are saved only once the rows are written,
+        so a request that fails can be retried without its records counting as duplicates.
+        """
+        fresh, duplicates, missing, seqs = [], 0, 0, {}
+        for record in records:
+            stream = record.get("stream") if isinstance(record, dict) else None
+            seq = record.get("seq") if stream else None
+            if not isinstance(seq, int):
+                fresh.append(record)
+                continue
+            key = (client, stream)
+            last = seqs.get(key) or self.streams.get(key, 0)
+            if seq <= last:
+                duplicates += 1
+                continue
+            missing += seq - last - 1
+            seqs[key] = seq
+            fresh.append(record)
+        return fresh, duplicates, missing, seqs
+
+    async def _handle(self, method, path, headers, body):
+        kind = ENDPOINTS.get(path)
+        if kind is None:
+            raise HttpError(404, "Unknown endpoint")
+        if method != "POST":
+            raise HttpError(405, "POST only")
+        client = self._authenticate(headers)
+        self._rate_limit(client)
+        records, duplicates, missing, seqs = self._sequence(client, self._decode(headers, body))
+        now = time.time()
+        rows = [(kind, client, now, json.dumps(r, separators=(",", ":"))) for r in records]
+        accepted = await self.writer.submit(rows) if rows else 0
+        for key, seq in seqs.items():
+            self.streams[key] = max(seq, self.streams.get(key, 0))
+        self.duplicates += duplicates
+        self.missing += missing
+        return 200, {"status": "ok", "accepted": accepted, "duplicates": duplicates, "missing": missing}, {}
+
+    @staticmethod
+    def _response(status, payload, extra, keep_alive):
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{k}: {v}" for k, v in extra.items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode() + body
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    writer.write(self._response(e.status, {"error": str(e)}, e.headers, False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.requests += 1
+                try:
+                    status, payload, extra = await self._handle(method, path, headers, body)
+                except HttpError as e:
+                    self.rejected += 1
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                except Exception as e:
+                    print(f"[ERROR] ingest: {e}")
+                    status, payload, extra = 500, {"error": "internal error"}, {}
+                writer.write(self._response(status, payload, extra, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=HOST, port=PORT):
+        self.writer_task = asyncio.create_task(self.writer.run())
+        self.server = await asyncio.start_server(self.serve_client, host, port, backlog=1024)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.writer_task.cancel()
+        self.writer.close()
+
+    def stats(self):
+        return {"requests": self.requests, "rejected": self.rejected,
+                "duplicates": self.duplicates, "missing": self.missing,
+                "rows_written": self.writer.rows_written, "commits": self.writer.commits}
+
+
+async def serve(host, port, tokens, db_path, rate, burst):
+    server = IngestServer(tokens, db_path, rate, burst)
+    await server.start(host, port)
+    print(f"🟢 Ingest server on http://{host}:{port} ({len(tokens)} tokens, db {db_path})")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"📈 {server.stats()}")
+    finally:
+        await server.stop()
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Odoo activity endpoints")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--tokens", default=TOKEN_FILE, help="file of accepted Bearer tokens")
+    parser.add_argument("--db", default=INGEST_DB)
+    parser.add_argument("--rate", type=float, default=RATE_LIMIT_RPS, help="requests/s per client")
+    parser.add_argument("--burst", type=int, default=RATE_LIMIT_BURST)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.tokens):
+        print(f"❌ Token file not found: {args.tokens}")
+        return
+    try:
+        asyncio.run(serve(args.host, args.port, load_tokens(args.tokens), args.db, args.rate, args.burst))
+    except KeyboardInterrupt:
+        print("\n🛑 Ingest server stopped")
+
+
+if __name__ == "__main__":
+    main()
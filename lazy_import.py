@@ -0,0 +1,29 @@
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Lets a tracker keep `requests.post(...)`-style call sites while only paying for (and
+    only requiring) the heavy or optional dependencies of the collectors it actually runs.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
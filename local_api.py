@@ -0,0 +1,419 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import http.client
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+import local_store
+from memory_budget import LRUCache
+from rollups import RollupStore, local_midnight, HOUR
+
+# === CONFIG ===
+DEFAULT_LISTEN = "127.0.0.1:8765"  # host:port, or a filesystem path for a Unix socket (mode 0600)
+CACHE_ENTRIES = 256                # distinct hot queries kept
+MAX_STREAMS = 32                   # concurrent /events subscribers
+KEEPALIVE = 15                     # seconds between SSE comments on a quiet stream
+MAX_WAIT = 60                      # longest /focus long-poll
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def parse_time(value, default):
+    """Epoch seconds, YYYY-MM-DD (local midnight) or an ISO datetime."""
+    if value in (None, ""):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise BadRequest(f"bad time {value!r}: use epoch seconds, YYYY-MM-DD or an ISO datetime")
+
+
+class QueryAPI:
+    """Read-only queries over the tracker's rollups and its live focus, for local dashboards.
+
+    Responses are cached per query and tagged with the generation of the data they read:
+    invalidate() (new segments flushed to the rollups) and focus_changed() bump the
+    generations. Until then a query is answered from the cache, and a client presenting
+    the current ETag gets a 304 without the cache being touched, so frequent dashboard
+    refreshes cost a dict lookup each. Queries without an end time run to "now" as of the
+    last flush, which is as far as the rollups go anyway.
+    """
+
+    def __init__(self, store, clock=time.time, watch_store=False):
+        self.store = store
+        self.clock = clock
+        self.watch_store = watch_store  # another process writes the store: check it on every request
+        self.store_version = None
+        self.cond = threading.Condition()
+        self.data_version = 0
+        self.focus_version = 0
+        self.focus = {"app": None, "site": None, "since": None}
+        self.cache = LRUCache("local_api.responses", max_entries=CACHE_ENTRIES)
+        self.compute_lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.streams = 0
+        self.server = None
+        self.closing = False
+
+    # --- invalidation ---
+    def invalidate(self):
+        """New data reached the rollups (call after RollupStore.flush())."""
+        with self.cond:
+            self.data_version += 1
+
+    def focus_changed(self, app, site=None, since=None):
+        """The focused app changed; the segment it closed is new data too."""
+        with self.cond:
+            self.focus_version += 1
+            self.data_version += 1
+            self.focus = {"app": app, "site": site, "since": since or self.clock()}
+            self.cond.notify_all()
+
+    def _check_store(self):
+        # PRAGMA data_version changes when another connection commits to the database
+        with self.store.lock:
+            version = self.store.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.store_version:
+            self.store_version = version
+            self.invalidate()
+
+    # --- queries ---
+    def _range(self, params):
+        now = self.clock()
+        start = parse_time(params.get("start"), local_midnight(now))
+        end = parse_time(params.get("end"), None)
+        if end is not None and end <= start:
+            raise BadRequest("end must be after start")
+        return start, end
+
+    def _route(self, path, params):
+        """(cache key, generations it depends on, compute function) for a GET path."""
+        parts = [unquote(p) for p in path.strip("/").split("/") if p]
+        if parts == ["today"]:
+            day = local_midnight(self.clock())
+            return ("today", day), ("data", "focus"), lambda: self._today(day)
+        if parts == ["range"]:
+            start, end = self._range(params)
+            return ("range", start, end), ("data",), lambda: self._query(start, end)
+        if len(parts) == 1 and parts[0] in ("apps", "domains"):
+            start, end = self._range(params)
+            field = "application_usage" if parts[0] == "apps" else "site_usage"
+            return (parts[0], start, end), ("data",), lambda: self._totals(field, start, end)
+        if len(parts) == 2 and parts[0] in ("apps", "domains"):
+            start, end = self._range(params)
+            kind = "app" if parts[0] == "apps" else "domain"
+            return (kind, parts[1], start, end), ("data",), lambda: self._series(kind, parts[1], start, end)
+        return None
+
+    def _query(self, start, end):
+        result = self.store.query(start, end if end is not None else self.clock())
+        result["generated_at"] = self.clock()
+        return result
+
+    def _today(self, day):
+        result = self._query(day, None)
+        result["focus"] = dict(self.focus)  # the open segment: time since "since" is not in the totals yet
+        return result
+
+    def _totals(self, field, start, end):
+        result = self._query(start, end)
+        return {"start": result["start"], "end": result["end"], field: result[field],
+                "generated_at": result["generated_at"]}
+
+    def _series(self, kind, name, start, end):
+        end = end if end is not None else self.clock()
+        hours = self.store.series(kind, name, start, end)
+        return {kind: name, "start": start, "end": end,
+                "time_spent": sum(s for _, s in hours),
+                "hours": [{"hour": datetime.fromtimestamp(h).isoformat(), "time_spent": s} for h, s in hours],
+                "generated_at": self.clock()}
+
+    def respond(self, path, params, if_none_match=None):
+        """(status, headers, body bytes) for a GET; /events is handled by stream()."""
+        self.counts["requests"] += 1
+        if self.watch_store:
+            self._check_store()
+        try:
+            if path.rstrip("/") == "/focus":
+                return self._focus(params, if_none_match)
+            if path.rstrip("/") == "/stats":
+                return self._json(200, self.stats())
+            route = self._route(path, params)
+        except BadRequest as e:
+            return self._json(400, {"error": str(e)})
+        if route is None:
+            return self._json(404, {"error": f"unknown path {path}",
+                                    "paths": ["/today", "/range", "/apps", "/apps/<name>", "/domains",
+                                              "/domains/<name>", "/focus", "/events", "/stats"]})
+        key, depends, compute = route
+        with self.cond:
+            versions = tuple(self.data_version if d == "data" else self.focus_version for d in depends)
+        etag = '"%s-%08x"' % (".".join(map(str, versions)), zlib.crc32(repr(key).encode()))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag in if_none_match:
+            self.counts["not_modified"] += 1
+            return 304, headers, b""
+        cached = self.cache.get(key)
+        if cached is None or cached[0] != etag:
+            # One computation per stale query, however many dashboards ask at once
+            with self.compute_lock:
+                cached = self.cache.get(key)
+                if cached is None or cached[0] != etag:
+                    self.counts["computed"] += 1
+                    body = json.dumps(compute(), ensure_ascii=False).encode()
+                    cached = self.cache[key] = (etag, body)
+                else:
+                    self.counts["cached"] += 1
+        else:
+            self.counts["cached"] += 1
+        headers["Content-Type"] = "application/json"
+        return 200, headers, cached[1]
+
+    def _focus(self, params, if_none_match):
+        """Current focus; with ?since=<version>&wait=<s>, a long-poll until it changes."""
+        try:
+            since = int(params.get("since", -1))
+            wait = min(float(params.get("wait", 0)), MAX_WAIT)
+        except ValueError:
+            raise BadRequest("since and wait must be numbers")
+        with self.cond:
+            if wait > 0:
+                self.cond.wait_for(lambda: self.focus_version > since or self.closing, wait)
+            version, focus = self.focus_version, dict(self.focus)
+        etag = f'"f{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag in if_none_match:
+            self.counts["not_modified"] += 1
+            return 304, headers, b""
+        focus["version"] = version
+        return self._json(200, focus, headers)
+
+    def _json(self, status, payload, headers=None):
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/json"
+        return status, headers, json.dumps(payload, ensure_ascii=False).encode()
+
+    def stream(self, handler):
+        """Server-sent events: the current focus, then one "focus" event per change."""
+        with self.cond:
+            if self.streams >= MAX_STREAMS:
+                status, headers, body = self._json(503, {"error": "too many event streams"})
+                handler.reply(status, headers, body)
+                return
+            self.streams += 1
+        try:
+            handler.close_connection = True
+            handler.send_response(200)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.end_headers()
+            last = handler.headers.get("Last-Event-ID")
+            seen = int(last) if last and last.isdigit() else -1
+            while not self.closing:
+                with self.cond:
+                    self.cond.wait_for(lambda: self.focus_version != seen or self.closing, KEEPALIVE)
+                    version, focus = self.focus_version, dict(self.focus)
+                if self.closing:
+                    break
+                if version != seen:
+                    seen = version
+                    handler.wfile.write(f"id: {version}\nevent: focus\ndata: {json.dumps(focus)}\n\n".encode())
+                else:
+                    handler.wfile.write(b": keepalive\n\n")
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.cond:
+                self.streams -= 1
+
+    def stats(self):
+        return dict(self.counts, cache_entries=len(self.cache), streams=self.streams,
+                    data_version=self.data_version, focus_version=self.focus_version)
+
+    # --- serving ---
+    def serve(self, listen=DEFAULT_LISTEN):
+        """Serve on host:port or a Unix socket path from a daemon thread; returns the server."""
+        self.server = make_server(self, listen)
+        threading.Thread(target=self.server.serve_forever, name="local-api", daemon=True).start()
+        return self.server
+
+    def close(self):
+        with self.cond:
+            self.closing = True
+            self.cond.notify_all()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if isinstance(self.server, UnixStreamServer):
+                try:
+                    os.unlink(self.server.server_address)
+                except OSError:
+                    pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: a refreshing dashboard reuses its connection
+    # Headers and body leave in one write, without waiting for the client's delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        api = self.server.api
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") == "/events":
+            api.stream(self)
+            return
+        self.reply(*api.respond(url.path, dict(parse_qsl(url.query)), self.headers.get("If-None-Match")))
+
+    def reply(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHandler(_Handler):
+    disable_nagle_algorithm = False  # not a TCP socket
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(api, listen):
+    if "/" in listen:
+        if os.path.exists(listen):
+            os.unlink(listen)  # left behind by a previous run
+        server = _UnixHTTPServer(listen, _UnixHandler)
+        os.chmod(listen, 0o600)  # the activity data is the user's alone
+    else:
+        host, _, port = listen.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+        server.daemon_threads = True
+    server.api = api
+    return server
+
+# === BENCHMARK ===
+def _fill_store(store, days=30, apps=20, domains=50, seed=0):
+    rng = random.Random(seed)
+    end = time.time()
+    t = end - days * 24 * HOUR
+    while t < end:
+        length = rng.uniform(20, 600)
+        store.add_segment(f"app{rng.randrange(apps)}", t, min(t + length, end),
+                          domain=f"site{rng.randrange(domains)}.example" if rng.random() < 0.5 else None)
+        t += length
+    store.flush()
+    store.commit()
+
+
+def _timed(conn, path, n, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    t0 = time.perf_counter()
+    for _ in range(n):
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+    return (time.perf_counter() - t0) / n * 1e6, response, body
+
+
+def run_bench(requests=2000, days=30):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RollupStore(os.path.join(tmp, "bench.db"), source="bench")
+        t0 = time.perf_counter()
+        _fill_store(store, days)
+        print(f"📐 {days} days of segments rolled up in {time.perf_counter() - t0:.1f} s")
+        api = QueryAPI(store)
+        api.focus_changed("app1", "site1.example")
+        server = api.serve("127.0.0.1:0")
+        conn = http.client.HTTPConnection(*server.server_address[:2])
+        paths = ["/today", f"/range?start={time.time() - days * 86400:.0f}", "/apps", "/domains/site3.example"]
+        for path in paths:
+            api.invalidate()
+            cold, response, body = _timed(conn, path, 1)
+            etag = response.getheader("ETag")
+            warm, _, _ = _timed(conn, path, requests)
+            revalidate, response, _ = _timed(conn, path, requests, etag)
+            assert response.status == 304
+            print(f"⏱️ {path:<36} computed {cold / 1000:6.1f} ms ({len(body):,} B), "
+                  f"cached {warm:5.0f} µs, 304 {revalidate:5.0f} µs")
+        cpu0, n = time.process_time(), 500
+        for i in range(n):
+            _timed(conn, paths[i % len(paths)], 1, None)
+        per_request = (time.process_time() - cpu0) / n
+        print(f"📈 500 dashboard refreshes/min: {per_request * 500 / 60 * 100:.3f}% of one core "
+              f"(client and server in this process, {per_request * 1e6:.0f} µs CPU each)")
+
+        events = socket.create_connection(server.server_address[:2])
+        events.sendall(b"GET /events HTTP/1.1\r\nHost: x\r\n\r\n")
+        events.settimeout(5)
+        events.recv(4096)  # headers and the current focus
+        t0 = time.perf_counter()
+        api.focus_changed("app2", None)
+        data = events.recv(4096).decode()
+        line = next((line for line in data.splitlines() if line.startswith("data:")), data.strip())
+        print(f"📡 SSE focus event after {(time.perf_counter() - t0) * 1000:.2f} ms: {line}")
+        events.close()
+        print(f"📊 {api.stats()}")
+        conn.close()
+        api.close()
+        store.close()
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local read API over the tracker's rollups")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help="host:port, or a path for a Unix socket")
+    parser.add_argument("--db", default=local_store.LOCAL_STORE)
+    parser.add_argument("--bench", action="store_true", help="cold, cached and 304 latency; SSE delivery")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_bench()
+        return 0
+    if not os.path.exists(args.db):
+        print(f"❌ {args.db} not found (run from the tracker's directory or pass --db)")
+        return 1
+    # Standalone: rollups only; the tracker daemon also publishes focus and invalidates on each flush
+    store = RollupStore(args.db, source="local_api")
+    api = QueryAPI(store, watch_store=True)
+    server = make_server(api, args.listen)
+    print(f"🟢 Serving {args.db} on {args.listen} (/today /range /apps /domains /focus /events /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+        server.server_close()
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+import sqlite3
+
+# === CONFIG ===
+LOCAL_STORE = "tracker_store.db"
+
+
+def connect(path=LOCAL_STORE):
+    """Open the tracker's local SQLite store in WAL mode, shareable across tracker threads."""
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,477 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+
+import local_store
+
+# === CONFIG ===
+MEMORY_BUDGET = 32 * 1024 * 1024  # bytes across every registered cache and accumulator
+ENFORCE_TARGET = 0.9              # when over budget, evict down to this fraction of it
+EVICT_BATCH = 64                  # LRU entries evicted per step
+ENTRY_OVERHEAD = 100              # hash slot + ordering links per entry, roughly
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory_spill (
+    structure TEXT NOT NULL,
+    owner INTEGER NOT NULL,     -- pid of the process that spilled the entry
+    key TEXT NOT NULL,          -- JSON-encoded key
+    value REAL NOT NULL,
+    PRIMARY KEY (structure, owner, key)
+);
+"""
+
+
+def entry_size(key, value):
+    """Approximate bytes held by one key/value pair (one level into tuples)."""
+    size = ENTRY_OVERHEAD
+    for obj in (key, value):
+        size += sys.getsizeof(obj)
+        if isinstance(obj, tuple):
+            size += sum(sys.getsizeof(item) for item in obj)
+    return size
+
+
+class MemoryBudget:
+    """Global byte budget shared by registered structures.
+
+    Structures account their own size and call charge(); once the total passes the
+    limit, the largest structures give up their least recently used entries (dropped, or
+    spilled to the local store) until the total is back under ENFORCE_TARGET.
+    """
+
+    def __init__(self, limit=MEMORY_BUDGET):
+        self.limit = limit
+        self.structures = {}
+        self.lock = threading.Lock()
+        self.enforcing = threading.Lock()
+        self.total = 0
+
+    def register(self, structure):
+        with self.lock:
+            name, n = structure.name, 2
+            while name in self.structures:
+                name, n = f"{structure.name}#{n}", n + 1
+            structure.name = name
+            self.structures[name] = structure
+            self.total += structure.nbytes
+        return structure
+
+    def unregister(self, structure):
+        with self.lock:
+            if self.structures.pop(structure.name, None) is structure:
+                self.total -= structure.nbytes
+
+    def watch(self, name, obj, entry_bytes):
+        """Report a structure that bounds itself (e.g. a deque with maxlen) without managing it."""
+        return self.register(Watched(name, obj, entry_bytes))
+
+    def charge(self, nbytes):
+        with self.lock:
+            self.total += nbytes
+            over = self.total > self.limit
+        if over:
+            self.enforce()
+
+    def enforce(self):
+        """Evict LRU entries from the largest structures until under ENFORCE_TARGET of the limit."""
+        if not self.enforcing.acquire(blocking=False):
+            return 0  # another thread is already evicting
+        freed = 0
+        try:
+            target = self.limit * ENFORCE_TARGET
+            while True:
+                with self.lock:
+                    self.total = sum(s.nbytes for s in self.structures.values())
+                    if self.total <= target:
+                        break
+                    candidates = sorted(self.structures.values(), key=lambda s: -s.nbytes)
+                step = 0
+                for structure in candidates:
+                    step = structure.evict(EVICT_BATCH)
+                    if step:
+                        break
+                if not step:
+                    break  # nothing evictable left
+                freed += step
+        finally:
+            self.enforcing.release()
+        return freed
+
+    def usage(self):
+        """One row per structure: entries, bytes, evicted and spilled counts, largest first."""
+        with self.lock:
+            structures = list(self.structures.values())
+        rows = [s.stats() for s in structures]
+        return sorted(rows, key=lambda r: -r["bytes"])
+
+    def report(self, out=sys.stdout):
+        rows = self.usage()
+        total = sum(r["bytes"] for r in rows)
+        print(f"🧠 Memory budget: {total / 1024:,.0f} KB of {self.limit / 1024:,.0f} KB", file=out)
+        for r in rows:
+            print(f" - {r['name']:<32} {r['entries']:>9,} entries {r['bytes'] / 1024:>9,.0f} KB "
+                  f"evicted {r['evicted']:>9,} spilled {r['spilled']:>9,}", file=out)
+
+
+class _Tracked:
+    kind = "tracked"
+
+    def __init__(self, name, budget=None):
+        self.name = name
+        self.lock = threading.RLock()
+        self.nbytes = 0
+        self.evicted = 0
+        self.spilled = 0
+        self.budget = default_budget() if budget is None else budget
+        if self.budget:
+            self.budget.register(self)
+
+    def _charge(self, delta):
+        # Called with self.lock released, so enforcement may evict from any structure
+        if delta and self.budget:
+            self.budget.charge(delta)
+
+    def evict(self, count):
+        return 0
+
+    def __len__(self):
+        return 0
+
+    def stats(self):
+        return {"name": self.name, "kind": self.kind, "entries": len(self), "bytes": self.nbytes,
+                "evicted": self.evicted, "spilled": self.spilled}
+
+
+class Watched(_Tracked):
+    """Read-only view of a self-bounded container for usage reports."""
+    kind = "watched"
+
+    def __init__(self, name, obj, entry_bytes):
+        self.obj = obj
+        self.entry_bytes = entry_bytes
+        super().__init__(name, budget=False)
+
+    @property
+    def nbytes(self):
+        return len(self.obj) * self.entry_bytes
+
+    @nbytes.setter
+    def nbytes(self, value):
+        pass
+
+    def __len__(self):
+        return len(self.obj)
+
+
+class LRUCache(_Tracked):
+    """Mapping whose least recently used entries are dropped under memory pressure.
+
+    Use it for anything that can be rebuilt or re-read (history titles, symbol names);
+    max_entries additionally caps the structure on its own.
+    """
+    kind = "cache"
+
+    def __init__(self, name, budget=None, max_entries=None):
+        self.data = OrderedDict()
+        self.max_entries = max_entries
+        super().__init__(name, budget)
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                return default
+            return self.data[key]
+
+    def __getitem__(self, key):
+        with self.lock:
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            delta = self._put(key, value)
+            self.nbytes += delta
+            if self.max_entries and len(self.data) > self.max_entries:
+                delta -= self._pop_lru(len(self.data) - self.max_entries)
+        self._charge(delta)
+
+    def _put(self, key, value):
+        # Callers add the returned delta to nbytes (update() batches it)
+        old = self.data.pop(key, None)
+        self.data[key] = value
+        return entry_size(key, value) - (entry_size(key, old) if old is not None else 0)
+
+    def _pop_lru(self, count):
+        freed = 0
+        for _ in range(min(count, len(self.data))):
+            key, value = self.data.popitem(last=False)
+            freed += entry_size(key, value)
+            self.evicted += 1
+        self.nbytes -= freed
+        return freed
+
+    def update(self, mapping):
+        with self.lock:
+            delta = sum(self._put(key, value) for key, value in mapping.items())
+            self.nbytes += delta
+            if self.max_entries and len(self.data) > self.max_entries:
+                delta -= self._pop_lru(len(self.data) - self.max_entries)
+        self._charge(delta)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.data))
+
+    def items(self):
+        with self.lock:
+            return list(self.data.items())
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        with self.lock:
+            freed, self.nbytes = self.nbytes, 0
+            self.data.clear()
+        self._charge(-freed)
+
+    def evict(self, count):
+        with self.lock:
+            freed = self._pop_lru(count)
+        if freed and self.budget:
+            self.budget.charge(-freed)
+        return freed
+
+
+class SpillCounter(_Tracked):
+    """key -> number accumulator whose cold entries spill to the local store instead of being lost.
+
+    items() and get() see spilled values too, so totals stay exact; drain() returns
+    everything and clears both tiers. Spilled rows belong to this process (by pid) and
+    rows left behind by processes that are gone are purged on first use.
+    """
+    kind = "spill"
+
+    def __init__(self, name, budget=None, path=local_store.LOCAL_STORE):
+        self.data = OrderedDict()
+        self.path = path
+        self.conn = None
+        self.db_lock = None
+        self.owner = os.getpid()
+        super().__init__(name, budget)
+        self.spill_name = self.name
+
+    def _db(self):
+        if self.conn is None:
+            self.conn, self.db_lock = _spill_store(self.path)
+        return self.conn
+
+    def add(self, key, amount):
+        with self.lock:
+            old = self.data.pop(key, None)
+            self.data[key] = (old or 0) + amount
+            delta = 0 if old is not None else entry_size(key, 0.0)
+            self.nbytes += delta
+        self._charge(delta)
+
+    def _spilled(self, key=None):
+        if self.conn is None:
+            return [] if key is None else None
+        if key is None:
+            with self.db_lock:
+                rows = self.conn.execute("SELECT key, value FROM memory_spill WHERE structure = ? AND owner = ?",
+                                         (self.spill_name, self.owner)).fetchall()
+            return [(_decode_key(k), v) for k, v in rows]
+        with self.db_lock:
+            row = self.conn.execute("SELECT value FROM memory_spill WHERE structure = ? AND owner = ? AND key = ?",
+                                    (self.spill_name, self.owner, json.dumps(key))).fetchone()
+        return row[0] if row else None
+
+    def get(self, key, default=0):
+        with self.lock:
+            value = self.data.get(key)
+            spilled = self._spilled(key)
+        if value is None and spilled is None:
+            return default
+        return (value or 0) + (spilled or 0)
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def items(self):
+        with self.lock:
+            merged = dict(self._spilled())
+            for key, value in self.data.items():
+                merged[key] = merged.get(key, 0) + value
+        return list(merged.items())
+
+    def drain(self):
+        with self.lock:
+            merged = dict(self.items())
+            freed, self.nbytes = self.nbytes, 0
+            self.data.clear()
+            if self.conn is not None:
+                with self.db_lock, self.conn:
+                    self.conn.execute("DELETE FROM memory_spill WHERE structure = ? AND owner = ?",
+                                      (self.spill_name, self.owner))
+        self._charge(-freed)
+        return merged
+
+    def __len__(self):
+        return len(self.data)
+
+    def evict(self, count):
+        with self.lock:
+            if not self.data:
+                return 0
+            batch = [self.data.popitem(last=False) for _ in range(min(count, len(self.data)))]
+            db = self._db()
+            with self.db_lock, db:
+                db.executemany(
+                    "INSERT INTO memory_spill (structure, owner, key, value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(structure, owner, key) DO UPDATE SET value = value + excluded.value",
+                    [(self.spill_name, self.owner, json.dumps(key), value) for key, value in batch])
+            freed = sum(entry_size(key, 0.0) for key, _ in batch)
+            self.nbytes -= freed
+            self.spilled += len(batch)
+        if self.budget:
+            self.budget.charge(-freed)
+        return freed
+
+
+_spill_stores = {}
+_spill_lock = threading.Lock()
+
+
+def _spill_store(path):
+    """(connection, lock) shared by every SpillCounter of this process on one store.
+
+    Opened on the first spill; rows left by this pid's predecessors and by processes
+    that are no longer running are purged then.
+    """
+    with _spill_lock:
+        store = _spill_stores.get(path)
+        if store is None:
+            conn = local_store.connect(path)
+            conn.executescript(SCHEMA)
+            owners = [row[0] for row in conn.execute("SELECT DISTINCT owner FROM memory_spill")]
+            dead = [pid for pid in owners if pid == os.getpid() or not _pid_alive(pid)]
+            with conn:
+                conn.executemany("DELETE FROM memory_spill WHERE owner = ?", [(pid,) for pid in dead])
+            store = _spill_stores[path] = (conn, threading.Lock())
+        return store
+
+
+def _decode_key(text):
+    key = json.loads(text)
+    return tuple(key) if isinstance(key, list) else key
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_default_budget = None
+_default_lock = threading.Lock()
+
+
+def default_budget():
+    """Process-wide budget every tracker structure registers with."""
+    global _default_budget
+    if _default_budget is None:
+        with _default_lock:
+            if _default_budget is None:
+                _default_budget = MemoryBudget()
+    return _default_budget
+
+
+def install_report_signal(budget=None, sig=getattr(signal, "SIGUSR1", None)):
+    """Print per-structure usage on `kill -USR1 <pid>` (call from the main thread)."""
+    if sig is None:
+        return
+    budget = budget or default_budget()
+    signal.signal(sig, lambda signum, frame: budget.report())
+
+# === SOAK ===
+def _rss():
+    import psutil
+    return psutil.Process().memory_info().rss
+
+
+def run_soak(days=30, budget_bytes=4 * 1024 * 1024, new_titles=6, seed=0):
+    """Simulated uptime: every minute brings new window titles, sites and history entries.
+
+    The symbol table, history cache, interval totals and session counters all see
+    unbounded churn; with the budget in place RSS should level off after the first day.
+    """
+    import random
+    from symbols import SymbolTable
+    from activity_payload import IntervalSnapshot, UsageAccumulator
+
+    rng = random.Random(seed)
+    tmp = tempfile.mkdtemp(prefix="memory_soak_")
+    path = os.path.join(tmp, "soak.db")
+    budget = MemoryBudget(budget_bytes)
+    symbols = SymbolTable(path, budget=budget)
+    snapshot = IntervalSnapshot(symbols, budget=budget, path=path)
+    history = LRUCache("history_cache", budget=budget)
+    session = SpillCounter("session_usage", budget=budget, path=path)
+    usage = UsageAccumulator()
+
+    t0 = time.perf_counter()
+    base = _rss()
+    print(f"{'day':>4} {'rss MB':>8} {'budget KB':>10} {'evicted':>9} {'spilled':>9}")
+    for minute in range(days * 1440):
+        for i in range(new_titles):
+            title = f"Document {minute}-{i} — editor"
+            site = f"site{rng.randrange(minute // 10 + 50)}.example"
+            sid = symbols.intern(title)
+            usage.add(sid, rng.uniform(1, 10))
+            session.add(sid, rng.uniform(1, 10))
+            session.add(symbols.intern(site), rng.uniform(1, 10))
+            history[title] = f"https://{site}/{minute}/{i}"
+        snapshot.emit({"application_usage": usage.drain()})
+        if (minute + 1) % 1440 == 0:
+            rows = budget.usage()
+            print(f"{(minute + 1) // 1440:>4} {(_rss() - base) / 1024 ** 2:>8.1f} "
+                  f"{sum(r['bytes'] for r in rows) / 1024:>10,.0f} {sum(r['evicted'] for r in rows):>9,} "
+                  f"{sum(r['spilled'] for r in rows):>9,}")
+    print(f"⏱️ {days} simulated days in {time.perf_counter() - t0:.1f} s")
+    budget.report()
+    exact = sum(v for _, v in session.items())
+    print(f"📈 session totals kept exact through spills: {exact:,.0f} s over "
+          f"{len(session.items()):,} keys ({len(session):,} in memory)")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory budget for tracker caches and accumulators")
+    parser.add_argument("--soak", action="store_true", help="simulate a long uptime and print RSS per day")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--budget-kb", type=int, default=4096)
+    args = parser.parse_args(argv)
+    if args.soak:
+        run_soak(args.days, args.budget_kb * 1024)
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,25 @@
 import time
 from collections import deque
-from evdev import InputDevice, categorize, ecodes, list_devices
-from Xlib import display, X
-from Xlib.ext import record
-from Xlib.protocol import rq
 import threading
 
+from lazy_import import lazy_module
+from activity_bitmap import ActivityRecorder, BitmapStore
+from memory_budget import default_budget, install_report_signal
+
+# evdev and python-xlib load when monitoring starts, not on import
+evdev = lazy_module("evdev")
+ecodes = lazy_module("evdev.ecodes")
+display = lazy_module("Xlib.display")
+X = lazy_module("Xlib.X")
+record = lazy_module("Xlib.ext.record")
+rq = lazy_module("Xlib.protocol.rq")
+
+BITMAP_SAVE_INTERVAL = 60  # seconds between activity bitmap writes to the local store
+EVENT_BUFFER_MAX = 4096    # events kept per device if the main loop stalls (oldest are dropped)
+EVENT_BYTES = 200          # (timestamp, InputEvent) tuple, roughly
+
 def find_device(keywords):
-    devices = [InputDevice(path) for path in list_devices()]
+    devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
     for dev in devices:
         if any(keyword in dev.name.lower() for keyword in keywords):
             return dev
@@ -17,10 +29,13 @@ def get_mouse_position():
     data = display.Display().screen().root.query_pointer()._data
     return data["root_x"], data["root_y"]
 
-def monitor_device(device, event_buffer, key):
+def monitor_device(device, event_buffer, key, activity=None):
     for event in device.read_loop():
         if event.type in {ecodes.EV_REL, ecodes.EV_ABS, ecodes.EV_KEY}:
-            event_buffer[key].append((time.time(), event))
+            now = time.time()
+            event_buffer[key].append((now, event))
+            if activity is not None:
+                activity.mark(now)  # hardware events only: scripted input never sets a bit
 
 def record_keyboard_events(event_buffer):
     local_dpy = display.Display()
@@ -70,13 +85,18 @@ def detect_non_scripted_inputs(poll_interval=0.05, event_window=0.15):
         return
 
     event_buffer = {
-        'mouse': deque(),
-        'keyboard': deque(),
-        'scripted_keyboard': deque()
+        'mouse': deque(maxlen=EVENT_BUFFER_MAX),
+        'keyboard': deque(maxlen=EVENT_BUFFER_MAX),
+        'scripted_keyboard': deque(maxlen=EVENT_BUFFER_MAX)
     }
+    for key, buffer in event_buffer.items():
+        default_budget().watch(f"event_buffer.{key}", buffer, EVENT_BYTES)
 
-    threading.Thread(target=monitor_device, args=(mouse_device, event_buffer, 'mouse'), daemon=True).start()
-    threading.Thread(target=monitor_device, args=(keyboard_device, event_buffer, 'keyboard'), daemon=True).start()
+    active_seconds = ActivityRecorder(BitmapStore(), source="evdev")
+    last_save = time.time()
+
+    threading.Thread(target=monitor_device, args=(mouse_device, event_buffer, 'mouse', active_seconds), daemon=True).start()
+    threading.Thread(target=monitor_device, args=(keyboard_device, event_buffer, 'keyboard', active_seconds), daemon=True).start()
     threading.Thread(target=record_keyboard_events, args=(event_buffer,), daemon=True).start()
 
     last_mouse_pos = get_mouse_position()
@@ -137,9 +157,14 @@ def detect_non_scripted_inputs(poll_interval=0.05, event_window=0.15):
             if should_print('keyboard_scripted'):
                 print("⚠️ Scripted keyboard input detected")
 
+        if now - last_save >= BITMAP_SAVE_INTERVAL:
+            active_seconds.save()
+            last_save = now
+
         elapsed = time.time() - start_time
         time.sleep(max(0, poll_interval - elapsed))
 
 
 if __name__ == "__main__":
+    install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
     detect_non_scripted_inputs()
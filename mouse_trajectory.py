@@ -0,0 +1,375 @@
+import sys
+import math
+import time
+import zlib
+import json
+import argparse
+import threading
+from array import array
+from collections import deque
+
+import local_store
+
+# === CONFIG ===
+EPSILON = 2.0            # px a dropped point may deviate from the simplified polyline
+WINDOW = 32              # max points buffered since the last kept point (bounds per-event work)
+STROKE_GAP = 0.05        # seconds without motion that end a stroke (the end point is always kept)
+DWELL_MIN = 0.5          # seconds without motion counted as dwell
+SEGMENT_POINTS = 4096    # kept points per compressed segment
+DWELL_BUCKETS = (1, 5, 30, 120)  # dwell histogram upper bounds in seconds (last bucket open)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mouse_segments (
+    id INTEGER PRIMARY KEY,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    points INTEGER NOT NULL,
+    path_length REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mouse_segments_start ON mouse_segments(start);
+"""
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def encode_segment(ts, xs, ys, count):
+    """Delta + zigzag varint encode (ms, x, y) points column by column, then zlib.
+
+    Columns (all time deltas, then x deltas, then y deltas) compress far better than
+    interleaved triples; the first point's deltas are from zero, i.e. absolute.
+    """
+    out = bytearray()
+    _put_varint(out, count)
+    for col in (ts, xs, ys):
+        prev = 0
+        for i in range(count):
+            v = col[i]
+            _put_varint(out, _zigzag(v - prev))
+            prev = v
+    return zlib.compress(bytes(out), 9)
+
+
+def decode_segment(blob, start=0.0):
+    """[(time, x, y)] from encode_segment output; times are start + offset in seconds."""
+    data = zlib.decompress(blob)
+    pos = 0
+
+    def varint():
+        nonlocal pos
+        shift = value = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value
+            shift += 7
+
+    count = varint()
+    cols = []
+    for _ in range(3):
+        col, v = [], 0
+        for _ in range(count):
+            v += _unzigzag(varint())
+            col.append(v)
+        cols.append(col)
+    return [(start + t / 1000.0, x, y) for t, x, y in zip(*cols)]
+
+
+class TrajectoryRecorder:
+    """Turns raw pointer motion into path statistics and a simplified, compressed polyline.
+
+    Simplification is an on-line opening-window Douglas-Peucker: points since the last kept
+    point wait in a small fixed window, and the previous point is kept as soon as the chord
+    from the last kept point to the newest one passes more than EPSILON px from any waiting
+    point (or the window fills, or the stroke ends). Kept points go to fixed-size arrays
+    that are flushed as one compressed segment when full.
+    """
+
+    def __init__(self, on_segment=None, epsilon=EPSILON, segment_points=SEGMENT_POINTS):
+        self.on_segment = on_segment
+        self.epsilon = epsilon
+        self.segment_points = segment_points
+        self.lock = threading.Lock()
+        # kept points of the open segment (ms offsets from segment start)
+        self.ts = array("l", bytes(8 * segment_points))
+        self.xs = array("l", bytes(8 * segment_points))
+        self.ys = array("l", bytes(8 * segment_points))
+        self.count = 0
+        self.segment_start = None
+        self.segment_length = 0.0
+        # waiting window since the anchor
+        self.wx = array("d", bytes(8 * WINDOW))
+        self.wy = array("d", bytes(8 * WINDOW))
+        self.wt = array("d", bytes(8 * WINDOW))
+        self.wn = 0
+        self.anchor = None  # (t, x, y) of the last kept point
+        self.last = None    # (t, x, y) of the last raw event
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.events = 0
+        self.kept = 0
+        self.path_length = 0.0
+        self.moving_time = 0.0
+        self.max_speed = 0.0
+        self.dwell_time = 0.0
+        self.dwell_hist = [0] * len(DWELL_BUCKETS)
+        self.strokes = 0
+
+    # --- kept points ---
+    def _keep(self, t, x, y):
+        if self.segment_start is None:
+            self.segment_start = t
+        i = self.count
+        self.ts[i] = int(round((t - self.segment_start) * 1000))
+        self.xs[i] = int(x)
+        self.ys[i] = int(y)
+        self.count += 1
+        self.kept += 1
+        self.anchor = (t, x, y)
+        self.wn = 0
+        if self.count >= self.segment_points:
+            self._flush_segment()
+
+    def _flush_segment(self):
+        if not self.count:
+            return None
+        segment = {
+            "start": self.segment_start,
+            "end": self.segment_start + self.ts[self.count - 1] / 1000.0,
+            "points": self.count,
+            "path_length": round(self.segment_length, 1),
+            "data": encode_segment(self.ts, self.xs, self.ys, self.count),
+        }
+        last = (self.segment_start + self.ts[self.count - 1] / 1000.0, self.xs[self.count - 1], self.ys[self.count - 1])
+        self.count = 0
+        self.segment_start = None
+        self.segment_length = 0.0
+        if self.on_segment:
+            try:
+                self.on_segment(segment)
+            except Exception as e:
+                print(f"[ERROR] mouse segment: {e}")
+        # the next segment starts where this one ended, so polylines join up
+        self._keep_anchor_copy(last)
+        return segment
+
+    def _keep_anchor_copy(self, point):
+        t, x, y = point
+        self.segment_start = t
+        self.ts[0], self.xs[0], self.ys[0] = 0, int(x), int(y)
+        self.count = 1
+        self.anchor = point
+
+    def _deviates(self, t, x, y):
+        """True if some waiting point lies more than epsilon from the chord anchor -> (x, y)."""
+        _, ax, ay = self.anchor
+        dx, dy = x - ax, y - ay
+        norm = math.hypot(dx, dy)
+        eps = self.epsilon
+        wx, wy = self.wx, self.wy
+        if norm < 1e-9:
+            for i in range(self.wn):
+                if math.hypot(wx[i] - ax, wy[i] - ay) > eps:
+                    return True
+            return False
+        limit = eps * norm
+        for i in range(self.wn):
+            if abs(dy * (wx[i] - ax) - dx * (wy[i] - ay)) > limit:
+                return True
+        return False
+
+    # --- events ---
+    def on_move(self, x, y, t=None):
+        t = time.time() if t is None else t
+        with self.lock:
+            self.events += 1
+            last = self.last
+            self.last = (t, x, y)
+            if last is None or self.anchor is None:
+                self._keep(t, x, y)
+                self.strokes += 1
+                return
+            lt, lx, ly = last
+            gap = t - lt
+            if gap > STROKE_GAP:
+                # the previous stroke ends at its last point; dwell if the pointer rested
+                if self.wn:
+                    self._keep(lt, lx, ly)
+                if gap >= DWELL_MIN:
+                    self.dwell_time += gap
+                    for b, bound in enumerate(DWELL_BUCKETS):
+                        if gap <= bound or b == len(DWELL_BUCKETS) - 1:
+                            self.dwell_hist[b] += 1
+                            break
+                self.strokes += 1
+                self._keep(t, x, y)
+                return
+            step = math.hypot(x - lx, y - ly)
+            self.path_length += step
+            self.segment_length += step
+            if gap > 0:
+                self.moving_time += gap
+                speed = step / gap
+                if speed > self.max_speed:
+                    self.max_speed = speed
+            if self.wn >= WINDOW or self._deviates(t, x, y):
+                self._keep(lt, lx, ly)
+            i = self.wn
+            self.wx[i], self.wy[i], self.wt[i] = x, y, t
+            self.wn += 1
+
+    def drain_stats(self):
+        """Movement statistics since the last drain (for the per-minute activity record)."""
+        with self.lock:
+            stats = {
+                "events": self.events,
+                "kept_points": self.kept,
+                "strokes": self.strokes,
+                "path_length_px": round(self.path_length, 1),
+                "mean_speed_px_s": round(self.path_length / self.moving_time, 1) if self.moving_time else 0.0,
+                "max_speed_px_s": round(self.max_speed, 1),
+                "moving_seconds": round(self.moving_time, 3),
+                "dwell_seconds": round(self.dwell_time, 3),
+                "dwell_histogram": dict(zip([f"<={b}s" for b in DWELL_BUCKETS[:-1]] + [f">{DWELL_BUCKETS[-2]}s"],
+                                            self.dwell_hist)),
+            }
+            self._reset_stats()
+        return stats
+
+    def flush(self):
+        """Close the open segment (keeping the pending stroke end) and hand it to on_segment."""
+        with self.lock:
+            if self.wn and self.last:
+                self._keep(*self.last)
+            return self._flush_segment()
+
+
+class SegmentStore:
+    """Compressed trajectory segments in the local SQLite store.
+
+    add() only queues (it runs on the input listener's thread, via on_segment); write()
+    stores the queued segments from the flush loop.
+    """
+
+    def __init__(self, path=local_store.LOCAL_STORE):
+        self.conn = local_store.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = deque()
+
+    def add(self, segment):
+        if segment["points"] >= 2:
+            self.pending.append(segment)
+
+    def write(self):
+        """Insert the queued segments in one transaction; returns how many."""
+        rows = []
+        while self.pending:
+            segment = self.pending.popleft()
+            rows.append((segment["start"], segment["end"], segment["points"], segment["path_length"], segment["data"]))
+        if rows:
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO mouse_segments (start, end, points, path_length, data) VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def points(self, start, end):
+        self.write()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT start, data FROM mouse_segments WHERE end >= ? AND start < ? ORDER BY start",
+                (start, end)).fetchall()
+        return [p for seg_start, blob in rows for p in decode_segment(blob, seg_start) if start <= p[0] < end]
+
+# === BENCHMARK ===
+def run_benchmark(hours=8.0, rate=125):
+    """A working day of synthetic human input: raw motion-event JSON size vs compressed segments.
+
+    human_trace emits motion at 125 Hz; rate > 125 resamples strokes to model faster mouse
+    polling (500/1000 Hz mice send proportionally more raw events for the same path).
+    """
+    from automation_detector import human_trace
+
+    segments = []
+    recorder = TrajectoryRecorder(on_segment=segments.append)
+    raw_bytes = raw_events = 0
+    factor = max(1, rate // 125)
+    t0 = time.perf_counter()
+    offset, seed = 0.0, 0
+    prev = None
+    while offset < hours * 3600:
+        trace = human_trace(seconds=600, start=offset, seed=seed)
+        for t, kind, x, y in trace:
+            if kind != "move":
+                continue
+            if prev and factor > 1 and t - prev[0] < STROKE_GAP:
+                pt, px, py = prev
+                for k in range(1, factor):
+                    f = k / factor
+                    sub = (pt + (t - pt) * f, int(px + (x - px) * f), int(py + (y - py) * f))
+                    raw_events += 1
+                    raw_bytes += len(json.dumps({"t": round(sub[0], 3), "x": sub[1], "y": sub[2]})) + 1
+                    recorder.on_move(sub[1], sub[2], sub[0])
+            raw_events += 1
+            raw_bytes += len(json.dumps({"t": round(t, 3), "x": x, "y": y})) + 1
+            recorder.on_move(x, y, t)
+            prev = (t, x, y)
+        offset, seed = trace[-1][0] + 1, seed + 1
+    recorder.flush()
+    elapsed = time.perf_counter() - t0
+    stored = sum(len(s["data"]) for s in segments)
+    points = sum(s["points"] for s in segments)
+    print(f"🖱️ {raw_events:,} raw motion events ({raw_bytes / 1e6:.1f} MB as JSON lines) -> "
+          f"{points:,} kept points in {len(segments)} segments, {stored / 1024:.0f} KB compressed "
+          f"({raw_bytes / max(stored, 1):.0f}x smaller)")
+    print(f"⏱️ {raw_events / elapsed:,.0f} events/s including trace generation")
+    # Round-trip check: every kept point decodes to within 1 ms / exact pixels
+    first = decode_segment(segments[0]["data"], segments[0]["start"])
+    print(f"✅ decoded first segment: {len(first)} points, starts {first[0]}")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mouse trajectory capture")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--hours", type=float, default=8.0, help="session hours for --bench")
+    parser.add_argument("--rate", type=int, default=125, help="mouse polling rate (Hz) for --bench")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_benchmark(args.hours, args.rate)
+        return 0
+    from pynput import mouse
+
+    store = SegmentStore()
+    recorder = TrajectoryRecorder(on_segment=store.add)
+    print("🟢 Recording mouse trajectory (Ctrl+C to stop)...")
+    with mouse.Listener(on_move=recorder.on_move) as listener:
+        try:
+            while listener.running:
+                time.sleep(60)
+                recorder.flush()
+                store.write()
+                print(f"📈 {recorder.drain_stats()}")
+        except KeyboardInterrupt:
+            recorder.flush()
+            store.write()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,514 @@
+import os
+import sys
+import json
+import time
+import heapq
+import argparse
+import selectors
+import threading
+import subprocess
+from collections import namedtuple, defaultdict
+
+from ingest_client import client_phase, encode_batch
+
+# === CONFIG ===
+ODOO_URL = "http://localhost:8069"
+ODOO_API_ENDPOINT_USER = f"{ODOO_URL}/api/user-activity"
+X11_SOCKET_DIR = "/tmp/.X11-unix"
+SPOOL_DIR = "/var/spool/activity-tracker"  # <user>/records.jsonl, one directory per user, mode 0700
+TOKEN_FILE = "PycharmProjects/ScriptDev/checkin_token.txt"  # in each user's home, as for smart_tracker
+UPLOAD_RECORDS = False
+MIN_UID = 1000              # system accounts (gdm, lightdm) are not tracked
+SESSION_RESCAN = 30         # seconds between looks for new and ended sessions
+RECORD_INTERVAL = 60
+IDLE_POLL = 10
+IDLE_AFTER = 120            # no browser reads for a session idle this long (its tabs cannot change)
+BROWSER_INTERVAL = 60
+UPLOAD_INTERVAL = 300
+
+Session = namedtuple("Session", "display user uid home xauthority")
+
+
+# === DISCOVERY ===
+def _environ(pid, proc="/proc"):
+    try:
+        with open(f"{proc}/{pid}/environ", "rb") as f:
+            data = f.read()
+    except OSError:
+        return {}
+    env = {}
+    for item in data.split(b"\0"):
+        key, sep, value = item.partition(b"=")
+        if sep and key in (b"DISPLAY", b"XAUTHORITY"):
+            env[key.decode()] = value.decode(errors="replace")
+    return env
+
+
+def _local_display(value):
+    """":1", ":1.0" and "unix:1" name local display 1; TCP displays (ssh -X) are not sessions here."""
+    host, sep, rest = value.partition(":")
+    if not sep or host not in ("", "unix"):
+        return None
+    number = rest.split(".", 1)[0]
+    return f":{number}" if number.isdigit() else None
+
+
+def discover_sessions(proc="/proc", socket_dir=X11_SOCKET_DIR, min_uid=MIN_UID):
+    """{display: Session} for every local X display with a non-system owner.
+
+    The owner is the user with the most processes on the display (their DISPLAY variable);
+    a display without clients yet belongs to its X server's user. Reading other users'
+    environments needs root; without it only our own sessions are found.
+    """
+    import pwd
+    try:
+        displays = {f":{name[1:]}" for name in os.listdir(socket_dir) if name[1:].isdigit()}
+    except OSError:
+        return {}
+    users = defaultdict(lambda: defaultdict(int))  # display -> uid -> processes
+    xauth = {}                                     # (display, uid) -> XAUTHORITY
+    servers = {}                                   # display -> X server uid
+    for pid in os.listdir(proc):
+        if not pid.isdigit():
+            continue
+        try:
+            uid = os.stat(f"{proc}/{pid}").st_uid
+        except OSError:
+            continue
+        env = _environ(pid, proc)
+        display = _local_display(env.get("DISPLAY", ""))
+        if display in displays:
+            users[display][uid] += 1
+            if "XAUTHORITY" in env:
+                xauth.setdefault((display, uid), env["XAUTHORITY"])
+        elif not env:
+            try:
+                with open(f"{proc}/{pid}/cmdline", "rb") as f:
+                    args = f.read().split(b"\0")
+            except OSError:
+                continue
+            if os.path.basename(args[0]).decode(errors="replace") in ("Xvfb", "Xorg", "Xwayland", "Xvnc", "X"):
+                for arg in args[1:]:
+                    if arg.decode(errors="replace") in displays:
+                        servers[arg.decode()] = uid
+    sessions = {}
+    for display in sorted(displays):
+        owners = {uid: n for uid, n in users[display].items() if uid >= min_uid}
+        uid = max(owners, key=owners.get) if owners else servers.get(display)
+        if uid is None or uid < min_uid:
+            continue
+        try:
+            pw = pwd.getpwuid(uid)
+        except KeyError:
+            continue
+        auth = xauth.get((display, uid)) or os.path.join(pw.pw_dir, ".Xauthority")
+        sessions[display] = Session(display, pw.pw_name, uid, pw.pw_dir, auth if os.path.exists(auth) else None)
+    return sessions
+
+# === PER-USER SPOOL ===
+class UserSpool:
+    """Records for one user, appended as JSON lines and uploaded in batches with that user's token.
+
+    Before an upload the spool is renamed to records.sending, so records written during
+    the upload go to a fresh file; a failed batch is retried before the next one.
+    """
+
+    def __init__(self, session, spool_dir=SPOOL_DIR):
+        self.user = session.user
+        self.home = session.home
+        self.dir = os.path.join(spool_dir, session.user)
+        os.makedirs(self.dir, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.dir, "records.jsonl")
+        self.sending = os.path.join(self.dir, "records.sending")
+        self.lock = threading.Lock()
+        self.warned = False
+
+    def append(self, record):
+        with self.lock, open(self.path, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def token(self):
+        try:
+            with open(os.path.join(self.home, TOKEN_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def upload(self, endpoint=ODOO_API_ENDPOINT_USER):
+        """Send the pending batch; runs on its own thread (blocking HTTP)."""
+        import requests
+        token = self.token()
+        if token is None:
+            if not self.warned:
+                print(f"⚠️ {self.user}: no token in ~/{TOKEN_FILE}; records stay in {self.dir}")
+                self.warned = True
+            return False
+        with self.lock:
+            if not os.path.exists(self.sending):
+                if not os.path.exists(self.path):
+                    return True
+                os.replace(self.path, self.sending)
+        with open(self.sending) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        body, headers = encode_batch(records)
+        headers["Authorization"] = f"Bearer {token}"
+        try:
+            response = requests.post(endpoint, data=body, headers=headers, timeout=30)
+        except Exception as e:
+            print(f"❌ {self.user}: upload failed: {e}")
+            return False
+        if response.status_code == 401:
+            print(f"🔐 {self.user}: authentication failed - token might be invalid.")
+            return False
+        if response.status_code != 200:
+            print(f"❌ {self.user}: upload failed: {response.status_code}")
+            return False
+        os.unlink(self.sending)
+        return True
+
+# === PER-SESSION COLLECTION ===
+class SessionTracker:
+    """Focus, idle and browser collection for one X session, driven by the daemon's loop.
+
+    Focus and titles come from the TitleWatcher's X events (no polling); idle time from
+    the MIT-SCREEN-SAVER extension of that display; open tabs from the user's own
+    Firefox session (parsed in the shared offload pool) and Chromium session files.
+    """
+
+    def __init__(self, session, daemon):
+        self.session = session
+        self.daemon = daemon
+        self.tag = f"{session.user}@{session.display}"
+        self.watcher = None
+        self.fd = None
+        self.app_usage = defaultdict(float)
+        self.site_usage = defaultdict(float)
+        self.segments = 0
+        self.idle = 0.0
+        self.idle_seconds = 0.0
+        self.sites = []
+        self.site_time = time.time()
+        self.chromium = None
+        self.firefox_session = None
+        self.closed = False
+
+    def open(self):
+        from title_watcher import TitleWatcher
+        from net_accounting import process_name
+        # python-xlib reads the cookie file named by XAUTHORITY when it connects; only this thread connects
+        saved = os.environ.get("XAUTHORITY")
+        if self.session.xauthority:
+            os.environ["XAUTHORITY"] = self.session.xauthority
+        try:
+            self.watcher = TitleWatcher(self.on_segment, self.session.display, process_name)
+        finally:
+            if saved is None:
+                os.environ.pop("XAUTHORITY", None)
+            else:
+                os.environ["XAUTHORITY"] = saved
+        self.fd = self.watcher.fileno()
+        self.watcher.listen()
+        self._find_browsers()
+
+    def _find_browsers(self):
+        from firefox_profiles import FIREFOX_ROOTS, discover_profiles, recovery_file
+        from browser_sources import CHROMIUM_CONFIG_DIRS
+        from chromium_sessions import ChromiumSessions
+        home = self.session.home
+        profiles = discover_profiles([os.path.join(home, r[2:]) for r in FIREFOX_ROOTS])
+        self.firefox_session = recovery_file(profiles[0].path) if profiles else None
+        self.chromium = ChromiumSessions({b: os.path.join(home, d[2:]) for b, d in CHROMIUM_CONFIG_DIRS.items()})
+
+    def on_segment(self, app, title, start, end):
+        self.app_usage[app] += end - start
+        self.segments += 1
+
+    def poll_idle(self):
+        try:
+            idle = self.watcher.root.screensaver_query_info().idle / 1000.0
+        except Exception:
+            return  # no MIT-SCREEN-SAVER on this display
+        if idle >= IDLE_POLL:
+            self.idle_seconds += IDLE_POLL  # no input during the whole poll period
+        self.idle = idle
+
+    def poll_browsers(self):
+        from url_engine import site_keys_batch
+        now = time.time()
+        for site in self.sites:
+            self.site_usage[site] += now - self.site_time
+        self.site_time = now
+        if self.idle >= IDLE_AFTER:
+            self.sites = []  # away: no site accrues time until the next active poll
+            return
+        urls = []
+        try:
+            urls.extend(self.chromium.open_urls())
+        except Exception as e:
+            print(f"[ERROR] {self.tag}: chromium sessions: {e}")
+        if self.firefox_session and os.path.exists(self.firefox_session):
+            from firefox_profiles import read_session_tabs
+            from offload import default_pool
+            future = default_pool().submit(f"firefox_session:{self.tag}", read_session_tabs, self.firefox_session)
+            future.add_done_callback(lambda f: self.daemon.post(lambda: self._firefox_done(f, urls)))
+        else:
+            self.sites = site_keys_batch(urls)
+
+    def _firefox_done(self, future, urls):
+        from url_engine import site_keys_batch
+        if self.closed or future.cancelled() or self.idle >= IDLE_AFTER:
+            return
+        try:
+            urls = urls + [url for _, url in future.result()["tabs"]]
+        except Exception as e:
+            print(f"[ERROR] {self.tag}: firefox session: {e}")
+        self.sites = site_keys_batch(urls)
+
+    def record(self):
+        """The interval's record, tagged with the session's user and display."""
+        if self.watcher is not None:
+            self.watcher.close_segment()
+        now = time.time()
+        for site in self.sites:
+            self.site_usage[site] += now - self.site_time
+        self.site_time = now
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "user": self.session.user,
+            "uid": self.session.uid,
+            "display": self.session.display,
+            "application_usage": {app: round(s, 2) for app, s in self.app_usage.items()},
+            "site_usage": {site: round(s, 2) for site, s in self.site_usage.items()},
+            "idle_seconds": round(self.idle_seconds, 1),
+            "focus_segments": self.segments,
+        }
+        self.app_usage.clear()
+        self.site_usage.clear()
+        self.idle_seconds = 0.0
+        self.segments = 0
+        return record
+
+    def close(self):
+        self.closed = True
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+# === EVENT LOOP ===
+class MultiSessionDaemon:
+    """One process, one thread, one selector for every X session on the machine.
+
+    Each display's X connection is registered with the selector, so focus changes on any
+    session wake the loop and nothing else does; idle polls, browser reads, records and
+    session rescans are timers on a heap, staggered per user. Parsing runs in the shared
+    offload pool and comes back through post(), so the loop never blocks on it.
+    """
+
+    def __init__(self, spool_dir=SPOOL_DIR, discover=discover_sessions, on_record=None):
+        self.spool_dir = spool_dir
+        self.discover = discover
+        self.on_record = on_record
+        self.selector = selectors.DefaultSelector()
+        self.timers = []  # heap of (when, seq, fn)
+        self.seq = 0
+        self.trackers = {}  # display -> SessionTracker
+        self.spools = {}    # user -> UserSpool
+        self.posted = []
+        self.posted_lock = threading.Lock()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.running = False
+        self.wakeups = 0
+
+    def call_at(self, when, fn):
+        self.seq += 1
+        heapq.heappush(self.timers, (when, self.seq, fn))
+
+    def every(self, interval, fn, key, alive=lambda: True):
+        """Run fn every interval seconds, phase-shifted by key, while alive()."""
+        def tick():
+            if not alive():
+                return
+            try:
+                fn()
+            except Exception as e:
+                print(f"[ERROR] {key}: {e}")
+            self.call_at(time.time() + interval, tick)
+        now = time.time()
+        self.call_at(now + interval - ((now - client_phase(key, interval)) % interval), tick)
+
+    def post(self, fn):
+        """Run fn on the loop thread (from pool callbacks and other threads)."""
+        with self.posted_lock:
+            self.posted.append(fn)
+        os.write(self.wake_w, b"x")
+
+    # --- sessions ---
+    def rescan(self):
+        found = self.discover()
+        for display in list(self.trackers):
+            tracker = self.trackers[display]
+            if found.get(display, (None,))[:3] != tracker.session[:3]:
+                self._end(display)  # logged out, or the display now belongs to someone else
+        for display, session in found.items():
+            if display not in self.trackers:
+                self._start(session)
+
+    def _start(self, session):
+        tracker = SessionTracker(session, self)
+        try:
+            if session.user not in self.spools:
+                self.spools[session.user] = UserSpool(session, self.spool_dir)
+            tracker.open()
+        except Exception as e:
+            print(f"⚠️ {tracker.tag}: cannot track this session: {e}")
+            return
+        self.trackers[session.display] = tracker
+        self.selector.register(tracker.fd, selectors.EVENT_READ, tracker)
+        alive = lambda: not tracker.closed
+        self.every(IDLE_POLL, tracker.poll_idle, f"idle:{tracker.tag}", alive)
+        self.every(BROWSER_INTERVAL, tracker.poll_browsers, f"browser:{tracker.tag}", alive)
+        self.every(RECORD_INTERVAL, lambda: self._emit(tracker), f"record:{tracker.tag}", alive)
+        print(f"🟢 Tracking {tracker.tag} ({session.home})")
+
+    def _end(self, display):
+        tracker = self.trackers.pop(display)
+        try:
+            self.selector.unregister(tracker.fd)
+        except (KeyError, ValueError, OSError):
+            pass
+        try:
+            self._emit(tracker)
+        except Exception as e:
+            print(f"[ERROR] {tracker.tag}: final record: {e}")
+        tracker.close()
+        print(f"⚪ Session ended: {tracker.tag}")
+
+    def _emit(self, tracker):
+        record = tracker.record()
+        self.spools[tracker.session.user].append(record)
+        if self.on_record:
+            self.on_record(record)
+
+    def _upload_all(self):
+        spools = list(self.spools.values())
+        threading.Thread(target=lambda: [s.upload() for s in spools], daemon=True).start()
+
+    # --- loop ---
+    def run(self, seconds=None):
+        self.running = True
+        stop_at = time.time() + seconds if seconds else None
+        self.rescan()
+        self.every(SESSION_RESCAN, self.rescan, "rescan")
+        if UPLOAD_RECORDS:
+            self.every(UPLOAD_INTERVAL, self._upload_all, "upload")
+        while self.running:
+            now = time.time()
+            deadline = self.timers[0][0] if self.timers else now + SESSION_RESCAN
+            if stop_at is not None:
+                deadline = min(deadline, stop_at)
+            for key, _ in self.selector.select(max(0.0, deadline - now)):
+                if key.data is None:
+                    self._run_posted()  # X-readable displays are handled by the dispatch pass below
+            self.wakeups += 1
+            now = time.time()
+            while self.timers and self.timers[0][0] <= now:
+                _, _, fn = heapq.heappop(self.timers)
+                fn()
+            # replies read by timers (idle queries) can leave events in python-xlib's queue, not the socket
+            for display, tracker in list(self.trackers.items()):
+                if not tracker.watcher.dispatch():
+                    self._end(display)
+            if stop_at is not None and now >= stop_at:
+                break
+        for display in list(self.trackers):
+            self._end(display)
+
+    def _run_posted(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.posted_lock:
+            posted, self.posted = self.posted, []
+        for fn in posted:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[ERROR] posted callback: {e}")
+
+    def stop(self):
+        self.running = False
+        os.write(self.wake_w, b"x")
+
+# === XVFB TEST ===
+def spawn_xvfb(count, first=90, size="1280x800x24"):
+    """Start `count` Xvfb servers (:first, :first+1, ...), each with an xterm-less client holding DISPLAY."""
+    servers = []
+    for n in range(first, first + count):
+        servers.append(subprocess.Popen(["Xvfb", f":{n}", "-screen", "0", size, "-nolisten", "tcp"],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    deadline = time.time() + 10
+    while time.time() < deadline and not all(os.path.exists(f"{X11_SOCKET_DIR}/X{n}")
+                                             for n in range(first, first + count)):
+        time.sleep(0.1)
+    return servers
+
+
+def run_xvfb_test(count=3, seconds=20):
+    """Several Xvfb displays owned by this user, tracked by one daemon; prints each display's records."""
+    global RECORD_INTERVAL, IDLE_POLL
+    RECORD_INTERVAL, IDLE_POLL = max(5, seconds // 3), 2
+    try:
+        servers = spawn_xvfb(count)
+    except FileNotFoundError:
+        print("❌ Xvfb not found (apt install xvfb)")
+        return 1
+    import tempfile
+    spool = tempfile.mkdtemp(prefix="multi_session_")
+    uid = os.getuid()
+    daemon = MultiSessionDaemon(spool, discover=lambda: {
+        d: s for d, s in discover_sessions(min_uid=0).items() if s.uid == uid and int(d[1:]) >= 90},
+        on_record=lambda r: print(f"📝 {r['user']}@{r['display']}: {r['focus_segments']} segments, "
+                                  f"idle {r['idle_seconds']} s, apps {r['application_usage']}"))
+    t0 = time.process_time()
+    try:
+        daemon.run(seconds)
+    finally:
+        for server in servers:
+            server.terminate()
+    print(f"📈 {count} displays for {seconds} s: {daemon.wakeups} loop wakeups, "
+          f"{time.process_time() - t0:.2f} s CPU, spools in {spool}")
+    return 0
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One tracker process for every X session on a terminal server")
+    parser.add_argument("--list", action="store_true", help="show the sessions that would be tracked")
+    parser.add_argument("--seconds", type=int, help="stop after this long (default: run until killed)")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR)
+    parser.add_argument("--xvfb-test", type=int, metavar="N", help="track N fresh Xvfb displays")
+    args = parser.parse_args(argv)
+    if args.xvfb_test:
+        return run_xvfb_test(args.xvfb_test, args.seconds or 20)
+    sessions = discover_sessions()
+    if args.list:
+        for s in sessions.values():
+            print(f"{s.display:<6} {s.user:<16} uid {s.uid:<6} {s.home} {s.xauthority or '(no Xauthority)'}")
+        if not sessions:
+            print("⚪ No X sessions found" + ("" if os.geteuid() == 0 else " (run as root to see other users)"))
+        return 0
+    print("✅ Multi-session tracker started.")
+    daemon = MultiSessionDaemon(args.spool_dir)
+    try:
+        daemon.run(args.seconds)
+    except KeyboardInterrupt:
+        for display in list(daemon.trackers):
+            daemon._end(display)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
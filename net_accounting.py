@@ -0,0 +1,440 @@
+import os
+import sys
+import time
+import struct
+import socket
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+
+# === CONFIG ===
+PROC = "/proc"
+NET_TABLES = ("tcp", "tcp6", "udp", "udp6")
+RESCAN_BUDGET = 64      # pids whose fd tables may be re-read per tick to find the owners of new sockets
+MISS_BACKOFF = 30       # seconds before a socket no readable pid owns is looked for again
+TOP_APPS = 10
+# Same as the focus trackers: helper processes roll up to the app below these
+IGNORED_PROCESSES = {"Xwayland", "Xorg", "gnome-shell", "gnome-shell-calendar-server", "pipewire"}
+# Parents that start apps rather than belong to them: the identity stops below them
+LAUNCHERS = {"systemd", "init", "sh", "bash", "zsh", "fish", "dash", "sshd", "tmux: server", "screen",
+             "gnome-terminal-", "gnome-session-b", "konsole", "xterm", "kitty", "alacritty", "xdg-desktop-por"}
+PACKET_OUTGOING = 4
+ETH_P_ALL = 0x0003
+IP_PROTOCOLS = {6: "tcp", 17: "udp"}
+
+
+# === /proc READERS ===
+def read_net_tables(proc=PROC, tables=NET_TABLES):
+    """inode -> (proto, local port, uid) for every inet socket in this network namespace.
+
+    Sockets without an inode (TIME_WAIT, orphans) have no owning process and are skipped.
+    """
+    sockets = {}
+    for table in tables:
+        proto = table.rstrip("6")
+        try:
+            f = open(f"{proc}/net/{table}")
+        except OSError:
+            continue
+        with f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) < 10 or parts[9] == "0":
+                    continue
+                sockets[int(parts[9])] = (proto, int(parts[1].rsplit(":", 1)[1], 16), int(parts[7]))
+    return sockets
+
+
+def read_stat(pid, proc=PROC):
+    """(comm, ppid, starttime) from /proc/<pid>/stat, or None once the process is gone."""
+    try:
+        with open(f"{proc}/{pid}/stat", "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    head, _, rest = data.rpartition(b")")
+    fields = rest.split()
+    return head.split(b"(", 1)[1].decode("utf-8", "replace"), int(fields[1]), int(fields[19])
+
+
+def read_io(pid, proc=PROC):
+    """(rchar, wchar, read_bytes, write_bytes) from /proc/<pid>/io, or None when unreadable."""
+    try:
+        with open(f"{proc}/{pid}/io", "rb") as f:
+            values = dict(line.split(b": ") for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return None
+    return (int(values[b"rchar"]), int(values[b"wchar"]),
+            int(values.get(b"read_bytes", 0)), int(values.get(b"write_bytes", 0)))
+
+
+def process_name(pid, proc=PROC):
+    stat = read_stat(pid, proc)
+    return stat[0] if stat else "Unknown"
+
+
+def main_process_name(pid, proc=PROC):
+    """App identity as the focus trackers see it: the topmost ancestor below a launcher or the desktop shell.
+
+    Firefox content processes ("Isolated Web Co") and Chromium's network service roll up
+    to "firefox" / "chrome", the names focus tracking records for the focused window.
+    """
+    stat = read_stat(pid, proc)
+    if stat is None:
+        return "Unknown"
+    name, ppid, _ = stat
+    while ppid > 1 and name not in IGNORED_PROCESSES:
+        parent = read_stat(ppid, proc)
+        if parent is None or parent[0] in IGNORED_PROCESSES or parent[0] in LAUNCHERS:
+            break
+        name, ppid, _ = parent
+    return name
+
+
+class SocketIndex:
+    """Incremental inode -> pid index for inet sockets.
+
+    A full walk of every /proc/<pid>/fd costs one readlink per open file in the system;
+    at 1 Hz with thousands of sockets that is most of a core. Instead each update only
+    looks for the owners of sockets it has not seen: new pids first (most new sockets
+    belong to them), then pids of the socket's uid that owned the most recently found
+    sockets, within a per-tick budget. Closed sockets and dead pids are dropped; sockets
+    no readable pid owns (other users, other namespaces) back off for MISS_BACKOFF.
+    One index may serve several readers (net accounting, passive_domains): update() and
+    anything iterating owner/pids hold `lock`.
+    """
+
+    def __init__(self, proc=PROC, rescan_budget=RESCAN_BUDGET, miss_backoff=MISS_BACKOFF):
+        self.proc = proc
+        self.rescan_budget = rescan_budget
+        self.miss_backoff = miss_backoff
+        self.owner = {}      # inode -> pid
+        self.pids = {}       # pid -> {"uid", "readable", "found" (last time it owned a new socket)}
+        self.misses = {}     # inode -> time of the last failed lookup
+        self.fd_reads = 0    # pids whose fd table was read, since the start
+        self.lock = threading.RLock()
+
+    def _add_pid(self, pid):
+        try:
+            uid = os.stat(f"{self.proc}/{pid}").st_uid
+        except OSError:
+            return None
+        info = {"uid": uid, "readable": True, "found": 0.0}
+        self.pids[pid] = info
+        return info
+
+    def _forget(self, pid):
+        self.pids.pop(pid, None)
+
+    def _scan(self, pid, info, sockets):
+        """Record the inet sockets pid holds; False when its fd table cannot be read."""
+        self.fd_reads += 1
+        found = []
+        try:
+            with os.scandir(f"{self.proc}/{pid}/fd") as entries:
+                for entry in entries:
+                    try:
+                        target = os.readlink(entry.path)
+                    except OSError:
+                        continue
+                    if target.startswith("socket:["):
+                        found.append(int(target[8:-1]))
+        except OSError:
+            info["readable"] = False
+            return False
+        for inode in found:
+            if inode in sockets:
+                self.owner[inode] = pid
+        return True
+
+    def update(self, sockets, now=None):
+        """Bring the index up to date with read_net_tables() output; returns the unresolved inodes."""
+        with self.lock:
+            return self._update(sockets, now)
+
+    def _update(self, sockets, now=None):
+        now = time.time() if now is None else now
+        live = {int(name) for name in os.listdir(self.proc) if name.isdigit()}
+        for pid in [p for p in self.pids if p not in live]:
+            self._forget(pid)
+        for inode in [i for i, pid in self.owner.items() if i not in sockets or pid not in live]:
+            del self.owner[inode]
+        for inode in [i for i in self.misses if i not in sockets]:
+            del self.misses[inode]
+
+        unresolved = {i for i in sockets if i not in self.owner and now - self.misses.get(i, -1e18) >= self.miss_backoff}
+        if not unresolved:
+            return unresolved
+        uids = {sockets[i][2] for i in unresolved}
+        fresh = {pid for pid in live if pid not in self.pids}
+        candidates = []
+        for pid in fresh:
+            info = self._add_pid(pid)
+            if info is not None and info["uid"] in uids:
+                candidates.append((pid, info))
+        known = [(pid, info) for pid, info in self.pids.items()
+                 if info["readable"] and info["uid"] in uids and pid not in fresh]
+        known.sort(key=lambda item: -item[1]["found"])
+        budget = self.rescan_budget
+        for pid, info in candidates + known:
+            if not unresolved:
+                break
+            if pid not in fresh:
+                if budget <= 0:
+                    break
+                budget -= 1
+            if not self._scan(pid, info, sockets):
+                continue
+            hits = {i for i in unresolved if self.owner.get(i) == pid}
+            if hits:
+                info["found"] = now
+                unresolved -= hits
+        for inode in unresolved:
+            self.misses[inode] = now
+        return unresolved
+
+# === PACKET COUNTER ===
+class PacketCounter:
+    """Bytes per (proto, local port) from a raw AF_PACKET socket; needs CAP_NET_RAW.
+
+    Only the IP and transport headers are parsed, and with sample_every=N only one packet
+    in N is parsed at all (its bytes are scaled by N), to bound CPU at high packet rates.
+    """
+
+    def __init__(self, interface=None, sample_every=1):
+        self.interface = interface
+        self.sample_every = max(1, sample_every)
+        self.lock = threading.Lock()
+        self.counts = defaultdict(lambda: [0, 0])  # (proto, port) -> [rx, tx]
+        self.sock = None
+        self.packets = 0
+
+    def start(self):
+        """Open the capture socket and start the reader thread; raises PermissionError without CAP_NET_RAW."""
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(ETH_P_ALL))
+        if self.interface:
+            self.sock.bind((self.interface, 0))
+        threading.Thread(target=self._run, name="packet-counter", daemon=True).start()
+        return self
+
+    def _run(self):
+        buf = bytearray(65536)
+        view = memoryview(buf)
+        while True:
+            try:
+                n, addr = self.sock.recvfrom_into(view)
+            except OSError:
+                return
+            self.packets += 1
+            if self.packets % self.sample_every:
+                continue
+            self.add(addr[1], addr[2] == PACKET_OUTGOING, buf, n)
+
+    def add(self, ethertype, outgoing, buf, length):
+        """Count one cooked (no link header) packet."""
+        if ethertype == 0x0800 and length >= 20:
+            proto, offset = buf[9], (buf[0] & 0x0F) * 4
+        elif ethertype == 0x86DD and length >= 40:
+            proto, offset = buf[6], 40  # extension headers are rare for TCP/UDP; those packets are not counted
+        else:
+            return
+        name = IP_PROTOCOLS.get(proto)
+        if name is None or length < offset + 4:
+            return
+        sport, dport = struct.unpack_from("!HH", buf, offset)
+        key = (name, sport if outgoing else dport)
+        with self.lock:
+            self.counts[key][1 if outgoing else 0] += length * self.sample_every
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, defaultdict(lambda: [0, 0])
+        return counts
+
+# === ACCOUNTANT ===
+class NetAccountant:
+    """Per-app network bytes, rolled up to the app identities focus tracking uses.
+
+    Call tick() about once a second. With a PacketCounter, captured bytes are joined to
+    sockets by (proto, local port) and from there to pids. Without one, each socket-owning
+    pid's /proc/<pid>/io character counts, less its storage I/O, are used as an estimate:
+    read()/write() on sockets is included (Chromium's network service), send()/recv() is
+    not, and pipe and cached-file traffic is counted as well.
+    """
+
+    def __init__(self, proc=PROC, packets=None, app_resolver=None):
+        self.proc = proc
+        self.index = SocketIndex(proc)
+        self.packets = packets
+        self.app_resolver = app_resolver or (lambda pid: main_process_name(pid, proc))
+        self.apps = {}                             # pid -> app
+        self.io_last = {}                          # pid -> last read_io()
+        self.totals = defaultdict(lambda: [0, 0])  # app -> [rx, tx] since the last drain
+        self.lock = threading.Lock()
+        self.last_tick_ms = 0.0
+        self.sockets = 0
+
+    def app(self, pid):
+        known = self.apps.get(pid)
+        if known is None:
+            known = self.apps[pid] = self.app_resolver(pid)
+        return known
+
+    def tick(self):
+        t0 = time.perf_counter()
+        sockets = read_net_tables(self.proc)
+        owners = defaultdict(list)
+        with self.index.lock:
+            self.index.update(sockets)
+            for inode, pid in self.index.owner.items():
+                owners[pid].append(inode)
+            for pid in [p for p in self.apps if p not in self.index.pids]:
+                del self.apps[pid]
+        for pid in [p for p in self.io_last if p not in owners]:
+            del self.io_last[pid]
+
+        usage = defaultdict(lambda: [0, 0])
+        if self.packets is not None:
+            by_port = {(proto, port): inode for inode, (proto, port, _) in sockets.items()}
+            for key, (rx, tx) in self.packets.drain().items():
+                pid = self.index.owner.get(by_port.get(key))
+                if pid is not None:
+                    usage[pid][0] += rx
+                    usage[pid][1] += tx
+        else:
+            for pid in owners:
+                io = read_io(pid, self.proc)
+                last = self.io_last.get(pid)
+                if io is None:
+                    continue
+                self.io_last[pid] = io
+                if last is not None:
+                    usage[pid][0] += max(0, (io[0] - last[0]) - (io[2] - last[2]))
+                    usage[pid][1] += max(0, (io[1] - last[1]) - (io[3] - last[3]))
+
+        with self.lock:
+            for pid, (rx, tx) in usage.items():
+                if rx or tx:
+                    total = self.totals[self.app(pid)]
+                    total[0] += rx
+                    total[1] += tx
+        self.sockets = len(sockets)
+        self.last_tick_ms = (time.perf_counter() - t0) * 1000
+
+    def drain(self, top=TOP_APPS):
+        """{app: {"rx": bytes, "tx": bytes}} for the busiest apps since the last drain."""
+        with self.lock:
+            totals, self.totals = self.totals, defaultdict(lambda: [0, 0])
+        ranked = sorted(totals.items(), key=lambda item: -(item[1][0] + item[1][1]))[:top]
+        return {app: {"rx": rx, "tx": tx} for app, (rx, tx) in ranked}
+
+
+def default_accountant(interface=None):
+    """Packet counts when the capture socket can be opened, /proc/<pid>/io estimates otherwise."""
+    try:
+        packets = PacketCounter(interface).start()
+    except (PermissionError, OSError, AttributeError):
+        packets = None
+    return NetAccountant(packets=packets)
+
+# === BENCHMARK ===
+CHILD = """
+import os, socket, sys, time, ctypes
+ctypes.CDLL(None).prctl(15, sys.argv[2].encode(), 0, 0, 0)  # PR_SET_NAME
+socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(int(sys.argv[1]))]
+for s in socks:
+    s.bind(("127.0.0.1", 0))
+server = socket.socket()
+server.bind(("127.0.0.1", 0))
+server.listen(1)
+client = socket.create_connection(server.getsockname())
+peer, _ = server.accept()
+print("ready", flush=True)
+payload = b"x" * 1400
+while True:
+    os.write(client.fileno(), payload)  # read()/write() on the socket, as Chromium does
+    os.read(peer.fileno(), 2048)
+    time.sleep(0.01)
+"""
+
+
+def _spawn(count, name):
+    child = subprocess.Popen([sys.executable, "-c", CHILD, str(count), name],
+                             stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    child.stdout.readline()
+    return child
+
+
+def run_bench(sockets=1200, processes=12, ticks=10):
+    """Tick cost with `sockets` inet sockets spread over `processes` children, then with one new child."""
+    per = max(2, sockets // processes)
+    children = [_spawn(per, f"benchapp{i}") for i in range(processes)]
+    try:
+        accountant = NetAccountant(app_resolver=process_name)
+        t0 = time.perf_counter()
+        accountant.tick()
+        cold = (time.perf_counter() - t0) * 1000
+        print(f"⏱️ cold tick: {cold:.1f} ms, {accountant.sockets:,} sockets, "
+              f"{len(accountant.index.owner):,} resolved, {accountant.index.fd_reads} fd tables read")
+        times = []
+        reads = accountant.index.fd_reads
+        for _ in range(ticks):
+            time.sleep(0.1)
+            accountant.tick()
+            times.append(accountant.last_tick_ms)
+        print(f"⏱️ steady ticks: avg {sum(times) / len(times):.1f} ms, max {max(times):.1f} ms, "
+              f"{accountant.index.fd_reads - reads} fd tables read over {ticks} ticks")
+        reads = accountant.index.fd_reads
+        children.append(_spawn(per, "benchappnew"))
+        accountant.tick()
+        print(f"⏱️ tick after a new process opened {per} sockets: {accountant.last_tick_ms:.1f} ms, "
+              f"{accountant.index.fd_reads - reads} fd table(s) read, {len(accountant.index.owner):,} resolved")
+        accountant.drain()
+        try:
+            packets = PacketCounter("lo").start()
+        except (PermissionError, OSError):
+            packets = None
+        time.sleep(1)
+        accountant.tick()
+        results = [("/proc/<pid>/io estimate", accountant.drain(top=5))]
+        if packets is not None:
+            by_packets = NetAccountant(packets=packets, app_resolver=process_name)
+            by_packets.index = accountant.index
+            by_packets.tick()
+            results.append(("packet counts on lo", by_packets.drain(top=5)))
+        for label, top in results:
+            print(f"📈 {label} over 1 s (top 5):")
+            for app, usage in top.items():
+                print(f" - {app:<16} rx {usage['rx'] / 1024:8.1f} KB  tx {usage['tx'] / 1024:8.1f} KB")
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-application network traffic from /proc and packet counts")
+    parser.add_argument("--bench", action="store_true", help="tick cost with 1000+ sockets and an incremental rescan")
+    parser.add_argument("--sockets", type=int, default=1200)
+    parser.add_argument("--interface", help="capture interface for packet counts (needs CAP_NET_RAW)")
+    parser.add_argument("--seconds", type=int, default=10, help="watch for this long and print per-app totals")
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_bench(args.sockets)
+        return 0
+    accountant = default_accountant(args.interface)
+    source = "packet counts" if accountant.packets else "/proc/<pid>/io estimates"
+    print(f"🟢 Measuring per-app network traffic for {args.seconds} s ({source})")
+    for _ in range(args.seconds):
+        accountant.tick()
+        time.sleep(1)
+    for app, usage in accountant.drain().items():
+        print(f" - {app:<24} rx {usage['rx'] / 1024:10.1f} KB  tx {usage['tx'] / 1024:10.1f} KB")
+    print(f"⏱️ last tick {accountant.last_tick_ms:.1f} ms for {accountant.sockets:,} sockets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
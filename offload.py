@@ -0,0 +1,285 @@
+import os
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+# === CONFIG ===
+WORKERS = 2
+WORKER_NICE = 10           # workers yield the CPU to the listeners and the desktop
+START_METHOD = "forkserver"  # never fork a process that has pynput/X threads running
+JOB_MAX_AGE = 10           # seconds a queued job may wait; older ones are dropped by the worker
+JOB_TIMEOUT = 5            # seconds run() waits for a result
+
+
+class StaleJob(Exception):
+    """The job was superseded by a newer one with the same key, or waited past JOB_MAX_AGE."""
+
+
+class _Stale:
+    pass
+
+
+def _worker_init(nice):
+    try:
+        os.nice(nice)
+    except OSError:
+        pass
+
+
+def _run_job(fn, args, deadline):
+    # CLOCK_MONOTONIC is system-wide on Linux, so the parent's deadline is valid here
+    if time.monotonic() > deadline:
+        return _Stale()
+    return fn(*args)
+
+
+class OffloadPool:
+    """Worker processes for CPU-heavy parsing and encoding, off the listeners' GIL.
+
+    Jobs are keyed: submitting a job cancels a still-queued older job with the same key
+    (a newer session snapshot or history read supersedes it), and workers drop jobs that
+    waited longer than max_age. Large inputs go through shared memory (save_png), results
+    come back pickled, so jobs should return small summaries rather than whole documents.
+    The processes start on first use, from a forkserver.
+    """
+
+    def __init__(self, workers=WORKERS, max_age=JOB_MAX_AGE):
+        self.workers = workers
+        self.max_age = max_age
+        self.executor = None
+        self.lock = threading.Lock()
+        self.latest = {}  # key -> most recent future
+        self.counts = {"submitted": 0, "completed": 0, "cancelled": 0, "stale": 0, "failed": 0}
+
+    def _executor(self):
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(START_METHOD),
+                                                initializer=_worker_init, initargs=(WORKER_NICE,))
+        return self.executor
+
+    def submit(self, key, fn, *args):
+        """Run fn(*args) in a worker; fn must be a module-level function. Returns the future."""
+        from concurrent.futures.process import BrokenProcessPool
+        with self.lock:
+            previous = self.latest.get(key)
+            if previous is not None and previous.cancel():
+                self.counts["cancelled"] += 1
+            deadline = time.monotonic() + self.max_age
+            try:
+                future = self._executor().submit(_run_job, fn, args, deadline)
+            except BrokenProcessPool:
+                self.executor = None  # a worker died (OOM, segfault in a decoder): start a fresh pool
+                future = self._executor().submit(_run_job, fn, args, deadline)
+            self.latest[key] = future
+            self.counts["submitted"] += 1
+        return future
+
+    def result(self, key, future, timeout=JOB_TIMEOUT):
+        """Wait for a submitted job. Raises StaleJob, TimeoutError, or the job's own exception."""
+        from concurrent.futures import CancelledError, TimeoutError as FutureTimeout
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            value = future.result(timeout)
+        except CancelledError:
+            raise StaleJob(f"{key}: superseded by a newer job")
+        except FutureTimeout:
+            raise TimeoutError(f"{key}: no result after {timeout}s")
+        except BrokenProcessPool:
+            with self.lock:
+                self.executor = None
+            self.counts["failed"] += 1
+            raise
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        if isinstance(value, _Stale):
+            self.counts["stale"] += 1
+            raise StaleJob(f"{key}: queued longer than {self.max_age}s")
+        self.counts["completed"] += 1
+        return value
+
+    def run(self, key, fn, *args, timeout=JOB_TIMEOUT):
+        """submit() and wait; the calling thread sleeps without the GIL while the worker runs."""
+        return self.result(key, self.submit(key, fn, *args), timeout)
+
+    def save_png(self, image, path, key="screenshot"):
+        """Encode a PIL image to PNG in a worker; the pixels travel through shared memory."""
+        from multiprocessing import shared_memory
+        data = image.tobytes()
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        del data
+        future = self.submit(key, encode_png, shm.name, len(shm.buf), image.mode, image.size, path)
+        future.add_done_callback(lambda f: _release(shm))
+        return future
+
+    def save_frame(self, frame, path, rawmode="BGRX", key="screenshot"):
+        """Encode a captured NumPy frame (screen_capture) to PNG in a worker: one copy into shared memory."""
+        import numpy as np
+        from multiprocessing import shared_memory
+        height, width, channels = frame.shape
+        shm = shared_memory.SharedMemory(create=True, size=max(frame.nbytes, 1))
+        np.copyto(np.ndarray(frame.shape, np.uint8, buffer=shm.buf), frame)
+        future = self.submit(key, encode_png, shm.name, frame.nbytes, "RGB", (width, height), path,
+                             rawmode, width * channels)
+        future.add_done_callback(lambda f: _release(shm))
+        return future
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+
+def _release(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def encode_png(shm_name, nbytes, mode, size, path, rawmode=None, stride=0):
+    """Worker side of save_png/save_frame: read the raw pixels from shared memory and write the PNG."""
+    from multiprocessing import shared_memory
+    from PIL import Image
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        view = shm.buf[:nbytes]
+        image = Image.frombytes(mode, size, bytes(view), "raw", rawmode or mode, stride)
+        view.release()
+        image.save(path, "PNG")
+    finally:
+        shm.close()
+    return path
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool():
+    """Process-wide pool every tracker submits its heavy jobs to."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = OffloadPool()
+    return _default_pool
+
+# === LATENCY PROBE ===
+def _ticker(conn, period, seconds):
+    """Separate process: send a monotonic timestamp every period, like an input device would."""
+    stop = time.monotonic() + seconds
+    while time.monotonic() < stop:
+        conn.send_bytes(struct.pack("d", time.monotonic()))
+        time.sleep(period)
+    conn.close()
+
+
+def _listen(conn, delays):
+    """Stand-in for a pynput listener thread: delay between an event's arrival and its callback running."""
+    while True:
+        try:
+            sent, = struct.unpack("d", conn.recv_bytes())
+        except EOFError:
+            return
+        delays.append((time.monotonic() - sent) * 1000)
+
+
+def write_session_file(path, mb=8, seed=0):
+    """Synthetic recovery.jsonlz4 of roughly `mb` MB of JSON (tabs with long histories and form data)."""
+    import json
+    import random
+    import lz4.block
+    rng = random.Random(seed)
+    tabs = []
+    size = 0
+    while size < mb * 1024 * 1024:
+        entries = [{"url": f"https://site{rng.randrange(5000)}.example/{i}/{rng.random():.12f}",
+                    "title": f"Page {i} " + "lorem ipsum " * rng.randrange(1, 8),
+                    "formdata": {"id": {f"field{j}": "x" * rng.randrange(10, 80) for j in range(4)}}}
+                   for i in range(rng.randrange(5, 40))]
+        tab = {"entries": entries, "index": len(entries)}
+        size += len(json.dumps(tab))
+        tabs.append(tab)
+    raw = json.dumps({"windows": [{"tabs": tabs, "selected": 1}], "selectedWindow": 1}).encode()
+    with open(path, "wb") as f:
+        f.write(b"mozLz40\0" + lz4.block.compress(raw))
+    return len(raw)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def run_probe(seconds=5, mb=8, period=0.002):
+    """Input-callback dispatch delay with no load, with session parsing on a thread, and offloaded."""
+    from firefox_profiles import read_session_tabs
+
+    tmp = tempfile.mkdtemp(prefix="offload_probe_")
+    path = os.path.join(tmp, "recovery.jsonlz4")
+    raw = write_session_file(path, mb)
+    print(f"📄 synthetic session: {raw / 1024 ** 2:.1f} MB JSON, {os.path.getsize(path) / 1024 ** 2:.1f} MB on disk")
+    pool = OffloadPool()
+    pool.run("warmup", read_session_tabs, path, timeout=60)
+
+    def in_thread(stop, parses):
+        while not stop.is_set():
+            read_session_tabs(path)
+            parses[0] += 1
+
+    def offloaded(stop, parses):
+        while not stop.is_set():
+            pool.run("firefox_session", read_session_tabs, path, timeout=60)
+            parses[0] += 1
+
+    ctx = multiprocessing.get_context(START_METHOD)
+    print(f"{'load':<24} {'events':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'parses':>7}")
+    for label, load in (("none", None), ("parse on a thread", in_thread), ("parse offloaded", offloaded)):
+        r, w = ctx.Pipe(duplex=False)
+        ticker = ctx.Process(target=_ticker, args=(w, period, seconds))
+        ticker.start()
+        w.close()
+        delays = []
+        listener = threading.Thread(target=_listen, args=(r, delays), daemon=True)
+        listener.start()
+        stop = threading.Event()
+        parses = [0]
+        worker = threading.Thread(target=load, args=(stop, parses), daemon=True) if load else None
+        if worker is not None:
+            worker.start()
+        ticker.join()
+        listener.join()
+        stop.set()
+        if worker is not None:
+            worker.join()
+        r.close()
+        print(f"{label:<24} {len(delays):>7} {_percentile(delays, 0.5):>8.2f} {_percentile(delays, 0.99):>8.2f} "
+              f"{max(delays, default=0):>8.2f} {parses[0]:>7}")
+    pool.close()
+    print(f"📈 pool: {pool.counts}")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process-pool offload for heavy parsing and encoding")
+    parser.add_argument("--probe", action="store_true", help="measure input-callback dispatch delay under load")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--mb", type=float, default=8, help="size of the synthetic session JSON")
+    args = parser.parse_args(argv)
+    if args.probe:
+        run_probe(args.seconds, args.mb)
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,582 @@
+import os
+import sys
+import mmap
+import time
+import ctypes
+import struct
+import socket
+import random
+import argparse
+import tempfile
+import threading
+from collections import deque, namedtuple, defaultdict
+
+# === CONFIG ===
+ACTIVITY_WINDOW = 60      # seconds a connection to a site counts as use of that site by its app
+DNS_MIN_TTL = 60          # answers with shorter TTLs are kept at least this long (connections follow lookups)
+DNS_MAX_ENTRIES = 50000
+PENDING_MAX = 10000       # parsed events waiting for the process join
+SO_ATTACH_FILTER = 26
+ETH_P_ALL = 0x0003
+PACKET_OUTGOING = 4
+ETH_IPV4, ETH_IPV6, ETH_VLAN = 0x0800, 0x86DD, 0x8100
+
+Connection = namedtuple("Connection", "ts domain site source src sport dst dport pid app")
+
+
+# === KERNEL FILTER ===
+# Classic BPF on a cooked (SOCK_DGRAM) packet socket: offsets start at the IP header.
+# Accepts UDP to/from port 53 and TCP to port 443 whose payload starts with a TLS
+# handshake record (0x16); everything else is dropped in the kernel, never copied to us.
+BPF_LD, BPF_LDX, BPF_ALU, BPF_JMP, BPF_RET, BPF_MISC = 0x00, 0x01, 0x04, 0x05, 0x06, 0x07
+BPF_W, BPF_H, BPF_B = 0x00, 0x08, 0x10
+BPF_IMM, BPF_ABS, BPF_IND, BPF_MSH = 0x00, 0x20, 0x40, 0xa0
+BPF_JA, BPF_JEQ, BPF_JSET = 0x00, 0x10, 0x40
+BPF_ADD, BPF_RSH, BPF_AND = 0x00, 0x70, 0x50
+BPF_K, BPF_X, BPF_TAX = 0x00, 0x08, 0x00
+SKF_AD_PROTOCOL = 0xFFFFF000  # SKF_AD_OFF + SKF_AD_PROTOCOL: the packet's ethertype
+
+CAPTURE_FILTER = [
+    (None, BPF_LD | BPF_W | BPF_ABS, SKF_AD_PROTOCOL, None, None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, ETH_IPV4, "v4", None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, ETH_IPV6, "v6", "drop"),
+    ("v4", BPF_LD | BPF_H | BPF_ABS, 6, None, None),
+    (None, BPF_JMP | BPF_JSET | BPF_K, 0x1FFF, "drop", None),  # non-first fragment
+    (None, BPF_LDX | BPF_B | BPF_MSH, 0, None, None),           # X = IPv4 header length
+    (None, BPF_LD | BPF_B | BPF_ABS, 9, None, None),
+    (None, BPF_JMP | BPF_JA, "l4", None, None),
+    ("v6", BPF_LDX | BPF_IMM, 40, None, None),
+    (None, BPF_LD | BPF_B | BPF_ABS, 6, None, None),
+    ("l4", BPF_JMP | BPF_JEQ | BPF_K, 17, "udp", None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, 6, "tcp", "drop"),
+    ("udp", BPF_LD | BPF_H | BPF_IND, 0, None, None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, 53, "accept", None),
+    (None, BPF_LD | BPF_H | BPF_IND, 2, None, None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, 53, "accept", "drop"),
+    ("tcp", BPF_LD | BPF_H | BPF_IND, 2, None, None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, 443, None, "drop"),
+    (None, BPF_LD | BPF_B | BPF_IND, 12, None, None),
+    (None, BPF_ALU | BPF_AND | BPF_K, 0xF0, None, None),
+    (None, BPF_ALU | BPF_RSH | BPF_K, 2, None, None),            # A = TCP header length
+    (None, BPF_ALU | BPF_ADD | BPF_X, 0, None, None),
+    (None, BPF_MISC | BPF_TAX, 0, None, None),                   # X = offset of the TCP payload
+    (None, BPF_LD | BPF_B | BPF_IND, 0, None, None),
+    (None, BPF_JMP | BPF_JEQ | BPF_K, 0x16, "accept", "drop"),
+    ("accept", BPF_RET | BPF_K, 0xFFFF, None, None),
+    ("drop", BPF_RET | BPF_K, 0, None, None),
+]
+
+
+def assemble(program):
+    """[(label, code, k, jt label, jf label)] -> packed struct sock_filter array; None means the next instruction."""
+    labels = {ins[0]: i for i, ins in enumerate(program) if ins[0]}
+    out = []
+    for i, (_, code, k, jt, jf) in enumerate(program):
+        if code == BPF_JMP | BPF_JA:
+            k, jt, jf = labels[k] - i - 1, None, None
+        jt = labels[jt] - i - 1 if jt else 0
+        jf = labels[jf] - i - 1 if jf else 0
+        out.append(struct.pack("HBBI", code, jt, jf, k))
+    return b"".join(out)
+
+
+def attach_filter(sock, program=CAPTURE_FILTER):
+    code = assemble(program)
+    buf = ctypes.create_string_buffer(code)
+    fprog = struct.pack("HL", len(code) // 8, ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    return buf  # the kernel copies the program, but keep it alive until setsockopt returns
+
+
+def classify(buf, off, end, ethertype):
+    """The kernel filter in Python, for offline captures: ("dns"|"tls", l4 offset, payload offset, src, dst, sport, dport)."""
+    if ethertype == ETH_IPV4:
+        if end - off < 20 or struct.unpack_from("!H", buf, off + 6)[0] & 0x1FFF:
+            return None
+        l4 = off + (buf[off] & 0x0F) * 4
+        proto = buf[off + 9]
+        src, dst = bytes(buf[off + 12:off + 16]), bytes(buf[off + 16:off + 20])
+    elif ethertype == ETH_IPV6:
+        if end - off < 40:
+            return None
+        l4 = off + 40
+        proto = buf[off + 6]
+        src, dst = bytes(buf[off + 8:off + 24]), bytes(buf[off + 24:off + 40])
+    else:
+        return None
+    if end - l4 < 8:
+        return None
+    sport, dport = struct.unpack_from("!HH", buf, l4)
+    if proto == 17 and (sport == 53 or dport == 53):
+        return "dns", l4, l4 + 8, src, dst, sport, dport
+    if proto == 6 and dport == 443 and end - l4 >= 20:
+        payload = l4 + ((buf[l4 + 12] & 0xF0) >> 2)
+        if payload < end and buf[payload] == 0x16:
+            return "tls", l4, payload, src, dst, sport, dport
+    return None
+
+# === PARSERS ===
+def parse_sni(buf, off, end):
+    """server_name from a TLS ClientHello starting at off (record header included), or None.
+
+    Walks length fields only; the one slice copied is the host name itself.
+    """
+    try:
+        if buf[off] != 0x16 or buf[off + 5] != 0x01:  # handshake record, ClientHello
+            return None
+        p = off + 5 + 4 + 2 + 32                      # handshake header, client_version, random
+        p += 1 + buf[p]                               # session_id
+        p += 2 + struct.unpack_from("!H", buf, p)[0]  # cipher_suites
+        p += 1 + buf[p]                               # compression_methods
+        ext_end = min(end, p + 2 + struct.unpack_from("!H", buf, p)[0])
+        p += 2
+        while p + 4 <= ext_end:
+            ext_type, ext_len = struct.unpack_from("!HH", buf, p)
+            p += 4
+            if ext_type == 0:                         # server_name
+                q = p + 2
+                while q + 3 <= p + ext_len:
+                    name_type, name_len = buf[q], struct.unpack_from("!H", buf, q + 1)[0]
+                    if name_type == 0 and q + 3 + name_len <= end:
+                        return bytes(buf[q + 3:q + 3 + name_len]).decode("ascii", "replace").lower()
+                    q += 3 + name_len
+                return None
+            p += ext_len
+    except (IndexError, struct.error):
+        pass  # truncated hello (split across segments): the DNS answer usually names the host instead
+    return None
+
+
+def _skip_name(buf, p, end):
+    while p < end:
+        n = buf[p]
+        if n == 0:
+            return p + 1
+        if n & 0xC0 == 0xC0:
+            return p + 2
+        p += n + 1
+    raise IndexError("name runs past the packet")
+
+
+def _read_name(buf, p, start, end):
+    labels = []
+    for _ in range(64):
+        n = buf[p]
+        if n == 0:
+            return ".".join(labels).lower()
+        if n & 0xC0 == 0xC0:
+            p = start + (struct.unpack_from("!H", buf, p)[0] & 0x3FFF)
+            continue
+        labels.append(bytes(buf[p + 1:p + 1 + n]).decode("ascii", "replace"))
+        p += n + 1
+    raise IndexError("name pointer loop")
+
+
+def parse_dns_answers(buf, off, end):
+    """(queried name, [(ip, ttl)]) from a DNS response's A/AAAA answers, or None.
+
+    CNAME chains are not decoded: every address in the answer section belongs to the question.
+    """
+    try:
+        flags, qdcount, ancount = struct.unpack_from("!HHH", buf, off + 2)
+        if not flags & 0x8000 or flags & 0x000F or qdcount != 1 or ancount == 0:
+            return None
+        p = off + 12
+        name = _read_name(buf, p, off, end)
+        p = _skip_name(buf, p, end) + 4
+        ips = []
+        for _ in range(ancount):
+            p = _skip_name(buf, p, end)
+            rtype, _, ttl, rdlen = struct.unpack_from("!HHIH", buf, p)
+            p += 10
+            if rtype == 1 and rdlen == 4:
+                ips.append((bytes(buf[p:p + 4]), ttl))
+            elif rtype == 28 and rdlen == 16:
+                ips.append((bytes(buf[p:p + 16]), ttl))
+            p += rdlen
+        return (name, ips) if ips else None
+    except (IndexError, struct.error):
+        return None
+
+# === CAPTURE FILES ===
+def _link_header(linktype, buf, off, end):
+    """(ethertype, outgoing or None, network header offset) for one captured frame."""
+    if linktype == 1:                                   # Ethernet
+        ethertype = struct.unpack_from("!H", buf, off + 12)[0]
+        off += 14
+        while ethertype == ETH_VLAN and off + 4 <= end:
+            ethertype = struct.unpack_from("!H", buf, off + 2)[0]
+            off += 4
+        return ethertype, None, off
+    if linktype == 113:                                 # Linux cooked v1
+        pkttype, = struct.unpack_from("!H", buf, off)
+        return struct.unpack_from("!H", buf, off + 14)[0], pkttype == PACKET_OUTGOING, off + 16
+    if linktype == 276:                                 # Linux cooked v2
+        return struct.unpack_from("!H", buf, off)[0], buf[off + 10] == PACKET_OUTGOING, off + 20
+    if linktype in (101, 12, 14):                       # raw IP
+        return (ETH_IPV6 if buf[off] >> 4 == 6 else ETH_IPV4), None, off
+    if linktype in (0, 108):                            # BSD loopback: 4-byte family
+        family = struct.unpack_from("<I" if linktype == 0 else "!I", buf, off)[0]
+        return (ETH_IPV6 if family in (10, 24, 28, 30) else ETH_IPV4), None, off + 4
+    return None, None, off
+
+
+def read_capture(path):
+    """Yield (ts, ethertype, outgoing, buf, off, end) for every frame of a .pcap or .pcapng file.
+
+    The file is mmapped and frames are handed out as offsets into it: no per-packet copies.
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = memoryview(data)
+    try:
+        magic = bytes(buf[:4])
+        if magic == b"\x0a\x0d\x0d\x0a":
+            yield from _read_pcapng(buf)
+        else:
+            yield from _read_pcap(buf, magic)
+    finally:
+        buf.release()
+        data.close()
+
+
+def _read_pcap(buf, magic):
+    formats = {b"\xd4\xc3\xb2\xa1": ("<", 1e-6), b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+               b"\x4d\x3c\xb2\xa1": ("<", 1e-9), b"\xa1\xb2\x3c\x4d": (">", 1e-9)}
+    if magic not in formats:
+        raise ValueError("not a pcap or pcapng file")
+    endian, scale = formats[magic]
+    linktype = struct.unpack_from(endian + "I", buf, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + "IIII")
+    p, size = 24, len(buf)
+    while p + 16 <= size:
+        sec, frac, caplen, _ = record.unpack_from(buf, p)
+        p += 16
+        ethertype, outgoing, off = _link_header(linktype, buf, p, p + caplen)
+        if ethertype is not None:
+            yield sec + frac * scale, ethertype, outgoing, buf, off, p + caplen
+        p += caplen
+
+
+def _read_pcapng(buf):
+    interfaces = []  # (linktype, seconds per tick)
+    endian = "<"
+    p, size = 0, len(buf)
+    while p + 12 <= size:
+        block_type = struct.unpack_from(endian + "I", buf, p)[0]
+        if block_type == 0x0A0D0D0A:
+            endian = "<" if bytes(buf[p + 8:p + 12]) == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+        length = struct.unpack_from(endian + "I", buf, p + 4)[0]
+        if length < 12:
+            break
+        if block_type == 1:                                  # interface description
+            linktype = struct.unpack_from(endian + "H", buf, p + 8)[0]
+            resolution = 1e-6
+            q = p + 16
+            while q + 4 <= p + length - 4:
+                code, olen = struct.unpack_from(endian + "HH", buf, q)
+                if code == 0:
+                    break
+                if code == 9:                                # if_tsresol
+                    v = buf[q + 4]
+                    resolution = 2.0 ** -(v & 0x7F) if v & 0x80 else 10.0 ** -v
+                q += 4 + (olen + 3) // 4 * 4
+            interfaces.append((linktype, resolution))
+        elif block_type == 6 and interfaces:                 # enhanced packet
+            iface, high, low, caplen = struct.unpack_from(endian + "IIII", buf, p + 8)
+            linktype, resolution = interfaces[iface]
+            start = p + 28
+            ethertype, outgoing, off = _link_header(linktype, buf, start, start + caplen)
+            if ethertype is not None:
+                yield ((high << 32) | low) * resolution, ethertype, outgoing, buf, off, start + caplen
+        p += length
+
+# === JOIN ===
+class PassiveDomains:
+    """Domains from DNS answers and TLS SNI, joined to the connection and the process that made it.
+
+    feed() runs on the capture thread and only parses: DNS answers fill an ip -> domain
+    map, ClientHellos queue (ts, sni, 5-tuple). join() runs on the tracker's own cadence and
+    resolves queued connections to pids with one net_accounting socket-index update, so a
+    burst of new connections costs one /proc pass. Hellos without SNI (ECH) fall back to
+    the DNS answer for the server address.
+    """
+
+    def __init__(self, socket_index=None, app_resolver=None):
+        self.dns = {}                              # ip bytes -> (domain, expires)
+        self.pending = deque(maxlen=PENDING_MAX)
+        self.socket_index = socket_index
+        self.app_resolver = app_resolver
+        self.counts = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def feed(self, ts, ethertype, outgoing, buf, off, end):
+        kind = classify(buf, off, end, ethertype)
+        self.counts["packets"] += 1
+        if kind is None:
+            return
+        kind, _, payload, src, dst, sport, dport = kind
+        if kind == "dns":
+            answer = parse_dns_answers(buf, payload, end) if sport == 53 else None
+            if answer is None:
+                return
+            name, ips = answer
+            self.counts["dns_answers"] += 1
+            if len(self.dns) >= DNS_MAX_ENTRIES:
+                self._expire(ts)
+            for ip, ttl in ips:
+                self.dns[ip] = (name, ts + max(ttl, DNS_MIN_TTL))
+            return
+        if outgoing is False:
+            return  # a hello to a local server, not a connection made from this machine
+        sni = parse_sni(buf, payload, end)
+        source = "sni"
+        if sni is None:
+            known = self.dns.get(dst)
+            if known is None:
+                self.counts["unnamed"] += 1
+                return
+            sni, source = known[0], "dns"
+        self.counts["hellos"] += 1
+        with self.lock:
+            self.pending.append((ts, sni, source, src, sport, dst, dport))
+
+    def _expire(self, now):
+        for ip in [ip for ip, (_, expires) in self.dns.items() if expires < now]:
+            del self.dns[ip]
+        while len(self.dns) >= DNS_MAX_ENTRIES:
+            self.dns.pop(next(iter(self.dns)))
+
+    def join(self):
+        """Queued connections as Connection tuples, with pid/app when the socket is still open."""
+        from url_engine import registrable_domain
+        with self.lock:
+            pending, self.pending = self.pending, deque(maxlen=PENDING_MAX)
+        if not pending:
+            return []
+        by_port = {}
+        if self.socket_index is not None:
+            from net_accounting import read_net_tables
+            # Every table, not just TCP: the index may be net accounting's, and update() drops absent sockets
+            sockets = read_net_tables(self.socket_index.proc)
+            self.socket_index.update(sockets)
+            by_port = {port: inode for inode, (proto, port, _) in sockets.items() if proto == "tcp"}
+        out = []
+        for ts, domain, source, src, sport, dst, dport in pending:
+            pid = self.socket_index.owner.get(by_port.get(sport)) if by_port else None
+            app = self.app_resolver(pid) if pid is not None and self.app_resolver else None
+            out.append(Connection(ts, domain, registrable_domain(domain), source, socket.inet_ntop(
+                socket.AF_INET if len(src) == 4 else socket.AF_INET6, src), sport,
+                socket.inet_ntop(socket.AF_INET if len(dst) == 4 else socket.AF_INET6, dst), dport, pid, app))
+        return out
+
+
+class SiteActivity:
+    """(app, site) -> seconds: each connection marks ACTIVITY_WINDOW seconds of use, overlaps merged."""
+
+    def __init__(self, window=ACTIVITY_WINDOW):
+        self.window = window
+        self.open = {}                    # key -> [start, end]
+        self.closed = defaultdict(float)  # key -> seconds in intervals that already ended
+        self.lock = threading.Lock()
+
+    def add(self, key, ts):
+        with self.lock:
+            span = self.open.get(key)
+            if span is not None and ts <= span[1]:
+                span[1] = max(span[1], ts + self.window)
+                return
+            if span is not None:
+                self.closed[key] += span[1] - span[0]
+            self.open[key] = [ts, ts + self.window]
+
+    def drain(self, now=None):
+        """Seconds per key up to now; open intervals continue from now."""
+        now = time.time() if now is None else now
+        with self.lock:
+            totals, self.closed = self.closed, defaultdict(float)
+            for key, span in list(self.open.items()):
+                upto = min(span[1], now)
+                if upto > span[0]:
+                    totals[key] += upto - span[0]
+                if span[1] <= now:
+                    del self.open[key]
+                else:
+                    span[0] = max(span[0], now)
+        return dict(totals)
+
+# === LIVE CAPTURE ===
+class LiveCapture:
+    """Cooked AF_PACKET socket with CAPTURE_FILTER attached; needs CAP_NET_RAW."""
+
+    def __init__(self, domains, interface=None):
+        self.domains = domains
+        self.interface = interface
+        self.sock = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(ETH_P_ALL))
+        attach_filter(self.sock)
+        if self.interface:
+            self.sock.bind((self.interface, 0))
+        try:  # frames queued before the filter was attached
+            while True:
+                self.sock.recv(65536, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            pass
+        threading.Thread(target=self._run, name="passive-domains", daemon=True).start()
+        return self
+
+    def _run(self):
+        buf = bytearray(65536)
+        view = memoryview(buf)
+        while True:
+            try:
+                n, addr = self.sock.recvfrom_into(view)
+            except OSError:
+                return
+            try:
+                self.domains.feed(time.time(), addr[1], addr[2] == PACKET_OUTGOING, buf, 0, n)
+            except Exception as e:
+                self.domains.counts["errors"] += 1
+                if self.domains.counts["errors"] == 1:
+                    print(f"⚠️ passive_domains: {e}")
+
+# === BENCHMARK ===
+def _ip4(src, dst, proto, l4):
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4), 0, 0x4000, 64, proto, 0, src, dst)
+    return b"\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02\x08\x00" + header + l4
+
+
+def _udp(sport, dport, payload):
+    return struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload
+
+
+def _tcp(sport, dport, payload):
+    return struct.pack("!HHIIBBHHH", sport, dport, 1, 1, 0x50, 0x18, 65535, 0, 0) + payload
+
+
+def _dns_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\0"
+
+
+def _dns_response(name, ips):
+    answers = b"".join(b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, 300, 4) + socket.inet_aton(ip) for ip in ips)
+    return struct.pack("!HHHHHH", 0x1234, 0x8180, 1, len(ips), 0, 0) + _dns_name(name) + b"\0\x01\0\x01" + answers
+
+
+def _client_hello(sni):
+    name = sni.encode()
+    server_name = struct.pack("!HBH", len(name) + 3, 0, len(name)) + name
+    extensions = struct.pack("!HH", 0x000a, 4) + b"\0\x02\0\x1d" + struct.pack("!HH", 0, len(server_name)) + server_name
+    body = (b"\x03\x03" + os.urandom(32) + b"\x20" + os.urandom(32) + struct.pack("!H", 4) + b"\x13\x01\x13\x02"
+            + b"\x01\x00" + struct.pack("!H", len(extensions)) + extensions)
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + body
+    return b"\x16\x03\x01" + struct.pack("!H", len(handshake)) + handshake
+
+
+def write_pcap(path, frames):
+    """Classic little-endian pcap, Ethernet link type: frames are (ts, bytes)."""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for ts, frame in frames:
+            f.write(struct.pack("<IIII", int(ts), int((ts % 1) * 1e6), len(frame), len(frame)) + frame)
+
+
+def synthetic_frames(n, seed=0):
+    """Traffic mix: mostly TLS application data, some DNS answers and ClientHellos, other UDP."""
+    rng = random.Random(seed)
+    sites = [f"www.site{i}.example.com" for i in range(500)]
+    local, resolver = socket.inet_aton("192.168.1.10"), socket.inet_aton("192.168.1.1")
+    ts = 1_700_000_000.0
+    frames = []
+    for _ in range(n):
+        ts += 0.0005
+        roll = rng.random()
+        site = rng.choice(sites)
+        server = socket.inet_aton(f"203.0.{rng.randrange(256)}.{rng.randrange(1, 255)}")
+        if roll < 0.05:
+            frame = _ip4(resolver, local, 17, _udp(53, rng.randrange(30000, 60000),
+                                                  _dns_response(site, [socket.inet_ntoa(server)])))
+        elif roll < 0.10:
+            frame = _ip4(local, server, 6, _tcp(rng.randrange(30000, 60000), 443, _client_hello(site)))
+        elif roll < 0.15:
+            frame = _ip4(local, server, 17, _udp(rng.randrange(30000, 60000), 443, os.urandom(rng.randrange(50, 1200))))
+        else:
+            frame = _ip4(server, local, 6, _tcp(443, rng.randrange(30000, 60000), b"\x17\x03\x03" + os.urandom(rng.randrange(100, 1400))))
+        frames.append((ts, frame))
+    return frames
+
+
+def run_bench(n=200_000):
+    tmp = tempfile.mkdtemp(prefix="passive_domains_")
+    path = os.path.join(tmp, "bench.pcap")
+    write_pcap(path, synthetic_frames(n))
+    size = os.path.getsize(path)
+    domains = PassiveDomains()
+    t0 = time.perf_counter()
+    for frame in read_capture(path):
+        domains.feed(*frame)
+    elapsed = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    connections = domains.join()
+    t_join = time.perf_counter() - t1
+    print(f"⏱️ {n:,} packets ({size / 1024 ** 2:.1f} MB) in {elapsed:.2f} s: {n / elapsed:,.0f} packets/s, "
+          f"{size / elapsed / 1024 ** 2:,.0f} MB/s")
+    print(f"📈 {dict(domains.counts)}; {len(domains.dns):,} addresses named; "
+          f"{len(connections):,} connections joined in {t_join * 1000:.1f} ms")
+    assert all(c.site.endswith("example.com") for c in connections)
+
+# === MAIN ===
+def print_connections(connections, activity):
+    for c in connections:
+        who = f"{c.app} ({c.pid})" if c.pid else "-"
+        print(f"{time.strftime('%H:%M:%S', time.localtime(c.ts))} {c.source:<3} {c.domain:<40} {c.dst}:{c.dport} {who}")
+        activity.add((c.app or "Unknown", c.site), c.ts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Passive DNS/SNI site detection from packet captures")
+    parser.add_argument("--pcap", help="read a .pcap/.pcapng file instead of capturing")
+    parser.add_argument("--live", action="store_true", help="capture (needs CAP_NET_RAW)")
+    parser.add_argument("--interface")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--bench", action="store_true", help="packets/s over a synthetic capture")
+    parser.add_argument("--packets", type=int, default=200_000)
+    args = parser.parse_args(argv)
+    if args.bench:
+        run_bench(args.packets)
+        return 0
+    activity = SiteActivity()
+    if args.pcap:
+        domains = PassiveDomains()
+        for frame in read_capture(args.pcap):
+            domains.feed(*frame)
+        connections = domains.join()
+        print_connections(connections, activity)
+        end = connections[-1].ts + ACTIVITY_WINDOW if connections else 0
+    elif args.live:
+        from net_accounting import SocketIndex, main_process_name
+        domains = PassiveDomains(SocketIndex(), main_process_name)
+        try:
+            LiveCapture(domains, args.interface).start()
+        except PermissionError:
+            print("❌ Capturing needs root or CAP_NET_RAW (setcap cap_net_raw+ep on the interpreter)")
+            return 1
+        print(f"🟢 Capturing DNS answers and TLS ClientHellos for {args.seconds} s...")
+        for _ in range(args.seconds):
+            time.sleep(1)
+            print_connections(domains.join(), activity)
+        end = time.time()
+    else:
+        parser.print_help()
+        return 0
+    print("\n🌐 Site usage by app (connection activity):")
+    for (app, site), seconds in sorted(activity.drain(end).items(), key=lambda x: -x[1]):
+        print(f" - {app}: {site} {seconds:.0f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
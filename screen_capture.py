@@ -0,0 +1,476 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import argparse
+import threading
+from collections import OrderedDict, namedtuple
+
+# === CONFIG ===
+HEADER_CACHE = 8  # XImage headers kept for recently used region sizes (all share one SHM segment)
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFFFFFFFFFF
+IPC_PRIVATE, IPC_CREAT, IPC_RMID = 0, 0o1000, 0
+LSB_FIRST = 0
+
+Monitor = namedtuple("Monitor", "x y width height primary name")
+
+
+class _XImage(ctypes.Structure):
+    _fields_ = [("width", ctypes.c_int), ("height", ctypes.c_int), ("xoffset", ctypes.c_int),
+                ("format", ctypes.c_int), ("data", ctypes.c_void_p), ("byte_order", ctypes.c_int),
+                ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int), ("bitmap_pad", ctypes.c_int),
+                ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int), ("bits_per_pixel", ctypes.c_int),
+                ("red_mask", ctypes.c_ulong), ("green_mask", ctypes.c_ulong), ("blue_mask", ctypes.c_ulong),
+                ("obdata", ctypes.c_void_p), ("funcs", ctypes.c_void_p * 6)]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int), ("shmaddr", ctypes.c_void_p),
+                ("readOnly", ctypes.c_int)]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("display", ctypes.c_void_p), ("resourceid", ctypes.c_ulong),
+                ("serial", ctypes.c_ulong), ("error_code", ctypes.c_ubyte), ("request_code", ctypes.c_ubyte),
+                ("minor_code", ctypes.c_ubyte)]
+
+
+class _XRRMonitorInfo(ctypes.Structure):
+    _fields_ = [("name", ctypes.c_ulong), ("primary", ctypes.c_int), ("automatic", ctypes.c_int),
+                ("noutput", ctypes.c_int), ("x", ctypes.c_int), ("y", ctypes.c_int), ("width", ctypes.c_int),
+                ("height", ctypes.c_int), ("mwidth", ctypes.c_int), ("mheight", ctypes.c_int),
+                ("outputs", ctypes.c_void_p)]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent))
+
+
+def _bind(lib, name, restype, *argtypes):
+    fn = getattr(lib, name)
+    fn.restype = restype
+    fn.argtypes = list(argtypes)
+    return fn
+
+
+class _Xlib:
+    """The few libX11/libXext/libXrandr entry points capture needs, loaded once."""
+
+    def __init__(self):
+        vp, ul, i, ui = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_uint
+        pi, pui, pul = ctypes.POINTER(i), ctypes.POINTER(ui), ctypes.POINTER(ul)
+        x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+        self.XOpenDisplay = _bind(x11, "XOpenDisplay", vp, ctypes.c_char_p)
+        self.XCloseDisplay = _bind(x11, "XCloseDisplay", i, vp)
+        self.XDefaultScreen = _bind(x11, "XDefaultScreen", i, vp)
+        self.XRootWindow = _bind(x11, "XRootWindow", ul, vp, i)
+        self.XDefaultVisual = _bind(x11, "XDefaultVisual", vp, vp, i)
+        self.XDefaultDepth = _bind(x11, "XDefaultDepth", i, vp, i)
+        self.XDisplayWidth = _bind(x11, "XDisplayWidth", i, vp, i)
+        self.XDisplayHeight = _bind(x11, "XDisplayHeight", i, vp, i)
+        self.XSync = _bind(x11, "XSync", i, vp, i)
+        self.XFree = _bind(x11, "XFree", i, vp)
+        self.XGetImage = _bind(x11, "XGetImage", ctypes.POINTER(_XImage), vp, ul, i, i, ui, ui, ul, i)
+        self.XInternAtom = _bind(x11, "XInternAtom", ul, vp, ctypes.c_char_p, i)
+        self.XGetWindowProperty = _bind(x11, "XGetWindowProperty", i, vp, ul, ul, ctypes.c_long, ctypes.c_long, i,
+                                        ul, pul, pi, pul, pul, ctypes.POINTER(ctypes.c_void_p))
+        self.XGetGeometry = _bind(x11, "XGetGeometry", i, vp, ul, pul, pi, pi, pui, pui, pui, pui)
+        self.XTranslateCoordinates = _bind(x11, "XTranslateCoordinates", i, vp, ul, ul, i, i, pi, pi, pul)
+        self.XSetErrorHandler = _bind(x11, "XSetErrorHandler", vp, _XErrorHandler)
+        self.xext = None
+        self.xrandr = None
+        xext = ctypes.util.find_library("Xext")
+        if xext:
+            xext = ctypes.CDLL(xext)
+            self.XShmQueryExtension = _bind(xext, "XShmQueryExtension", i, vp)
+            self.XShmCreateImage = _bind(xext, "XShmCreateImage", ctypes.POINTER(_XImage), vp, vp, ui, i, vp,
+                                         ctypes.POINTER(_XShmSegmentInfo), ui, ui)
+            self.XShmAttach = _bind(xext, "XShmAttach", i, vp, ctypes.POINTER(_XShmSegmentInfo))
+            self.XShmDetach = _bind(xext, "XShmDetach", i, vp, ctypes.POINTER(_XShmSegmentInfo))
+            self.XShmGetImage = _bind(xext, "XShmGetImage", i, vp, ul, ctypes.POINTER(_XImage), i, i, ul)
+            self.xext = xext
+        xrandr = ctypes.util.find_library("Xrandr")
+        if xrandr:
+            xrandr = ctypes.CDLL(xrandr)
+            self.XRRGetMonitors = _bind(xrandr, "XRRGetMonitors", ctypes.POINTER(_XRRMonitorInfo), vp, ul, i, pi)
+            self.XRRFreeMonitors = _bind(xrandr, "XRRFreeMonitors", None, ctypes.POINTER(_XRRMonitorInfo))
+            self.XGetAtomName = _bind(x11, "XGetAtomName", ctypes.c_void_p, vp, ul)
+            self.xrandr = xrandr
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.shmget = _bind(libc, "shmget", i, i, ctypes.c_size_t, i)
+        self.shmat = _bind(libc, "shmat", vp, i, vp, i)
+        self.shmdt = _bind(libc, "shmdt", i, vp)
+        self.shmctl = _bind(libc, "shmctl", i, i, i, vp)
+
+
+_x = None
+_errors = {}          # display pointer -> last X error code seen on it
+_previous_handler = None
+
+
+def _on_x_error(display, event):
+    # Our displays record the error (a failed XShmAttach on a remote display, a window that
+    # closed between lookup and capture); anything else goes to the handler we replaced,
+    # instead of Xlib's default, which exits the process.
+    if display in _errors:
+        _errors[display] = event.contents.error_code
+        return 0
+    if _previous_handler:
+        return _XErrorHandler(_previous_handler)(display, event)
+    return 0
+
+
+_x_error_handler = _XErrorHandler(_on_x_error)
+
+
+def xlib():
+    global _x, _previous_handler
+    if _x is None:
+        _x = _Xlib()
+        _previous_handler = _x.XSetErrorHandler(_x_error_handler)
+    return _x
+
+# === CAPTURE ===
+class ScreenCapture:
+    """Screen, monitor and active-window grabs as NumPy arrays, without a subprocess or a PNG round trip.
+
+    Backends, best first: "shm" (MIT-SHM: the X server writes pixels straight into a
+    SysV segment we map once; grab() returns a view of it, no copy), "xgetimage" (plain
+    XGetImage over the socket, for remote displays without SHM) and "pyautogui" (no
+    usable X connection). Frames are height x width x channels uint8 in `rawmode`
+    channel order ("BGRX" on little-endian X servers). A SHM frame is only valid until
+    the next grab: copy it, or hold `lock` while using it.
+    """
+
+    def __init__(self, display_name=None, shm=True):
+        self.display_name = display_name
+        self.lock = threading.RLock()
+        self.backend = None
+        self.rawmode = "BGRX"
+        self.dpy = None
+        self.shminfo = None
+        self.headers = OrderedDict()  # (w, h) -> (XImage pointer, ndarray view)
+        self._open(shm)
+
+    def _open(self, shm):
+        if not (self.display_name or os.environ.get("DISPLAY")):
+            self.backend, self.rawmode = "pyautogui", "RGB"
+            return
+        try:
+            x = xlib()
+        except OSError as e:
+            print(f"⚠️ libX11 unavailable ({e}); capturing with pyautogui")
+            self.backend, self.rawmode = "pyautogui", "RGB"
+            return
+        self.dpy = x.XOpenDisplay(self.display_name.encode() if self.display_name else None)
+        if not self.dpy:
+            print(f"⚠️ Cannot open display {self.display_name or os.environ.get('DISPLAY')}; capturing with pyautogui")
+            self.backend, self.rawmode = "pyautogui", "RGB"
+            return
+        _errors[self.dpy] = 0
+        screen = x.XDefaultScreen(self.dpy)
+        self.root = x.XRootWindow(self.dpy, screen)
+        self.visual = x.XDefaultVisual(self.dpy, screen)
+        self.depth = x.XDefaultDepth(self.dpy, screen)
+        self.width = x.XDisplayWidth(self.dpy, screen)
+        self.height = x.XDisplayHeight(self.dpy, screen)
+        self.backend = "xgetimage"
+        if shm:
+            try:
+                self._attach_shm()
+                self.backend = "shm"
+            except OSError as e:
+                print(f"⚠️ MIT-SHM unavailable ({e}); capturing with XGetImage")
+
+    def _attach_shm(self):
+        """One SysV segment for a full-screen frame, attached to the X server once."""
+        x = xlib()
+        if x.xext is None or not x.XShmQueryExtension(self.dpy):
+            raise OSError("no MIT-SHM extension on this display")
+        probe = x.XShmCreateImage(self.dpy, self.visual, self.depth, ZPIXMAP, None,
+                                  ctypes.byref(_XShmSegmentInfo()), self.width, self.height)
+        if not probe:
+            raise OSError("XShmCreateImage failed")
+        size = probe.contents.bytes_per_line * self.height
+        bpp = probe.contents.bits_per_pixel
+        self.rawmode = "BGRX" if probe.contents.byte_order == LSB_FIRST else "XRGB"
+        x.XFree(probe)
+        if bpp != 32:
+            raise OSError(f"{bpp} bits per pixel (only 32 is mapped without conversion)")
+        info = _XShmSegmentInfo()
+        info.shmid = x.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if info.shmid < 0:
+            raise OSError(ctypes.get_errno(), f"shmget: {os.strerror(ctypes.get_errno())}")
+        info.shmaddr = x.shmat(info.shmid, None, 0)
+        if info.shmaddr in (None, ctypes.c_void_p(-1).value):
+            x.shmctl(info.shmid, IPC_RMID, None)
+            raise OSError("shmat failed")
+        info.readOnly = 0
+        _errors[self.dpy] = 0
+        attached = x.XShmAttach(self.dpy, ctypes.byref(info))
+        x.XSync(self.dpy, 0)
+        # Marked for removal now: the kernel frees it once both we and the server detach, even after a crash
+        x.shmctl(info.shmid, IPC_RMID, None)
+        if not attached or _errors[self.dpy]:
+            x.shmdt(info.shmaddr)
+            raise OSError(f"XShmAttach refused (X error {_errors[self.dpy]}; remote display?)")
+        self.shminfo = info
+        self.shm_size = size
+
+    def _header(self, w, h):
+        """XImage header of size w x h over the shared segment, and the NumPy view of its pixels."""
+        import numpy as np
+        key = (w, h)
+        cached = self.headers.get(key)
+        if cached is not None:
+            self.headers.move_to_end(key)
+            return cached
+        x = xlib()
+        image = x.XShmCreateImage(self.dpy, self.visual, self.depth, ZPIXMAP, self.shminfo.shmaddr,
+                                  ctypes.byref(self.shminfo), w, h)
+        if not image:
+            raise OSError("XShmCreateImage failed")
+        stride = image.contents.bytes_per_line
+        pixels = (ctypes.c_uint8 * (stride * h)).from_address(self.shminfo.shmaddr)
+        view = np.ndarray((h, w, 4), np.uint8, buffer=pixels, strides=(stride, 4, 1))
+        self.headers[key] = (image, view)
+        if len(self.headers) > HEADER_CACHE:
+            old, _ = self.headers.popitem(last=False)[1]
+            x.XFree(old)  # the header only; the pixels are the shared segment
+        return image, view
+
+    def _clip(self, region):
+        if region is None:
+            return 0, 0, self.width, self.height
+        rx, ry, rw, rh = region
+        x0, y0 = max(0, rx), max(0, ry)
+        x1, y1 = min(self.width, rx + rw), min(self.height, ry + rh)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def grab(self, region=None):
+        """(x, y, width, height) of the root window (default: all of it) as an array, or None."""
+        with self.lock:
+            if self.backend == "pyautogui":
+                return self._grab_pyautogui(region)
+            clipped = self._clip(region)
+            if clipped is None:
+                return None
+            rx, ry, rw, rh = clipped
+            x = xlib()
+            _errors[self.dpy] = 0
+            if self.backend == "shm":
+                image, view = self._header(rw, rh)
+                if not x.XShmGetImage(self.dpy, self.root, image, rx, ry, ALL_PLANES) or _errors[self.dpy]:
+                    return None
+                return view
+            return self._grab_xgetimage(rx, ry, rw, rh)
+
+    def _grab_xgetimage(self, rx, ry, rw, rh):
+        import numpy as np
+        x = xlib()
+        image = x.XGetImage(self.dpy, self.root, rx, ry, rw, rh, ALL_PLANES, ZPIXMAP)
+        if not image:
+            return None
+        try:
+            img = image.contents
+            if img.bits_per_pixel != 32:
+                return None
+            self.rawmode = "BGRX" if img.byte_order == LSB_FIRST else "XRGB"
+            pixels = (ctypes.c_uint8 * (img.bytes_per_line * rh)).from_address(img.data)
+            return np.ndarray((rh, rw, 4), np.uint8, buffer=pixels, strides=(img.bytes_per_line, 4, 1)).copy()
+        finally:
+            x.XFree(image.contents.data)
+            x.XFree(image)
+
+    def _grab_pyautogui(self, region):
+        import numpy as np
+        try:
+            import pyautogui
+        except Exception as e:
+            print(f"❌ No screen capture backend: {e}")
+            return None
+        return np.asarray(pyautogui.screenshot(region=region))
+
+    # === REGIONS ===
+    def monitors(self):
+        """Monitors from RandR 1.5 (one entry for the whole screen without it), primary first."""
+        if self.dpy is None:
+            return []
+        x = xlib()
+        found = []
+        if x.xrandr is not None:
+            count = ctypes.c_int()
+            infos = x.XRRGetMonitors(self.dpy, self.root, 1, ctypes.byref(count))
+            if infos:
+                for m in infos[:count.value]:
+                    name_ptr = x.XGetAtomName(self.dpy, m.name)
+                    name = ctypes.string_at(name_ptr).decode(errors="replace") if name_ptr else ""
+                    if name_ptr:
+                        x.XFree(name_ptr)
+                    found.append(Monitor(m.x, m.y, m.width, m.height, bool(m.primary), name))
+                x.XRRFreeMonitors(infos)
+        if not found:
+            found = [Monitor(0, 0, self.width, self.height, True, "screen")]
+        found.sort(key=lambda m: not m.primary)
+        return found
+
+    def active_window_region(self):
+        """(x, y, width, height) of the focused top-level window in root coordinates, from _NET_ACTIVE_WINDOW."""
+        if self.dpy is None:
+            return None
+        x = xlib()
+        with self.lock:
+            _errors[self.dpy] = 0
+            atom = x.XInternAtom(self.dpy, b"_NET_ACTIVE_WINDOW", 1)
+            if not atom:
+                return None
+            actual_type, actual_format = ctypes.c_ulong(), ctypes.c_int()
+            nitems, after, prop = ctypes.c_ulong(), ctypes.c_ulong(), ctypes.c_void_p()
+            status = x.XGetWindowProperty(self.dpy, self.root, atom, 0, 1, 0, 33,  # XA_WINDOW
+                                          ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                          ctypes.byref(nitems), ctypes.byref(after), ctypes.byref(prop))
+            if status != 0 or not prop.value:
+                return None
+            window = ctypes.cast(prop, ctypes.POINTER(ctypes.c_ulong))[0] if nitems.value else 0
+            x.XFree(prop)
+            if not window:
+                return None
+            root, wx, wy = ctypes.c_ulong(), ctypes.c_int(), ctypes.c_int()
+            w, h, border, depth = ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint(), ctypes.c_uint()
+            child = ctypes.c_ulong()
+            if not x.XGetGeometry(self.dpy, window, ctypes.byref(root), ctypes.byref(wx), ctypes.byref(wy),
+                                  ctypes.byref(w), ctypes.byref(h), ctypes.byref(border), ctypes.byref(depth)):
+                return None
+            if not x.XTranslateCoordinates(self.dpy, window, self.root, 0, 0, ctypes.byref(wx), ctypes.byref(wy),
+                                           ctypes.byref(child)) or _errors[self.dpy]:
+                return None
+            return wx.value, wy.value, w.value, h.value
+
+    def grab_monitor(self, index=0):
+        monitors = self.monitors()
+        if not monitors:
+            return self.grab()
+        m = monitors[min(index, len(monitors) - 1)]
+        return self.grab((m.x, m.y, m.width, m.height))
+
+    def grab_active_window(self):
+        """Only the focused window (what overlaps it on screen included); the whole screen if there is none."""
+        return self.grab(self.active_window_region())
+
+    def grab_scope(self, scope="screen"):
+        """"screen", "window" (active window) or "monitor" (the monitor showing the active window)."""
+        if scope == "window":
+            return self.grab_active_window()
+        if scope == "monitor":
+            region = self.active_window_region()
+            monitors = self.monitors()
+            if region and monitors:
+                cx, cy = region[0] + region[2] // 2, region[1] + region[3] // 2
+                for m in monitors:
+                    if m.x <= cx < m.x + m.width and m.y <= cy < m.y + m.height:
+                        return self.grab((m.x, m.y, m.width, m.height))
+            return self.grab_monitor(0)
+        return self.grab()
+
+    def close(self):
+        with self.lock:
+            if self.dpy is None:
+                return
+            x = xlib()
+            for image, _ in self.headers.values():
+                x.XFree(image)
+            self.headers.clear()
+            if self.shminfo is not None:
+                x.XShmDetach(self.dpy, ctypes.byref(self.shminfo))
+                x.XSync(self.dpy, 0)
+                x.shmdt(self.shminfo.shmaddr)
+                self.shminfo = None
+            _errors.pop(self.dpy, None)
+            x.XCloseDisplay(self.dpy)
+            self.dpy = None
+
+
+_default_capture = None
+_default_lock = threading.Lock()
+
+
+def default_capture():
+    """Process-wide capture connection; the SHM segment is mapped once and reused by every grab."""
+    global _default_capture
+    if _default_capture is None:
+        with _default_lock:
+            if _default_capture is None:
+                _default_capture = ScreenCapture()
+    return _default_capture
+
+# === BENCHMARK ===
+def _time_grabs(grab, frames):
+    times = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        frame = grab()
+        times.append((time.perf_counter() - t0) * 1000)
+        if frame is None:
+            return None
+    times.sort()
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.99))]
+
+
+def run_bench(frames=50, scope="screen"):
+    """Capture latency per backend. Run under Xvfb: xvfb-run -s "-screen 0 1920x1080x24" python screen_capture.py --bench"""
+    shm = ScreenCapture()
+    if shm.dpy is None:
+        print("❌ No X display (set DISPLAY, or run under xvfb-run)")
+        return 1
+    print(f"🖥️ {shm.width}x{shm.height} depth {shm.depth}, monitors: {shm.monitors()}")
+    plain = ScreenCapture(shm=False)
+    rows = [(shm.backend, lambda: shm.grab_scope(scope)), ("xgetimage", lambda: plain.grab_scope(scope))]
+    try:
+        import pyautogui
+        region = {"window": shm.active_window_region(), "monitor": None}.get(scope)
+        rows.append(("pyautogui", lambda: pyautogui.screenshot(region=region)))
+    except Exception as e:
+        print(f"⚠️ pyautogui not measured: {e}")
+    print(f"{'backend':<12} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, grab in rows:
+        result = _time_grabs(grab, frames)
+        if result is None:
+            print(f"{name:<12} {'failed':>8}")
+        else:
+            print(f"{name:<12} {result[0]:>8.2f} {result[1]:>8.2f}")
+    shm.close()
+    plain.close()
+    return 0
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MIT-SHM screen capture into NumPy arrays")
+    parser.add_argument("--bench", action="store_true", help="capture latency: MIT-SHM vs XGetImage vs pyautogui")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--scope", choices=("screen", "monitor", "window"), default="screen")
+    parser.add_argument("--save", help="write one capture of --scope to this PNG (needs Pillow)")
+    args = parser.parse_args(argv)
+    if args.bench:
+        return run_bench(args.frames, args.scope)
+    capture = ScreenCapture()
+    print(f"🖥️ backend: {capture.backend}")
+    for m in capture.monitors():
+        print(f" - {m.name or 'monitor'}: {m.width}x{m.height}+{m.x}+{m.y}{' (primary)' if m.primary else ''}")
+    if args.save:
+        frame = capture.grab_scope(args.scope)
+        if frame is None:
+            print("❌ Capture failed")
+            return 1
+        from PIL import Image
+        Image.frombuffer("RGB", (frame.shape[1], frame.shape[0]), frame, "raw", capture.rawmode,
+                         frame.strides[0], 1).save(args.save)
+        print(f"📸 {args.save}")
+    capture.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
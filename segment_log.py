@@ -0,0 +1,70 @@
+import os
+import json
+import threading
+
+import symbols
+
+# === CONFIG ===
+SEGMENT_LOG = "activity_segments.jsonl"
+
+_write_lock = threading.Lock()
+_defined = {}  # log path -> symbol ids already defined in it by this process
+
+# === WRITING ===
+def append_segment(app, start, end, title=None, url=None, idle=False, path=SEGMENT_LOG):
+    """Append one closed focus segment.
+
+    Strings are written as symbol ids; a {"sym": id, "name": ...} line precedes the first
+    use of an id by this process, so the log stays self-describing. Ids come from the
+    shared symbol table, so concurrent writers never disagree on them.
+    """
+    if not app or end <= start:
+        return
+    table = symbols.default_table()
+    record = {"start": round(start, 3), "end": round(end, 3), "app": table.intern(app)}
+    if title:
+        record["title"] = table.intern(title)
+    if url:
+        record["url"] = table.intern(url)
+    if idle:
+        record["idle"] = True
+    try:
+        with _write_lock:
+            if not os.path.exists(path):
+                _defined.pop(os.path.abspath(path), None)  # log was rotated
+            defined = _defined.setdefault(os.path.abspath(path), set())
+            lines = []
+            for field in ("app", "title", "url"):
+                sid = record.get(field)
+                if sid is not None and sid not in defined:
+                    lines.append(json.dumps({"sym": sid, "name": table.name(sid)}, ensure_ascii=False))
+                    defined.add(sid)
+            lines.append(json.dumps(record))
+            with open(path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+    except Exception as e:
+        print(f"[ERROR] append_segment: {e}")
+
+# === READING ===
+def read_segments(path=SEGMENT_LOG):
+    """Yield segment dicts (with names resolved) from a segment log, skipping damaged lines."""
+    if not os.path.exists(path):
+        return
+    names = {}
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "sym" in rec:
+                names[rec["sym"]] = rec.get("name")
+                continue
+            for field in ("app", "title", "url"):
+                value = rec.get(field)
+                if isinstance(value, int):
+                    rec[field] = names.get(value)
+            yield rec
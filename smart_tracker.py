@@ -1,50 +1,136 @@
+import sys
 import time
 import os
-import json
-import shutil
-import traceback
-import psutil
-import subprocess
-from pynput import keyboard, mouse
 from threading import Thread
 from datetime import datetime
-import requests
-import re
-import lz4.block
+
+from lazy_import import lazy_module
+from activity_payload import UsageAccumulator, InputCounters
+from adaptive_rate import default_rate
+
+# Imported on first use, so importing this module (tests, tooling) stays fast and side-effect free
+psutil = lazy_module("psutil")
+requests = lazy_module("requests")
+subprocess = lazy_module("subprocess")
+shutil = lazy_module("shutil")
+re = lazy_module("re")
 
 # === Configuration ===
 ODOO_URL = "http://localhost:8069"
 ODOO_API_ENDPOINT_USER = f"{ODOO_URL}/api/user-activity"
 ODOO_API_ENDPOINT_SYSTEM = f"{ODOO_URL}/api/system-usage"
 ODOO_API_ALERT = f"{ODOO_URL}/api/activity-alert"
+ODOO_API_ENDPOINT_ROLLUP = f"{ODOO_URL}/api/activity-rollup"
+UPLOAD_ROLLUPS = False  # send hourly rollups instead of raw per-minute records
 TOKEN_FILE = os.path.expanduser("~/PycharmProjects/ScriptDev/checkin_token.txt")
-FIREFOX_PROFILE_PATH = "/home/wassef/snap/firefox/common/.mozilla/firefox/3afnh5rk.default"
+FIREFOX_PROFILE_PATH = None  # from profiles.ini (native, Snap or Flatpak), resolved on first use
+CDP_URL = "http://localhost:9222/json"
+CDP_TIMEOUT = 1.0  # seconds; the tab list is served from cache if the browser does not answer
+PASSIVE_DOMAINS = False  # also detect sites from DNS/TLS SNI on the wire (any browser or app; needs CAP_NET_RAW)
+LOCAL_API = None  # "127.0.0.1:8765" or a Unix socket path: read API for local dashboards (local_api.py)
+ALERT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json")
 
-try:
-    with open(TOKEN_FILE, "r") as f:
-        AUTH_TOKEN = f.read().strip()
-    if not AUTH_TOKEN:
-        raise ValueError("Token file is empty")
-except Exception as e:
-    print(f"❌ CRITICAL ERROR: Failed to load token - {str(e)}")
-    exit(1)
-
-ODOO_HEADERS = {
-    "Content-Type": "application/json",
-    "Authorization": f"Bearer {AUTH_TOKEN}"
-}
-
-mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-keyboard_activity = {"key_presses": 0, "keys": []}
-app_usage = {}
+ODOO_HEADERS = None  # set by setup() once the token is loaded
+
+input_counters = InputCounters()  # per-minute mouse/keyboard counts, drained atomically
+app_usage = UsageAccumulator()  # symbol id -> seconds since the last record
 active_app = None
 app_start_time = time.time()
 
+# Interval bounds per collector; stretched on battery, idle or locked (adaptive_rate)
+sampling = default_rate()
+sampling.register("activity_log", 60, high=300)
+sampling.register("system_usage", 60, high=600)
+sampling.register("active_window", 5, low=2, high=60, follows_focus=True)  # xdotool + xprop + ps per wakeup
+sampling.register("browser_tabs", 60, high=300, expensive=True)  # session files and the debug port
+sampling.register("net_accounting", 1, high=30)
+
 last_sites = []
-site_usage = {}
+site_usage = UsageAccumulator()
 site_last_time = time.time()
 
+# Collectors backed by the local store; created by setup()
+symbol_table = None
+activity_snapshot = None
+rollup_store = None
+mouse_trajectory = None
+trajectory_store = None
+active_seconds = None
+automation_detector = None
+browser_collector = None  # created on first use, after the tab readers are defined
+net_accountant = None  # per-app network bytes; created by main() (may open a capture socket)
+passive_domains = None  # DNS/SNI site detection; created by main() when PASSIVE_DOMAINS is set
+passive_sites = None
+checkpoint = None  # crash-safe copy of the accumulators and the open app segment (checkpoint.py)
+local_api = None  # created by main() when LOCAL_API is set
+alert_engine = None  # streaming alert rules (alert_rules.json); created by setup()
+alert_sender = None
+
+def load_token(path=TOKEN_FILE):
+    with open(path, "r") as f:
+        token = f.read().strip()
+    if not token:
+        raise ValueError("Token file is empty")
+    return token
+
+def setup(token=None):
+    """Load the token and create the collectors; nothing here starts a thread or a listener."""
+    global ODOO_HEADERS, symbol_table, activity_snapshot, rollup_store
+    global mouse_trajectory, trajectory_store, active_seconds, automation_detector, alert_engine, alert_sender
+    global checkpoint, app_usage, site_usage
+    from symbols import default_table
+    from activity_payload import IntervalSnapshot
+    from rollups import RollupStore
+    from automation_detector import AutomationDetector
+    from mouse_trajectory import TrajectoryRecorder, SegmentStore
+    from activity_bitmap import ActivityRecorder, BitmapStore
+    from alert_rules import RuleEngine, AlertSender
+    from checkpoint import Checkpoint, CheckpointedCounter
+
+    ODOO_HEADERS = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {token or load_token()}"
+    }
+    symbol_table = default_table()
+    activity_snapshot = IntervalSnapshot(symbol_table)
+    rollup_store = RollupStore(source="smart_tracker")
+    # Usage since the last record survives a crash or kill; recovered seconds go out with the next record
+    checkpoint = Checkpoint("smart_tracker", ("app_usage", "site_usage"))
+    app_usage = CheckpointedCounter(app_usage, checkpoint, "app_usage")
+    site_usage = CheckpointedCounter(site_usage, checkpoint, "site_usage")
+    recover_open_segment()
+    # Simplified pointer path: per-minute stats in the activity record, compressed polylines in the local store
+    trajectory_store = SegmentStore()
+    mouse_trajectory = TrajectoryRecorder(on_segment=trajectory_store.add)
+    active_seconds = ActivityRecorder(BitmapStore(), source="smart_tracker")  # one bit per second with input
+    automation_detector = AutomationDetector(on_alert=report_automation)
+    # The sender's thread starts with the first alert; delivery failures feed the "odoo_error" rule
+    alert_sender = AlertSender(ODOO_API_ALERT, ODOO_HEADERS, on_failure=lambda: emit_event("odoo_error"))
+    alert_engine = RuleEngine.from_file(ALERT_RULES_FILE, on_alert=alert_sender.add)
+
 # === Utility Functions ===
+def recover_open_segment():
+    """Close the app segment a crashed run left open, at its last heartbeat."""
+    segment = checkpoint.take_segment()
+    if segment is None:
+        return
+    (app_id, *_), start, seen = segment
+    if app_id is not None and seen > start:
+        app_usage.add(app_id, seen - start)
+        rollup_store.add_segment(symbol_table.name(app_id), start, seen)
+        print(f"⚠️ Recovered {seen - start:.0f} s of {symbol_table.name(app_id)} from an interrupted run")
+
+def checkpoint_segment(now):
+    if active_app and active_app != "Unknown":
+        checkpoint.open_segment(now, symbol_table.intern(active_app))
+    else:
+        checkpoint.close_segment()
+
+def emit_event(kind, value=1.0, **attrs):
+    """Feed the alert rules; a no-op until setup() has loaded them."""
+    if alert_engine is not None:
+        alert_engine.emit(kind, value, **attrs)
+
 def send_log_to_odoo(endpoint, data):
     try:
         response = requests.post(endpoint, json=data, headers=ODOO_HEADERS)
@@ -52,109 +138,171 @@ def send_log_to_odoo(endpoint, data):
             print("🔐 Authentication failed - token might be invalid.")
         elif response.status_code == 200:
             print(f"✅ Log sent to {endpoint}")
+            return True
         else:
             print(f"❌ Failed to send log to {endpoint}: {response.text}")
     except Exception as e:
         print(f"❌ Error sending log to Odoo: {e}")
+    emit_event("odoo_error", endpoint=endpoint)
+    return False
 
+def firefox_recovery_file():
+    """recovery.jsonlz4 of the default Firefox profile; profiles.ini is read on the first call."""
+    global FIREFOX_PROFILE_PATH
+    from firefox_profiles import default_profile_path, recovery_file
+    if FIREFOX_PROFILE_PATH is None:
+        FIREFOX_PROFILE_PATH = default_profile_path() or ""
+    return recovery_file(FIREFOX_PROFILE_PATH)
+
+# Read errors propagate: the BrowserCollector keeps the last good tabs and opens the source's circuit
 def get_firefox_tabs():
-    try:
-        recovery_file = os.path.join(FIREFOX_PROFILE_PATH, "sessionstore-backups", "recovery.jsonlz4")
-        if not os.path.exists(recovery_file):
-            return []
-        with open(recovery_file, "rb") as f:
-            f.read(8)
-            data = lz4.block.decompress(f.read())
-            session = json.loads(data)
-            urls = []
-            for window in session.get("windows", []):
-                for tab in window.get("tabs", []):
-                    i = tab.get("index", 1) - 1
-                    entries = tab.get("entries", [])
-                    if 0 <= i < len(entries):
-                        urls.append(entries[i].get("url", ""))
-            return urls
-    except Exception as e:
-        print(f"[ERROR] get_firefox_tabs: {e}")
+    from firefox_profiles import read_session_tabs
+    from offload import default_pool
+    path = firefox_recovery_file()
+    if not os.path.exists(path):
         return []
+    # Multi-MB JSON: decompressed and parsed in a worker process, off the listeners' GIL
+    session = default_pool().run("firefox_tabs", read_session_tabs, path)
+    return [url for _, url in session["tabs"]]
 
 def get_chromium_tabs():
+    response = requests.get(CDP_URL, timeout=CDP_TIMEOUT)
+    return [tab["url"] for tab in response.json() if "url" in tab]
+
+def get_open_tabs():
+    """URLs open in Firefox and Chromium browsers (session files, plus the debug port if enabled), read concurrently."""
+    global browser_collector
+    if browser_collector is None:
+        from browser_sources import BrowserCollector, Source
+        from chromium_sessions import default_sessions
+        browser_collector = BrowserCollector([Source("firefox_session", get_firefox_tabs),
+                                              Source("chromium_sessions", default_sessions().open_urls),
+                                              Source("chromium_cdp", get_chromium_tabs, CDP_TIMEOUT + 0.5)])
+    return [url for urls, _ in browser_collector.collect().values() for url in urls]
+
+def focused_site(app):
+    """Site of the active tab when `app` is a browser, else None."""
+    from url_engine import site_key
     try:
-        response = requests.get("http://localhost:9222/json")
-        return [tab["url"] for tab in response.json() if "url" in tab]
+        if "firefox" in (app or "").lower():
+            from firefox_profiles import read_session_tabs
+            from offload import default_pool
+            path = firefox_recovery_file()
+            if not os.path.exists(path):
+                return None
+            # Own key: a keyed submit cancels the queued job with the same key (the tab collector's)
+            tab = default_pool().run("firefox_focus", read_session_tabs, path)["selected"]
+            url = tab[1] if tab else None
+        else:
+            from chromium_sessions import default_sessions
+            tab = default_sessions().active_tab(app)
+            url = tab[0] if tab else None
+        return site_key(url) if url else None
     except Exception as e:
-        return []
+        print(f"[ERROR] focused_site: {e}")
+        return None
 
-def extract_domain(url):
-    if "://" in url:
-        url = url.split("://", 1)[1]
-    return url.split("/", 1)[0]
+def report_automation(alert):
+    print(f"🚨 Synthetic {alert['channel']} input detected (confidence {alert['confidence']:.2f})")
+    # Alerting goes through the rules (threshold, cooldown, batching) instead of one POST per detection
+    emit_event("automation", alert["confidence"], channel=alert["channel"])
 
 # === Input Handlers ===
 def on_key_press(key):
     try:
-        keyboard_activity["key_presses"] += 1
-        keyboard_activity["keys"].append(str(key))
+        input_counters.key(key)
+        sampling.note_input()
+        automation_detector.on_key()
+        active_seconds.mark()
     except Exception as e:
         print(f"[ERROR] key press: {e}")
 
 def on_mouse_click(x, y, button, pressed):
     if pressed:
-        mouse_activity["clicks"] += 1
+        input_counters.mouse_event("clicks")
+        sampling.note_input()
+        automation_detector.on_click()
+        active_seconds.mark()
 
 def on_mouse_scroll(x, y, dx, dy):
-    mouse_activity["scrolls"] += 1
+    input_counters.mouse_event("scrolls")
+    sampling.note_input()
+    automation_detector.on_scroll()
+    active_seconds.mark()
 
 def on_mouse_move(x, y):
-    mouse_activity["movements"] += 1
+    input_counters.mouse_event("movements")
+    sampling.note_input()
+    automation_detector.on_move(x, y)
+    mouse_trajectory.on_move(x, y)
+    active_seconds.mark()
 
 def log_user_activity():
-    global mouse_activity, keyboard_activity, last_sites, site_usage, site_last_time
+    global last_sites, site_last_time
+    from url_engine import site_keys_batch
     while True:
         try:
             update_current_app_time()
+            mouse_counts, keyboard_counts = input_counters.drain()
             now = time.time()
-            current_sites = get_chromium_tabs() + get_firefox_tabs()
-            current_domains = [extract_domain(url) for url in current_sites]
+            if sampling.due("browser_tabs"):
+                current_domains = site_keys_batch(get_open_tabs())
+            else:
+                current_domains = last_sites  # locked or away: the open tabs cannot have changed
             for site in last_sites:
-                site_usage[site] = site_usage.get(site, 0) + (now - site_last_time)
+                site_usage.add(symbol_table.intern(site), now - site_last_time)
+                rollup_store.add_segment(None, site_last_time, now, domain=site)
+            rollup_store.add_input(site_last_time, now,
+                                   key_presses=keyboard_counts["key_presses"],
+                                   clicks=mouse_counts["clicks"],
+                                   scrolls=mouse_counts["scrolls"],
+                                   movements=mouse_counts["movements"])
             last_sites = current_domains
             site_last_time = now
+            emit_event("idle", sampling.state()["idle"], ts=now)
+            alert_engine.tick(now)  # windows age and schedule-held alerts are released without new events
 
             uptime = now - psutil.boot_time()
-            log_data = {
-                "timestamp": datetime.now().isoformat(),
-                #"mouse_clicks": mouse_activity["clicks"],
-                #"scrolls": mouse_activity["scrolls"],
-                #"movements": mouse_activity["movements"],
-                #"key_presses": keyboard_activity["key_presses"],
-                #"keys": keyboard_activity["keys"],
-                "system_uptime": f"{uptime:.2f} seconds",
-                "application_usage": [
-                    {"name": app, "time_spent": time_spent}
-                    for app, time_spent in app_usage.items()
-                ],
-                "site_usage": [
-                    {"domain": site, "time_spent": time_spent}
-                    for site, time_spent in site_usage.items()
-                ]
-            }
+            log_data = activity_snapshot.emit(
+                {"application_usage": app_usage.drain(), "site_usage": site_usage.drain(),
+                 "passive_site_usage": drain_passive_sites(now)},
+                timestamp=datetime.now().isoformat(),
+                #mouse_clicks=mouse_counts["clicks"],
+                #scrolls=mouse_counts["scrolls"],
+                #movements=mouse_counts["movements"],
+                #key_presses=keyboard_counts["key_presses"],
+                #keys=keyboard_counts["keys"],
+                mouse_trajectory=mouse_trajectory.drain_stats(),
+                system_uptime=f"{uptime:.2f} seconds",
+                wakeups_per_hour=sampling.wakeups_per_hour()
+            )
             print(log_data)
-            #send_log_to_odoo(ODOO_API_ENDPOINT_USER, log_data)
+            rollup_store.flush()
+            trajectory_store.write()
+            if local_api is not None:
+                local_api.invalidate()
+            active_seconds.save()
+            checkpoint.sync()
+            if UPLOAD_ROLLUPS:
+                rollups = rollup_store.pending_upload()
+                if rollups["rollups"] and send_log_to_odoo(ODOO_API_ENDPOINT_ROLLUP, rollups):
+                    rollup_store.mark_uploaded(rollups)
+            #else:
+            #    send_log_to_odoo(ODOO_API_ENDPOINT_USER, log_data)
 
-            mouse_activity = {"clicks": 0, "scrolls": 0, "movements": 0}
-            keyboard_activity = {"key_presses": 0, "keys": []}
         except Exception as e:
             print(f"[ERROR] log_user_activity: {e}")
-        time.sleep(60)
+        sampling.wait("activity_log", jitter=True)
 
 def update_current_app_time():
-    global active_app, app_start_time, app_usage
+    global active_app, app_start_time
     now = time.time()
     if active_app and active_app != "Unknown":
         duration = now - app_start_time
-        app_usage[active_app] = app_usage.get(active_app, 0) + duration
+        app_usage.add(symbol_table.intern(active_app), duration)
+        rollup_store.add_segment(active_app, app_start_time, now)
         app_start_time = now
+        checkpoint_segment(now)
 
 def get_active_window():
     try:
@@ -193,8 +341,8 @@ def get_active_window():
         return "Unknown"
 
 
-def track_active_window(interval=5):
-    global active_app, app_start_time, app_usage
+def track_active_window():
+    global active_app, app_start_time
     while True:
         try:
             current_app = get_active_window()
@@ -202,13 +350,22 @@ def track_active_window(interval=5):
             if current_app != active_app:
                 if active_app and active_app != "Unknown":
                     duration = now - app_start_time
-                    app_usage[active_app] = app_usage.get(active_app, 0) + duration
+                    app_usage.add(symbol_table.intern(active_app), duration)
+                    rollup_store.add_segment(active_app, app_start_time, now)
                     print(f"[SWITCH] {active_app} → {current_app} ({duration:.2f} sec)")
                 active_app = current_app
                 app_start_time = now
+                checkpoint_segment(now)
+                sampling.note_focus_change(now)
+                site = focused_site(current_app)
+                emit_event("focus", app=current_app, site=site)
+                if local_api is not None:
+                    local_api.focus_changed(current_app, site, now)
+            else:
+                checkpoint.heartbeat(now)
         except Exception as e:
             print(f"[ERROR] track_active_window: {e}")
-        time.sleep(interval)
+        sampling.wait("active_window")
 
 def log_system_usage():
     while True:
@@ -224,17 +381,88 @@ def log_system_usage():
                 "memory_percent": memory.percent,
                 "disk_usage": f"Total: {total / 1024 ** 3:.2f} GB, Used: {used / 1024 ** 3:.2f} GB, Free: {free / 1024 ** 3:.2f} GB",
                 "network_sent": f"{net.bytes_sent / 1024 ** 2:.2f} MB",
-                "network_received": f"{net.bytes_recv / 1024 ** 2:.2f} MB"
+                "network_received": f"{net.bytes_recv / 1024 ** 2:.2f} MB",
+                "network_by_app": net_accountant.drain() if net_accountant else {}
             }
+            rollup_store.add_system_sample(time.time(), sum(cpu_percent) / len(cpu_percent), memory.percent)
+            emit_event("cpu", sum(cpu_percent) / len(cpu_percent))
+            emit_event("memory", memory.percent)
             #send_log_to_odoo(ODOO_API_ENDPOINT_SYSTEM, log_data)
         except Exception as e:
             print(f"[ERROR] log_system_usage: {e}")
-        time.sleep(60)
+        sampling.wait("system_usage", jitter=True)
+
+def start_network_accounting():
+    global net_accountant
+    from net_accounting import default_accountant
+    net_accountant = default_accountant()
+    Thread(target=track_network, daemon=True).start()
+
+def start_passive_domains():
+    """Sites from DNS answers and TLS SNI, reported apart from site_usage (tabs) so nothing is counted twice."""
+    global passive_domains, passive_sites
+    from passive_domains import PassiveDomains, SiteActivity, LiveCapture
+    from net_accounting import main_process_name
+    # Shares net accounting's socket index: one incremental /proc walk resolves both
+    domains = PassiveDomains(net_accountant.index, main_process_name)
+    try:
+        LiveCapture(domains).start()
+    except PermissionError:
+        print("⚠️ Passive site detection needs CAP_NET_RAW; disabled")
+        return
+    passive_sites = SiteActivity()
+    passive_domains = domains
+
+def start_local_api():
+    """Serve today's totals, time ranges and focus changes to local dashboards (local_api.py)."""
+    global local_api
+    from local_api import QueryAPI
+    api = QueryAPI(rollup_store)
+    try:
+        api.serve(LOCAL_API)
+    except OSError as e:
+        print(f"⚠️ Local API on {LOCAL_API} unavailable: {e}")
+        return
+    local_api = api
+
+def drain_passive_sites(now):
+    if passive_sites is None:
+        return {}
+    return {symbol_table.intern(site): seconds for site, seconds in passive_sites.drain(now).items()}
+
+def track_network():
+    """Socket owners and per-app bytes, about once a second (net_accounting).
+
+    Also joins captured ClientHellos to their process while the sockets are still open.
+    """
+    while True:
+        try:
+            net_accountant.tick()
+            if passive_domains is not None:
+                for connection in passive_domains.join():
+                    passive_sites.add(connection.site, connection.ts)
+        except Exception as e:
+            print(f"[ERROR] track_network: {e}")
+        sampling.wait("net_accounting")
 
 # === Main Entry ===
-if __name__ == "__main__":
+def main(argv=None):
+    try:
+        setup()
+    except Exception as e:
+        print(f"❌ CRITICAL ERROR: Failed to load token - {str(e)}")
+        return 1
+    from pynput import keyboard, mouse
+    from memory_budget import install_report_signal
+
     try:
         print("\u2705 Activity tracker started. Logging in background.")
+        install_report_signal()  # kill -USR1 <pid> prints per-structure memory usage
+        start_network_accounting()
+        if PASSIVE_DOMAINS:
+            start_passive_domains()
+        if LOCAL_API:
+            start_local_api()
         Thread(target=log_system_usage, daemon=True).start()
         Thread(target=log_user_activity, daemon=True).start()
         Thread(target=track_active_window, daemon=True).start()
@@ -246,4 +474,16 @@ if __name__ == "__main__":
 
     except Exception as e:
         print(f"\u274c MAIN ERROR: {e}")
+        import traceback
         traceback.print_exc()
+    finally:
+        mouse_trajectory.flush()  # keep the open trajectory segment
+        trajectory_store.write()
+        active_seconds.save()
+        checkpoint.close()
+        sampling.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+# === CONFIG ===
+STARTUP_BUDGET_MS = 150  # interpreter start + import + setup() on the daemon path
+RUNS = 5                 # best of N, to keep disk/CPU noise out of the verdict
+
+# module -> code run after importing it (the part of the daemon path before listeners start)
+DAEMON_PATHS = {
+    "smart_tracker": "smart_tracker.setup(token='startup-check')",
+}
+# Modules that must import without side effects and without their heavy dependencies
+TRACKERS = [
+    "smart_tracker",
+    "TrackUserSystemApplications",
+    "TrackDesktop_SavedFile",
+    "FirefoxChromiumBrowsersAppUsage",
+    "TimeSpentINGoogleBraveEdge",
+    "appwindowandsnap",
+    "tracking",
+    "monitor_input",
+]
+# Loaded only by the collectors that need them (lazy_import / function-level imports)
+HEAVY_MODULES = {"pynput", "pyautogui", "requests", "lz4", "psutil", "numpy", "evdev", "Xlib", "PIL"}
+
+PROBE = """
+import sys, threading
+{imports}
+{setup}
+print("THREADS", threading.active_count())
+print("MODULES", " ".join(sorted({{m.split(".")[0] for m in sys.modules}})))
+"""
+
+
+def parse_importtime(stderr):
+    """[(name, self_us, cumulative_us, depth)] from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, raw = line[len("import time:"):].split("|", 2)
+        name = raw.strip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        rows.append((name, int(self_us), int(cumulative), depth))
+    return rows
+
+
+def probe(module, setup="", runs=RUNS, importtime=True):
+    """Import module (and run setup) in a fresh interpreter inside an empty cwd/HOME.
+
+    Returns the best wall time in ms, importtime rows of that run, thread count,
+    top-level modules loaded, files created, and the error output if the import failed.
+    Wall times for the budget are taken without -X importtime, which adds its own overhead.
+    """
+    best = None
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="startup_") as tmp:
+            env = dict(os.environ, HOME=tmp,
+                       PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                                os.environ.get("PYTHONPATH")])))
+            code = PROBE.format(imports=f"import {module}", setup=setup)
+            t0 = time.perf_counter()
+            flags = ["-X", "importtime"] if importtime else []
+            proc = subprocess.run([sys.executable, *flags, "-c", code], cwd=tmp, env=env,
+                                  capture_output=True, text=True)
+            elapsed = (time.perf_counter() - t0) * 1000
+            created = sorted(os.listdir(tmp))
+        result = {"ms": elapsed, "ok": proc.returncode == 0, "created": created, "threads": 0, "modules": set(),
+                  "rows": parse_importtime(proc.stderr),
+                  "error": "" if proc.returncode == 0 else proc.stderr.strip().splitlines()[-1]}
+        for line in proc.stdout.splitlines():
+            if line.startswith("THREADS "):
+                result["threads"] = int(line.split()[1])
+            elif line.startswith("MODULES "):
+                result["modules"] = set(line.split()[1:])
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+        if not result["ok"]:
+            break
+    return best
+
+
+def check(budget_ms=STARTUP_BUDGET_MS, runs=RUNS):
+    """Side-effect-free imports for every tracker, and the daemon path under budget. Returns failures."""
+    failures = []
+    print(f"{'module':<34} {'import ms':>9}  heavy modules loaded / side effects")
+    for module in TRACKERS:
+        r = probe(module, runs=1)
+        if not r["ok"]:
+            failures.append(f"{module}: import failed ({r['error']})")
+            print(f"❌ {module:<32} {'-':>9}  {r['error']}")
+            continue
+        heavy = sorted(HEAVY_MODULES & r["modules"])
+        problems = []
+        if heavy:
+            problems.append("imports " + ", ".join(heavy))
+        if r["created"]:
+            problems.append("creates " + ", ".join(r["created"]))
+        if r["threads"] > 1:
+            problems.append(f"starts {r['threads'] - 1} thread(s)")
+        own = next((row[2] for row in r["rows"] if row[0] == module), 0) / 1000
+        mark = "❌" if problems else "🟢"
+        print(f"{mark} {module:<32} {own:>9.1f}  {'; '.join(problems) or 'clean'}")
+        failures += [f"{module}: {p}" for p in problems]
+
+    print(f"\n⏱️ Daemon path (interpreter + import + setup), best of {runs}, budget {budget_ms} ms:")
+    for module, setup in DAEMON_PATHS.items():
+        r = probe(module, setup, runs, importtime=False)
+        if not r["ok"]:
+            failures.append(f"{module}: daemon path failed ({r['error']})")
+            print(f"❌ {module}: {r['error']}")
+            continue
+        mark = "🟢" if r["ms"] <= budget_ms else "❌"
+        print(f"{mark} {module}: {r['ms']:.1f} ms")
+        if r["ms"] > budget_ms:
+            failures.append(f"{module}: daemon path {r['ms']:.1f} ms > {budget_ms} ms")
+    return failures
+
+
+def profile(module, setup="", top=15):
+    """Slowest imports (cumulative) on a module's startup path."""
+    r = probe(module, setup, runs=1)
+    if not r["ok"]:
+        print(f"❌ {module}: {r['error']}")
+        return
+    print(f"⏱️ {module}: {r['ms']:.1f} ms wall")
+    for name, self_us, cumulative, depth in sorted(r["rows"], key=lambda row: -row[2])[:top]:
+        print(f"   {cumulative / 1000:8.1f} ms cumulative {self_us / 1000:7.1f} ms self  {'  ' * depth}{name}")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup-time budget and import side-effect check for the trackers")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--profile", metavar="MODULE", help="show the slowest imports of one module's startup path")
+    args = parser.parse_args(argv)
+    if args.profile:
+        profile(args.profile, DAEMON_PATHS.get(args.profile, ""))
+        return 0
+    failures = check(args.budget_ms, args.runs)
+    if failures:
+        print(f"\n❌ {len(failures)} startup regression(s):")
+        for failure in failures:
+            print(f" - {failure}")
+        return 1
+    print("\n🟢 Startup within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import threading
+
+import local_store
+from memory_budget import LRUCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+"""
+
+
+class SymbolTable:
+    """Intern app names, window titles and domains as compact integer ids.
+
+    With a store path the ids are persisted in the local SQLite store, so every tracker
+    process (and every restart) agrees on them and only recently used ones stay in
+    memory; without one they live in memory only.
+    """
+
+    def __init__(self, path=None, budget=None):
+        self.ids = {}
+        self.names = {}
+        self.lock = threading.Lock()
+        self.conn = None
+        if path:
+            self.conn = local_store.connect(path)
+            self.conn.executescript(SCHEMA)
+            # The store is the source of truth, so cold symbols can simply be dropped
+            self.ids = LRUCache("symbols.ids", budget)
+            self.names = LRUCache("symbols.names", budget)
+
+    def intern(self, name):
+        sid = self.ids.get(name)
+        if sid is not None:
+            return sid
+        with self.lock:
+            sid = self.ids.get(name)
+            if sid is not None:
+                return sid
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("INSERT OR IGNORE INTO symbols (name) VALUES (?)", (name,))
+                sid = self.conn.execute("SELECT id FROM symbols WHERE name = ?", (name,)).fetchone()[0]
+            else:
+                sid = len(self.ids) + 1
+            self.ids[name] = sid
+            self.names[sid] = name
+        return sid
+
+    def name(self, sid):
+        name = self.names.get(sid)
+        if name is None and self.conn is not None:
+            with self.lock:
+                row = self.conn.execute("SELECT name FROM symbols WHERE id = ?", (sid,)).fetchone()
+            if row:
+                name = row[0]
+                self.ids[name] = sid
+                self.names[sid] = name
+        return name
+
+    def definitions(self, ids):
+        """sid -> name for many ids; cold ones are read in bulk and not cached (checkpoints)."""
+        found, missing = {}, []
+        for sid in ids:
+            name = self.names.get(sid)
+            if name is None:
+                missing.append(sid)
+            else:
+                found[sid] = name
+        if missing and self.conn is not None:
+            with self.lock:
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i:i + 500]
+                    found.update(self.conn.execute(
+                        f"SELECT id, name FROM symbols WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class SymbolSender:
+    """Remembers which symbol ids a receiver already knows, so payloads carry only new ones."""
+
+    def __init__(self, table, budget=None):
+        self.table = table
+        # Forgetting an id only means its definition is sent again, so this can be evicted
+        self.known = LRUCache("symbols.sent", budget)
+
+    def new_symbols(self, ids):
+        return {str(sid): self.table.name(sid) for sid in ids if sid not in self.known}
+
+    def acknowledge(self, symbols):
+        self.known.update({int(sid): True for sid in symbols})
+
+
+_default_table = None
+_default_lock = threading.Lock()
+
+
+def default_table():
+    """Process-wide table backed by the tracker's local store."""
+    global _default_table
+    if _default_table is None:
+        with _default_lock:
+            if _default_table is None:
+                _default_table = SymbolTable(local_store.LOCAL_STORE)
+    return _default_table
@@ -0,0 +1,196 @@
+import time
+import threading
+
+import psutil
+from Xlib import X, Xatom, display, error
+
+
+def _process_name(pid):
+    try:
+        return psutil.Process(pid).name()
+    except Exception:
+        return "Unknown"
+
+
+class TitleWatcher:
+    """Event-driven focus/title tracker for X11 (no polling).
+
+    Listens for PropertyNotify on the root window's _NET_ACTIVE_WINDOW to follow focus
+    changes, and on the focused window's _NET_WM_NAME / WM_NAME to see title changes
+    (tab switches, document switches, terminal panes). Each time the (app, title) pair
+    changes, the closed segment is passed to on_segment(app, title, start, end).
+    """
+
+    def __init__(self, on_segment, display_name=None, app_resolver=_process_name):
+        self.on_segment = on_segment
+        self.app_resolver = app_resolver
+        self.dpy = display.Display(display_name)
+        self.root = self.dpy.screen().root
+        self.NET_ACTIVE_WINDOW = self.dpy.intern_atom("_NET_ACTIVE_WINDOW")
+        self.NET_WM_NAME = self.dpy.intern_atom("_NET_WM_NAME")
+        self.NET_WM_PID = self.dpy.intern_atom("_NET_WM_PID")
+        self.UTF8_STRING = self.dpy.intern_atom("UTF8_STRING")
+        self.title_atoms = {self.NET_WM_NAME, Xatom.WM_NAME}
+
+        self.lock = threading.Lock()
+        self.window = None
+        self.app = None
+        self.title = None
+        self.start = time.time()
+        self.running = False
+
+    # --- X helpers ---
+    def _active_window(self):
+        try:
+            prop = self.root.get_full_property(self.NET_ACTIVE_WINDOW, X.AnyPropertyType)
+            if prop and prop.value and prop.value[0]:
+                return self.dpy.create_resource_object("window", prop.value[0])
+        except error.XError:
+            pass
+        return None
+
+    def _window_title(self, win):
+        try:
+            prop = win.get_full_property(self.NET_WM_NAME, self.UTF8_STRING)
+            if prop and prop.value:
+                value = prop.value
+                return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+            name = win.get_wm_name()
+            if isinstance(name, bytes):
+                name = name.decode("latin-1", "replace")
+            return name or None
+        except error.XError:
+            return None
+
+    def _window_app(self, win):
+        try:
+            prop = win.get_full_property(self.NET_WM_PID, X.AnyPropertyType)
+            if prop and prop.value:
+                return self.app_resolver(int(prop.value[0]))
+            wm_class = win.get_wm_class()
+            if wm_class:
+                return wm_class[-1]
+        except error.XError:
+            pass
+        return "Unknown"
+
+    # --- state changes ---
+    def _switch(self, app, title, now):
+        with self.lock:
+            if (app, title) == (self.app, self.title):
+                return
+            closed = (self.app, self.title, self.start, now)
+            self.app, self.title, self.start = app, title, now
+        if closed[0] and closed[3] > closed[2]:
+            try:
+                self.on_segment(*closed)
+            except Exception as e:
+                print(f"[ERROR] on_segment: {e}")
+
+    def _retarget(self, now):
+        win = self._active_window()
+        old = self.window
+        if old is not None and (win is None or win.id != old.id):
+            try:
+                old.change_attributes(event_mask=X.NoEventMask)
+            except error.XError:
+                pass  # window already gone
+        self.window = win
+        if win is None:
+            self._switch(None, None, now)
+            return
+        try:
+            win.change_attributes(event_mask=X.PropertyChangeMask | X.StructureNotifyMask)
+        except error.XError:
+            self.window = None
+            self._switch(None, None, now)
+            return
+        self._switch(self._window_app(win), self._window_title(win), now)
+
+    def current(self):
+        """(app, title, start) of the segment in progress."""
+        with self.lock:
+            return self.app, self.title, self.start
+
+    # --- loop ---
+    def listen(self):
+        """Subscribe to focus and title changes and open the first segment."""
+        self.running = True
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._retarget(time.time())
+
+    def handle(self, event):
+        now = time.time()
+        if event.type == X.PropertyNotify:
+            if event.window.id == self.root.id:
+                if event.atom == self.NET_ACTIVE_WINDOW:
+                    self._retarget(now)
+            elif self.window is not None and event.window.id == self.window.id \
+                    and event.atom in self.title_atoms:
+                self._switch(self.app, self._window_title(self.window), now)
+        elif event.type == X.DestroyNotify and self.window is not None \
+                and event.window.id == self.window.id:
+            self._retarget(now)
+
+    def fileno(self):
+        return self.dpy.fileno()
+
+    def dispatch(self):
+        """Handle every queued event without blocking, for callers that select() on fileno().
+
+        Returns False once the display connection is gone.
+        """
+        try:
+            while self.dpy.pending_events():
+                self.handle(self.dpy.next_event())
+        except (error.ConnectionClosedError, OSError):
+            return False
+        return True
+
+    def run(self):
+        """Block on X events until stop(); call from a dedicated thread."""
+        self.listen()
+        while self.running:
+            try:
+                event = self.dpy.next_event()
+            except (error.ConnectionClosedError, OSError):
+                break
+            self.handle(event)
+        self.close_segment()
+
+    def close_segment(self):
+        """Emit the open segment (e.g. on shutdown or checkpoint); the same app/title continues."""
+        now = time.time()
+        with self.lock:
+            closed = (self.app, self.title, self.start, now)
+            self.start = now
+        if closed[0] and now > closed[2]:
+            try:
+                self.on_segment(*closed)
+            except Exception as e:
+                print(f"[ERROR] on_segment: {e}")
+
+    def stop(self):
+        self.running = False
+        try:
+            self.dpy.close()
+        except Exception:
+            pass
+
+
+def start_title_watcher(on_segment, display_name=None, app_resolver=_process_name):
+    watcher = TitleWatcher(on_segment, display_name, app_resolver)
+    threading.Thread(target=watcher.run, daemon=True).start()
+    return watcher
+
+
+if __name__ == "__main__":
+    def print_segment(app, title, start, end):
+        print(f"[SEGMENT] {app} | {title} | {end - start:.3f} sec")
+
+    print("🟢 Watching focus and title changes (Ctrl+C to stop)...")
+    w = TitleWatcher(print_segment)
+    try:
+        w.run()
+    except KeyboardInterrupt:
+        w.close_segment()
@@ -1,17 +1,18 @@
 import os
 import time
 import json
-import psutil
 import subprocess
 from datetime import datetime
-from pynput import keyboard, mouse
+import sys
 from threading import Thread
-import lz4.frame
-import lz4.block
+from firefox_profiles import default_profile_path, recovery_file, read_session_tabs
+from offload import default_pool
+
 # ------------------------ CONFIG ------------------------
 
 IDLE_THRESHOLD_SECONDS = 60
 LOG_FILE = "activity_log.json"
+BITMAP_SAVE_INTERVAL = 60  # seconds between activity bitmap writes to the local store
 
 # ------------------------ GLOBALS ------------------------
 
@@ -20,16 +21,19 @@ mouse_last_active = time.time()
 
 current_app = None
 app_start_time = time.time()
+active_seconds = None  # per-second input bitmap, created by main()
 
 # ------------------------ ACTIVITY DETECTION ------------------------
 
 def on_key_press(key):
     global keyboard_last_active
     keyboard_last_active = time.time()
+    active_seconds.mark(keyboard_last_active)
 
 def on_mouse_event(*args):
     global mouse_last_active
     mouse_last_active = time.time()
+    active_seconds.mark(mouse_last_active)
 
 def is_idle():
     now = time.time()
@@ -58,34 +62,19 @@ def is_idle():
 #         return None
 
 
-FIREFOX_PROFILE_PATH = "/home/wassef/snap/firefox/common/.mozilla/firefox/3afnh5rk.default"
+FIREFOX_PROFILE_PATH = default_profile_path()  # from profiles.ini (native, Snap or Flatpak)
 
 def get_firefox_tabs():
-    session_file = os.path.join(
-        FIREFOX_PROFILE_PATH, "sessionstore-backups", "recovery.jsonlz4"
-    )
+    session_file = recovery_file(FIREFOX_PROFILE_PATH)
     try:
         if not os.path.exists(session_file):
             print("[⚠️] recovery.jsonlz4 not found")
             return None
 
-        with open(session_file, "rb") as f:
-            magic = f.read(8)  # Skip the 'mozLz40\0' header
-            compressed_data = f.read()
-            json_data = lz4.block.decompress(compressed_data)
-            session = json.loads(json_data)
-
-            tabs = []
-            for window in session.get("windows", []):
-                for tab in window.get("tabs", []):
-                    index = tab.get("index", 1) - 1
-                    entries = tab.get("entries", [])
-                    if index < len(entries):
-                        url = entries[index].get("url", "")
-                        title = entries[index].get("title", "")
-                        tabs.append(f"{title} ({url})")
-
-            return tabs if tabs else None
+        # Parsed in an offload worker so the listeners never wait on the GIL
+        session = default_pool().run("firefox_session", read_session_tabs, session_file)
+        tabs = [f"{title} ({url})" for title, url in session["tabs"]]
+        return tabs if tabs else None
 
     except Exception as e:
         print(f"[⚠️] Error reading Firefox tabs: {e}")
@@ -121,6 +110,7 @@ def log_activity(activity):
 
 def activity_tracker_loop():
     global current_app, app_start_time
+    last_save = time.time()
 
     while True:
         try:
@@ -142,11 +132,14 @@ def activity_tracker_loop():
                         "application": current_app,
                         "duration_seconds": round(duration),
                         "idle": idle,
-
+                        "active_seconds": active_seconds.count(app_start_time, now),
                     }
                     log_activity(activity)
                 current_app = title
                 app_start_time = now
+            if now - last_save >= BITMAP_SAVE_INTERVAL:
+                active_seconds.save()
+                last_save = now
 
             time.sleep(5)
         except Exception as e:
@@ -154,8 +147,13 @@ def activity_tracker_loop():
 
 # ------------------------ MAIN ENTRY ------------------------
 
-if __name__ == "__main__":
+def main(argv=None):
+    global active_seconds
+    from pynput import keyboard, mouse
+    from activity_bitmap import ActivityRecorder, BitmapStore
+
     print("🟢 Smart Activity Tracker Started (logging to activity_log.json)")
+    active_seconds = ActivityRecorder(BitmapStore(), source="tracking")
 
     Thread(target=activity_tracker_loop, daemon=True).start()
 
@@ -165,3 +163,8 @@ if __name__ == "__main__":
                         on_move=on_mouse_event) as m_listener:
         k_listener.join()
         m_listener.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
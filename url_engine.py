@@ -0,0 +1,303 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import namedtuple
+from functools import lru_cache
+
+# === CONFIG ===
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PSL_FILE = os.path.join(BASE_DIR, "public_suffix_list.dat")
+CATEGORIES_FILE = os.path.join(BASE_DIR, "url_categories.json")
+CACHE_SIZE = 65536
+
+HIERARCHICAL_SCHEMES = {"http", "https", "ws", "wss", "ftp"}
+WRAPPER_SCHEMES = {"view-source"}
+
+UrlParts = namedtuple("UrlParts", "scheme host port path")
+
+# === PARSING ===
+def parse_url(url):
+    """Split a URL into (scheme, host, port, path); tolerant of what browsers report.
+
+    Userinfo is dropped, hosts are lower-cased without a trailing dot, IPv6 literals keep
+    their brackets, and opaque URLs (about:, data:, mailto:) get host "". A URL without a
+    scheme ("example.com/page") is treated as http.
+    """
+    url = url.strip()
+    scheme, sep, rest = url.partition(":")
+    if not sep or not scheme or not (scheme[0].isalpha() and scheme.replace("-", "").replace("+", "").replace(".", "").isalnum()) \
+            or (rest[:1].isdigit() and "//" not in url[:len(scheme) + 3]):
+        scheme, rest = "http", "//" + url  # bare "host/path" or "host:port/path"
+    scheme = scheme.lower()
+    if scheme in WRAPPER_SCHEMES:
+        return parse_url(rest)
+    if not rest.startswith("//"):
+        return UrlParts(scheme, "", None, rest)
+
+    rest = rest[2:]
+    end = len(rest)
+    for ch in "/?#":
+        i = rest.find(ch)
+        if i != -1 and i < end:
+            end = i
+    authority, path = rest[:end], rest[end:] or "/"
+    if "@" in authority:
+        authority = authority.rpartition("@")[2]
+    port = None
+    if authority.startswith("["):
+        close = authority.find("]")
+        host = authority[:close + 1] if close != -1 else authority
+        tail = authority[close + 1:] if close != -1 else ""
+        if tail.startswith(":") and tail[1:].isdigit():
+            port = int(tail[1:])
+    else:
+        host, colon, port_text = authority.rpartition(":")
+        if not colon:
+            host = port_text
+        elif port_text.isdigit():
+            port = int(port_text)
+        elif not port_text:
+            pass
+        else:
+            host = authority
+    host = host.rstrip(".").lower()
+    if host and not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+    return UrlParts(scheme, host, port, path)
+
+
+def _is_ip(host):
+    if host.startswith("["):
+        return True
+    parts = host.split(".")
+    return len(parts) == 4 and all(p.isdigit() for p in parts)
+
+# === PUBLIC SUFFIX TRIE ===
+class SuffixTrie:
+    """Public-suffix rules stored as a trie over reversed labels ("co.uk" -> uk -> co).
+
+    Each node is a dict of child labels; the "$" key marks the end of a rule and "!" the
+    end of an exception rule. Wildcard rules are stored as a "*" child.
+    """
+
+    def __init__(self, rules=()):
+        self.root = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        exception = rule.startswith("!")
+        if exception:
+            rule = rule[1:]
+        node = self.root
+        for label in reversed(rule.split(".")):
+            node = node.setdefault(label, {})
+        node["!" if exception else "$"] = True
+
+    @classmethod
+    def from_file(cls, path=PSL_FILE):
+        trie = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("//"):
+                    continue
+                rule = line.split()[0].lower()
+                if not rule.isascii():
+                    rule = ".".join(_idna_label(label) for label in rule.split("."))
+                trie.add(rule)
+        return trie
+
+    def suffix_labels(self, labels):
+        """Number of trailing labels forming the public suffix (the implicit "*" rule gives 1)."""
+        best = 1
+        node = self.root
+        depth = 0
+        for label in reversed(labels):
+            child = node.get(label)
+            if child is None:
+                child = node.get("*")
+                if child is None:
+                    break
+            depth += 1
+            if "!" in child:
+                return depth - 1
+            if "$" in child:
+                best = depth
+            node = child
+        return best
+
+
+def _idna_label(label):
+    if label in ("*", "") or label.startswith("!"):
+        return label
+    try:
+        return label.encode("idna").decode("ascii")
+    except UnicodeError:
+        return label
+
+
+_trie = None
+
+
+def suffix_trie():
+    global _trie
+    if _trie is None:
+        _trie = SuffixTrie.from_file()
+    return _trie
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def registrable_domain(host):
+    """eTLD+1 for a host ("news.bbc.co.uk" -> "bbc.co.uk"); IPs and single labels are returned as-is."""
+    if not host or _is_ip(host) or "." not in host:
+        return host
+    labels = host.split(".")
+    n = suffix_trie().suffix_labels(labels)
+    if len(labels) <= n:
+        return host  # the host itself is a public suffix
+    return ".".join(labels[-(n + 1):])
+
+# === SITE KEYS ===
+@lru_cache(maxsize=CACHE_SIZE)
+def site_key(url):
+    """Stable key for site accounting: registrable domain for web URLs, else a scheme-level key."""
+    if not url:
+        return ""
+    parts = parse_url(url)
+    if parts.scheme in HIERARCHICAL_SCHEMES:
+        return registrable_domain(parts.host) or parts.scheme
+    if parts.scheme == "about":
+        return "about:" + parts.path.split("?", 1)[0].split("#", 1)[0]
+    if parts.scheme == "file":
+        return "file"
+    if parts.host:  # moz-extension://<uuid>/, chrome-extension://<id>/
+        return f"{parts.scheme}://{parts.host}"
+    return parts.scheme
+
+# === CATEGORIES ===
+class Categorizer:
+    """Rule-based URL categories from a JSON config (see url_categories.json)."""
+
+    def __init__(self, config):
+        self.default = config.get("default", "other")
+        self.schemes = dict(config.get("schemes", {}))
+        self.domains = {}
+        for category, domains in config.get("domains", {}).items():
+            for domain in domains:
+                self.domains[domain.lower()] = category
+        self.contains = [(rule["pattern"], rule["category"]) for rule in config.get("url_contains", [])]
+        self.classify = lru_cache(maxsize=CACHE_SIZE)(self._classify)
+
+    @classmethod
+    def from_file(cls, path=CATEGORIES_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _classify(self, url):
+        for pattern, category in self.contains:
+            if pattern in url:
+                return category
+        parts = parse_url(url)
+        host = parts.host
+        if host:
+            # Most specific first: mail.google.com, then google.com
+            stop = registrable_domain(host)
+            while True:
+                category = self.domains.get(host)
+                if category is not None:
+                    return category
+                if host == stop or "." not in host:
+                    break
+                host = host.split(".", 1)[1]
+            if host in ("localhost", "127.0.0.1", "[::1]"):
+                return self.schemes.get("localhost", self.default)
+        return self.schemes.get(parts.scheme, self.default)
+
+    def classify_batch(self, urls):
+        """Categories for a sequence of URLs; each distinct URL is classified once."""
+        classify = self.classify
+        mapping = {url: classify(url) for url in dict.fromkeys(urls)}
+        return [mapping[url] for url in urls]
+
+
+def site_keys_batch(urls):
+    mapping = {url: site_key(url) for url in dict.fromkeys(urls)}
+    return [mapping[url] for url in urls]
+
+
+_categorizer = None
+
+
+def default_categorizer():
+    global _categorizer
+    if _categorizer is None:
+        _categorizer = Categorizer.from_file()
+    return _categorizer
+
+
+def categorize(url):
+    return default_categorizer().classify(url)
+
+# === BENCHMARK ===
+def _synthetic_urls(n, distinct):
+    rng = random.Random(0)
+    hosts = ["github.com", "www.youtube.com", "news.bbc.co.uk", "mail.google.com", "foo.github.io",
+             "docs.python.org", "intranet.local", "192.168.1.10:8080", "[::1]:9222", "shop.example.co.jp"]
+    pool = []
+    for i in range(distinct):
+        kind = i % 12
+        if kind == 10:
+            pool.append("about:newtab")
+        elif kind == 11:
+            pool.append(f"file:///home/user/doc{i}.pdf")
+        else:
+            host = hosts[kind]
+            pool.append(f"https://user@{host}/path/{i}?q={i}#frag")
+    return [pool[rng.randrange(distinct)] for _ in range(n)]
+
+
+def run_benchmark(n=1_000_000, distinct=20_000):
+    urls = _synthetic_urls(n, distinct)
+    categorizer = default_categorizer()
+    suffix_trie()
+
+    t0 = time.perf_counter()
+    keys = [site_key(u) for u in dict.fromkeys(urls)]
+    cold = time.perf_counter() - t0
+    print(f"⏱️ cold parse + registrable domain: {len(keys):,} distinct URLs in {cold:.3f} s "
+          f"({len(keys) / cold:,.0f} URLs/s)")
+
+    site_key.cache_clear()
+    registrable_domain.cache_clear()
+    for label, fn in (("site_keys_batch", site_keys_batch), ("classify_batch", categorizer.classify_batch)):
+        t0 = time.perf_counter()
+        out = fn(urls)
+        elapsed = time.perf_counter() - t0
+        print(f"⏱️ {label}: {len(out):,} URLs ({distinct:,} distinct) in {elapsed:.3f} s "
+              f"({len(out) / elapsed:,.0f} URLs/s)")
+
+# === MAIN ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="URL normalisation and categorisation")
+    parser.add_argument("urls", nargs="*", help="URLs to classify (default: read stdin)")
+    parser.add_argument("--bench", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        run_benchmark()
+        return
+    urls = args.urls or [line.strip() for line in sys.stdin if line.strip()]
+    categorizer = default_categorizer()
+    for url, key, category in zip(urls, site_keys_batch(urls), categorizer.classify_batch(urls)):
+        print(f"{category:<10} {key:<30} {url}")
+
+
+if __name__ == "__main__":
+    main()